@@ -0,0 +1,138 @@
+from typing import Any, Mapping, Optional
+
+from ai_agent.scheduler import StudySchedule, schedule_for_profile
+from ai_agent.utils.catalog_index import get_catalog_index, parse_level
+from ai_agent.utils.prompt_assets import PromptAssets, get_prompt_assets
+
+# Aviso exibido no topo dos planos gerados sem o modelo
+DEGRADED_NOTICE = (
+    "> ⚠️ **Versão simplificada.** Nosso assistente de IA está indisponível no momento, "
+    "então este plano foi montado automaticamente a partir do catálogo e das suas respostas. "
+    "Você pode solicitar a versão completa e personalizada assim que o serviço normalizar."
+)
+
+# Dicas por tema e nível do questionário (0 = nunca utilizei ... 3 = avançado)
+_TOPIC_TIPS = {
+    "python": {
+        0: "Comece pela lógica de programação: variáveis, condicionais e laços. Escreva código todos os dias, mesmo que pouco.",
+        1: "Pratique manipulação de listas, dicionários e funções com pequenos scripts que resolvam problemas do seu dia a dia.",
+        2: "Aprofunde-se em módulos, tratamento de erros e testes automatizados para deixar seus scripts prontos para produção.",
+        3: "Use seu domínio de Python para automatizar os exercícios dos outros cursos e revisar boas práticas de projeto.",
+    },
+    "sql": {
+        0: "Comece entendendo tabelas, SELECT e WHERE; consultas simples bem feitas são a base de tudo.",
+        1: "Pratique JOINs e agregações (GROUP BY) em um banco de exemplo até ficarem naturais.",
+        2: "Explore window functions e CTEs para escrever consultas analíticas mais legíveis.",
+        3: "Concentre-se em modelagem de dados e performance de consultas.",
+    },
+    "cloud": {
+        0: "Antes da nuvem, garanta os fundamentos de programação e banco de dados; ela vem no final do plano.",
+        1: "Crie uma conta gratuita em um provedor e reproduza os exemplos das aulas em um ambiente real.",
+        2: "Pratique infraestrutura como código para tornar seus ambientes reproduzíveis.",
+        3: "Aproveite seu conhecimento de cloud para publicar os projetos práticos do plano.",
+    },
+}
+
+_TOOL_TIPS = {
+    "git": "Crie um repositório no GitHub logo na primeira semana e faça commits de todos os exercícios.",
+    "docker": "Instale o Docker cedo: ele vai facilitar a execução de bancos de dados e ferramentas nos próximos cursos.",
+}
+
+_TOPIC_NAMES = {"python": "Python", "sql": "SQL", "cloud": "Cloud"}
+
+
+def _overview(schedule: StudySchedule) -> str:
+    lines = ["| Semana | Período | Cursos | Horas |", "|----|----|----|----|"]
+    for week in schedule.weeks:
+        courses = ", ".join(week.courses) if week.courses else "Revisão e projetos"
+        lines.append(f"| {week.number} | {week.start:%d/%m} a {week.end:%d/%m} | {courses} | {week.hours}h |")
+    return "\n".join(lines)
+
+
+def _milestones(schedule: StudySchedule) -> str:
+    finished_in = {}
+    for course, _, last in schedule.course_spans():
+        finished_in[course] = last
+    lines = []
+    for week in schedule.weeks:
+        done = [course for course in week.courses if week.start <= finished_in[course] <= week.end]
+        if done:
+            lines.append(f"- **Semana {week.number}:** ✅ concluir {', '.join(done)}")
+        elif week.courses:
+            lines.append(f"- **Semana {week.number}:** 📌 avançar em {', '.join(week.courses)}")
+    return "\n".join(lines)
+
+
+def _tips(user_data: Mapping[str, Any]) -> str:
+    tips = []
+    for topic, name in _TOPIC_NAMES.items():
+        level = parse_level(user_data.get(f"{topic}_level"))
+        tips.append(f"- **{name}:** {_TOPIC_TIPS[topic][level]}")
+    for tool, tip in _TOOL_TIPS.items():
+        if not user_data.get(f"used_{tool}"):
+            tips.append(f"- **{tool.capitalize()}:** {tip}")
+    if user_data.get("main_challenge"):
+        tips.append(
+            f"- **Seu desafio:** você mencionou \"{user_data['main_challenge']}\". "
+            "Use os exercícios práticos de cada semana para aproximar o conteúdo desse objetivo."
+        )
+    return "\n".join(tips)
+
+
+def render_fallback_plan(user_data: Mapping[str, Any], assets: Optional[PromptAssets] = None,
+                         schedule: Optional[StudySchedule] = None) -> str:
+    """
+    Gera um plano de estudos completo em Markdown sem chamar o modelo.
+
+    Usado quando o provedor de LLM está fora do ar, lento ou saturado. O plano é
+    montado apenas com o catálogo, as guidelines e o questionário: seleção de
+    cursos pelo índice do catálogo, cronograma determinístico (ver scheduler),
+    marcos por semana e dicas de acordo com o nível do aluno.
+
+    Args:
+        user_data (Mapping): Questionário do aluno (mesmo formato do prompt).
+        assets (PromptAssets, optional): Snapshot dos arquivos de prompt.
+        schedule (StudySchedule, optional): Cronograma já calculado para o aluno.
+
+    Returns:
+        str: Plano de estudos em Markdown.
+    """
+    name = user_data.get("name") or "aluno(a)"
+    if schedule is None:
+        index = get_catalog_index(assets or get_prompt_assets())
+        schedule = schedule_for_profile(index, index.select(user_data).names, user_data)
+
+    weekly_hours = sum(hours for hours in (user_data.get("hours_per_day") or {}).values() if hours)
+    interests = user_data.get("interests") or []
+
+    intro = (
+        f"Olá, **{name}**! 🚀 Preparamos um plano de 6 semanas a partir de "
+        f"{schedule.start:%d/%m/%Y}, com cerca de **{weekly_hours}h por semana**, "
+        "começando pelos fundamentos que ainda fazem falta para você e avançando "
+        "gradualmente para temas mais complexos."
+    )
+    if interests:
+        intro += f" Também incluímos conteúdos ligados aos seus interesses: {', '.join(interests)}."
+
+    parts = [
+        f"# Plano de Estudos: {name}",
+        DEGRADED_NOTICE,
+        intro,
+        "## Visão geral",
+        _overview(schedule),
+        f"\nTotal planejado: **{schedule.scheduled_hours}h** de {schedule.available_hours}h disponíveis.",
+        "---",
+        schedule.render_markdown(name),
+        "## Marcos",
+        _milestones(schedule),
+        "## Dicas para você",
+        _tips(user_data),
+        "## Projeto prático",
+        "> 💡 Ao final de cada curso, aplique o que aprendeu em um pequeno projeto: colete dados "
+        "de uma fonte pública, trate-os com Python, armazene-os em um banco SQL e publique o "
+        "código no GitHub. Evolua o mesmo projeto a cada semana.",
+        "## Próximos passos",
+        "Siga o cronograma no seu ritmo, celebre cada curso concluído e, quando o assistente "
+        "estiver disponível, peça a versão completa do plano para ajustes mais detalhados. Bons estudos! 🎉",
+    ]
+    return "\n\n".join(parts)
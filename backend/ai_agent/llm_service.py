@@ -1,59 +1,147 @@
+import importlib
 import os
 import sys
 from loguru import logger
-from ai_agent.utils.select_model import select_model
-from ai_agent.llm_services.openai_client import OpenAIService
-from ai_agent.llm_services.deepseek_client import DeepSeekService
-from ai_agent.llm_services.openrouter_client import OpenRouterService
+from ai_agent.utils.select_model import select_models
+from ai_agent.llm_services.providers import PROVIDERS
+from ai_agent.llm_services.router import ROUTING_ENABLED, LLMRouter
+from ai_agent.llm_services.hedging import HEDGING_ENABLED, Hedger
+from ai_agent.llm_services.resilience import RESILIENCE_ENABLED, ResilientLLMService
+from ai_agent.llm_services.admission import ADMISSION_ENABLED, AdmissionControlledLLMService
+from ai_agent.llm_services.coalescing import COALESCING_ENABLED, CoalescingLLMService
+from ai_agent.llm_services.cassette import (
+    CASSETTE_LATENCY, CASSETTE_MODE, CassetteLLMService, CassetteStore, RecordingLLMService, parse_latency,
+    recorded_speed,
+)
 from ai_agent.llm_services.base_client import BaseLLMService
 
+# Serviços com classe própria; os demais provedores de PROVIDERS usam o cliente genérico.
+# Os módulos são importados só ao criar o serviço: o SDK da OpenAI (a importação mais
+# pesada do backend) fica fora da inicialização quando nenhum provedor é usado (ex.: replay).
+_SERVICE_CLASSES = {
+    'openai': ('ai_agent.llm_services.openai_client', 'OpenAIService'),
+    'deepseek': ('ai_agent.llm_services.deepseek_client', 'DeepSeekService'),
+    'openrouter': ('ai_agent.llm_services.openrouter_client', 'OpenRouterService'),
+}
+_GENERIC_SERVICE = ('ai_agent.llm_services.openai_compatible', 'OpenAICompatibleService')
 
-def initialize_llm_service() -> BaseLLMService:
+
+def _load_class(module_name: str, class_name: str) -> type:
+    """Importa o módulo de um cliente na primeira vez que ele é necessário."""
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _create_service(model_name: str, token: str) -> BaseLLMService:
     """
-    Identifica as chaves de API disponíveis, seleciona o serviço
-    e retorna a instância Singleton do cliente LLM correspondente.
+    Cria (ou obtém) a instância Singleton do serviço de um provedor.
 
-    Returns:
-        BaseLLMService: A instância Singleton do serviço LLM selecionado.
-                       Retorna None se a inicialização falhar.
+    Raises:
+        ValueError: Se o provedor for desconhecido.
+        ConnectionError: Se o cliente não puder ser inicializado.
     """
+    logger.info(f"Inicializando serviço para {model_name}...")
+    if model_name in _SERVICE_CLASSES:
+        # Calling the service class will return the Singleton instance
+        llm_service_instance = _load_class(*_SERVICE_CLASSES[model_name])(api_key=token)
+    elif model_name in PROVIDERS:
+        # Any other OpenAI-compatible provider configured in PROVIDERS
+        llm_service_instance = _load_class(*_GENERIC_SERVICE)(PROVIDERS[model_name], api_key=token)
+    else:
+        # This case should ideally not be reached due to select_models logic
+        raise ValueError(f"Tentativa de inicializar modelo desconhecido: {model_name}")
+
+    # Check if initialization inside the singleton actually succeeded
+    if not getattr(llm_service_instance, '_initialized', False):
+        # The __init__ inside the singleton should raise an error if it fails,
+        # but double-check here just in case.
+        raise ConnectionError(f"Falha ao inicializar o serviço {model_name}. Verifique os logs e a chave de API.")
+
+    logger.success(f"Serviço {llm_service_instance.name} pronto.") # Use the name property
+    return llm_service_instance
+
+
+def _wrap_provider(service: BaseLLMService) -> BaseLLMService:
+    """Acrescenta ao serviço de um provedor as retentativas e o controle de admissão habilitados."""
+    # Retentativas e circuit breaker por provedor (ver ResilientLLMService)
+    if RESILIENCE_ENABLED:
+        service = ResilientLLMService(service)
+    # Limites de taxa e de concorrência por provedor, com fila limitada (ver AdmissionController)
+    if ADMISSION_ENABLED:
+        service = AdmissionControlledLLMService(service)
+    return service
+
+
+def _create_providers() -> list:
+    """Inicializa os serviços de todos os provedores com chave de API configurada."""
     # Obtém tokens das variáveis de ambiente
     openai_token = os.getenv('OPENAI_API_KEY')
     deepseek_token = os.getenv('DEEPSEEK_API_KEY')
     openrouter_token = os.getenv('OPENROUTER_API_KEY')
 
-    # Seleciona o modelo e obtém o token
-    model_name, token = select_model(openai_token, deepseek_token, openrouter_token)
-
-    # Obtém a instância Singleton do serviço apropriado
-    llm_service_instance = None
-    try:
-        logger.info(f"Inicializando serviço para {model_name}...")
-        if model_name == 'openai':
-            # Calling OpenAIService() will return the Singleton instance
-            llm_service_instance = OpenAIService(api_key=token)
-        elif model_name == 'deepseek':
-            # Calling DeepSeekService() will return the Singleton instance
-            llm_service_instance = DeepSeekService(api_key=token)
-        elif model_name == 'openrouter': # Added
-            # Calling OpenRouterService() will return the Singleton instance
-            llm_service_instance = OpenRouterService(api_key=token)
-        else:
-            # This case should ideally not be reached due to select_model logic
-            logger.error(f"Tentativa de inicializar modelo desconhecido: {model_name}")
-            sys.exit(1) # Exit if model name is somehow invalid
-
-        # Check if initialization inside the singleton actually succeeded
-        if not llm_service_instance or not getattr(llm_service_instance, '_initialized', False):
-             # The __init__ inside the singleton should raise an error if it fails,
-             # but double-check here just in case.
-             logger.error(f"Falha ao inicializar o serviço {model_name}. Verifique os logs e a chave de API.")
-             sys.exit(1)
-
-        logger.success(f"Serviço {llm_service_instance.name} pronto.") # Use the name property
-        return llm_service_instance
-
-    except (ValueError, ConnectionError, Exception) as e:
-         logger.error(f"Erro durante a inicialização do serviço {model_name}: {e}")
-         # Exit because the service couldn't be initialized
-         sys.exit(1)
\ No newline at end of file
+    # Lista os provedores disponíveis, em ordem de prioridade
+    available = select_models(openai_token, deepseek_token, openrouter_token)
+    if not ROUTING_ENABLED:
+        available = available[:1]
+
+    store = CassetteStore() if CASSETTE_MODE == "record" else None
+    if store:
+        logger.warning(f"Gravando as respostas dos provedores em {store.directory}")
+
+    services = []
+    for model_name, token in available:
+        try:
+            service = _create_service(model_name, token)
+            if store:
+                # Grava cada resposta recebida do provedor, antes das retentativas (ver RecordingLLMService)
+                service = RecordingLLMService(service, store)
+            services.append(_wrap_provider(service))
+        except (ValueError, ConnectionError, Exception) as e:
+            # Um provedor com problema não impede o uso dos demais
+            logger.error(f"Erro durante a inicialização do serviço {model_name}: {e}")
+    return services
+
+
+def initialize_llm_service() -> BaseLLMService:
+    """
+    Identifica as chaves de API disponíveis e inicializa os serviços correspondentes.
+
+    Com mais de um provedor configurado (e LLM_ROUTING habilitado), retorna um
+    LLMRouter que distribui as chamadas entre todos eles, escolhendo o mais
+    rápido e saudável e trocando de provedor em caso de erro. Com um único
+    provedor, retorna diretamente a instância Singleton do seu cliente, a menos
+    que LLM_HEDGING esteja habilitado: nesse caso o roteador é usado mesmo com um
+    só provedor, e a requisição duplicada vai para o próprio provedor. Com
+    LLM_COALESCING habilitado, chamadas idênticas simultâneas compartilham uma
+    única requisição (ver CoalescingLLMService). LLM_CASSETTE_MODE=record grava
+    as respostas dos provedores e LLM_CASSETTE_MODE=replay as reproduz sem
+    chamar nenhum provedor (ver cassette.py).
+
+    Returns:
+        BaseLLMService: O roteador ou o serviço LLM selecionado.
+                       Encerra a aplicação se nenhum serviço puder ser inicializado.
+    """
+    if CASSETTE_MODE == "replay":
+        # Respostas gravadas (ver CassetteLLMService): nenhuma chave de API é necessária
+        store = CassetteStore()
+        logger.warning(f"Modo replay: respondendo com as gravações de {store.directory}, sem chamar provedores")
+        services = [_wrap_provider(CassetteLLMService(
+            store, latency=parse_latency(CASSETTE_LATENCY), speed=recorded_speed(CASSETTE_LATENCY)
+        ))]
+    else:
+        services = _create_providers()
+
+    if not services:
+        logger.error("Nenhum serviço LLM pôde ser inicializado. Verifique os logs e as chaves de API.")
+        # Exit because no service could be initialized
+        sys.exit(1)
+
+    if len(services) == 1 and not HEDGING_ENABLED:
+        llm_service = services[0]
+    else:
+        logger.success(f"Roteamento entre provedores habilitado: {', '.join(s.name for s in services)}")
+        if HEDGING_ENABLED:
+            logger.info("Requisições duplicadas (hedging) habilitadas para chamadas lentas")
+        llm_service = LLMRouter(services, hedger=Hedger() if HEDGING_ENABLED else None)
+
+    # Chamadas idênticas simultâneas (ex.: formulário enviado duas vezes) viram uma só requisição
+    return CoalescingLLMService(llm_service) if COALESCING_ENABLED else llm_service
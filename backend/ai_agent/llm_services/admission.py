@@ -0,0 +1,342 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
+
+from loguru import logger
+
+from ai_agent.llm_services.base_client import BaseLLMService, DelegatingLLMService
+
+# Limit the rate and concurrency of calls sent to each provider
+ADMISSION_ENABLED = os.getenv("LLM_ADMISSION", "true").lower() in ("1", "true", "yes")
+
+# Requests and estimated tokens per minute allowed per provider (0 disables the limit).
+# Each can be overridden per provider, e.g. LLM_ADMISSION_RPM_DEEPSEEK=300
+ADMISSION_RPM = int(os.getenv("LLM_ADMISSION_RPM", "500"))
+ADMISSION_TPM = int(os.getenv("LLM_ADMISSION_TPM", "400000"))
+
+# Calls outstanding at once per provider, and callers allowed to wait for a slot
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("LLM_ADMISSION_MAX_CONCURRENCY", "64"))
+ADMISSION_MAX_QUEUE = int(os.getenv("LLM_ADMISSION_MAX_QUEUE", "128"))
+
+# Longest a caller waits for admission; calls that would wait longer are rejected at once
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("LLM_ADMISSION_MAX_WAIT_SECONDS", "10"))
+
+# Completion tokens assumed for a call that does not set max_tokens
+ADMISSION_COMPLETION_TOKENS = int(os.getenv("LLM_ADMISSION_COMPLETION_TOKENS", "1500"))
+
+# Rough characters per token, used to estimate the prompt size without a tokenizer
+_CHARS_PER_TOKEN = 4
+
+# Rejection reasons reported in the stats
+QUEUE_FULL = "queue_full"
+RATE_LIMITED = "rate_limited"
+WAIT_TIMEOUT = "wait_timeout"
+
+
+def _limit(setting: str, provider: str, default: int) -> int:
+    """Per-provider override of an admission limit (LLM_ADMISSION_<SETTING>_<PROVIDER>)."""
+    value = os.getenv(f"LLM_ADMISSION_{setting}_{provider.upper()}")
+    return int(value) if value else default
+
+
+class AdmissionRejectedError(ConnectionError):
+    """Raised without calling the provider when it has no capacity left for the call."""
+
+    def __init__(self, provider: str, reason: str, retry_after: float):
+        super().__init__(f"{provider} is at capacity ({reason}); retry in {retry_after:.0f}s")
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def estimate_call_tokens(messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> int:
+    """Prompt tokens (from the message length) plus the completion tokens the call may use."""
+    prompt_chars = sum(len(message.get("content") or "") for message in messages)
+    return prompt_chars // _CHARS_PER_TOKEN + int(kwargs.get("max_tokens") or ADMISSION_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units per minute, up to one minute's worth.
+
+    Not thread-safe on its own; AdmissionController guards it with its lock.
+    A `per_minute` of 0 means no limit.
+    """
+
+    def __init__(self, per_minute: int, clock: Callable[[], float] = time.monotonic):
+        self.per_minute = max(0, per_minute)
+        self._clock = clock
+        self._tokens = float(self.per_minute)
+        self._updated = clock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.per_minute == 0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.per_minute, self._tokens + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def available(self) -> float:
+        if self.unlimited:
+            return float("inf")
+        self._refill()
+        return self._tokens
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (a call larger than the bucket waits for a full one)."""
+        if self.unlimited:
+            return 0.0
+        missing = min(amount, self.per_minute) - self.available()
+        return max(0.0, missing * 60 / self.per_minute)
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self._refill()
+            self._tokens -= min(amount, self.per_minute)
+
+
+class _Waiter:
+    """A queued caller; `wake` is called (from any thread) when it may be admitted."""
+
+    def __init__(self, tokens: int, wake: Callable[[], None]):
+        self.tokens = tokens
+        self.wake = wake
+        self.admitted = False
+
+
+class AdmissionController:
+    """
+    Admission control for one provider: rate limits, a bulkhead and a bounded queue.
+
+    A call is admitted when the requests-per-minute and tokens-per-minute
+    buckets can pay for it and fewer than `max_concurrency` calls are in
+    flight. Otherwise it waits in a FIFO queue of at most `max_queue` callers.
+    A call is rejected at once with AdmissionRejectedError when the queue is
+    full or when the rate limits alone would keep it waiting longer than
+    `max_wait`, and after `max_wait` seconds in the queue; the error carries a
+    retry-after estimate.
+    """
+
+    def __init__(self, name: str, rpm: int = ADMISSION_RPM, tpm: int = ADMISSION_TPM,
+                 max_concurrency: int = ADMISSION_MAX_CONCURRENCY, max_queue: int = ADMISSION_MAX_QUEUE,
+                 max_wait: float = ADMISSION_MAX_WAIT_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(rpm, clock)
+        self._tokens = TokenBucket(tpm, clock)
+        self._queue: Deque[_Waiter] = deque()
+        self._active = 0
+        self._admitted = 0
+        self._queued = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._rejected: Dict[str, int] = {QUEUE_FULL: 0, RATE_LIMITED: 0, WAIT_TIMEOUT: 0}
+
+    @classmethod
+    def for_provider(cls, name: str) -> "AdmissionController":
+        """Controller with the default limits and any LLM_ADMISSION_*_<PROVIDER> overrides."""
+        return cls(
+            name,
+            rpm=_limit("RPM", name, ADMISSION_RPM),
+            tpm=_limit("TPM", name, ADMISSION_TPM),
+            max_concurrency=_limit("MAX_CONCURRENCY", name, ADMISSION_MAX_CONCURRENCY),
+            max_queue=_limit("MAX_QUEUE", name, ADMISSION_MAX_QUEUE),
+        )
+
+    # --- Internals (called with the lock held) ---
+
+    def _rate_wait(self, tokens: int) -> float:
+        return max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+
+    def _backlog_wait(self, tokens: int) -> float:
+        """Rate-limit wait for this call after everything already queued is paid for."""
+        queued_tokens = sum(waiter.tokens for waiter in self._queue) + tokens
+        return max(self._requests.wait_time(len(self._queue) + 1), self._tokens.wait_time(queued_tokens))
+
+    def _admit(self, tokens: int) -> None:
+        self._requests.take(1)
+        self._tokens.take(tokens)
+        self._active += 1
+        self._admitted += 1
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejectedError:
+        self._rejected[reason] += 1
+        return AdmissionRejectedError(self.name, reason, max(1.0, retry_after))
+
+    def _wake_head(self) -> None:
+        if self._queue:
+            self._queue[0].wake()
+
+    # --- Permit lifecycle ---
+
+    def _enter(self, tokens: int, wake: Callable[[], None]) -> Optional[_Waiter]:
+        """Admits the call (returns None), queues it (returns its waiter) or raises AdmissionRejectedError."""
+        with self._lock:
+            if not self._queue and self._active < self.max_concurrency and self._rate_wait(tokens) == 0:
+                self._admit(tokens)
+                return None
+            backlog = self._backlog_wait(tokens)
+            if len(self._queue) >= self.max_queue:
+                error = self._reject(QUEUE_FULL, max(backlog, 1.0))
+            elif backlog > self.max_wait:
+                error = self._reject(RATE_LIMITED, backlog)
+            else:
+                waiter = _Waiter(tokens, wake)
+                self._queue.append(waiter)
+                self._queued += 1
+                return waiter
+        logger.warning(f"Admission rejected for {self.name}: {error}")
+        raise error
+
+    def _try_admit(self, waiter: _Waiter) -> Optional[float]:
+        """Admits the waiter if it is at the head of the queue and capacity allows; else returns
+        how long to sleep before trying again (None: until woken)."""
+        with self._lock:
+            if self._queue[0] is not waiter or self._active >= self.max_concurrency:
+                return None
+            delay = self._rate_wait(waiter.tokens)
+            if delay > 0:
+                return delay
+            self._admit(waiter.tokens)
+            waiter.admitted = True
+            self._queue.popleft()
+            self._wake_head()
+            return 0.0
+
+    def _finish_wait(self, waiter: _Waiter, started: float, deadline: float) -> None:
+        """Records the wait; a waiter that was not admitted (timed out or cancelled) leaves the queue."""
+        now = self._clock()
+        with self._lock:
+            self._wait_total += now - started
+            self._wait_max = max(self._wait_max, now - started)
+            if waiter.admitted:
+                return
+            was_head = bool(self._queue) and self._queue[0] is waiter
+            self._queue.remove(waiter)
+            if was_head:
+                self._wake_head()
+            if now < deadline:
+                return
+            error = self._reject(WAIT_TIMEOUT, self._backlog_wait(0))
+        logger.warning(f"Admission rejected for {self.name}: {error}")
+        raise error
+
+    def release(self) -> None:
+        """Frees the slot of a finished call."""
+        with self._lock:
+            self._active -= 1
+            self._wake_head()
+
+    async def acquire(self, tokens: int) -> None:
+        """Waits until the call may be sent to the provider; call `release()` when it ends."""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = self._enter(tokens, lambda: loop.call_soon_threadsafe(event.set))
+        if waiter is None:
+            return
+
+        started = self._clock()
+        deadline = started + self.max_wait
+        try:
+            while True:
+                event.clear()
+                delay = self._try_admit(waiter)
+                if delay == 0:
+                    return
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(remaining, delay or remaining))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._finish_wait(waiter, started, deadline)
+
+    def acquire_sync(self, tokens: int) -> None:
+        """Blocking version of `acquire`, for calls made from worker threads."""
+        event = threading.Event()
+        waiter = self._enter(tokens, event.set)
+        if waiter is None:
+            return
+
+        started = self._clock()
+        deadline = started + self.max_wait
+        try:
+            while True:
+                event.clear()
+                delay = self._try_admit(waiter)
+                if delay == 0:
+                    return
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    break
+                event.wait(timeout=min(remaining, delay or remaining))
+        finally:
+            self._finish_wait(waiter, started, deadline)
+
+    def stats(self) -> Dict[str, Any]:
+        """Slots in use, queue depth, wait times, rejections and the rate-limit headroom."""
+        with self._lock:
+            return {
+                "active": self._active,
+                "max_concurrency": self.max_concurrency,
+                "queue_depth": len(self._queue),
+                "max_queue": self.max_queue,
+                "admitted": self._admitted,
+                "queued": self._queued,
+                "mean_wait_seconds": round(self._wait_total / self._queued, 3) if self._queued else 0.0,
+                "max_wait_seconds": round(self._wait_max, 3),
+                "rejected": dict(self._rejected),
+                "requests_available": None if self._requests.unlimited else int(self._requests.available()),
+                "tokens_available": None if self._tokens.unlimited else int(self._tokens.available()),
+            }
+
+
+class AdmissionControlledLLMService(DelegatingLLMService):
+    """
+    Sends calls to the wrapped provider only when its AdmissionController admits them.
+
+    The slot is held for the whole call, including retries and, for streams,
+    until the stream is closed.
+    """
+
+    def __init__(self, service: BaseLLMService, controller: Optional[AdmissionController] = None):
+        super().__init__(service)
+        self.controller = controller or AdmissionController.for_provider(service.name)
+
+    def chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        self.controller.acquire_sync(estimate_call_tokens(messages, kwargs))
+        try:
+            return self.service.chat_completion(messages, **kwargs)
+        finally:
+            self.controller.release()
+
+    async def achat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        await self.controller.acquire(estimate_call_tokens(messages, kwargs))
+        try:
+            return await self.service.achat_completion(messages, **kwargs)
+        finally:
+            self.controller.release()
+
+    async def astream_chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> AsyncIterator[str]:
+        await self.controller.acquire(estimate_call_tokens(messages, kwargs))
+        stream = self.service.astream_chat_completion(messages, **kwargs)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+            self.controller.release()
+
+    def admission_stats(self) -> Dict[str, Any]:
+        return self.controller.stats()
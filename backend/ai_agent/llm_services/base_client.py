@@ -1,5 +1,6 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, List, Dict
+from typing import Any, AsyncIterator, List, Dict
 
 class BaseLLMService(ABC):
     """  
@@ -53,3 +54,109 @@ class BaseLLMService(ABC):
                         de API, problemas de conexão, falhas de autenticação, etc.  
         """
         raise NotImplementedError
+
+    async def achat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        """
+        Versão assíncrona de `chat_completion`, para uso dentro do event loop.
+
+        Os clientes com SDK assíncrono sobrescrevem este método com chamadas
+        nativas. A implementação padrão executa `chat_completion` em uma thread
+        separada, para que o event loop não fique bloqueado durante a geração.
+
+        Args:
+            messages (List[Dict[str, str]]): Histórico da conversa (ver `chat_completion`).
+            **kwargs (Any): Argumentos específicos da API do LLM.
+
+        Retorna:
+            str: A resposta em texto gerada pelo LLM.
+        """
+        return await asyncio.to_thread(self.chat_completion, messages, **kwargs)
+
+    async def astream_chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> AsyncIterator[str]:
+        """
+        Gera a resposta em partes, à medida que o provedor as emite.
+
+        Os clientes com suporte a streaming sobrescrevem este método. A
+        implementação padrão entrega a resposta completa de `achat_completion`
+        em uma única parte.
+
+        Args:
+            messages (List[Dict[str, str]]): Histórico da conversa (ver `chat_completion`).
+            **kwargs (Any): Argumentos específicos da API do LLM.
+
+        Retorna:
+            AsyncIterator[str]: Trechos do texto gerado, na ordem.
+        """
+        text = await self.achat_completion(messages, **kwargs)
+        if text:
+            yield text
+
+    async def warm_up(self) -> int:
+        """
+        Abre conexões com o provedor antes da primeira requisição real.
+
+        Chamado no startup da aplicação. A implementação padrão não faz nada.
+
+        Retorna:
+            int: Número de conexões abertas.
+        """
+        return 0
+
+    async def aclose(self) -> None:
+        """Libera as conexões mantidas pelo cliente; chamado no shutdown da aplicação."""
+        return None
+
+    def usage_stats(self) -> Dict[str, Any]:
+        """
+        Retorna o consumo acumulado de tokens do serviço, incluindo a taxa de
+        acerto do cache de prompt do provedor.
+
+        Retorna:
+            Dict[str, Any]: Totais de tokens e `cache_hit_ratio`, ou um dicionário
+                            vazio se o serviço não registrar consumo.
+        """
+        tracker = getattr(self, "usage", None)
+        return tracker.snapshot() if tracker else {}
+
+
+class DelegatingLLMService(BaseLLMService):
+    """
+    Base para serviços que envolvem outro serviço LLM e acrescentam um comportamento
+    (retentativas, gravação de respostas, etc.).
+
+    Por padrão todas as chamadas são repassadas ao serviço envolvido; as subclasses
+    sobrescrevem apenas os métodos que precisam alterar.
+    """
+
+    def __init__(self, service: BaseLLMService):
+        self.service = service
+
+    def __getattr__(self, attribute: str) -> Any:
+        # Atributos extras do serviço envolvido (ex.: routing_stats do roteador) continuam acessíveis
+        if attribute == "service":
+            raise AttributeError(attribute)
+        return getattr(self.service, attribute)
+
+    @property
+    def name(self) -> str:
+        """Retorna o nome do serviço envolvido."""
+        return self.service.name
+
+    def chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        return self.service.chat_completion(messages, **kwargs)
+
+    async def achat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        return await self.service.achat_completion(messages, **kwargs)
+
+    async def astream_chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> AsyncIterator[str]:
+        async for chunk in self.service.astream_chat_completion(messages, **kwargs):
+            yield chunk
+
+    async def warm_up(self) -> int:
+        return await self.service.warm_up()
+
+    async def aclose(self) -> None:
+        await self.service.aclose()
+
+    def usage_stats(self) -> Dict[str, Any]:
+        return self.service.usage_stats()
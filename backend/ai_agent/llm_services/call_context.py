@@ -0,0 +1,41 @@
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Name of the API endpoint on whose behalf the current LLM call is made.
+# Each request runs in its own task (and context), so setting it once at the
+# start of a service method labels every LLM call made while serving it.
+current_endpoint: ContextVar[str] = ContextVar("llm_endpoint", default="default")
+
+
+@dataclass
+class RequestScope:
+    """
+    Identifies the LLM calls made while serving one request, for the call ledger.
+
+    The scope is mutable and shared with the tasks started by the request (hedged
+    attempts, coalesced calls), so a plan id set after the calls still reaches them.
+    """
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    plan_id: Optional[int] = None
+    calls: int = 0
+
+
+current_scope: ContextVar[Optional[RequestScope]] = ContextVar("llm_request_scope", default=None)
+
+
+def set_endpoint(name: str) -> None:
+    """Labels the LLM calls made from now on in the current request."""
+    current_endpoint.set(name)
+    current_scope.set(RequestScope())
+
+
+def get_endpoint() -> str:
+    """Returns the endpoint label of the current request."""
+    return current_endpoint.get()
+
+
+def get_scope() -> Optional[RequestScope]:
+    """Returns the scope of the current request, or None outside a labelled request."""
+    return current_scope.get()
@@ -0,0 +1,282 @@
+import asyncio
+import datetime
+import gzip
+import json
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from ai_agent.llm_services.base_client import BaseLLMService, DelegatingLLMService
+from ai_agent.llm_services.coalescing import request_key
+from ai_agent.llm_services.usage import UsageTracker, last_call_usage
+
+# "record" saves every provider response to the cassette store; "replay" answers from
+# the store without calling any provider (no API key needed); empty disables both
+CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "").lower()
+
+# Directory of the cassette store (one gzip-compressed JSON file per request)
+CASSETTE_DIR = Path(os.getenv(
+    "LLM_CASSETTE_DIR", Path(__file__).resolve().parents[3] / "data" / "cassettes"
+))
+
+# Replay latency: "recorded" (optionally scaled, e.g. "recorded:0.5"), "none",
+# "fixed:<s>", "uniform:<min>,<max>" or "lognormal:<median>,<sigma>"
+CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "recorded")
+
+# What replay does for a request that was never recorded: "error", or "any" to answer
+# with a recording chosen deterministically from the request hash (for load tests
+# whose prompts differ from the recorded ones)
+CASSETTE_ON_MISS = os.getenv("LLM_CASSETTE_ON_MISS", "error").lower()
+
+_FORMAT = 1
+
+# Words per chunk when a non-streamed recording is replayed as a stream
+_WORDS_PER_CHUNK = 4
+_WORDS = re.compile(r"\S+\s*|\s+")
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode for a request that is not in the cassette store."""
+
+
+class CassetteStore:
+    """
+    On-disk store of recorded LLM responses, keyed by request hash.
+
+    Each recording is a small gzip-compressed JSON file under a two-character
+    shard directory. Recordings are read once and then kept in memory.
+    """
+
+    def __init__(self, directory: Path = CASSETTE_DIR):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._keys: Optional[List[str]] = None
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json.gz"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+        path = self._path(key)
+        if not path.exists():
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            recording = json.load(file)
+        with self._lock:
+            self._cache[key] = recording
+        return recording
+
+    def put(self, key: str, recording: Dict[str, Any]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(temporary, "wt", encoding="utf-8") as file:
+            json.dump(recording, file, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporary, path)
+        with self._lock:
+            self._cache[key] = recording
+            if self._keys is not None and key not in self._keys:
+                self._keys.append(key)
+
+    def keys(self) -> List[str]:
+        """Keys of every recording in the store, in a stable order."""
+        with self._lock:
+            if self._keys is None:
+                self._keys = sorted(path.name.split(".")[0] for path in self.directory.glob("*/*.json.gz"))
+            return list(self._keys)
+
+
+def parse_latency(spec: str) -> Optional[Callable[[], float]]:
+    """
+    Latency sampler for replay, or None to use the recorded timings.
+
+    See CASSETTE_LATENCY for the accepted forms. "recorded:<factor>" returns None
+    as well; the factor is read by `recorded_speed`.
+    """
+    kind, _, arguments = spec.strip().lower().partition(":")
+    values = [float(value) for value in arguments.split(",") if value.strip()]
+    if kind == "recorded":
+        return None
+    if kind == "none":
+        return lambda: 0.0
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda: median * random.lognormvariate(0, sigma)
+    raise ValueError(f"Invalid cassette latency specification: {spec!r}")
+
+
+def recorded_speed(spec: str) -> float:
+    """Factor applied to the recorded timings ("recorded:0.5" replays twice as fast)."""
+    kind, _, argument = spec.strip().lower().partition(":")
+    return float(argument) if kind == "recorded" and argument else 1.0
+
+
+class RecordingLLMService(DelegatingLLMService):
+    """
+    Forwards calls to a real provider and saves each successful response.
+
+    Recordings hold the response text, the total latency, the token usage and,
+    for streams, the delay before every chunk. Streams that end early (client
+    disconnect, error) are not recorded.
+    """
+
+    def __init__(self, service: BaseLLMService, store: CassetteStore, clock: Callable[[], float] = time.monotonic):
+        super().__init__(service)
+        self.store = store
+        self._clock = clock
+
+    def _save(self, messages: List[Dict[str, str]], kwargs: Dict[str, Any], text: str, latency: float,
+              chunks: Optional[List[List[Any]]] = None) -> None:
+        recording = {
+            "format": _FORMAT,
+            "provider": self.service.name,
+            "text": text,
+            "latency_ms": round(latency * 1000),
+            "chunks": chunks,
+            "usage": last_call_usage.get(),
+            "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        }
+        try:
+            self.store.put(request_key(messages, kwargs), recording)
+        except OSError as e:
+            logger.error(f"Failed to save LLM recording: {e}")
+
+    def chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        last_call_usage.set(None)
+        started = self._clock()
+        text = self.service.chat_completion(messages, **kwargs)
+        self._save(messages, kwargs, text, self._clock() - started)
+        return text
+
+    async def achat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        last_call_usage.set(None)
+        started = self._clock()
+        text = await self.service.achat_completion(messages, **kwargs)
+        self._save(messages, kwargs, text, self._clock() - started)
+        return text
+
+    async def astream_chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> AsyncIterator[str]:
+        last_call_usage.set(None)
+        started = previous = self._clock()
+        chunks: List[List[Any]] = []
+        stream = self.service.astream_chat_completion(messages, **kwargs)
+        try:
+            async for chunk in stream:
+                now = self._clock()
+                chunks.append([round((now - previous) * 1000), chunk])
+                previous = now
+                yield chunk
+        finally:
+            await stream.aclose()
+        self._save(messages, kwargs, "".join(chunk for _, chunk in chunks), self._clock() - started, chunks)
+
+
+class CassetteLLMService(BaseLLMService):
+    """
+    Answers from recorded responses instead of calling a provider.
+
+    Requests are matched by the same hash as the recording (messages and call
+    arguments). Responses are replayed with the recorded timings, optionally
+    scaled, or with latencies drawn from `latency`; for streams the recorded
+    chunk delays are scaled to the drawn total. Recorded token usage is added to
+    `usage_stats()` as if the call had been made.
+    """
+
+    def __init__(self, store: CassetteStore, latency: Optional[Callable[[], float]] = None, speed: float = 1.0,
+                 on_miss: str = CASSETTE_ON_MISS, asleep: Callable[[float], Any] = asyncio.sleep,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.store = store
+        self.latency = latency
+        self.speed = speed
+        self.on_miss = on_miss
+        self._asleep = asleep
+        self._sleep = sleep
+        self.usage = UsageTracker(self.name)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._initialized = True
+
+    @property
+    def name(self) -> str:
+        """Returns the service name."""
+        return "cassette"
+
+    def _recording(self, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        key = request_key(messages, kwargs)
+        recording = self.store.get(key)
+        with self._lock:
+            if recording is not None:
+                self._hits += 1
+            else:
+                self._misses += 1
+        if recording is None:
+            keys = self.store.keys() if self.on_miss == "any" else []
+            if not keys:
+                raise CassetteMissError(f"No recording for request {key[:12]} in {self.store.directory}")
+            recording = self.store.get(keys[int(key, 16) % len(keys)])
+        usage = recording.get("usage") or {}
+        self.usage.record(SimpleNamespace(
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            prompt_cache_hit_tokens=usage.get("cached_tokens", 0),
+        ))
+        return recording
+
+    def _chunks(self, recording: Dict[str, Any]) -> List[List[Any]]:
+        """(delay in seconds, text) pairs for a stream replay."""
+        chunks = recording.get("chunks")
+        if not chunks:
+            # Recorded without streaming: split the text and spread the latency evenly
+            words = _WORDS.findall(recording["text"])
+            pieces = ["".join(words[i:i + _WORDS_PER_CHUNK]) for i in range(0, len(words), _WORDS_PER_CHUNK)]
+            step = recording["latency_ms"] / max(1, len(pieces))
+            chunks = [[step, piece] for piece in pieces]
+        recorded_total = sum(delay for delay, _ in chunks)
+        if self.latency is not None:
+            target = self.latency() * 1000
+            scale = target / recorded_total if recorded_total else 0.0
+            return [[delay * scale / 1000, text] for delay, text in chunks]
+        return [[delay * self.speed / 1000, text] for delay, text in chunks]
+
+    def _delay(self, recording: Dict[str, Any]) -> float:
+        if self.latency is not None:
+            return self.latency()
+        return recording["latency_ms"] / 1000 * self.speed
+
+    def chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        recording = self._recording(messages, kwargs)
+        self._sleep(self._delay(recording))
+        return recording["text"]
+
+    async def achat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        recording = self._recording(messages, kwargs)
+        await self._asleep(self._delay(recording))
+        return recording["text"]
+
+    async def astream_chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> AsyncIterator[str]:
+        recording = self._recording(messages, kwargs)
+        for delay, text in self._chunks(recording):
+            if delay > 0:
+                await self._asleep(delay)
+            yield text
+
+    def cassette_stats(self) -> Dict[str, Any]:
+        """Recorded responses found and not found for the requests replayed."""
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "on_miss": self.on_miss,
+                    "directory": str(self.store.directory)}
@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+from loguru import logger
+
+from ai_agent.llm_services.base_client import BaseLLMService, DelegatingLLMService
+
+T = TypeVar("T")
+
+# Let concurrent identical LLM calls share a single upstream request
+COALESCING_ENABLED = os.getenv("LLM_COALESCING", "true").lower() in ("1", "true", "yes")
+
+
+class _Flight:
+    """One upstream call and the number of callers waiting on it."""
+
+    def __init__(self, task: "asyncio.Future"):
+        self.task = task
+        self.waiters = 0
+
+
+class _SyncFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the same
+    key wait for that call and all receive its result (or its exception).
+
+    The call runs in its own task, so a caller that goes away (client
+    disconnect, deadline) does not cancel it for the others; it is cancelled
+    only when every caller has left.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._sync_flights: Dict[Hashable, _SyncFlight] = {}
+        self._stats = {"calls": 0, "upstream": 0, "coalesced": 0}
+
+    def _count(self, leader: bool) -> None:
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["upstream" if leader else "coalesced"] += 1
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Awaits `fn()`, or the identical call already in flight for `key`."""
+        flight = self._flights.get(key)
+        leader = flight is None or flight.task.cancelled()
+        if leader:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda _, finished=flight: self._forget(key, finished))
+        else:
+            logger.debug(f"{self.name}: joining in-flight call {str(key)[:12]}")
+        self._count(leader)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def do_sync(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Thread-based version of `do` for blocking calls."""
+        with self._lock:
+            flight = self._sync_flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._sync_flights[key] = _SyncFlight()
+        self._count(leader)
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._sync_flights.pop(key, None)
+            flight.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls received, upstream calls made and calls served by another call's result."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights) + len(self._sync_flights)
+        stats["saved_ratio"] = round(stats["coalesced"] / stats["calls"], 3) if stats["calls"] else 0.0
+        return stats
+
+
+def request_key(messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> str:
+    """SHA-256 of the exact message list and call arguments."""
+    payload = json.dumps({"messages": messages, "kwargs": kwargs}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CoalescingLLMService(DelegatingLLMService):
+    """
+    Shares one upstream call among concurrent identical chat completions.
+
+    Keyed on the exact message list and arguments, so only true duplicates
+    (e.g. a double-submitted form) are merged. Streams are not coalesced: each
+    stream is consumed by its own client.
+    """
+
+    def __init__(self, service: BaseLLMService):
+        super().__init__(service)
+        self.flight = SingleFlight(f"{service.name} coalescing")
+
+    def chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        return self.flight.do_sync(
+            request_key(messages, kwargs), lambda: self.service.chat_completion(messages, **kwargs)
+        )
+
+    async def achat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        return await self.flight.do(
+            request_key(messages, kwargs), lambda: self.service.achat_completion(messages, **kwargs)
+        )
+
+    def coalescing_stats(self) -> Dict[str, Any]:
+        return self.flight.stats()
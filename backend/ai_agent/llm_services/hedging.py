@@ -0,0 +1,191 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from loguru import logger
+
+from ai_agent.llm_services.call_context import get_endpoint
+
+T = TypeVar("T")
+
+
+def _parse_budgets(value: str) -> Dict[str, float]:
+    """Parses "generate_plan=0.1,continue_chat=0.05" into a dict."""
+    budgets = {}
+    for item in value.split(","):
+        if "=" in item:
+            endpoint, budget = item.split("=", 1)
+            budgets[endpoint.strip()] = float(budget)
+    return budgets
+
+
+# Send a duplicate (hedge) request when the first one is slower than usual
+HEDGING_ENABLED = os.getenv("LLM_HEDGING", "false").lower() in ("1", "true", "yes")
+
+# The hedge fires when a call has been waiting longer than this latency quantile
+HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.9"))
+
+# Never hedge before this many seconds, however fast the endpoint usually is
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1.0"))
+
+# Threshold used until an endpoint has HEDGE_MIN_SAMPLES latency samples
+HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SECONDS", "15"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# Number of recent calls per endpoint used for the quantile and the budget
+HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+
+# Fraction of an endpoint's recent calls that may send a hedge (caps the extra spend).
+# LLM_HEDGE_BUDGETS overrides it per endpoint, e.g. "generate_plan=0.1,continue_chat=0"
+HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+HEDGE_BUDGETS = _parse_budgets(os.getenv("LLM_HEDGE_BUDGETS", ""))
+
+
+class _EndpointHedging:
+    """Latency samples and hedge counters of one endpoint."""
+
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.hedged = deque(maxlen=window)  # one flag per call
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+
+class Hedger:
+    """
+    Races a duplicate request against calls that take longer than usual.
+
+    A call starts on the primary provider. If it has not completed after the
+    endpoint's adaptive threshold (the HEDGE_QUANTILE of its recent latencies),
+    the same request is sent to a backup provider; whichever completes first
+    wins and the other one is cancelled. For streams, "completed" means the
+    first chunk arrived.
+
+    Each endpoint (see `call_context`) has a budget: at most `budget` of its
+    last HEDGE_WINDOW calls (counting at least HEDGE_MIN_SAMPLES) may be hedged,
+    so a provider slowdown can't double the spend.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, _EndpointHedging] = {}
+
+    def _state(self, endpoint: str) -> _EndpointHedging:
+        with self._lock:
+            state = self._endpoints.get(endpoint)
+            if state is None:
+                state = self._endpoints[endpoint] = _EndpointHedging(HEDGE_WINDOW)
+            return state
+
+    @staticmethod
+    def budget(endpoint: str) -> float:
+        """Fraction of the endpoint's calls that may be hedged."""
+        return HEDGE_BUDGETS.get(endpoint, HEDGE_BUDGET)
+
+    def threshold(self, endpoint: str) -> float:
+        """Seconds to wait before hedging a call of this endpoint."""
+        state = self._state(endpoint)
+        with self._lock:
+            samples = sorted(state.latencies)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY_SECONDS
+        index = min(len(samples) - 1, max(0, math.ceil(HEDGE_QUANTILE * len(samples)) - 1))
+        return max(HEDGE_MIN_DELAY_SECONDS, samples[index])
+
+    def _take_budget(self, endpoint: str, state: _EndpointHedging) -> bool:
+        with self._lock:
+            # Relative to the calls actually observed (at least HEDGE_MIN_SAMPLES), so a
+            # fresh or quiet endpoint doesn't get a whole window's worth of hedges up front
+            return sum(state.hedged) < self.budget(endpoint) * max(len(state.hedged), HEDGE_MIN_SAMPLES)
+
+    def _record(self, state: _EndpointHedging, hedged: bool, backup_won: bool, latency: Optional[float]) -> None:
+        with self._lock:
+            state.calls += 1
+            state.hedged.append(hedged)
+            if hedged:
+                state.hedges += 1
+            if backup_won:
+                state.hedge_wins += 1
+            if latency is not None:
+                state.latencies.append(latency)
+
+    @staticmethod
+    async def _first_success(tasks: List[asyncio.Future]) -> asyncio.Future:
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in tasks:
+                if task in done:
+                    if task.exception() is None:
+                        return task
+                    error = task.exception()
+        raise error
+
+    async def race(self, primary: Callable[[], Awaitable[T]], backup: Callable[[], Awaitable[T]],
+                   discard: Optional[Callable[[T], Awaitable[Any]]] = None) -> T:
+        """
+        Runs `primary()`, and `backup()` too if the primary is slow and the budget allows.
+
+        Args:
+            primary: Starts the call on the primary provider.
+            backup: Starts the same call on the backup provider.
+            discard: Releases the result of a call that completed but lost the race
+                     (e.g. closes an open stream).
+
+        Returns:
+            The result of the first call to complete successfully.
+
+        Raises:
+            Exception: The last error, when every started call failed.
+        """
+        endpoint = get_endpoint()
+        state = self._state(endpoint)
+        started = self._clock()
+        tasks = [asyncio.ensure_future(primary())]
+        winner = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.threshold(endpoint))
+            if not done and self._take_budget(endpoint, state):
+                logger.info(
+                    f"LLM call for {endpoint} still pending after {self._clock() - started:.1f}s, sending hedge request"
+                )
+                tasks.append(asyncio.ensure_future(backup()))
+            winner = await self._first_success(tasks)
+            return winner.result()
+        finally:
+            losers = [task for task in tasks if task is not winner]
+            for task in losers:
+                task.cancel()
+            results = await asyncio.gather(*losers, return_exceptions=True)
+            if discard:
+                for result in results:
+                    if not isinstance(result, BaseException):
+                        await discard(result)
+            self._record(
+                state,
+                hedged=len(tasks) > 1,
+                backup_won=winner is not None and winner is not tasks[0],
+                latency=self._clock() - started if winner is not None else None,
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-endpoint hedge threshold, budget and counters."""
+        with self._lock:
+            endpoints = dict(self._endpoints)
+        stats = {}
+        for endpoint, state in endpoints.items():
+            stats[endpoint] = {
+                "threshold_seconds": round(self.threshold(endpoint), 3),
+                "budget": self.budget(endpoint),
+                "calls": state.calls,
+                "hedged": state.hedges,
+                "hedge_wins": state.hedge_wins,
+            }
+        return stats
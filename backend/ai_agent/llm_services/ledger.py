@@ -0,0 +1,185 @@
+import datetime
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from ai_agent.llm_services.call_context import get_endpoint, get_scope
+
+# Record every provider call (tokens, latency, cost) in the llmcall table
+LEDGER_ENABLED = os.getenv("LLM_LEDGER", "true").lower() in ("1", "true", "yes")
+
+# Pending entries are written at least this often, or as soon as a batch is full
+LEDGER_FLUSH_SECONDS = float(os.getenv("LLM_LEDGER_FLUSH_SECONDS", "2"))
+LEDGER_BATCH_SIZE = int(os.getenv("LLM_LEDGER_BATCH_SIZE", "200"))
+
+# Entries kept in memory while the database is slow or down; newer ones are dropped beyond it
+LEDGER_MAX_PENDING = int(os.getenv("LLM_LEDGER_MAX_PENDING", "10000"))
+
+# USD per million tokens: (prompt, cached prompt, completion). Models missing here get no
+# cost estimate; LLM_PRICES (JSON, same shape) adds or overrides entries.
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "openai/gpt-4o-mini": (0.15, 0.075, 0.60),
+    "deepseek-chat": (0.28, 0.028, 0.42),
+}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+
+# (new ledger rows, (request_id, plan_id) attributions) -> None
+LedgerSink = Callable[[List[Dict[str, Any]], List[Tuple[str, int]]], None]
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> Optional[float]:
+    """Estimated price of one call in USD, or None when the model has no known price."""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    prompt_price, cached_price, completion_price = prices
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    return round((uncached * prompt_price + cached_tokens * cached_price
+                  + completion_tokens * completion_price) / 1_000_000, 8)
+
+
+class CallLedger:
+    """
+    Collects one entry per provider call and writes them to the database in batches.
+
+    Recording only appends to an in-memory list; a background thread hands the
+    pending entries to `sink` every `flush_interval` seconds, or earlier when
+    `batch_size` entries are waiting, so requests never wait on the write. Until
+    `start` is called (e.g. in tests) entries are discarded.
+
+    Plan generations only know their plan id after the LLM answered; `attribute_plan`
+    queues an update that links the calls of the current request to the new plan.
+    """
+
+    def __init__(self, flush_interval: float = LEDGER_FLUSH_SECONDS, batch_size: int = LEDGER_BATCH_SIZE,
+                 max_pending: int = LEDGER_MAX_PENDING, enabled: bool = LEDGER_ENABLED):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.enabled = enabled
+        self._sink: Optional[LedgerSink] = None
+        self._lock = threading.Lock()
+        self._calls: List[Dict[str, Any]] = []
+        self._attributions: List[Tuple[str, int]] = []
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._written = 0
+        self._dropped = 0
+        self._failed_batches = 0
+
+    def record(self, provider: str, model: str, kind: str, outcome: str, usage: Optional[Dict[str, int]],
+               latency: float, time_to_first_token: Optional[float] = None) -> None:
+        """Queues the ledger entry of one provider call made in the current request."""
+        if self._sink is None:
+            return
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        cached_tokens = usage.get("cached_tokens", 0)
+        scope = get_scope()
+        if scope is not None:
+            scope.calls += 1
+        entry = {
+            "created_at": datetime.datetime.now(datetime.timezone.utc),
+            "request_id": scope.request_id if scope else None,
+            "endpoint": get_endpoint(),
+            "plan_id": scope.plan_id if scope else None,
+            "provider": provider,
+            "model": model,
+            "kind": kind,
+            "outcome": outcome,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "latency_ms": round(latency * 1000),
+            "ttft_ms": round(time_to_first_token * 1000) if time_to_first_token is not None else None,
+            "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+            if usage else None,
+        }
+        with self._lock:
+            if len(self._calls) >= self.max_pending:
+                self._dropped += 1
+                return
+            self._calls.append(entry)
+            full = len(self._calls) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def attribute_plan(self, plan_id: int) -> None:
+        """Links the LLM calls of the current request (past and future) to `plan_id`."""
+        scope = get_scope()
+        if scope is None or scope.plan_id == plan_id:
+            return
+        scope.plan_id = plan_id
+        if scope.calls and self._sink is not None:
+            with self._lock:
+                self._attributions.append((scope.request_id, plan_id))
+
+    def flush(self) -> int:
+        """Writes the pending entries now; returns how many were written."""
+        with self._lock:
+            calls, self._calls = self._calls, []
+            attributions, self._attributions = self._attributions, []
+        if (not calls and not attributions) or self._sink is None:
+            return 0
+        try:
+            self._sink(calls, attributions)
+        except Exception as e:
+            # The ledger is best effort: a failed batch is dropped rather than retried forever
+            logger.error(f"Failed to write {len(calls)} LLM ledger entries: {e}")
+            with self._lock:
+                self._failed_batches += 1
+                self._dropped += len(calls)
+            return 0
+        with self._lock:
+            self._written += len(calls)
+        return len(calls)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self, sink: LedgerSink) -> None:
+        """Starts the background writer that hands batches to `sink`."""
+        if not self.enabled or (self._writer and self._writer.is_alive()):
+            return
+        self._sink = sink
+        self._stop_event.clear()
+        self._writer = threading.Thread(target=self._run, name="llm-ledger-writer", daemon=True)
+        self._writer.start()
+        logger.info(f"LLM ledger writer started (every {self.flush_interval}s or {self.batch_size} calls)")
+
+    def stop(self) -> None:
+        """Stops the writer after writing what is still pending."""
+        self._stop_event.set()
+        self._wake.set()
+        if self._writer:
+            self._writer.join(timeout=self.flush_interval + 5)
+            self._writer = None
+        self.flush()
+        self._sink = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Entries written, pending and dropped since start."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "running": bool(self._writer and self._writer.is_alive()),
+                "written": self._written,
+                "pending": len(self._calls),
+                "dropped": self._dropped,
+                "failed_batches": self._failed_batches,
+            }
+
+
+# Ledger shared by every provider
+call_ledger = CallLedger()
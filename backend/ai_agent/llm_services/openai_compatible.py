@@ -0,0 +1,388 @@
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import openai
+from openai import AsyncOpenAI, OpenAI, OpenAIError
+from loguru import logger
+
+try:
+    import httpx
+except ImportError:  # Newer openai SDK releases ship their transport as httpx2
+    import httpx2 as httpx
+
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.providers import PROVIDERS, ProviderConfig
+from ai_agent.llm_services.resilience import RESILIENCE_ENABLED
+from ai_agent.llm_services.ledger import call_ledger
+from ai_agent.llm_services.usage import UsageTracker, last_call_usage
+from metrics import LLM_CALL_DURATION, LLM_CALLS_IN_FLIGHT, LLM_TIME_TO_FIRST_TOKEN, record_llm_usage
+
+
+@dataclass
+class _CallTiming:
+    """Start of one API call and, for streams, the delay until its first token."""
+    started: float
+    time_to_first_token: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class HttpSettings:
+    """Connection pool, timeout and protocol settings for the provider HTTP clients."""
+    max_connections: int = 200
+    max_keepalive_connections: int = 50
+    keepalive_expiry: float = 120.0
+    connect_timeout: float = 5.0
+    read_timeout: float = 120.0
+    write_timeout: float = 30.0
+    pool_timeout: float = 10.0
+    http2: bool = False
+    warmup_connections: int = 2
+
+    @classmethod
+    def from_env(cls) -> "HttpSettings":
+        """
+        Reads the LLM_HTTP_* environment variables.
+
+        HTTP/2 is used when LLM_HTTP2 is not disabled and the optional `h2`
+        package is installed; a single HTTP/2 connection multiplexes requests,
+        so only one connection is warmed up in that case.
+        """
+        http2_requested = os.getenv("LLM_HTTP2", "true").lower() in ("1", "true", "yes")
+        http2 = http2_requested and importlib.util.find_spec("h2") is not None
+        return cls(
+            max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", cls.max_connections)),
+            max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", cls.max_keepalive_connections)),
+            keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", cls.keepalive_expiry)),
+            connect_timeout=float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", cls.connect_timeout)),
+            read_timeout=float(os.getenv("LLM_HTTP_READ_TIMEOUT", cls.read_timeout)),
+            write_timeout=float(os.getenv("LLM_HTTP_WRITE_TIMEOUT", cls.write_timeout)),
+            pool_timeout=float(os.getenv("LLM_HTTP_POOL_TIMEOUT", cls.pool_timeout)),
+            http2=http2,
+            warmup_connections=1 if http2 else int(os.getenv("LLM_WARMUP_CONNECTIONS", cls.warmup_connections)),
+        )
+
+    def client_options(self) -> Dict[str, Any]:
+        """Keyword arguments shared by the sync and async httpx clients."""
+        return {
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            "timeout": httpx.Timeout(
+                connect=self.connect_timeout,
+                read=self.read_timeout,
+                write=self.write_timeout,
+                pool=self.pool_timeout,
+            ),
+            "http2": self.http2,
+        }
+
+
+class OpenAICompatibleService(BaseLLMService):
+    """
+    Singleton client for any provider exposing the OpenAI chat completions API.
+
+    One instance exists per provider. Each instance owns a pooled, keep-alive
+    HTTP transport (sync and async) tuned by `HttpSettings`, and the OpenAI SDK
+    clients are built on top of it. `warm_up` opens the TLS connections ahead of
+    the first real request.
+
+    Subclasses (OpenAIService, DeepSeekService, OpenRouterService) only pin a
+    `CONFIG`; any other provider can be used directly with
+    `OpenAICompatibleService(PROVIDERS["name"])`.
+    """
+
+    CONFIG: Optional[ProviderConfig] = None
+
+    _instances: Dict[str, "OpenAICompatibleService"] = {}
+    _lock = threading.Lock()
+
+    def __new__(cls, config: Optional[ProviderConfig] = None, *args, **kwargs):
+        config = config or cls.CONFIG
+        if config is None:
+            raise ValueError("A provider configuration is required.")
+        instance = cls._instances.get(config.name)
+        if instance is None:
+            with cls._lock:
+                # Double-check locking
+                instance = cls._instances.get(config.name)
+                if instance is None:
+                    logger.debug(f"Creating new {config.label} service instance")
+                    instance = super().__new__(cls)
+                    instance._initialized = False
+                    cls._instances[config.name] = instance
+        return instance
+
+    def __init__(self, config: Optional[ProviderConfig] = None, api_key: str = None,
+                 default_model: Optional[str] = None, http_settings: Optional[HttpSettings] = None):
+        """
+        Initializes the provider service Singleton.
+
+        Args:
+            config (ProviderConfig, optional): Provider configuration. Defaults to the subclass CONFIG.
+            api_key (str, optional): API key. If None, read from the provider's environment variable.
+            default_model (str, optional): Model used when not overridden per call. Defaults to the
+                                           provider's model environment variable, then its default model.
+            http_settings (HttpSettings, optional): Transport settings. Defaults to HttpSettings.from_env().
+
+        Raises:
+            ValueError: If no API key is provided or found in environment variables.
+            ConnectionError: If the clients fail to initialize.
+        """
+        if self._initialized:
+            return
+
+        with self._lock:
+            if self._initialized: # Double-check after acquiring lock
+                return
+
+            self.config = config or self.CONFIG
+            logger.info(f"Initializing {self.config.label} service...")
+
+            resolved_api_key = api_key or os.getenv(self.config.api_key_env)
+            if not resolved_api_key:
+                logger.error(f"{self.config.label} API key not provided and not found in {self.config.api_key_env} environment variable.")
+                raise ValueError(f"{self.config.label} API key is required for initialization.")
+
+            self.api_key = resolved_api_key
+            self.default_model = (
+                default_model
+                or (os.getenv(self.config.model_env) if self.config.model_env else None)
+                or self.config.default_model
+            )
+            self.http_settings = http_settings or HttpSettings.from_env()
+            self.usage = UsageTracker(self.name)
+
+            try:
+                options = self.http_settings.client_options()
+                self._http_client = httpx.Client(**options)
+                self._async_http_client = httpx.AsyncClient(**options)
+                client_kwargs = {
+                    "api_key": self.api_key,
+                    "base_url": self.config.base_url,
+                    "default_headers": self.config.default_headers or None,
+                    # ResilientLLMService retries with its own backoff; SDK retries would multiply them
+                    "max_retries": 0 if RESILIENCE_ENABLED else openai.DEFAULT_MAX_RETRIES,
+                }
+                self.client = OpenAI(http_client=self._http_client, **client_kwargs)
+                self.async_client = AsyncOpenAI(http_client=self._async_http_client, **client_kwargs)
+                logger.success(
+                    f"{self.config.label} client initialized successfully. "
+                    f"Endpoint: {self.client.base_url}, Default model: {self.default_model}, "
+                    f"HTTP/2: {self.http_settings.http2}, pool: {self.http_settings.max_connections}"
+                )
+                self._initialized = True
+            except OpenAIError as e:
+                logger.error(f"Failed to initialize {self.config.label} client: {e}")
+                raise ConnectionError(f"Failed to initialize {self.config.label} Client: {e}") from e
+            except Exception as e:
+                logger.error(f"An unexpected error occurred during {self.config.label} client initialization: {e}")
+                raise ConnectionError(f"Unexpected error initializing {self.config.label} Client: {e}") from e
+
+    @property
+    def name(self) -> str:
+        """Returns the service name."""
+        return self.config.name
+
+    def _prepare_request(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Resolves the model and keeps only the keyword arguments accepted by the API."""
+        model = kwargs.get("model", self.default_model)
+        logger.debug(f"Sending messages to {self.config.label} model {model} via endpoint {self.client.base_url}...")
+
+        valid_api_keys = {
+            'temperature', 'max_tokens', 'top_p', 'frequency_penalty',
+            'presence_penalty', 'stop', 'stream', 'response_format'
+        }
+        api_kwargs = {k: v for k, v in kwargs.items() if k in valid_api_keys}
+        api_kwargs['model'] = model
+        response_format = api_kwargs.get('response_format')
+        if response_format and response_format.get('type') == 'json_schema' and not self.config.json_schema_output:
+            # JSON mode still guarantees valid JSON; the schema is described in the prompt
+            api_kwargs['response_format'] = {'type': 'json_object'}
+        return api_kwargs
+
+    def _record_usage(self, response_usage, model: str) -> None:
+        usage = self.usage.record(response_usage)
+        record_llm_usage(self.name, model, usage)
+        logger.debug(
+            f"{self.config.label} usage: prompt={usage['prompt_tokens']}, cached={usage['cached_tokens']}, "
+            f"completion={usage['completion_tokens']}"
+        )
+
+    @contextmanager
+    def _timed_call(self, model: str, kind: str) -> Iterator[_CallTiming]:
+        """Reports the duration, outcome and usage of one API call to /metrics and the call ledger."""
+        timing = _CallTiming(time.perf_counter())
+        outcome = "error"
+        last_call_usage.set(None)
+        LLM_CALLS_IN_FLIGHT.inc(self.name)
+        try:
+            yield timing
+            outcome = "success"
+        except (GeneratorExit, asyncio.CancelledError):
+            # Stream closed by the consumer (e.g. client disconnect)
+            outcome = "cancelled"
+            raise
+        finally:
+            latency = time.perf_counter() - timing.started
+            LLM_CALLS_IN_FLIGHT.dec(self.name)
+            LLM_CALL_DURATION.observe(latency, self.name, model, kind, outcome)
+            call_ledger.record(self.name, model, kind, outcome, last_call_usage.get(), latency,
+                               timing.time_to_first_token)
+
+    def _handle_response(self, response, model: str) -> str:
+        """Records token usage and extracts the message content from a completion response."""
+        logger.debug(f"Received response from {self.config.label}")
+        self._record_usage(response.usage, model)
+
+        if response.choices:
+            content = response.choices[0].message.content
+            return content.strip() if content else ""
+        else:
+            logger.warning(f"{self.config.label} response did not contain any choices.")
+            return ""
+
+    def chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """
+        Generates a chat completion based on a list of messages.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries,
+                                             e.g., [{"role": "user", "content": "Hello"}].
+            **kwargs: Additional keyword arguments for the API call, such as:
+                - model (str): Override the default model.
+                - temperature (float): Sampling temperature.
+                - max_tokens (int): Maximum number of tokens to generate.
+                - top_p (float): Nucleus sampling parameter.
+                - frequency_penalty (float): Penalty for frequent tokens.
+                - presence_penalty (float): Penalty for new tokens.
+                - stop (list[str]): List of stop sequences.
+
+        Returns:
+            str: The content of the generated message.
+
+        Raises:
+            RuntimeError: If the service is not initialized.
+            OpenAIError: If the API call fails.
+        """
+        if not self._initialized or not self.client:
+            raise RuntimeError(f"{type(self).__name__} is not initialized.")
+
+        api_kwargs = self._prepare_request(kwargs)
+
+        try:
+            with self._timed_call(api_kwargs["model"], "completion"):
+                response = self.client.chat.completions.create(messages=messages, **api_kwargs)
+                return self._handle_response(response, api_kwargs["model"])
+
+        except OpenAIError as e:
+            logger.error(f"{self.config.label} API call failed: {e}")
+            raise # Re-raise the specific OpenAI error
+        except Exception as e:
+            logger.error(f"An unexpected error occurred during {self.config.label} API call: {e}")
+            raise RuntimeError(f"Unexpected error during {self.config.label} chat completion: {e}") from e
+
+    async def achat_completion(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """
+        Async version of `chat_completion`, using the AsyncOpenAI client.
+
+        Awaiting the request keeps the event loop free while the model generates,
+        so a single worker can serve many conversations concurrently. Accepts the
+        same arguments and raises the same errors as `chat_completion`.
+        """
+        if not self._initialized or not self.async_client:
+            raise RuntimeError(f"{type(self).__name__} is not initialized.")
+
+        api_kwargs = self._prepare_request(kwargs)
+
+        try:
+            with self._timed_call(api_kwargs["model"], "completion"):
+                response = await self.async_client.chat.completions.create(messages=messages, **api_kwargs)
+                return self._handle_response(response, api_kwargs["model"])
+
+        except OpenAIError as e:
+            logger.error(f"{self.config.label} API call failed: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"An unexpected error occurred during {self.config.label} API call: {e}")
+            raise RuntimeError(f"Unexpected error during {self.config.label} chat completion: {e}") from e
+
+    async def astream_chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """
+        Streams a chat completion, yielding content deltas as the provider emits them.
+
+        Token usage is requested with the final chunk (`stream_options.include_usage`)
+        and recorded like in `chat_completion`. Accepts the same arguments and raises
+        the same errors as `chat_completion`.
+        """
+        if not self._initialized or not self.async_client:
+            raise RuntimeError(f"{type(self).__name__} is not initialized.")
+
+        api_kwargs = self._prepare_request(kwargs)
+        api_kwargs["stream"] = True
+        api_kwargs["stream_options"] = {"include_usage": True}
+
+        model = api_kwargs["model"]
+        try:
+            with self._timed_call(model, "stream") as timing:
+                stream = await self.async_client.chat.completions.create(messages=messages, **api_kwargs)
+                async for chunk in stream:
+                    if chunk.usage:
+                        self._record_usage(chunk.usage, model)
+                    if chunk.choices:
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            if timing.time_to_first_token is None:
+                                timing.time_to_first_token = time.perf_counter() - timing.started
+                                LLM_TIME_TO_FIRST_TOKEN.observe(timing.time_to_first_token, self.name, model)
+                            yield delta
+            logger.debug(f"{self.config.label} stream finished")
+
+        except OpenAIError as e:
+            logger.error(f"{self.config.label} streaming API call failed: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"An unexpected error occurred during {self.config.label} streaming API call: {e}")
+            raise RuntimeError(f"Unexpected error during {self.config.label} chat completion stream: {e}") from e
+
+    async def _open_connection(self) -> bool:
+        # GET /models is free, authenticated and cheap; it leaves a TLS connection in the pool
+        try:
+            response = await self._async_http_client.get(
+                f"{str(self.async_client.base_url).rstrip('/')}/models",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+            return response.status_code < 500
+        except Exception as e:
+            logger.warning(f"{self.config.label} warm-up request failed: {e}")
+            return False
+
+    async def warm_up(self) -> int:
+        """
+        Opens `warmup_connections` pooled connections to the provider concurrently.
+
+        Failures are logged and never raised, so startup does not depend on the
+        provider being reachable.
+
+        Returns:
+            int: Number of connections successfully opened.
+        """
+        count = self.http_settings.warmup_connections
+        if count <= 0:
+            return 0
+        results = await asyncio.gather(*(self._open_connection() for _ in range(count)))
+        opened = sum(results)
+        logger.info(f"{self.config.label} warm-up: {opened}/{count} connections ready")
+        return opened
+
+    async def aclose(self) -> None:
+        """Closes the pooled HTTP connections."""
+        await self._async_http_client.aclose()
+        self._http_client.close()
@@ -0,0 +1,44 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    """Everything that differs between OpenAI-compatible providers."""
+    name: str
+    label: str
+    api_key_env: str
+    default_model: str
+    base_url: Optional[str] = None
+    model_env: Optional[str] = None
+    default_headers: Dict[str, str] = field(default_factory=dict)
+    # Accepts response_format={"type": "json_schema"}; otherwise it is sent as "json_object"
+    json_schema_output: bool = True
+
+
+# Supported providers. Adding an OpenAI-compatible provider only takes a new entry
+# here (and its place in select_models' priority order).
+PROVIDERS: Dict[str, ProviderConfig] = {
+    "openai": ProviderConfig(
+        name="openai",
+        label="OpenAI",
+        api_key_env="OPENAI_API_KEY",
+        default_model="gpt-4.1-mini",
+    ),
+    "deepseek": ProviderConfig(
+        name="deepseek",
+        label="DeepSeek",
+        api_key_env="DEEPSEEK_API_KEY",
+        default_model="deepseek-chat",
+        base_url="https://api.deepseek.com",
+        json_schema_output=False,
+    ),
+    "openrouter": ProviderConfig(
+        name="openrouter",
+        label="OpenRouter",
+        api_key_env="OPENROUTER_API_KEY",
+        default_model="openai/gpt-4o-mini",
+        base_url="https://openrouter.ai/api/v1",
+        model_env="OPENROUTER_MODEL",
+    ),
+}
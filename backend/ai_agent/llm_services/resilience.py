@@ -0,0 +1,299 @@
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from ai_agent.llm_services.base_client import BaseLLMService, DelegatingLLMService
+
+# Wrap every provider with retries and a circuit breaker
+RESILIENCE_ENABLED = os.getenv("LLM_RESILIENCE", "true").lower() in ("1", "true", "yes")
+
+# Attempts per call (1 disables retries) and the backoff bounds, in seconds
+RETRY_MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "20"))
+
+# Consecutive transient failures that open the breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"Circuit breaker for {provider} is open; retry in {retry_after:.0f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient errors: timeouts, connection failures, 408/409/429 and 5xx responses."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    # The SDK is only imported with the provider clients: if it is not loaded, no error came from it
+    openai = sys.modules.get("openai")
+    if openai is not None:
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in _RETRYABLE_STATUS or error.status_code >= 500
+        if isinstance(error, openai.APIConnectionError):
+            return True
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Reads the provider's `retry-after-ms` / `Retry-After` header, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            # HTTP-date form
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one provider.
+
+    BREAKER_FAILURE_THRESHOLD consecutive transient failures open the breaker:
+    calls are rejected immediately for BREAKER_OPEN_SECONDS. After that it is
+    half-open and lets a single probe through; the probe's outcome closes the
+    breaker or opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 open_seconds: float = BREAKER_OPEN_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        """Lets the call through or raises CircuitOpenError."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                logger.info(f"Circuit breaker for {self.name} half-open, probing the provider")
+                return
+            self.rejected += 1
+            retry_after = max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.success(f"Circuit breaker for {self.name} closed")
+            self._state = self.CLOSED
+            self._probe_in_flight = False
+            self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                    logger.warning(
+                        f"Circuit breaker for {self.name} opened after {self.consecutive_failures} "
+                        f"consecutive failures; rejecting calls for {self.open_seconds:.0f}s"
+                    )
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Frees the half-open probe slot when the probe ended without an outcome (e.g. cancelled)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+class ResilientLLMService(DelegatingLLMService):
+    """
+    Wraps a provider with bounded retries and a circuit breaker.
+
+    Transient errors (see `is_retryable`) are retried up to RETRY_MAX_ATTEMPTS
+    times with decorrelated jitter backoff; a provider-sent Retry-After is
+    honoured, and when it exceeds RETRY_MAX_DELAY the error is raised at once so
+    the router can fail over instead. Other errors (bad request,
+    authentication) are raised immediately and do not count against the
+    breaker. While the breaker is open, calls fail in microseconds with
+    CircuitOpenError.
+
+    Streams are retried only until their first chunk.
+    """
+
+    def __init__(self, service: BaseLLMService, breaker: Optional[CircuitBreaker] = None,
+                 max_attempts: Optional[int] = None, sleep: Callable[[float], None] = time.sleep,
+                 asleep: Callable[[float], Any] = asyncio.sleep):
+        super().__init__(service)
+        self.breaker = breaker or CircuitBreaker(service.name)
+        self.max_attempts = max(1, max_attempts if max_attempts is not None else RETRY_MAX_ATTEMPTS)
+        self._sleep = sleep
+        self._asleep = asleep
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._retries = 0
+        self._failures = 0
+
+    def _count(self, calls: int = 0, retries: int = 0, failures: int = 0) -> None:
+        with self._lock:
+            self._calls += calls
+            self._retries += retries
+            self._failures += failures
+
+    def _next_delay(self, error: Exception, attempt: int, previous: float) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None when the error must be raised."""
+        if attempt >= self.max_attempts or not is_retryable(error):
+            return None
+        # Decorrelated jitter: sleep = min(cap, random(base, previous sleep * 3))
+        delay = min(RETRY_MAX_DELAY, random.uniform(RETRY_BASE_DELAY, max(RETRY_BASE_DELAY, previous * 3)))
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            if retry_after > RETRY_MAX_DELAY:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+
+    def _on_error(self, error: Exception, attempt: int, previous: float) -> float:
+        """Records the failure and returns the backoff delay, or re-raises the error."""
+        if is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            # The provider answered; the request itself is at fault
+            self.breaker.record_success()
+        delay = self._next_delay(error, attempt, previous)
+        if delay is None:
+            self._count(failures=1)
+            raise error
+        self._count(retries=1)
+        logger.warning(
+            f"{self.name} call failed ({type(error).__name__}: {error}); "
+            f"retry {attempt}/{self.max_attempts - 1} in {delay:.2f}s"
+        )
+        return delay
+
+    def chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        self._count(calls=1)
+        delay = RETRY_BASE_DELAY
+        for attempt in range(1, self.max_attempts + 1):
+            self.breaker.before_call()
+            try:
+                result = self.service.chat_completion(messages, **kwargs)
+            except Exception as e:
+                delay = self._on_error(e, attempt, delay)
+                self._sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def achat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        self._count(calls=1)
+        delay = RETRY_BASE_DELAY
+        for attempt in range(1, self.max_attempts + 1):
+            self.breaker.before_call()
+            try:
+                result = await self.service.achat_completion(messages, **kwargs)
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                delay = self._on_error(e, attempt, delay)
+                await self._asleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def astream_chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> AsyncIterator[str]:
+        self._count(calls=1)
+        delay = RETRY_BASE_DELAY
+        for attempt in range(1, self.max_attempts + 1):
+            self.breaker.before_call()
+            stream = self.service.astream_chat_completion(messages, **kwargs)
+            try:
+                first = await anext(stream)
+            except StopAsyncIteration:
+                self.breaker.record_success()
+                return
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                await stream.aclose()
+                raise
+            except Exception as e:
+                await stream.aclose()
+                delay = self._on_error(e, attempt, delay)
+                await self._asleep(delay)
+                continue
+
+            self.breaker.record_success()
+            try:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+            except Exception as e:
+                # Too late to retry: part of the answer was already sent
+                if is_retryable(e):
+                    self.breaker.record_failure()
+                self._count(failures=1)
+                raise
+            finally:
+                await stream.aclose()
+            return
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Breaker state plus call, retry and failure counters."""
+        with self._lock:
+            counters = {"calls": self._calls, "retries": self._retries, "failures": self._failures}
+        return {"breaker": self.breaker.snapshot(), **counters}
@@ -0,0 +1,293 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from loguru import logger
+
+from ai_agent.llm_services.admission import AdmissionRejectedError
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.hedging import Hedger
+
+T = TypeVar("T")
+
+# Route across every configured provider (False keeps the single highest-priority provider)
+ROUTING_ENABLED = os.getenv("LLM_ROUTING", "true").lower() in ("1", "true", "yes")
+
+# Number of recent calls used for the error rate
+ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "20"))
+
+# Error rate (over at least ROUTER_MIN_SAMPLES calls) above which a provider is benched
+ROUTER_MAX_ERROR_RATE = float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5"))
+ROUTER_MIN_SAMPLES = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "4"))
+
+# Seconds a benched provider waits before receiving traffic again
+ROUTER_COOLDOWN_SECONDS = float(os.getenv("LLM_ROUTER_COOLDOWN_SECONDS", "30"))
+
+# The current provider keeps the traffic unless another one is this much faster,
+# so the provider-side prompt cache stays warm
+ROUTER_SWITCH_MARGIN = float(os.getenv("LLM_ROUTER_SWITCH_MARGIN", "0.2"))
+
+# Weight of the newest sample in the latency moving average
+_EWMA_ALPHA = 0.3
+
+
+class ProviderHealth:
+    """Rolling latency (EWMA) and error rate of one provider."""
+
+    def __init__(self, window: int = ROUTER_WINDOW):
+        self.latency: Optional[float] = None
+        self.outcomes = deque(maxlen=window)
+        self.benched_until = 0.0
+        self.calls = 0
+        self.failures = 0
+
+    @property
+    def error_rate(self) -> float:
+        return (self.outcomes.count(False) / len(self.outcomes)) if self.outcomes else 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.benched_until
+
+    def record(self, ok: bool, latency: Optional[float], now: float) -> bool:
+        """Records a call; returns True when the provider has just been benched."""
+        self.calls += 1
+        self.outcomes.append(ok)
+        if ok and latency is not None:
+            self.latency = latency if self.latency is None else (
+                _EWMA_ALPHA * latency + (1 - _EWMA_ALPHA) * self.latency
+            )
+            return False
+        self.failures += 1
+        if len(self.outcomes) >= ROUTER_MIN_SAMPLES and self.error_rate > ROUTER_MAX_ERROR_RATE:
+            self.benched_until = now + ROUTER_COOLDOWN_SECONDS
+            # Start over after the cooldown, so one good call can bring it back
+            self.outcomes.clear()
+            return True
+        return False
+
+
+class LLMRouter(BaseLLMService):
+    """
+    Routes each call to the fastest healthy provider and fails over on errors.
+
+    Every configured provider stays live. The router keeps a latency moving
+    average and a rolling error rate per provider; each call goes to the
+    current provider (or to a provider that was never measured, so all of them
+    get a latency estimate), and moves to another one only when it is faster
+    by more than ROUTER_SWITCH_MARGIN. When a call raises, the same request is
+    retried on the next provider in the ranking. Providers whose error rate
+    passes ROUTER_MAX_ERROR_RATE are benched for ROUTER_COOLDOWN_SECONDS.
+
+    Streaming calls fail over only until the first chunk is yielded.
+
+    With a `Hedger`, async calls that are slower than usual are also sent to
+    the next provider and the first response wins (see `Hedger`).
+    """
+
+    def __init__(self, services: Sequence[BaseLLMService], clock: Callable[[], float] = time.monotonic,
+                 hedger: Optional[Hedger] = None):
+        if not services:
+            raise ValueError("LLMRouter needs at least one LLM service.")
+        self.services: List[BaseLLMService] = list(services)
+        self._health: Dict[str, ProviderHealth] = {service.name: ProviderHealth() for service in self.services}
+        self._clock = clock
+        self.hedger = hedger
+        self._lock = threading.Lock()
+        self._current = self.services[0].name
+        self._failovers = 0
+        self._initialized = True
+
+    @property
+    def name(self) -> str:
+        """Returns the service name."""
+        return "router"
+
+    def ranked(self) -> List[BaseLLMService]:
+        """Providers in the order they will be tried for the next call."""
+        now = self._clock()
+        with self._lock:
+            healthy = [s for s in self.services if self._health[s.name].healthy(now)]
+            # When every provider is benched, try them all anyway (least recently benched first)
+            if not healthy:
+                return sorted(self.services, key=lambda s: self._health[s.name].benched_until)
+
+            unmeasured = [s for s in healthy if self._health[s.name].latency is None]
+            measured = sorted(
+                (s for s in healthy if self._health[s.name].latency is not None),
+                key=lambda s: self._health[s.name].latency,
+            )
+            current = next((s for s in measured if s.name == self._current), None)
+            if current and measured[0] is not current:
+                best = self._health[measured[0].name].latency
+                if best >= self._health[current.name].latency * (1 - ROUTER_SWITCH_MARGIN):
+                    measured.remove(current)
+                    measured.insert(0, current)
+            return unmeasured + measured
+
+    def _record(self, service: BaseLLMService, ok: bool, started: float) -> None:
+        now = self._clock()
+        with self._lock:
+            benched = self._health[service.name].record(ok, now - started if ok else None, now)
+            if ok:
+                self._current = service.name
+        if benched:
+            logger.warning(
+                f"Provider {service.name} benched for {ROUTER_COOLDOWN_SECONDS:.0f}s "
+                f"(error rate above {ROUTER_MAX_ERROR_RATE:.0%})"
+            )
+
+    def _record_error(self, service: BaseLLMService, error: Exception, started: float) -> None:
+        # A call refused by admission control never reached the provider: fail over, but
+        # don't count it against the provider's health
+        if not isinstance(error, AdmissionRejectedError):
+            self._record(service, False, started)
+
+    def _failed_over(self, service: BaseLLMService, error: Exception, remaining: int) -> None:
+        logger.warning(f"Provider {service.name} failed ({error}); {remaining} provider(s) left to try")
+        with self._lock:
+            self._failovers += 1
+
+    def chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        """Sends the call to the best provider, failing over to the next ones on errors."""
+        providers = self.ranked()
+        for position, service in enumerate(providers):
+            started = self._clock()
+            try:
+                result = service.chat_completion(messages, **kwargs)
+            except Exception as e:
+                self._record_error(service, e, started)
+                if position == len(providers) - 1:
+                    raise
+                self._failed_over(service, e, len(providers) - position - 1)
+                continue
+            self._record(service, True, started)
+            return result
+
+    async def _acall(self, service: BaseLLMService, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> str:
+        started = self._clock()
+        try:
+            result = await service.achat_completion(messages, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record_error(service, e, started)
+            raise
+        self._record(service, True, started)
+        return result
+
+    async def _open_stream(self, service: BaseLLMService, messages: List[Dict[str, str]],
+                           kwargs: Dict[str, Any]) -> Tuple[Optional[str], AsyncIterator[str]]:
+        """Starts a stream and waits for its first chunk (None if the stream is empty)."""
+        started = self._clock()
+        stream = service.astream_chat_completion(messages, **kwargs)
+        try:
+            first = await anext(stream)
+        except StopAsyncIteration:
+            first = None
+        except BaseException as e:
+            await stream.aclose()
+            if isinstance(e, Exception):
+                self._record_error(service, e, started)
+            raise
+        # Latency to the first chunk is what the user perceives when streaming
+        self._record(service, True, started)
+        return first, stream
+
+    @staticmethod
+    async def _close_stream(opened: Tuple[Optional[str], AsyncIterator[str]]) -> None:
+        await opened[1].aclose()
+
+    async def _afailover(self, call: Callable[[BaseLLMService], Awaitable[T]],
+                         discard: Optional[Callable[[T], Awaitable[Any]]] = None) -> T:
+        """
+        Runs `call` on the ranked providers until one succeeds.
+
+        With hedging enabled, a slow first attempt is raced against the same call
+        on the next provider (or on the same one, when it is the only provider).
+        """
+        providers = self.ranked()
+        tried = set()
+        for position, service in enumerate(providers):
+            if service in tried:
+                continue
+            tried.add(service)
+            try:
+                if position == 0 and self.hedger is not None:
+                    backup = providers[1] if len(providers) > 1 else service
+
+                    def start_backup() -> Awaitable[T]:
+                        # A hedged race that fails has already tried the backup: don't call it again
+                        tried.add(backup)
+                        return call(backup)
+
+                    return await self.hedger.race(lambda: call(service), start_backup, discard=discard)
+                return await call(service)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                remaining = [other for other in providers[position + 1:] if other not in tried]
+                if not remaining:
+                    raise
+                self._failed_over(service, e, len(remaining))
+
+    async def achat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        """Async version of `chat_completion`, with optional hedging."""
+        return await self._afailover(lambda service: self._acall(service, messages, kwargs))
+
+    async def astream_chat_completion(self, messages: List[Dict[str, str]], **kwargs: Any) -> AsyncIterator[str]:
+        """
+        Streams from the best provider. Errors before the first chunk fail over to the
+        next provider; once text was yielded they are raised to the caller.
+        """
+        first, stream = await self._afailover(
+            lambda service: self._open_stream(service, messages, kwargs), discard=self._close_stream
+        )
+        try:
+            if first is None:
+                return
+            yield first
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def warm_up(self) -> int:
+        results = await asyncio.gather(*(service.warm_up() for service in self.services))
+        return sum(results)
+
+    async def aclose(self) -> None:
+        for service in self.services:
+            await service.aclose()
+
+    def routing_stats(self) -> Dict[str, Any]:
+        """Current ranking and per-provider latency, error rate and bench state."""
+        ranking = [service.name for service in self.ranked()]
+        now = self._clock()
+        with self._lock:
+            return {
+                "current": self._current,
+                "ranking": ranking,
+                "failovers": self._failovers,
+                "providers": {
+                    name: {
+                        "latency_seconds": round(health.latency, 3) if health.latency is not None else None,
+                        "error_rate": round(health.error_rate, 3),
+                        "calls": health.calls,
+                        "failures": health.failures,
+                        "healthy": health.healthy(now),
+                        "benched_for_seconds": max(0.0, round(health.benched_until - now, 1)),
+                    }
+                    for name, health in self._health.items()
+                },
+                "hedging": self.hedger.stats() if self.hedger else None,
+            }
+
+    def usage_stats(self) -> Dict[str, Any]:
+        """Token usage of each provider, plus the routing state."""
+        return {
+            "providers": {service.name: service.usage_stats() for service in self.services},
+            "routing": self.routing_stats(),
+        }
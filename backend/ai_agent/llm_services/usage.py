@@ -0,0 +1,86 @@
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+# Normalized usage of the last completion recorded in the current task, so a
+# wrapper can read the usage of the call it just awaited (e.g. to record it)
+last_call_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar("llm_last_call_usage", default=None)
+
+
+def extract_usage(usage: Any) -> Dict[str, int]:
+    """
+    Normalizes the token usage block returned by OpenAI-compatible APIs.
+
+    OpenAI and OpenRouter report prompt cache hits in
+    `usage.prompt_tokens_details.cached_tokens`; DeepSeek reports them in
+    `usage.prompt_cache_hit_tokens`. Missing fields are reported as 0.
+
+    Args:
+        usage: The `usage` attribute of a chat completion (or chunk), or None.
+
+    Returns:
+        dict: prompt_tokens, completion_tokens and cached_tokens.
+    """
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+
+    cached_tokens = 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    if details is not None:
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+    if not cached_tokens:
+        cached_tokens = getattr(usage, "prompt_cache_hit_tokens", None) or 0
+
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+        "cached_tokens": cached_tokens,
+    }
+
+
+class UsageTracker:
+    """
+    Thread-safe accumulator of token usage for a single LLM service.
+
+    Used to report how much of the prompt was served from the provider's
+    prompt cache (cache-hit ratio = cached_tokens / prompt_tokens).
+    """
+
+    def __init__(self, service_name: str):
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+        self._cached_tokens = 0
+        self._calls_with_cache_hit = 0
+
+    def record(self, usage: Any) -> Dict[str, int]:
+        """Adds the usage of one completion to the totals and returns it normalized."""
+        normalized = extract_usage(usage)
+        with self._lock:
+            self._calls += 1
+            self._prompt_tokens += normalized["prompt_tokens"]
+            self._completion_tokens += normalized["completion_tokens"]
+            self._cached_tokens += normalized["cached_tokens"]
+            if normalized["cached_tokens"]:
+                self._calls_with_cache_hit += 1
+        last_call_usage.set(normalized)
+        return normalized
+
+    @staticmethod
+    def cache_hit_ratio(prompt_tokens: int, cached_tokens: int) -> Optional[float]:
+        return round(cached_tokens / prompt_tokens, 4) if prompt_tokens else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the accumulated totals and the overall prompt cache-hit ratio."""
+        with self._lock:
+            return {
+                "service": self.service_name,
+                "calls": self._calls,
+                "prompt_tokens": self._prompt_tokens,
+                "completion_tokens": self._completion_tokens,
+                "cached_tokens": self._cached_tokens,
+                "calls_with_cache_hit": self._calls_with_cache_hit,
+                "cache_hit_ratio": self.cache_hit_ratio(self._prompt_tokens, self._cached_tokens),
+            }
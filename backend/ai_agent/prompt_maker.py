@@ -1,37 +1,222 @@
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
 from loguru import logger
-from ai_agent.utils.data_loader import load_file
+from ai_agent.utils.prompt_assets import PromptAssets, get_prompt_assets
+from ai_agent.utils.catalog_renderer import render_catalog
+from ai_agent.utils.catalog_index import get_catalog_index
+from ai_agent.utils.course_codes import COURSE_CODES_ENABLED, get_course_codes
 from ai_agent.utils.calendar_info import get_calendar_info
+from ai_agent.scheduler import (
+    FIXED_SCHEDULE_ENABLED,
+    SCHEDULE_PLACEHOLDER,
+    StudySchedule,
+    schedule_for_profile,
+)
 
 
-FILES = {
-    "CONTENT": "conteudo_curso.json",
-    "GUIDELINES": "guidelines.txt",
-    "CALENDAR": "calendario_dados.json"
-}
+# Prefixo estático compilado, por versão do snapshot de arquivos de prompt
+_static_prefix_cache = {}
+_static_prefix_lock = threading.Lock()
+
+# Blocos de catálogo já renderizados, por (versão, cursos selecionados)
+_catalog_block_cache = {}
+_CATALOG_BLOCK_CACHE_SIZE = 256
+
+# Envia ao modelo apenas os cursos relevantes para o perfil do aluno
+CATALOG_PRUNING_ENABLED = os.getenv("PROMPT_CATALOG_PRUNING", "true").lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class PlanPrompt:
+    """Prompt final e o cronograma fixo calculado para ele (None se desabilitado)."""
+    prompt: str
+    schedule: Optional[StudySchedule] = None
+
+
+def build_static_prefix(assets: PromptAssets) -> str:
+    """
+    Monta a parte do prompt que é igual para todos os alunos: instruções e
+    guidelines.
+
+    Essa parte vem sempre primeiro e é byte a byte idêntica entre requisições,
+    permitindo que o cache de prompt dos provedores (OpenAI, DeepSeek, OpenRouter)
+    reaproveite o prefixo. O catálogo (filtrado pelo perfil) e o perfil do aluno
+    são anexados depois.
+
+    Args:
+        assets (PromptAssets): Snapshot dos arquivos de prompt.
+
+    Returns:
+        str: Prefixo estático do prompt.
+    """
+    guidelines = assets.guidelines
+    if not guidelines:
+        raise FileNotFoundError("Guidelines não encontradas ou vazias")
+
+    prompt_codigos = ""
+    if COURSE_CODES_ENABLED:
+        # Nomes de cursos trocados por códigos curtos (expandidos de volta no servidor)
+        guidelines = get_course_codes(assets).compress(guidelines)
+        prompt_codigos = """
+    ## CÓDIGOS DOS CURSOS
+    Cada curso tem um código curto entre colchetes (ex.: [BIP]), listado no conteúdo do curso.
+    Sempre que mencionar um curso, escreva SOMENTE o código entre colchetes, sem o nome
+    (inclusive em tabelas e no diagrama Mermaid). O sistema substitui os códigos pelos nomes.
+    """
+
+    # Prompt com instruções para o modelo
+    prompt_instrucoes = """
+    ## TAREFA
+    Com base nas informações abaixo, crie um plano de estudos personalizado para o aluno.
+    O plano deve incluir:
+
+    1. Uma introdução personalizada ao aluno
+    2. Distribuição semanal de conteúdos
+    3. Estimativa de tempo para cada atividade
+    4. Marcos de progresso e pequenos objetivos alcançáveis
+
+    O plano deve respeitar o tempo disponível do aluno e seu nível de conhecimento.
+    """
+
+    # Prompt para introduzir as guidelines
+    prompt_guidelines = f"""
+    ## GUIDELINES PARA O PLANO DE ESTUDOS
+    As seguintes diretrizes devem ser seguidas na criação do plano:
+
+    {guidelines}
+    """
+
+    prompt_cronograma = ""
+    if FIXED_SCHEDULE_ENABLED:
+        prompt_cronograma = f"""
+    ## CRONOGRAMA
+    O sistema já calculou o cronograma do aluno (seção CRONOGRAMA FIXO, mais abaixo), respeitando
+    a disponibilidade, os feriados e a ordem de prioridade das guidelines. As tabelas semanais e o
+    diagrama Mermaid serão inseridos automaticamente no plano a partir dele.
+    - NÃO recalcule nem reproduza as tabelas semanais, a tabela de resumo ou o diagrama Mermaid.
+    - Escreva apenas: introdução personalizada, visão geral, marcos de cada semana (lista curta),
+      sugestões de projetos práticos, dicas personalizadas e uma conclusão motivadora.
+    - Coloque o marcador {SCHEDULE_PLACEHOLDER} sozinho em uma linha, onde o cronograma deve aparecer.
+    - Estas instruções têm prioridade sobre a seção FORMATO DE RESPOSTA das guidelines.
+    """
+
+    return f"""
+
+    {prompt_instrucoes}
+    {prompt_codigos}
+    {prompt_cronograma}
+    {prompt_guidelines}
+"""
+
+
+def get_static_prefix(assets: PromptAssets = None) -> str:
+    """
+    Retorna o prefixo estático já compilado para a versão atual dos arquivos.
+
+    O prefixo é montado uma única vez por versão do snapshot; quando os arquivos
+    mudam (hot-swap), a nova versão é compilada na primeira requisição seguinte.
+    """
+    assets = assets or get_prompt_assets()
+    prefix = _static_prefix_cache.get(assets.version)
+    if prefix is not None:
+        return prefix
+
+    with _static_prefix_lock:
+        prefix = _static_prefix_cache.get(assets.version)
+        if prefix is None:
+            prefix = build_static_prefix(assets)
+            # Mantém apenas a versão mais recente
+            _static_prefix_cache.clear()
+            _static_prefix_cache[assets.version] = prefix
+            logger.info(f"Prefixo estático do prompt compilado (versão {assets.version}, {len(prefix)} caracteres)")
+    return prefix
+
+
+def get_catalog_block(assets: PromptAssets, user_data=None) -> str:
+    """
+    Retorna a seção de conteúdo do curso do prompt.
+
+    Com a poda habilitada, usa o índice do catálogo para incluir apenas os cursos
+    relevantes ao perfil do aluno (mais os fundamentos obrigatórios das
+    guidelines). O texto de cada combinação de cursos é renderizado uma única vez,
+    de modo que perfis equivalentes geram blocos idênticos.
+    """
+    if not assets.conteudo_curso:
+        raise FileNotFoundError("Conteúdo do curso não encontrado ou vazio")
+
+    if CATALOG_PRUNING_ENABLED and user_data:
+        selection = get_catalog_index(assets).select(user_data)
+        key = (assets.version, selection.names)
+        catalog = selection.catalog
+        descricao = (
+            f"Cursos relevantes para o perfil do aluno ({len(selection.names)} de "
+            f"{selection.total_courses}), incluindo os fundamentos obrigatórios."
+        )
+    else:
+        key = (assets.version, None)
+        catalog = assets.conteudo_curso
+        descricao = "O curso contém os seguintes materiais e aulas."
+
+    block = _catalog_block_cache.get(key)
+    if block is None:
+        label = get_course_codes(assets).label if COURSE_CODES_ENABLED else None
+        # Catálogo em formato compacto (em vez do repr do dicionário)
+        block = f"""
+    ## CONTEÚDO DO CURSO
+    {descricao} Cada seção lista as colunas no
+    cabeçalho e um curso por linha; módulos aparecem como sub-itens do curso.
+
+{render_catalog(catalog, label)}
+    """
+        if len(_catalog_block_cache) >= _CATALOG_BLOCK_CACHE_SIZE:
+            _catalog_block_cache.clear()
+        _catalog_block_cache[key] = block
+    return block
+
 
 def make_final_prompt(user_data=None):
     """
-    Carrega os dados necessários e cria o prompt final para o modelo.
-    
+    Cria o prompt final para o modelo.
+
     Returns:
         str: Prompt formatado pronto para ser enviado ao modelo.
     """
-        # ---- CARREGAMENTO DOS DADOS ----
-    try:
-        # Carrega o conteúdo do curso
-        conteudo_curso = load_file(FILES["CONTENT"])
-        if not conteudo_curso:
-            raise FileNotFoundError("Conteúdo do curso não encontrado ou vazio")
+    return prepare_plan_prompt(user_data).prompt
 
 
+def prepare_plan_prompt(user_data=None) -> PlanPrompt:
+    """
+    Cria o prompt final para o modelo: prefixo estático compilado seguido das
+    informações específicas do aluno (catálogo filtrado, calendário, cronograma
+    fixo e perfil).
+
+    Returns:
+        PlanPrompt: Prompt formatado e o cronograma usado nele.
+    """
+        # ---- CARREGAMENTO DOS DADOS ----
+    try:
         questionario_aluno = user_data
         if not questionario_aluno:
             raise FileNotFoundError("Não foi possível carregar informações do usuário")
 
-        # Carrega as guidelines para criação do plano de estudos
-        guidelines = load_file(FILES["GUIDELINES"])
-        if not guidelines:
-            raise FileNotFoundError("Guidelines não encontradas ou vazias")
+        # Prefixo estático (instruções e guidelines), compilado uma vez por versão
+        assets = get_prompt_assets()
+        prompt_prefixo = get_static_prefix(assets)
+
+        # Conteúdo do curso relevante para o perfil do aluno
+        prompt_conteudo_curso = get_catalog_block(assets, questionario_aluno)
+
+        # Cronograma determinístico: cursos distribuídos nos dias disponíveis
+        cronograma = None
+        if FIXED_SCHEDULE_ENABLED:
+            index = get_catalog_index(assets)
+            names = (
+                index.select(questionario_aluno).names if CATALOG_PRUNING_ENABLED
+                else [course.name for course in index.courses]
+            )
+            cronograma = schedule_for_profile(index, names, questionario_aluno)
 
         # Obtém informações de calendário com base no questionário
         try:
@@ -49,14 +234,6 @@ def make_final_prompt(user_data=None):
         raise RuntimeError(f"Erro inesperado: {e}")
 
     # ---- MONTAGEM DO PROMPT ----
-    # Prompt para introduzir o conteúdo do curso
-    prompt_conteudo_curso = f"""
-    ## CONTEÚDO DO CURSO
-    O curso contém os seguintes materiais e aulas:
-
-    {conteudo_curso}
-    """
-
     # Prompt para introduzir o questionário do aluno
     prompt_questionario = f"""
     ## PERFIL DO ALUNO
@@ -85,42 +262,24 @@ def make_final_prompt(user_data=None):
     # Prompt com informações de calendário
     prompt_calendario = calendario_info
 
-    # Prompt para introduzir as guidelines
-    prompt_guidelines = f"""
-    ## GUIDELINES PARA O PLANO DE ESTUDOS
-    As seguintes diretrizes devem ser seguidas na criação do plano:
-
-    {guidelines}
-    """
-
-    # Prompt com instruções para o modelo
-    prompt_instrucoes = """
-    ## TAREFA
-    Com base nas informações acima, crie um plano de estudos personalizado para o aluno.
-    O plano deve incluir:
-
-    1. Uma introdução personalizada ao aluno
-    2. Distribuição semanal de conteúdos
-    3. Estimativa de tempo para cada atividade
-    4. Marcos de progresso e pequenos objetivos alcançáveis
-
-    O plano deve respeitar o tempo disponível do aluno e seu nível de conhecimento.
+    # Prompt com o cronograma fixo
+    prompt_cronograma = ""
+    if cronograma:
+        label = get_course_codes(assets).short if COURSE_CODES_ENABLED else None
+        prompt_cronograma = f"""
+    ## CRONOGRAMA FIXO
+{cronograma.render_prompt(label)}
     """
 
     # ---- PROMPT FINAL ----
-    # Combinação de todos os prompts em um único prompt final
-    prompt_final = f"""
-
-    {prompt_instrucoes}
-
-    {prompt_guidelines}
-
+    # Prefixo estático seguido apenas das partes que variam por aluno
+    prompt_final = f"""{prompt_prefixo}
     {prompt_conteudo_curso}
 
     {prompt_calendario}
-
-    {prompt_questionario}     
+    {prompt_cronograma}
+    {prompt_questionario}
 
     """
 
-    return prompt_final
\ No newline at end of file
+    return PlanPrompt(prompt=prompt_final, schedule=cronograma)
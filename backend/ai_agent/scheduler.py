@@ -0,0 +1,281 @@
+import math
+import os
+import re
+import datetime
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from ai_agent.utils.calendar_info import PLAN_WEEKS, WEEKDAYS, StudyDay, study_calendar
+from ai_agent.utils.catalog_index import CatalogIndex, parse_level
+
+# Gera o cronograma no servidor; o modelo escreve apenas a parte narrativa
+FIXED_SCHEDULE_ENABLED = os.getenv("PLAN_FIXED_SCHEDULE", "true").lower() in ("1", "true", "yes")
+
+# Fração das horas de cada curso reservada para exercícios práticos logo após a teoria
+PRACTICE_RATIO = float(os.getenv("PLAN_PRACTICE_RATIO", "0.25"))
+
+# Marcador que o modelo coloca onde o cronograma deve ser inserido
+SCHEDULE_PLACEHOLDER = "{{CRONOGRAMA}}"
+
+THEORY = "Teoria"
+PRACTICE = "Prática"
+
+
+def course_hours(course: Mapping[str, Any]) -> int:
+    """
+    Duração total de um curso em horas inteiras.
+
+    Usa 'duracao_total' ou 'duracao' ("20h", "4h") e, na falta deles,
+    'aulas' x 'duracao_por_aula'.
+    """
+    for key in ("duracao_total", "duracao"):
+        match = re.search(r"(\d+(?:[.,]\d+)?)", str(course.get(key) or ""))
+        if match:
+            return max(1, math.ceil(float(match.group(1).replace(",", "."))))
+    per_class = re.search(r"(\d+(?:[.,]\d+)?)", str(course.get("duracao_por_aula") or "1"))
+    return max(1, math.ceil((course.get("aulas") or 1) * float(per_class.group(1).replace(",", "."))))
+
+
+@dataclass
+class ScheduledItem:
+    course: str
+    hours: int
+    kind: str
+
+
+@dataclass
+class ScheduledDay:
+    date: datetime.date
+    weekday: str
+    available_hours: int
+    holiday: Optional[str] = None
+    items: List[ScheduledItem] = field(default_factory=list)
+
+
+@dataclass
+class ScheduledWeek:
+    number: int
+    start: datetime.date
+    end: datetime.date
+    days: List[ScheduledDay] = field(default_factory=list)
+
+    @property
+    def hours(self) -> int:
+        return sum(item.hours for day in self.days for item in day.items)
+
+    @property
+    def courses(self) -> List[str]:
+        seen = []
+        for day in self.days:
+            for item in day.items:
+                if item.course not in seen:
+                    seen.append(item.course)
+        return seen
+
+
+@dataclass
+class StudySchedule:
+    """Cronograma determinístico de 6 semanas: cursos distribuídos em semanas e dias."""
+    start: datetime.date
+    weeks: List[ScheduledWeek]
+    unscheduled: List[Tuple[str, int]]
+    available_hours: int
+
+    @property
+    def scheduled_hours(self) -> int:
+        return sum(week.hours for week in self.weeks)
+
+    def course_spans(self) -> List[Tuple[str, datetime.date, datetime.date]]:
+        """Primeiro e último dia de cada curso, na ordem em que começam."""
+        spans: Dict[str, List[datetime.date]] = {}
+        for week in self.weeks:
+            for day in week.days:
+                for item in day.items:
+                    span = spans.setdefault(item.course, [day.date, day.date])
+                    span[1] = day.date
+        return [(course, first, last) for course, (first, last) in spans.items()]
+
+    def render_prompt(self, label: Optional[Callable[[str], str]] = None) -> str:
+        """
+        Versão compacta do cronograma para o prompt (um dia por linha).
+
+        Args:
+            label (Callable, optional): Formata o nome do curso (ex.: código curto).
+        """
+        label = label or (lambda name: name)
+        lines = []
+        for week in self.weeks:
+            lines.append(f"S{week.number} ({week.start:%d/%m}-{week.end:%d/%m}, {week.hours}h):")
+            for day in week.days:
+                if day.holiday:
+                    lines.append(f"- {day.weekday[:3]} {day.date:%d/%m}: feriado ({day.holiday})")
+                elif day.items:
+                    activities = "; ".join(f"{label(i.course)} {i.hours}h {i.kind}" for i in day.items)
+                    lines.append(f"- {day.weekday[:3]} {day.date:%d/%m}: {activities}")
+        if self.unscheduled:
+            lines.append("Não couberam no período: " + ", ".join(
+                f"{label(course)} ({hours}h)" for course, hours in self.unscheduled
+            ))
+        return "\n".join(lines)
+
+    def render_markdown(self, student_name: str = "") -> str:
+        """Cronograma completo em Markdown: uma tabela por semana e o diagrama Mermaid."""
+        parts = []
+        for week in self.weeks:
+            title = ", ".join(week.courses) if week.courses else "Revisão e projetos"
+            parts.append(f"## Semana {week.number}: {title}")
+            parts.append(f"*{week.start:%d/%m} a {week.end:%d/%m} · {week.hours}h de estudo*\n")
+            parts.append("| Dia | Atividade | Duração | Tipo |")
+            parts.append("|----|----|----|----|")
+            for day in week.days:
+                if day.holiday:
+                    parts.append(f"| {day.weekday} {day.date:%d/%m} | 🎉 Feriado: {day.holiday} | - | - |")
+                for item in day.items:
+                    parts.append(f"| {day.weekday} {day.date:%d/%m} | {item.course} | {item.hours}h | {item.kind} |")
+            parts.append("\n---\n")
+
+        if self.unscheduled:
+            parts.append("📌 **Para depois das 6 semanas:** " + ", ".join(
+                f"{course} ({hours}h)" for course, hours in self.unscheduled
+            ) + "\n")
+
+        gantt = [
+            "```mermaid",
+            "gantt",
+            f"  title Plano de Estudos: {student_name}".rstrip(),
+            "  dateFormat  YYYY-MM-DD",
+            "  axisFormat %d/%m",
+        ]
+        span_by_course = {course: (first, last) for course, first, last in self.course_spans()}
+        for week in self.weeks:
+            if not week.courses:
+                continue
+            gantt.append(f"  section Semana {week.number}")
+            for course in week.courses:
+                first, last = span_by_course[course]
+                first = max(first, week.start)
+                last = min(last, week.end)
+                task = course.replace(":", " -").replace("#", "")
+                gantt.append(f"  {task} :{first:%Y-%m-%d}, {(last + datetime.timedelta(days=1)):%Y-%m-%d}")
+        gantt.append("```")
+        parts.append("\n".join(gantt))
+        return "\n".join(parts)
+
+
+def prioritize_courses(index: CatalogIndex, names: Sequence[str], profile: Mapping[str, Any]) -> List[Mapping[str, Any]]:
+    """
+    Ordena os cursos selecionados segundo as guidelines.
+
+    Ordem: fundamentos obrigatórios na sequência das guidelines; cursos ligados
+    aos interesses do aluno; demais cursos do nível mais básico ao mais avançado,
+    alternando bootcamps e workshops. Fundamentos que o aluno já domina (nível
+    avançado no tema ou ferramenta já utilizada) vão para o final.
+    """
+    # Nomes vindos do catálogo são resolvidos por igualdade; a busca aproximada fica para texto livre
+    positions = [p for p in (index.position(name) for name in names) if p is not None]
+    selected = set(positions)
+
+    def mastered(position: int) -> bool:
+        course = index.courses[position]
+        if any(parse_level(profile.get(f"{topic}_level")) >= 3 for topic in course.topics):
+            return True
+        return bool(course.tools) and all(profile.get(f"used_{tool}") for tool in course.tools)
+
+    fundamentals = [p for p in index.fundamentals if p in selected]
+    interests = sorted(index.match_interests(profile.get("interests") or []) & selected - set(fundamentals))
+
+    rest = sorted(selected - set(fundamentals) - set(interests), key=lambda p: (index.courses[p].level_range, p))
+    bootcamps = [p for p in rest if index.courses[p].section == "bootcamps"]
+    workshops = [p for p in rest if index.courses[p].section != "bootcamps"]
+    alternated = []
+    while bootcamps or workshops:
+        if bootcamps:
+            alternated.append(bootcamps.pop(0))
+        if workshops:
+            alternated.append(workshops.pop(0))
+
+    ordered = [p for p in fundamentals if not mastered(p)] + interests + alternated
+    ordered += [p for p in fundamentals if mastered(p)]
+    return [index.courses[p].data for p in ordered]
+
+
+def build_schedule(courses: Sequence[Mapping[str, Any]], days: Sequence[StudyDay],
+                   start_date, weeks: int = PLAN_WEEKS, practice_ratio: float = PRACTICE_RATIO) -> StudySchedule:
+    """
+    Distribui os cursos, em ordem de prioridade, nos dias disponíveis.
+
+    Cada curso é dividido em blocos de teoria e prática (`practice_ratio` das horas)
+    e os blocos preenchem os dias em sequência, podendo ocupar vários dias ou
+    dividir um dia com o próximo curso. O que não couber nas semanas do plano é
+    listado em `unscheduled`.
+
+    Args:
+        courses: Cursos do catálogo, já ordenados por prioridade.
+        days: Dias de estudo do período (ver calendar_info.study_calendar).
+        start_date: Data de início do plano.
+        weeks: Número de semanas do plano.
+        practice_ratio: Fração das horas de cada curso dedicada à prática.
+
+    Returns:
+        StudySchedule: Cronograma por semana e dia.
+    """
+    start = start_date if isinstance(start_date, datetime.date) else datetime.date.fromisoformat(str(start_date))
+
+    queue: List[List[Any]] = []  # [curso, horas restantes, tipo]
+    for course in courses:
+        total = course_hours(course)
+        practice = math.ceil(total * practice_ratio) if practice_ratio > 0 else 0
+        queue.append([course["nome"], total, THEORY])
+        if practice:
+            queue.append([course["nome"], practice, PRACTICE])
+
+    schedule_weeks = [
+        ScheduledWeek(number=w + 1, start=start + datetime.timedelta(weeks=w),
+                      end=start + datetime.timedelta(weeks=w, days=6))
+        for w in range(weeks)
+    ]
+    for day in days:
+        scheduled = ScheduledDay(day.date, day.weekday, day.hours, day.holiday.name if day.holiday else None)
+        capacity = day.hours
+        while capacity > 0 and queue:
+            name, remaining, kind = queue[0]
+            hours = min(capacity, remaining)
+            if scheduled.items and scheduled.items[-1].course == name and scheduled.items[-1].kind == kind:
+                scheduled.items[-1].hours += hours
+            else:
+                scheduled.items.append(ScheduledItem(name, hours, kind))
+            capacity -= hours
+            queue[0][1] -= hours
+            if queue[0][1] == 0:
+                queue.pop(0)
+        schedule_weeks[(day.date - start).days // 7].days.append(scheduled)
+
+    unscheduled: Dict[str, int] = {}
+    for name, remaining, _ in queue:
+        unscheduled[name] = unscheduled.get(name, 0) + remaining
+
+    return StudySchedule(
+        start=start,
+        weeks=schedule_weeks,
+        unscheduled=list(unscheduled.items()),
+        available_hours=sum(day.hours for day in days),
+    )
+
+
+def schedule_for_profile(index: CatalogIndex, course_names: Sequence[str], profile: Mapping[str, Any]) -> StudySchedule:
+    """Monta o cronograma de um aluno a partir dos cursos selecionados e do questionário."""
+    courses = prioritize_courses(index, course_names, profile)
+    days = study_calendar(profile["start_date"], profile.get("hours_per_day") or {})
+    return build_schedule(courses, days, profile["start_date"])
+
+
+def insert_schedule(plan_text: str, schedule_markdown: str) -> str:
+    """
+    Insere o cronograma renderizado no texto gerado pelo modelo.
+
+    Substitui o marcador {{CRONOGRAMA}}; se o modelo não o incluiu, o cronograma
+    é adicionado ao final do texto.
+    """
+    if SCHEDULE_PLACEHOLDER in plan_text:
+        return plan_text.replace(SCHEDULE_PLACEHOLDER, schedule_markdown, 1).replace(SCHEDULE_PLACEHOLDER, "")
+    return f"{plan_text.rstrip()}\n\n{schedule_markdown}"
@@ -0,0 +1,442 @@
+import datetime
+import json
+import math
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+
+from ai_agent.scheduler import THEORY, ScheduledDay, ScheduledItem, ScheduledWeek, StudySchedule
+from ai_agent.utils.calendar_info import WEEKDAYS
+
+# "markdown": o modelo escreve o plano em texto livre; "json": o modelo devolve o plano
+# estruturado (validado e reparado localmente) e o Markdown é renderizado no servidor
+PLAN_OUTPUT_FORMAT = os.getenv("PLAN_OUTPUT_FORMAT", "markdown").lower()
+STRUCTURED_OUTPUT_ENABLED = PLAN_OUTPUT_FORMAT == "json"
+
+# Tentativas de fechar um JSON truncado em pontos anteriores do texto
+_MAX_REPAIR_CUTS = 20
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+class StructuredPlanError(ValueError):
+    """A resposta do modelo não pôde ser convertida em um plano estruturado."""
+
+
+def _as_list(value: Any) -> Any:
+    """Aceita um único valor onde se espera uma lista."""
+    if value is None:
+        return []
+    if isinstance(value, (str, dict)):
+        return [value]
+    return value
+
+
+def _as_text(value: Any) -> str:
+    if isinstance(value, dict):
+        return " ".join(str(item) for item in value.values() if item)
+    return "" if value is None else str(value)
+
+
+def _as_date(value: Any) -> Any:
+    """Aceita também DD/MM/AAAA; datas ilegíveis são descartadas."""
+    if isinstance(value, str):
+        for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+            try:
+                return datetime.datetime.strptime(value.strip(), fmt).date()
+            except ValueError:
+                continue
+        return None
+    return value
+
+
+class PlanItem(BaseModel):
+    """Atividade de um dia: curso, horas e tipo (Teoria ou Prática)."""
+    course: str
+    hours: int = Field(default=0, ge=0)
+    kind: str = THEORY
+
+    @field_validator("hours", mode="before")
+    @classmethod
+    def _parse_hours(cls, value: Any) -> int:
+        # Aceita "2h", "1,5" e 1.5 (arredondado para cima)
+        if isinstance(value, str):
+            match = _NUMBER.search(value)
+            value = float(match.group(0).replace(",", ".")) if match else 0
+        if isinstance(value, float):
+            value = math.ceil(value)
+        return max(int(value or 0), 0)
+
+
+class PlanDay(BaseModel):
+    date: Optional[datetime.date] = None
+    weekday: str = ""
+    holiday: Optional[str] = None
+    items: List[PlanItem] = Field(default_factory=list)
+
+    @field_validator("date", mode="before")
+    @classmethod
+    def _parse_date(cls, value: Any) -> Any:
+        return _as_date(value)
+
+    @field_validator("items", mode="before")
+    @classmethod
+    def _parse_items(cls, value: Any) -> Any:
+        return _as_list(value)
+
+    @model_validator(mode="after")
+    def _fill_weekday(self) -> "PlanDay":
+        if self.date and not self.weekday:
+            self.weekday = WEEKDAYS[self.date.weekday()]
+        return self
+
+
+class PlanWeek(BaseModel):
+    number: Optional[int] = None
+    start: Optional[datetime.date] = None
+    end: Optional[datetime.date] = None
+    milestones: List[str] = Field(default_factory=list)
+    days: List[PlanDay] = Field(default_factory=list)
+
+    @field_validator("start", "end", mode="before")
+    @classmethod
+    def _parse_dates(cls, value: Any) -> Any:
+        return _as_date(value)
+
+    @field_validator("milestones", mode="before")
+    @classmethod
+    def _parse_milestones(cls, value: Any) -> List[str]:
+        return [_as_text(item) for item in _as_list(value) if _as_text(item).strip()]
+
+    @field_validator("days", mode="before")
+    @classmethod
+    def _parse_days(cls, value: Any) -> Any:
+        return _as_list(value)
+
+    @property
+    def hours(self) -> int:
+        return sum(item.hours for day in self.days for item in day.items)
+
+    @property
+    def courses(self) -> List[str]:
+        seen = []
+        for day in self.days:
+            for item in day.items:
+                if item.course not in seen:
+                    seen.append(item.course)
+        return seen
+
+
+class StructuredPlan(BaseModel):
+    """
+    Plano de estudos estruturado: textos do plano e semanas -> dias -> atividades.
+
+    É o formato pedido ao modelo no modo "json" e o formato salvo em
+    StudyPlan.structured_plan; o Markdown exibido ao aluno é renderizado a partir dele.
+    """
+    introduction: str = ""
+    overview: str = ""
+    weeks: List[PlanWeek] = Field(default_factory=list)
+    projects: List[str] = Field(default_factory=list)
+    tips: List[str] = Field(default_factory=list)
+    conclusion: str = ""
+    # Cursos que não couberam nas semanas do plano
+    unscheduled: List[PlanItem] = Field(default_factory=list)
+
+    @field_validator("introduction", "overview", "conclusion", mode="before")
+    @classmethod
+    def _parse_text(cls, value: Any) -> str:
+        if isinstance(value, list):
+            return "\n\n".join(_as_text(item) for item in value)
+        return _as_text(value)
+
+    @field_validator("projects", "tips", mode="before")
+    @classmethod
+    def _parse_text_list(cls, value: Any) -> List[str]:
+        return [_as_text(item) for item in _as_list(value) if _as_text(item).strip()]
+
+    @field_validator("weeks", "unscheduled", mode="before")
+    @classmethod
+    def _parse_list(cls, value: Any) -> Any:
+        return _as_list(value)
+
+    @model_validator(mode="after")
+    def _number_weeks(self) -> "StructuredPlan":
+        # Semanas sem número ou com números repetidos são renumeradas pela posição
+        numbers = [week.number for week in self.weeks]
+        if None in numbers or len(set(numbers)) != len(numbers):
+            for position, week in enumerate(self.weeks, start=1):
+                week.number = position
+        return self
+
+
+def response_format() -> Dict[str, Any]:
+    """`response_format` da API de chat que restringe a saída ao esquema do plano."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "study_plan", "schema": StructuredPlan.model_json_schema(), "strict": False},
+    }
+
+
+def structured_output_instructions(fixed_schedule: bool) -> str:
+    """
+    Instruções anexadas ao final do prompt no modo "json".
+
+    Ficam depois das partes comuns a todos os alunos, preservando o prefixo
+    reaproveitado pelo cache de prompt dos provedores.
+    """
+    if fixed_schedule:
+        weeks = (
+            '"weeks": [{"number": 1, "milestones": ["..."]}, ...] com um item por semana do CRONOGRAMA FIXO, '
+            'apenas com número e marcos; NÃO preencha "days" (o sistema insere o cronograma)'
+        )
+    else:
+        weeks = (
+            '"weeks": [{"number": 1, "start": "AAAA-MM-DD", "end": "AAAA-MM-DD", "milestones": ["..."], '
+            '"days": [{"date": "AAAA-MM-DD", "weekday": "Segunda", "holiday": null, '
+            '"items": [{"course": "...", "hours": 2, "kind": "Teoria" ou "Prática"}]}]}, ...]'
+        )
+    return f"""
+    ## FORMATO DE SAÍDA (JSON)
+    Responda SOMENTE com um objeto JSON válido, sem texto antes ou depois e sem bloco de código.
+    Estas instruções têm prioridade sobre a seção FORMATO DE RESPOSTA das guidelines e sobre o
+    marcador do cronograma. Campos:
+    - "introduction": introdução personalizada (Markdown)
+    - "overview": visão geral do plano (Markdown)
+    - {weeks}
+    - "projects": lista de sugestões de projetos práticos
+    - "tips": lista de dicas personalizadas
+    - "conclusion": conclusão motivadora
+    """
+
+
+def _extract_json(text: str) -> str:
+    """Remove blocos de código e texto antes do primeiro "{"."""
+    fence = _FENCE.search(text)
+    if fence:
+        text = fence.group(1)
+    start = text.find("{")
+    if start < 0:
+        raise StructuredPlanError("A resposta não contém um objeto JSON")
+    return text[start:].strip()
+
+
+def _close_truncated(text: str) -> List[str]:
+    """
+    Candidatos a JSON completo para um texto truncado (ex.: limite de tokens).
+
+    Percorre o texto guardando a pilha de chaves/colchetes abertos em cada vírgula
+    fora de strings; cada candidato corta o texto em uma dessas vírgulas (descartando
+    o valor incompleto) e fecha o que ficou aberto. O primeiro candidato apenas fecha
+    o texto inteiro.
+    """
+    stack: List[str] = []
+    cuts = []
+    in_string = escaped = False
+    for position, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+        elif char == ",":
+            cuts.append((position, list(stack)))
+
+    whole = text + ('"' if in_string else "")
+    candidates = [whole.rstrip().rstrip(",") + "".join(reversed(stack))]
+    for position, open_brackets in reversed(cuts[-_MAX_REPAIR_CUTS:]):
+        candidates.append(text[:position] + "".join(reversed(open_brackets)))
+    return candidates
+
+
+def _load_json(text: str) -> Any:
+    """Faz o parse do JSON, reparando localmente vírgulas sobrando e truncamento."""
+    candidate = _TRAILING_COMMA.sub(r"\1", text)
+    end = candidate.rfind("}")
+    if end >= 0:
+        try:
+            return json.loads(candidate[:end + 1])
+        except json.JSONDecodeError:
+            pass
+    for repaired in _close_truncated(candidate):
+        try:
+            return json.loads(_TRAILING_COMMA.sub(r"\1", repaired))
+        except json.JSONDecodeError:
+            continue
+    raise StructuredPlanError("JSON inválido e não reparável")
+
+
+def parse_structured_plan(text: str) -> StructuredPlan:
+    """
+    Converte a resposta do modelo em um StructuredPlan, sem nova chamada ao modelo.
+
+    Tolera bloco de código ao redor do JSON, texto antes dele, vírgulas sobrando,
+    resposta truncada e pequenos desvios de formato (horas como "2h", listas
+    entregues como um único texto, datas DD/MM/AAAA, semanas sem número).
+
+    Raises:
+        StructuredPlanError: Se nenhum plano puder ser extraído da resposta.
+    """
+    data = _load_json(_extract_json(text))
+    if not isinstance(data, dict):
+        raise StructuredPlanError("O JSON da resposta não é um objeto")
+    if "plan" in data and isinstance(data["plan"], dict) and "weeks" not in data:
+        data = data["plan"]
+    try:
+        plan = StructuredPlan.model_validate(data)
+    except ValidationError as e:
+        raise StructuredPlanError(f"Plano fora do esquema: {e.errors()[0].get('msg')}") from e
+    if not (plan.introduction or plan.weeks):
+        raise StructuredPlanError("Plano sem conteúdo")
+    return plan
+
+
+def weeks_from_schedule(schedule: StudySchedule) -> List[PlanWeek]:
+    """Semanas do plano estruturado a partir do cronograma determinístico."""
+    return [
+        PlanWeek(
+            number=week.number,
+            start=week.start,
+            end=week.end,
+            days=[
+                PlanDay(
+                    date=day.date,
+                    weekday=day.weekday,
+                    holiday=day.holiday,
+                    items=[PlanItem(course=item.course, hours=item.hours, kind=item.kind) for item in day.items],
+                )
+                for day in week.days
+            ],
+        )
+        for week in schedule.weeks
+    ]
+
+
+def apply_schedule(plan: StructuredPlan, schedule: StudySchedule) -> StructuredPlan:
+    """Substitui as semanas do plano pelo cronograma fixo, mantendo os marcos escritos pelo modelo."""
+    milestones = {week.number: week.milestones for week in plan.weeks}
+    weeks = weeks_from_schedule(schedule)
+    for week in weeks:
+        week.milestones = milestones.get(week.number, [])
+    return plan.model_copy(update={
+        "weeks": weeks,
+        "unscheduled": [PlanItem(course=course, hours=hours) for course, hours in schedule.unscheduled],
+    })
+
+
+def map_strings(plan: StructuredPlan, transform: Callable[[str], str]) -> StructuredPlan:
+    """Aplica `transform` a todos os textos do plano (ex.: expandir códigos de curso)."""
+    def visit(value: Any) -> Any:
+        if isinstance(value, str):
+            return transform(value)
+        if isinstance(value, list):
+            return [visit(item) for item in value]
+        if isinstance(value, dict):
+            return {key: visit(item) for key, item in value.items()}
+        return value
+
+    return StructuredPlan.model_validate(visit(plan.model_dump()))
+
+
+def _to_schedule(plan: StructuredPlan) -> Optional[StudySchedule]:
+    """Cronograma equivalente, para reaproveitar seu Markdown; None se faltarem datas."""
+    if not plan.weeks or any(
+        week.start is None or week.end is None or any(day.date is None for day in week.days)
+        for week in plan.weeks
+    ):
+        return None
+    weeks = [
+        ScheduledWeek(
+            number=week.number,
+            start=week.start,
+            end=week.end,
+            days=[
+                ScheduledDay(
+                    date=day.date,
+                    weekday=day.weekday,
+                    available_hours=sum(item.hours for item in day.items),
+                    holiday=day.holiday,
+                    items=[ScheduledItem(course=item.course, hours=item.hours, kind=item.kind) for item in day.items],
+                )
+                for day in week.days
+            ],
+        )
+        for week in plan.weeks
+    ]
+    return StudySchedule(
+        start=weeks[0].start,
+        weeks=weeks,
+        unscheduled=[(item.course, item.hours) for item in plan.unscheduled],
+        available_hours=sum(week.hours for week in weeks),
+    )
+
+
+def _render_weeks(plan: StructuredPlan) -> str:
+    """Tabelas semanais para planos sem datas (o diagrama Mermaid exige datas)."""
+    parts = []
+    for week in plan.weeks:
+        if not week.days:
+            continue
+        title = ", ".join(week.courses) if week.courses else "Revisão e projetos"
+        parts.append(f"## Semana {week.number}: {title}")
+        parts.append(f"*{week.hours}h de estudo*\n")
+        parts.append("| Dia | Atividade | Duração | Tipo |")
+        parts.append("|----|----|----|----|")
+        for day in week.days:
+            if day.holiday:
+                parts.append(f"| {day.weekday} | 🎉 Feriado: {day.holiday} | - | - |")
+            for item in day.items:
+                parts.append(f"| {day.weekday} | {item.course} | {item.hours}h | {item.kind} |")
+        parts.append("\n---\n")
+    return "\n".join(parts)
+
+
+def render_structured_plan(plan: StructuredPlan, student_name: str) -> str:
+    """
+    Renderiza o plano estruturado no Markdown exibido ao aluno.
+
+    O cronograma usa as mesmas tabelas semanais e o mesmo diagrama Mermaid do
+    cronograma fixo (ver StudySchedule.render_markdown).
+    """
+    parts = [f"# Plano de Estudos: {student_name}".rstrip()]
+    if plan.introduction:
+        parts.append(plan.introduction)
+    if plan.overview:
+        parts += ["## Visão geral", plan.overview]
+
+    schedule = _to_schedule(plan)
+    if schedule is not None and any(week.days for week in plan.weeks):
+        parts += ["---", schedule.render_markdown(student_name)]
+    else:
+        weeks = _render_weeks(plan)
+        if weeks:
+            parts += ["---", weeks]
+        if plan.unscheduled:
+            parts.append("📌 **Para depois das 6 semanas:** " + ", ".join(
+                f"{item.course} ({item.hours}h)" for item in plan.unscheduled
+            ))
+
+    milestones = [
+        f"- **Semana {week.number}:** {'; '.join(week.milestones)}" for week in plan.weeks if week.milestones
+    ]
+    if milestones:
+        parts += ["## Marcos", "\n".join(milestones)]
+    if plan.projects:
+        parts += ["## Projetos práticos", "\n".join(f"- {project}" for project in plan.projects)]
+    if plan.tips:
+        parts += ["## Dicas para você", "\n".join(f"- {tip}" for tip in plan.tips)]
+    if plan.conclusion:
+        parts += ["## Próximos passos", plan.conclusion]
+    return "\n\n".join(parts)
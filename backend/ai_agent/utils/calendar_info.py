@@ -1,18 +1,177 @@
-from datetime import datetime, timedelta
-from ai_agent.utils.data_loader import load_file
+import datetime
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Nomes dos dias da semana no formato do questionário, indexados por date.weekday()
+WEEKDAYS = ("Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo")
+
+# Duração do plano de estudos
+PLAN_WEEKS = 6
+
+# Feriados nacionais de data fixa: (mês, dia, nome, ano a partir do qual vale)
+_FIXED_HOLIDAYS = (
+    (1, 1, "Confraternização Universal", None),
+    (4, 21, "Tiradentes", None),
+    (5, 1, "Dia do Trabalho", None),
+    (9, 7, "Independência do Brasil", None),
+    (10, 12, "Nossa Senhora Aparecida", None),
+    (11, 2, "Finados", None),
+    (11, 15, "Proclamação da República", None),
+    (11, 20, "Dia Nacional de Zumbi e da Consciência Negra", 2024),
+    (12, 25, "Natal", None),
+)
+
+# Datas móveis relativas ao Domingo de Páscoa: (deslocamento em dias, nome, ponto facultativo?)
+_EASTER_OFFSETS = (
+    (-48, "Carnaval (segunda-feira)", True),
+    (-47, "Carnaval (terça-feira)", True),
+    (-2, "Sexta-feira Santa", False),
+    (60, "Corpus Christi", True),
+)
+
+
+@dataclass(frozen=True)
+class Holiday:
+    date: datetime.date
+    name: str
+    optional: bool = False  # Ponto facultativo nacional
+
+
+@dataclass(frozen=True)
+class StudyDay:
+    """Dia do período do plano com as horas de estudo disponíveis."""
+    date: datetime.date
+    weekday: str
+    hours: int
+    holiday: Optional[Holiday] = None
+
+
+def easter_sunday(year: int) -> datetime.date:
+    """Calcula o Domingo de Páscoa (calendário gregoriano, algoritmo de Meeus/Jones/Butcher)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+@lru_cache(maxsize=32)
+def brazilian_holidays(year: int) -> Tuple[Holiday, ...]:
+    """
+    Retorna os feriados nacionais brasileiros e pontos facultativos nacionais do ano.
+
+    Inclui os feriados de data fixa e os móveis baseados na Páscoa (Carnaval,
+    Sexta-feira Santa e Corpus Christi). O resultado é memorizado por ano.
+    """
+    holidays = [
+        Holiday(datetime.date(year, month, day), name)
+        for month, day, name, since in _FIXED_HOLIDAYS
+        if since is None or year >= since
+    ]
+    easter = easter_sunday(year)
+    holidays.extend(
+        Holiday(easter + datetime.timedelta(days=offset), name, optional)
+        for offset, name, optional in _EASTER_OFFSETS
+    )
+    return tuple(sorted(holidays, key=lambda holiday: holiday.date))
+
+
+def holidays_between(start: datetime.date, end: datetime.date) -> Dict[datetime.date, Holiday]:
+    """Feriados entre `start` e `end` (inclusive), indexados pela data."""
+    return {
+        holiday.date: holiday
+        for year in range(start.year, end.year + 1)
+        for holiday in brazilian_holidays(year)
+        if start <= holiday.date <= end
+    }
+
+
+def _parse_date(value) -> datetime.date:
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value))
+
+
+def study_calendar(start_date, hours_per_day: Dict[str, int], weeks: int = PLAN_WEEKS) -> List[StudyDay]:
+    """
+    Lista os dias de estudo do período do plano, a partir de `start_date`.
+
+    Inclui apenas os dias da semana em que o aluno informou disponibilidade.
+    Em feriados (e pontos facultativos) as horas disponíveis do dia são zero.
+
+    Args:
+        start_date (date | str): Data de início do plano.
+        hours_per_day (dict): Horas por dia da semana (ex.: {"Segunda": 2}).
+        weeks (int): Duração do plano em semanas.
+
+    Returns:
+        List[StudyDay]: Dias de estudo em ordem cronológica.
+    """
+    start = _parse_date(start_date)
+    end = start + datetime.timedelta(weeks=weeks, days=-1)
+    holidays = holidays_between(start, end)
+
+    days = []
+    for offset in range((end - start).days + 1):
+        day = start + datetime.timedelta(days=offset)
+        weekday = WEEKDAYS[day.weekday()]
+        hours = int(hours_per_day.get(weekday, 0) or 0)
+        if hours <= 0:
+            continue
+        holiday = holidays.get(day)
+        days.append(StudyDay(day, weekday, 0 if holiday else hours, holiday))
+    return days
+
 
 def get_calendar_info(questionario_aluno=None):
     """
     Processa informações de calendário com base na data de início do questionário.
-    
+
+    Calcula localmente os feriados nacionais que caem nos dias de estudo do aluno
+    durante as 6 semanas do plano e as horas efetivamente disponíveis por semana.
+    Não depende de arquivos nem de rede.
+
     Args:
         questionario_aluno (dict): Dicionário com as respostas do questionário do aluno,
                                   incluindo a data de início desejada.
-    
+
     Returns:
         str: Texto formatado com informações de calendário para o prompt da LLM.
     """
-    # Carrega informações de feriados e eventos do arquivo JSON
-    calendario_dados = load_file('calendario_dados.json')
-    
-    return calendario_dados
+    start = _parse_date(questionario_aluno['start_date'])
+    end = start + datetime.timedelta(weeks=PLAN_WEEKS, days=-1)
+    days = study_calendar(start, questionario_aluno.get('hours_per_day') or {})
+
+    weekly_hours = [0] * PLAN_WEEKS
+    for day in days:
+        weekly_hours[(day.date - start).days // 7] += day.hours
+
+    lines = [
+        "## INFORMAÇÕES DE CALENDÁRIO",
+        f"Período do plano: {start:%d/%m/%Y} ({WEEKDAYS[start.weekday()]}) a "
+        f"{end:%d/%m/%Y} ({WEEKDAYS[end.weekday()]}), {PLAN_WEEKS} semanas.",
+        f"Horas de estudo disponíveis por semana (já descontados os feriados): "
+        + ", ".join(f"S{week + 1} {hours}h" for week, hours in enumerate(weekly_hours))
+        + f"; total {sum(weekly_hours)}h.",
+    ]
+
+    lost = [day for day in days if day.holiday]
+    if lost:
+        lines.append("Feriados em dias de estudo do aluno (não agendar estudo nesses dias):")
+        for day in lost:
+            kind = " (ponto facultativo)" if day.holiday.optional else ""
+            lost_hours = questionario_aluno['hours_per_day'].get(day.weekday, 0)
+            lines.append(f"- {day.date:%d/%m} ({day.weekday}): {day.holiday.name}{kind}, -{lost_hours}h")
+    else:
+        lines.append("Nenhum feriado nacional cai nos dias de estudo do aluno neste período.")
+
+    return "\n".join(lines)
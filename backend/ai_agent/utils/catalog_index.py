@@ -0,0 +1,257 @@
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+
+from ai_agent.utils.prompt_assets import PromptAssets, get_prompt_assets
+
+# Ordem dos níveis (valores do SkillLevel e termos usados no campo 'nivel' do catálogo)
+LEVELS = {
+    "nunca utilizei": 0,
+    "iniciante": 1,
+    "intermediario": 2,
+    "avancado": 3,
+}
+
+# Palavras-chave que associam um curso a um tema do questionário
+TOPIC_KEYWORDS = {
+    "python": {"python", "pydantic", "jupyter", "webscraping", "fastapi"},
+    "sql": {"sql", "dw", "dbt", "duckdb"},
+    "cloud": {"cloud", "nuvem", "aws", "azure", "lambda", "terraform"},
+}
+
+# Palavras-chave que associam um curso a uma ferramenta do questionário
+TOOL_KEYWORDS = {
+    "git": {"git", "github"},
+    "docker": {"docker", "linux"},
+}
+
+# Palavras ignoradas ao comparar nomes de cursos
+_NAME_STOPWORDS = {"workshop", "bootcamp", "de", "do", "da", "e", "com", "para", "o", "a", "em"}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas e sem acentos."""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> Set[str]:
+    return set(re.findall(r"[a-z0-9]+", normalize(text)))
+
+
+def _name_tokens(name: str) -> Set[str]:
+    return tokenize(name) - _NAME_STOPWORDS
+
+
+def parse_level(text: Optional[str]) -> int:
+    """Converte um nível do questionário ('Intermediário', 'Nunca utilizei') em ordinal 0-3."""
+    if not text:
+        return 0
+    return LEVELS.get(normalize(text).strip(), 0)
+
+
+def parse_level_range(text: Optional[str]) -> Tuple[int, int]:
+    """Converte o 'nivel' de um curso ('iniciante a intermediário') em um intervalo (min, max)."""
+    found = [LEVELS[part.strip()] for part in normalize(text or "").split(" a ") if part.strip() in LEVELS]
+    if not found:
+        return 1, 3
+    return min(found), max(found)
+
+
+def parse_fundamentals(guidelines: str) -> List[str]:
+    """
+    Extrai os nomes dos cursos listados na seção "FUNDAMENTOS ESSENCIAIS" das guidelines.
+
+    Cada item tem o formato "1. Nome do Curso - justificativa".
+    """
+    names = []
+    in_section = False
+    for line in guidelines.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            in_section = "FUNDAMENTOS ESSENCIAIS" in stripped.upper()
+            continue
+        match = re.match(r"^\d+\.\s+(.+?)(?:\s+-\s+.*)?$", stripped)
+        if in_section and match:
+            names.append(match.group(1).strip())
+    return names
+
+
+@dataclass(frozen=True)
+class IndexedCourse:
+    """Curso do catálogo com os atributos usados na seleção."""
+    position: int
+    section: str
+    name: str
+    level_range: Tuple[int, int]
+    topics: FrozenSet[str]
+    tools: FrozenSet[str]
+    tokens: FrozenSet[str]
+    compact_text: str
+    data: Mapping[str, Any]
+
+
+@dataclass(frozen=True)
+class CourseSelection:
+    """Resultado da seleção de cursos para um aluno."""
+    catalog: Dict[str, List[Mapping[str, Any]]]
+    names: Tuple[str, ...]
+    total_courses: int
+
+
+class CatalogIndex:
+    """
+    Índice em memória sobre o catálogo de cursos (conteudo_curso.json).
+
+    Construído uma única vez por versão dos arquivos de prompt, indexa os cursos
+    por nível, tema (Python, SQL, Cloud) e ferramenta (Git, Docker), e resolve
+    os fundamentos obrigatórios listados nas guidelines.
+    """
+
+    def __init__(self, conteudo_curso: Mapping[str, Any], guidelines: str = ""):
+        self.courses: List[IndexedCourse] = []
+        self.by_level: Dict[int, Set[int]] = {level: set() for level in LEVELS.values()}
+        self.by_topic: Dict[str, Set[int]] = {topic: set() for topic in TOPIC_KEYWORDS}
+        self.by_tool: Dict[str, Set[int]] = {tool: set() for tool in TOOL_KEYWORDS}
+        self.by_name: Dict[str, int] = {}
+        self._sections = [section for section, courses in conteudo_curso.items() if isinstance(courses, (list, tuple))]
+
+        for section in self._sections:
+            for course in conteudo_curso[section]:
+                self._add(section, course)
+
+        self.fundamentals: Tuple[int, ...] = tuple(
+            position for position in (self.find(name) for name in parse_fundamentals(guidelines))
+            if position is not None
+        )
+
+    def _add(self, section: str, course: Mapping[str, Any]) -> None:
+        position = len(self.courses)
+        name = course.get("nome", "")
+        text = f"{name} {course.get('descricao', '')}"
+        tokens = tokenize(text)
+        level_range = parse_level_range(course.get("nivel"))
+        topics = frozenset(topic for topic, keywords in TOPIC_KEYWORDS.items() if tokens & keywords)
+        tools = frozenset(tool for tool, keywords in TOOL_KEYWORDS.items() if tokens & keywords)
+
+        self.courses.append(IndexedCourse(
+            position=position,
+            section=section,
+            name=name,
+            level_range=level_range,
+            topics=topics,
+            tools=tools,
+            tokens=frozenset(tokens),
+            compact_text=re.sub(r"[^a-z0-9]", "", normalize(text)),
+            data=course,
+        ))
+        self.by_name.setdefault(name, position)
+        for level in range(level_range[0], level_range[1] + 1):
+            self.by_level[level].add(position)
+        for topic in topics:
+            self.by_topic[topic].add(position)
+        for tool in tools:
+            self.by_tool[tool].add(position)
+
+    def position(self, name: str) -> Optional[int]:
+        """Posição de um curso pelo nome exato do catálogo; outros nomes são buscados com `find`."""
+        position = self.by_name.get(name)
+        return position if position is not None else self.find(name)
+
+    def find(self, name: str) -> Optional[int]:
+        """Localiza um curso pelo nome, tolerando prefixos como 'Workshop'/'Bootcamp'."""
+        wanted = _name_tokens(name)
+        best, best_score = None, 0.0
+        for course in self.courses:
+            candidate = _name_tokens(course.name)
+            if not wanted or not candidate:
+                continue
+            score = len(wanted & candidate) / len(wanted | candidate)
+            if score > best_score:
+                best, best_score = course.position, score
+        return best if best_score >= 0.6 else None
+
+    def match_interests(self, interests: Sequence[str]) -> Set[int]:
+        matches = set()
+        for interest in interests or []:
+            wanted = re.sub(r"[^a-z0-9]", "", normalize(interest))
+            if len(wanted) < 3:
+                continue
+            matches.update(c.position for c in self.courses if wanted in c.compact_text)
+        return matches
+
+    def select(self, profile: Mapping[str, Any]) -> CourseSelection:
+        """
+        Seleciona os cursos relevantes para o perfil do aluno.
+
+        Inclui: os fundamentos obrigatórios das guidelines; cursos de cada tema
+        (Python, SQL, Cloud) cujo nível cobre o nível atual do aluno no tema;
+        cursos das ferramentas que o aluno ainda não usou; cursos ligados aos
+        interesses informados; e cursos gerais adequados ao nível médio do aluno.
+
+        Args:
+            profile (Mapping): Dados do questionário (formato de PlanRequestData).
+
+        Returns:
+            CourseSelection: Catálogo reduzido, no mesmo formato do original.
+        """
+        selected: Set[int] = set(self.fundamentals)
+
+        topic_levels = {
+            topic: max(parse_level(profile.get(f"{topic}_level")), 1)
+            for topic in TOPIC_KEYWORDS
+        }
+        for topic, level in topic_levels.items():
+            for position in self.by_topic[topic]:
+                low, high = self.courses[position].level_range
+                if low <= level <= high:
+                    selected.add(position)
+
+        for tool in TOOL_KEYWORDS:
+            if not profile.get(f"used_{tool}"):
+                selected.update(self.by_tool[tool])
+
+        selected.update(self.match_interests(profile.get("interests") or []))
+
+        overall_level = round(sum(topic_levels.values()) / len(topic_levels))
+        general = {c.position for c in self.courses if not c.topics and not c.tools}
+        selected.update(general & self.by_level[overall_level])
+
+        catalog: Dict[str, List[Mapping[str, Any]]] = {section: [] for section in self._sections}
+        for position in sorted(selected):
+            course = self.courses[position]
+            catalog[course.section].append(course.data)
+
+        return CourseSelection(
+            catalog=catalog,
+            names=tuple(self.courses[p].name for p in sorted(selected)),
+            total_courses=len(self.courses),
+        )
+
+
+_index_cache: Dict[str, CatalogIndex] = {}
+_index_lock = threading.Lock()
+
+
+def get_catalog_index(assets: PromptAssets = None) -> CatalogIndex:
+    """Retorna o índice do catálogo para a versão atual dos arquivos, construindo-o uma única vez."""
+    assets = assets or get_prompt_assets()
+    index = _index_cache.get(assets.version)
+    if index is not None:
+        return index
+
+    with _index_lock:
+        index = _index_cache.get(assets.version)
+        if index is None:
+            index = CatalogIndex(assets.conteudo_curso, assets.guidelines)
+            _index_cache.clear()
+            _index_cache[assets.version] = index
+            logger.info(
+                f"Índice do catálogo construído (versão {assets.version}): {len(index.courses)} cursos, "
+                f"{len(index.fundamentals)} fundamentos obrigatórios"
+            )
+    return index
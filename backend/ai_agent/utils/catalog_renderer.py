@@ -0,0 +1,135 @@
+import re
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+from ai_agent.utils.prompt_assets import to_builtin
+
+# Tipo implícito de cada seção do catálogo (não precisa ser repetido por curso)
+SECTION_TYPES = {
+    "bootcamps": "bootcamp",
+    "workshops": "workshop",
+}
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima o número de tokens de um texto.
+
+    Conta palavras e cada sinal de pontuação separadamente, o que aproxima bem
+    o comportamento dos tokenizadores BPE em textos com muitas aspas e chaves.
+    """
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def _format_value(value: Any) -> str:
+    if value is None or value == "":
+        return "-"
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _columns(section: str, courses: Sequence[Mapping[str, Any]]) -> List[str]:
+    """Colunas escalares da seção, na ordem em que aparecem no JSON."""
+    columns: List[str] = []
+    for course in courses:
+        for key, value in course.items():
+            if key in columns or isinstance(value, (list, tuple, dict, Mapping)):
+                continue
+            if key == "tipo" and all(c.get("tipo") == SECTION_TYPES.get(section) for c in courses):
+                continue
+            columns.append(key)
+    return columns
+
+
+def _render_nested(key: str, value: Any) -> List[str]:
+    """Renderiza campos compostos (ex.: módulos) como sub-itens indentados."""
+    lines = []
+    items = value if isinstance(value, (list, tuple)) else [value]
+    for item in items:
+        if isinstance(item, Mapping):
+            text = ": ".join(_format_value(v) for v in item.values())
+        else:
+            text = _format_value(item)
+        prefix = "" if key == "modulos" else f"{key}: "
+        lines.append(f"  - {prefix}{text}")
+    return lines
+
+
+def render_section(section: str, courses: Sequence[Mapping[str, Any]],
+                   label: Optional[Callable[[str], str]] = None) -> str:
+    """
+    Renderiza uma seção do catálogo em formato tabular compacto.
+
+    O cabeçalho lista as colunas uma única vez; cada curso ocupa uma linha com os
+    valores separados por " | " e eventuais campos compostos (ex.: módulos)
+    aparecem como sub-itens logo abaixo. Se `label` for informado, ele é aplicado
+    ao nome de cada curso (ex.: para acrescentar o código do curso).
+    """
+    columns = _columns(section, courses)
+    lines = [f"### {section.upper()} ({' | '.join(columns)})"]
+    for course in courses:
+        values = []
+        for col in columns:
+            value = course.get(col)
+            if label and col == "nome" and value:
+                value = label(value)
+            values.append(_format_value(value))
+        lines.append(" | ".join(values))
+        for key, value in course.items():
+            if isinstance(value, (list, tuple, dict, Mapping)):
+                lines.extend(_render_nested(key, value))
+    return "\n".join(lines)
+
+
+def render_catalog(conteudo_curso: Mapping[str, Any], label: Optional[Callable[[str], str]] = None) -> str:
+    """
+    Renderiza o catálogo de cursos (conteudo_curso.json) de forma compacta para o prompt.
+
+    Substitui o `repr` do dicionário: sem aspas, chaves ou nomes de campos
+    repetidos por curso, mas sem perda de informação.
+
+    Args:
+        conteudo_curso (Mapping): Catálogo com as seções 'bootcamps' e 'workshops'
+                                  (dict ou estrutura congelada do snapshot).
+        label (Callable, optional): Formata o nome de cada curso (ex.: CourseCodeBook.label).
+
+    Returns:
+        str: Catálogo em formato de linhas.
+    """
+    sections = []
+    for section, courses in conteudo_curso.items():
+        if isinstance(courses, (list, tuple)):
+            sections.append(render_section(section, courses, label))
+        else:
+            sections.append(f"### {section.upper()}\n{_format_value(courses)}")
+    return "\n\n".join(sections)
+
+
+def measure_catalog_rendering(conteudo_curso: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Compara o tamanho do catálogo renderizado com o `repr` usado anteriormente.
+
+    Returns:
+        dict: Caracteres e tokens estimados de cada formato e a economia obtida.
+    """
+    legacy = str(to_builtin(conteudo_curso))
+    compact = render_catalog(conteudo_curso)
+
+    legacy_tokens = estimate_tokens(legacy)
+    compact_tokens = estimate_tokens(compact)
+    return {
+        "repr_chars": len(legacy),
+        "compact_chars": len(compact),
+        "chars_saved": len(legacy) - len(compact),
+        "repr_tokens_est": legacy_tokens,
+        "compact_tokens_est": compact_tokens,
+        "tokens_saved_est": legacy_tokens - compact_tokens,
+        "tokens_saved_pct": round(100 * (legacy_tokens - compact_tokens) / legacy_tokens, 1) if legacy_tokens else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    from ai_agent.utils.prompt_assets import get_prompt_assets
+
+    for metric, value in measure_catalog_rendering(get_prompt_assets().conteudo_curso).items():
+        print(f"{metric}: {value}")
@@ -0,0 +1,146 @@
+import os
+import re
+import threading
+from typing import Any, Dict, List, Mapping, Optional
+
+from loguru import logger
+
+from ai_agent.utils.catalog_index import normalize
+from ai_agent.utils.prompt_assets import PromptAssets, get_prompt_assets
+
+# Usa códigos curtos para os cursos no prompt e na resposta do modelo
+COURSE_CODES_ENABLED = os.getenv("PROMPT_COURSE_CODES", "true").lower() in ("1", "true", "yes")
+
+# Prefixo do código por tipo de curso
+_TYPE_PREFIX = {"bootcamp": "B", "workshop": "W"}
+
+# Palavras ignoradas ao gerar as iniciais do código
+_CODE_STOPWORDS = {"bootcamp", "workshop", "de", "do", "da", "dos", "das", "e", "com", "para", "o", "a", "em", "um", "sem", "seu", "as"}
+
+_CODE_PATTERN = re.compile(r"\[([BW][A-Z0-9]{1,5})\]")
+_MERMAID_BLOCK = re.compile(r"(```mermaid.*?```)", re.DOTALL)
+
+
+def _initials(name: str, size: int = 3) -> str:
+    words = [w for w in re.findall(r"[a-z0-9]+", normalize(name)) if w not in _CODE_STOPWORDS]
+    return "".join(w[0] for w in words[:size]).upper() or "X"
+
+
+class CourseCodeBook:
+    """
+    Dicionário de códigos curtos e estáveis para os cursos do catálogo.
+
+    O código é formado pelo tipo do curso (B = bootcamp, W = workshop) seguido das
+    iniciais das palavras significativas do nome (ex.: "Bootcamp Intensivo Python"
+    -> "BIP"). Como depende apenas do nome, o código não muda quando a ordem do
+    catálogo muda. Colisões recebem um sufixo numérico, atribuído em ordem
+    alfabética dos nomes.
+
+    No prompt e na resposta do modelo os cursos aparecem como "[BIP]"; `expand`
+    troca os códigos de volta pelos nomes completos.
+    """
+
+    def __init__(self, conteudo_curso: Mapping[str, Any]):
+        candidates: Dict[str, List[str]] = {}
+        for section, courses in conteudo_curso.items():
+            if not isinstance(courses, (list, tuple)):
+                continue
+            default_type = section.rstrip("s")
+            for course in courses:
+                name = course.get("nome")
+                if not name:
+                    continue
+                prefix = _TYPE_PREFIX.get(course.get("tipo", default_type), "W")
+                candidates.setdefault(prefix + _initials(name), []).append(name)
+
+        self.names_by_code: Dict[str, str] = {}
+        for base, names in candidates.items():
+            for i, name in enumerate(sorted(set(names))):
+                self.names_by_code[base if i == 0 else f"{base}{i + 1}"] = name
+        self.codes_by_name: Dict[str, str] = {name: code for code, name in self.names_by_code.items()}
+
+        # Nomes (e variações usadas nas guidelines, como "Workshop Infra, Linux, Docker")
+        # ordenados do mais longo para o mais curto, para substituir o nome mais específico
+        aliases: Dict[str, str] = {}
+        for name, code in self.codes_by_name.items():
+            aliases[name] = code
+            for prefix in ("Workshop ", "Bootcamp "):
+                if not name.startswith(prefix):
+                    aliases[prefix + name] = code
+        self._aliases = aliases
+        self._alias_pattern = re.compile(
+            "|".join(re.escape(alias) for alias in sorted(aliases, key=len, reverse=True))
+        ) if aliases else None
+
+    def code_for(self, name: str) -> Optional[str]:
+        return self.codes_by_name.get(name)
+
+    def label(self, name: str) -> str:
+        """Nome do curso precedido do código, como aparece no catálogo do prompt."""
+        code = self.code_for(name)
+        return f"[{code}] {name}" if code else name
+
+    def short(self, name: str) -> str:
+        """Apenas o código entre colchetes (ou o nome, se o curso não tiver código)."""
+        code = self.code_for(name)
+        return f"[{code}]" if code else name
+
+    def compress(self, text: str) -> str:
+        """Substitui os nomes completos dos cursos por seus códigos ("[BIP]")."""
+        if not self._alias_pattern:
+            return text
+        return self._alias_pattern.sub(lambda m: f"[{self._aliases[m.group(0)]}]", text)
+
+    def expand_fragment(self, text: str, in_mermaid: bool = False) -> str:
+        """
+        Expande os códigos de um trecho de texto que está todo dentro (ou todo fora)
+        de um bloco Mermaid; usado no streaming, em que a resposta chega em partes.
+        """
+        def replace(match):
+            name = self.names_by_code.get(match.group(1))
+            if name is None:
+                return match.group(0)
+            # ":" separa o nome da tarefa dos metadados no gantt do Mermaid
+            return name.replace(":", " -") if in_mermaid else name
+        return _CODE_PATTERN.sub(replace, text)
+
+    def expand(self, text: str) -> str:
+        """Troca os códigos "[BIP]" pelos nomes completos; códigos desconhecidos são mantidos."""
+        if not text or "[" not in text:
+            return text
+        parts = _MERMAID_BLOCK.split(text)
+        return "".join(
+            self.expand_fragment(part, in_mermaid=part.startswith("```mermaid"))
+            for part in parts
+        )
+
+    def legend(self) -> str:
+        return "\n".join(f"[{code}] {name}" for code, name in sorted(self.names_by_code.items()))
+
+
+_codebook_cache: Dict[str, CourseCodeBook] = {}
+_codebook_lock = threading.Lock()
+
+
+def get_course_codes(assets: PromptAssets = None) -> CourseCodeBook:
+    """Retorna o dicionário de códigos para a versão atual dos arquivos, construindo-o uma única vez."""
+    assets = assets or get_prompt_assets()
+    codebook = _codebook_cache.get(assets.version)
+    if codebook is not None:
+        return codebook
+
+    with _codebook_lock:
+        codebook = _codebook_cache.get(assets.version)
+        if codebook is None:
+            codebook = CourseCodeBook(assets.conteudo_curso)
+            _codebook_cache.clear()
+            _codebook_cache[assets.version] = codebook
+            logger.info(f"Códigos de curso gerados (versão {assets.version}): {len(codebook.names_by_code)} cursos")
+    return codebook
+
+
+def expand_course_codes(text: str) -> str:
+    """Expande os códigos de curso de uma resposta do modelo para os nomes completos."""
+    if not COURSE_CODES_ENABLED:
+        return text
+    return get_course_codes().expand(text)
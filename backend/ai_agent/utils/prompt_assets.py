@@ -0,0 +1,298 @@
+import os
+import json
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from loguru import logger
+
+from ai_agent.utils.data_loader import get_data_dir
+
+
+def _freeze(value: Any) -> Any:
+    """Converte recursivamente dicts/listas em estruturas imutáveis."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def to_builtin(value: Any) -> Any:
+    """
+    Converte uma estrutura congelada do snapshot de volta para dict/list.
+
+    Útil quando é necessário o mesmo formato que `load_file` retornaria
+    (por exemplo, para serialização ou `repr`).
+    """
+    if isinstance(value, Mapping):
+        return {k: to_builtin(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [to_builtin(v) for v in value]
+    return value
+
+
+def _validate_conteudo_curso(content: Any) -> None:
+    if not isinstance(content, dict):
+        raise ValueError("conteudo_curso.json deve conter um objeto JSON")
+    for section in ("bootcamps", "workshops"):
+        courses = content.get(section)
+        if not isinstance(courses, list) or not courses:
+            raise ValueError(f"conteudo_curso.json: seção '{section}' ausente ou vazia")
+        for course in courses:
+            if not isinstance(course, dict) or not course.get("nome"):
+                raise ValueError(f"conteudo_curso.json: curso sem 'nome' na seção '{section}'")
+
+
+def _validate_guidelines(content: Any) -> None:
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError("guidelines.txt está vazio")
+
+
+@dataclass(frozen=True)
+class AssetSpec:
+    """Descreve um arquivo de prompt gerenciado pelo registro."""
+    key: str
+    filename: str
+    file_type: str
+    required: bool = True
+    validator: Optional[Callable[[Any], None]] = None
+
+
+ASSET_SPECS: Tuple[AssetSpec, ...] = (
+    AssetSpec("conteudo_curso", "conteudo_curso.json", "json", validator=_validate_conteudo_curso),
+    AssetSpec("guidelines", "guidelines.txt", "txt", validator=_validate_guidelines),
+)
+
+
+@dataclass(frozen=True)
+class PromptAssets:
+    """
+    Snapshot imutável dos arquivos de prompt carregados em memória.
+
+    Atributos:
+        conteudo_curso: Catálogo de cursos (estrutura congelada).
+        guidelines: Texto das diretrizes do plano de estudos.
+        version: Hash combinado de todos os arquivos; muda a cada troca de snapshot.
+        fingerprints: Por arquivo, a tupla (mtime_ns, sha256) usada para detectar mudanças.
+        loaded_at: Timestamp (epoch) do carregamento.
+    """
+    conteudo_curso: Mapping[str, Any]
+    guidelines: str
+    version: str
+    fingerprints: Mapping[str, Tuple[Optional[int], Optional[str]]]
+    loaded_at: float
+
+
+class PromptAssetRegistry:
+    """
+    Registro dos arquivos de prompt, carregados e validados uma única vez.
+
+    O caminho de requisição apenas lê a referência do snapshot atual em memória
+    (sem I/O de arquivo). Um watcher opcional verifica periodicamente o mtime dos
+    arquivos e, quando o conteúdo (hash) muda, carrega e valida um novo snapshot
+    e o troca atomicamente. Se o novo conteúdo for inválido, o snapshot anterior
+    continua em uso.
+    """
+
+    def __init__(self, data_dir: Optional[str] = None, specs: Tuple[AssetSpec, ...] = ASSET_SPECS,
+                 poll_interval: Optional[float] = None):
+        self._data_dir = data_dir
+        self._specs = specs
+        self._poll_interval = poll_interval if poll_interval is not None else float(
+            os.getenv("PROMPT_ASSETS_POLL_INTERVAL", "5")
+        )
+        self._snapshot: Optional[PromptAssets] = None
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+        self._file_reads: Dict[str, int] = {spec.filename: 0 for spec in specs}
+        self._snapshot_hits = 0
+        self._snapshot_misses = 0
+        self._reloads = 0
+        self._reload_errors = 0
+        # mtimes de uma recarga que falhou: não são relidos até algum arquivo mudar de novo
+        self._failed_fingerprints: Dict[str, Optional[int]] = {}
+
+    @property
+    def data_dir(self) -> str:
+        return self._data_dir or get_data_dir()
+
+    # ---- LEITURA DE ARQUIVOS ----
+
+    def _path(self, spec: AssetSpec) -> str:
+        return os.path.join(self.data_dir, spec.filename)
+
+    def _stat_mtime(self, spec: AssetSpec) -> Optional[int]:
+        try:
+            return os.stat(self._path(spec)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_asset(self, spec: AssetSpec) -> Tuple[Any, Optional[int], Optional[str]]:
+        """Lê, decodifica e valida um arquivo. Retorna (conteúdo, mtime_ns, sha256)."""
+        path = self._path(spec)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with open(path, "rb") as file:
+                raw = file.read()
+        except FileNotFoundError:
+            if spec.required:
+                raise FileNotFoundError(f"Arquivo de prompt obrigatório '{spec.filename}' não encontrado em {path}")
+            logger.warning(f"Arquivo de prompt opcional '{spec.filename}' não encontrado; usando None.")
+            return None, None, None
+
+        self._file_reads[spec.filename] += 1
+        digest = hashlib.sha256(raw).hexdigest()
+        text = raw.decode("utf-8")
+        content = json.loads(text) if spec.file_type == "json" else text
+        if spec.validator:
+            spec.validator(content)
+        return content, mtime, digest
+
+    def _build_snapshot(self) -> PromptAssets:
+        contents: Dict[str, Any] = {}
+        fingerprints: Dict[str, Tuple[Optional[int], Optional[str]]] = {}
+        for spec in self._specs:
+            content, mtime, digest = self._read_asset(spec)
+            contents[spec.key] = _freeze(content)
+            fingerprints[spec.filename] = (mtime, digest)
+
+        version = hashlib.sha256(
+            "|".join(f"{name}:{digest}" for name, (_, digest) in sorted(fingerprints.items())).encode()
+        ).hexdigest()[:16]
+
+        return PromptAssets(
+            conteudo_curso=contents.get("conteudo_curso"),
+            guidelines=contents.get("guidelines"),
+            version=version,
+            fingerprints=MappingProxyType(fingerprints),
+            loaded_at=time.time(),
+        )
+
+    # ---- API PÚBLICA ----
+
+    def load(self) -> PromptAssets:
+        """
+        Carrega e valida todos os arquivos de prompt e publica um novo snapshot.
+
+        Raises:
+            FileNotFoundError: Se um arquivo obrigatório não existir.
+            ValueError: Se algum arquivo tiver conteúdo inválido.
+        """
+        with self._reload_lock:
+            snapshot = self._build_snapshot()
+            self._snapshot = snapshot  # Troca atômica da referência
+            self._reloads += 1
+        logger.info(f"Arquivos de prompt carregados (versão {snapshot.version}) de {self.data_dir}")
+        return snapshot
+
+    def snapshot(self) -> PromptAssets:
+        """
+        Retorna o snapshot atual, sem nenhum acesso a disco.
+
+        Se o registro ainda não foi carregado (ex.: uso fora da aplicação FastAPI),
+        carrega os arquivos uma única vez.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            self._snapshot_hits += 1
+            return snapshot
+        self._snapshot_misses += 1
+        logger.warning("Snapshot de prompt solicitado antes do carregamento; carregando sob demanda.")
+        return self._snapshot or self.load()
+
+    def refresh_if_changed(self) -> bool:
+        """
+        Verifica se algum arquivo mudou (mtime e depois hash) e troca o snapshot.
+
+        Returns:
+            bool: True se um novo snapshot foi publicado.
+        """
+        current = self._snapshot
+        if current is None:
+            self.load()
+            return True
+
+        mtimes = {spec.filename: self._stat_mtime(spec) for spec in self._specs}
+        changed = [spec for spec in self._specs if mtimes[spec.filename] != current.fingerprints[spec.filename][0]]
+        if not changed or mtimes == self._failed_fingerprints:
+            # Nada mudou, ou os arquivos continuam como na última recarga que falhou
+            return False
+
+        try:
+            with self._reload_lock:
+                snapshot = self._build_snapshot()
+                if snapshot.version == current.version:
+                    # Apenas o mtime mudou; mantém o snapshot mas atualiza as fingerprints
+                    self._snapshot = PromptAssets(
+                        conteudo_curso=current.conteudo_curso,
+                        guidelines=current.guidelines,
+                        version=current.version,
+                        fingerprints=snapshot.fingerprints,
+                        loaded_at=current.loaded_at,
+                    )
+                    return False
+                self._snapshot = snapshot
+                self._reloads += 1
+        except Exception as e:
+            self._reload_errors += 1
+            self._failed_fingerprints = mtimes
+            logger.error(f"Falha ao recarregar arquivos de prompt; mantendo versão {current.version}: {e}")
+            return False
+
+        logger.success(
+            f"Arquivos de prompt atualizados: versão {current.version} -> {snapshot.version} "
+            f"({', '.join(spec.filename for spec in changed)})"
+        )
+        return True
+
+    def _watch(self) -> None:
+        while not self._stop_event.wait(self._poll_interval):
+            try:
+                self.refresh_if_changed()
+            except Exception as e:
+                logger.error(f"Erro no watcher de arquivos de prompt: {e}")
+
+    def start_watcher(self) -> None:
+        """Inicia a thread que verifica periodicamente mudanças nos arquivos."""
+        if self._poll_interval <= 0 or (self._watcher and self._watcher.is_alive()):
+            return
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=self._watch, name="prompt-assets-watcher", daemon=True)
+        self._watcher.start()
+        logger.info(f"Watcher de arquivos de prompt iniciado (intervalo: {self._poll_interval}s)")
+
+    def stop_watcher(self) -> None:
+        """Interrompe a thread de verificação, se estiver em execução."""
+        self._stop_event.set()
+        if self._watcher:
+            self._watcher.join(timeout=self._poll_interval + 1)
+            self._watcher = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna contadores de carregamento e de acertos do snapshot."""
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "file_reads": dict(self._file_reads),
+            "snapshot_hits": self._snapshot_hits,
+            "snapshot_misses": self._snapshot_misses,
+            "reloads": self._reloads,
+            "reload_errors": self._reload_errors,
+            "watcher_running": bool(self._watcher and self._watcher.is_alive()),
+        }
+
+
+# Instância compartilhada pela aplicação
+asset_registry = PromptAssetRegistry()
+
+
+def get_prompt_assets() -> PromptAssets:
+    """Atalho para o snapshot atual do registro compartilhado."""
+    return asset_registry.snapshot()
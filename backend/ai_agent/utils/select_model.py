@@ -1,9 +1,9 @@
 import sys
 from loguru import logger
 
-def select_model(openai_token: str | None, deepseek_token: str | None, openrouter_token: str | None):
+def select_models(openai_token: str | None, deepseek_token: str | None, openrouter_token: str | None):
     """
-    Seleciona automaticamente um serviço LLM com base na disponibilidade e prioridade das chaves de API.
+    Lista todos os serviços LLM com chave de API configurada, em ordem de prioridade.
 
     Prioridade: OpenAI > DeepSeek > OpenRouter
 
@@ -13,7 +13,7 @@ def select_model(openai_token: str | None, deepseek_token: str | None, openroute
         openrouter_token (str | None): Token da API OpenRouter.
 
     Returns:
-        tuple: (model_name, token) O nome do modelo selecionado e sua chave de API
+        list[tuple]: Pares (model_name, token) dos serviços disponíveis
     """
     # Define a ordem de prioridade e os tokens correspondentes
     priority_order = [
@@ -23,18 +23,30 @@ def select_model(openai_token: str | None, deepseek_token: str | None, openroute
         # Removido 'huggingface'
     ]
 
-    # Encontra o primeiro serviço disponível na ordem de prioridade
-    selected_service = None
-    for name, token in priority_order:
-        if token:
-            selected_service = (name, token)
-            break # Para no primeiro encontrado
+    available = [(name, token) for name, token in priority_order if token]
 
-    if not selected_service:
-        logger.error("Nenhuma chave de API encontrada para OpenAI, DeepSeek ou OpenRouter nas variáveis de ambiente (OPENAI_API_KEY, DEEPSEEK_TOKEN, OPENROUTER_API_KEY).")
+    if not available:
+        logger.error("Nenhuma chave de API encontrada para OpenAI, DeepSeek ou OpenRouter nas variáveis de ambiente (OPENAI_API_KEY, DEEPSEEK_API_KEY, OPENROUTER_API_KEY).")
         sys.exit(1) # Sai se nenhum serviço estiver configurado
 
-    model_name, token = selected_service
+    logger.info(f"Serviços LLM disponíveis: {', '.join(name for name, _ in available)}")
+    return available
+
+def select_model(openai_token: str | None, deepseek_token: str | None, openrouter_token: str | None):
+    """
+    Seleciona automaticamente um serviço LLM com base na disponibilidade e prioridade das chaves de API.
+
+    Prioridade: OpenAI > DeepSeek > OpenRouter
+
+    Args:
+        openai_token (str | None): Token da API OpenAI.
+        deepseek_token (str | None): Token da API DeepSeek.
+        openrouter_token (str | None): Token da API OpenRouter.
+
+    Returns:
+        tuple: (model_name, token) O nome do modelo selecionado e sua chave de API
+    """
+    model_name, token = select_models(openai_token, deepseek_token, openrouter_token)[0]
     logger.info(f"Seleção automática: Usando serviço {model_name.capitalize()} com base na prioridade e disponibilidade da chave.")
     return model_name, token
 
@@ -0,0 +1,90 @@
+from typing import Optional
+
+from ai_agent.utils.course_codes import CourseCodeBook
+
+# Maior trecho retido à espera do fechamento de um código ("[BIP2]") ou marcador ("{{CRONOGRAMA}}")
+_MAX_HOLD = 24
+
+
+class StreamRewriter:
+    """
+    Aplica à resposta em streaming as mesmas transformações feitas na resposta completa.
+
+    Cada parte recebida do modelo passa por `feed`, que devolve o texto já pronto
+    para enviar ao cliente: códigos de curso expandidos para os nomes completos e o
+    marcador do cronograma substituído pelo cronograma renderizado. Um "[" ou "{"
+    ainda sem fechamento no final da parte é retido até a próxima, para que um
+    código dividido entre duas partes seja expandido inteiro. `finish` libera o
+    restante e, se o modelo não escreveu o marcador, adiciona o cronograma ao final.
+
+    O estado "dentro de um bloco Mermaid" é acompanhado linha a linha, como em
+    `CourseCodeBook.expand`.
+    """
+
+    def __init__(self, codebook: Optional[CourseCodeBook] = None,
+                 placeholder: Optional[str] = None, replacement: Optional[str] = None):
+        self.codebook = codebook
+        self.placeholder = placeholder
+        self.replacement = replacement
+        self.placeholder_found = False
+        self._pending = ""
+        self._line = ""
+        self._in_mermaid = False
+        self._output = []
+
+    @property
+    def text(self) -> str:
+        """Todo o texto já devolvido por `feed` e `finish`."""
+        return "".join(self._output)
+
+    def _safe_cut(self, text: str) -> int:
+        cut = len(text)
+        for opener, closer in (("[", "]"), ("{", "}")):
+            index = text.rfind(opener)
+            if index == -1 or closer in text[index:] or len(text) - index >= _MAX_HOLD:
+                continue
+            while index > 0 and text[index - 1] == opener:
+                index -= 1
+            cut = min(cut, index)
+        return cut
+
+    def _rewrite(self, text: str) -> str:
+        parts = []
+        for piece in text.splitlines(keepends=True):
+            if self.codebook:
+                piece = self.codebook.expand_fragment(piece, in_mermaid=self._in_mermaid)
+            parts.append(piece)
+            self._line += piece
+            if piece.endswith("\n"):
+                line = self._line.strip()
+                if line.startswith("```mermaid"):
+                    self._in_mermaid = True
+                elif line.startswith("```") and self._in_mermaid:
+                    self._in_mermaid = False
+                self._line = ""
+        rewritten = "".join(parts)
+
+        if self.placeholder and self.placeholder in rewritten:
+            if not self.placeholder_found and self.replacement is not None:
+                rewritten = rewritten.replace(self.placeholder, self.replacement, 1)
+                self.placeholder_found = True
+            rewritten = rewritten.replace(self.placeholder, "")
+        self._output.append(rewritten)
+        return rewritten
+
+    def feed(self, chunk: str) -> str:
+        """Recebe uma parte da resposta e devolve o texto que já pode ser enviado."""
+        self._pending += chunk
+        cut = self._safe_cut(self._pending)
+        ready, self._pending = self._pending[:cut], self._pending[cut:]
+        return self._rewrite(ready) if ready else ""
+
+    def finish(self) -> str:
+        """Libera o texto retido; adiciona o cronograma se o marcador não apareceu."""
+        tail = self._rewrite(self._pending) if self._pending else ""
+        self._pending = ""
+        if self.replacement is not None and self.placeholder and not self.placeholder_found:
+            suffix = f"\n\n{self.replacement}"
+            self._output.append(suffix)
+            tail += suffix
+        return tail
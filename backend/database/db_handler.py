@@ -1,11 +1,17 @@
 from sqlmodel import SQLModel, create_engine, Session, select
-from typing import List, Dict
+from sqlalchemy import func, inspect, insert, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Any, List, Dict, Tuple
 from contextlib import contextmanager
 from pathlib import Path
 from loguru import logger
+import datetime
 import os
+import threading
+import time
 
-from database.models import Student, StudyPlan 
+from database.models import Student, StudyPlan, PlanCacheEntry, PregenerationCheckpoint, LLMCall
+from metrics import DB_SESSION_DURATION, DB_SESSIONS_IN_FLIGHT
 
 # --- Database Path Configuration ---
 # Determine the database directory based on environment
@@ -16,7 +22,6 @@ _DATABASE_DIR_PATH_STR = os.getenv("DATABASE_DIR_PATH")
 if _DATABASE_DIR_PATH_STR:
     # Use the path from the environment variable (Docker)
     DATABASE_DIR = Path(_DATABASE_DIR_PATH_STR)
-    logger.info(f"Using database directory from environment variable: {DATABASE_DIR}")
 else:
     # Default to a data directory at the project root for local execution
     # __file__ is the path to the current script (db_handler.py)
@@ -25,23 +30,59 @@ else:
     # .parent gets the project root directory (parent of backend)
     # / 'data' navigates to the data directory at the project root
     DATABASE_DIR = Path(__file__).resolve().parent.parent.parent / 'data'
-    logger.info(f"DATABASE_DIR_PATH not set, defaulting to project data directory: {DATABASE_DIR}")
 
 
 DATABASE_FILE = DATABASE_DIR / "database.db"
 DATABASE_URL = f"sqlite:///{DATABASE_FILE}"
 
-# Create the engine (connection pool)
-# connect_args is specific to SQLite to disable same-thread check for FastAPI background tasks if needed
-# For simple sequential requests, it might not be strictly necessary, but good practice.
-logger.info(f"Connecting to database at: {DATABASE_URL}")
-engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False})
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """
+    Returns the engine (connection pool), creating it on first use.
+
+    Importing this module does not touch the database, so tools and tests that
+    only need the models or the CRUD helpers start without it.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                source = "environment variable" if _DATABASE_DIR_PATH_STR else "default project data directory"
+                logger.info(f"Connecting to database at: {DATABASE_URL} ({source})")
+                # connect_args is specific to SQLite to disable same-thread check for FastAPI background tasks if needed
+                # For simple sequential requests, it might not be strictly necessary, but good practice.
+                _engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False})
+    return _engine
+
+# Columns added after the first release: (table, column, SQL definition).
+# create_all() does not alter existing tables, so they are added on startup.
+_ADDED_COLUMNS = [
+    ("studyplan", "is_degraded", "BOOLEAN NOT NULL DEFAULT 0"),
+    ("studyplan", "structured_plan", "JSON"),
+    ("plancacheentry", "structured_plan", "JSON"),
+]
+
+def _add_missing_columns():
+    """Adds columns introduced by newer model versions to existing SQLite tables."""
+    engine = get_engine()
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table, column, definition in _ADDED_COLUMNS:
+            if not inspector.has_table(table):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table)}
+            if column not in existing:
+                logger.info(f"Adding column {table}.{column} to existing database")
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
 
 def create_db_and_tables():
     """Creates the database file and tables if they don't exist."""
     logger.info(f"Ensuring database and tables exist at {DATABASE_FILE}...")
     try:
-        SQLModel.metadata.create_all(engine)
+        SQLModel.metadata.create_all(get_engine())
+        _add_missing_columns()
         logger.info("Database and tables verified/created successfully.")
     except Exception as e:
         logger.error(f"Failed to create database or tables: {e}", exc_info=True)
@@ -49,10 +90,14 @@ def create_db_and_tables():
 
 def get_session():
     """Provides a transactional scope around a series of operations."""
-    session = Session(engine)
+    session = Session(get_engine())
+    started = time.perf_counter()
+    outcome = "rollback"
+    DB_SESSIONS_IN_FLIGHT.inc()
     try:
         yield session
         session.commit()
+        outcome = "commit"
         logger.debug("DB Session committed.")
     except Exception as e:
         logger.error(f"DB Session rollback due to error: {e}", exc_info=True)
@@ -60,8 +105,14 @@ def get_session():
         raise
     finally:
         session.close()
+        DB_SESSIONS_IN_FLIGHT.dec()
+        DB_SESSION_DURATION.observe(time.perf_counter() - started, outcome)
         logger.debug("DB Session closed.")
 
+# Same transactional scope as get_session, usable with "with" outside request
+# dependencies (e.g. when a streaming response persists data after the last chunk)
+session_scope = contextmanager(get_session)
+
 # --- CRUD Operations ---
 
 def get_or_create_student(session: Session, name: str, email: str) -> Student:
@@ -87,13 +138,9 @@ def get_or_create_student(session: Session, name: str, email: str) -> Student:
             session.refresh(student)
     return student
 
-def add_study_plan(session: Session, student_id: int, plan_data: dict) -> StudyPlan:
-    """Adds a new study plan for a given student."""
-    logger.info(f"Adding study plan for student ID: {student_id}")
-    logger.debug(f"Plan data: {plan_data}")
-
-    # Map incoming plan_data (should match Streamlit form structure) to the new model fields
-    new_plan = StudyPlan(
+def _new_study_plan(student_id: int, plan_data: dict) -> StudyPlan:
+    """Maps incoming plan data (Streamlit form structure) to a StudyPlan row."""
+    return StudyPlan(
         student_id=student_id,
         start_date=plan_data["start_date"], # Assumes it's already a date object from API layer
         weekly_availability=plan_data["hours_per_day"], # Renamed in form/payload, maps to this field
@@ -104,8 +151,17 @@ def add_study_plan(session: Session, student_id: int, plan_data: dict) -> StudyP
         used_docker=plan_data["used_docker"], # Should be boolean
         interests=plan_data.get("interests"), # Optional list
         main_challenge=plan_data.get("main_challenge"), # Optional string
-        chat=plan_data["chat"] # Corrected to get chat history from 'chat' key
+        chat=plan_data["chat"], # Corrected to get chat history from 'chat' key
+        is_degraded=plan_data.get("is_degraded", False),
+        structured_plan=plan_data.get("structured_plan")
     )
+
+def add_study_plan(session: Session, student_id: int, plan_data: dict) -> StudyPlan:
+    """Adds a new study plan for a given student."""
+    logger.info(f"Adding study plan for student ID: {student_id}")
+    logger.debug(f"Plan data: {plan_data}")
+
+    new_plan = _new_study_plan(student_id, plan_data)
     session.add(new_plan)
     session.flush() # Assign ID
     session.refresh(new_plan)
@@ -113,12 +169,54 @@ def add_study_plan(session: Session, student_id: int, plan_data: dict) -> StudyP
     return new_plan
 
 
-def update_chat(session: Session, plan_id: int, conversation_history: List[Dict[str, str]]) -> StudyPlan | None:
-    """Updates the conversation history snapshot for a specific study plan."""
+def add_study_plans_bulk(session: Session, entries: List[Tuple[str, str, dict]]) -> List[StudyPlan]:
+    """
+    Gets or creates the students and adds one study plan per (name, email, plan_data) entry.
+
+    Students are looked up with a single query and new students and plans are
+    inserted in one flush each, instead of a round trip per row. Returns the
+    plans in the order of `entries`.
+    """
+    logger.info(f"Adding {len(entries)} study plans in bulk")
+    emails = {email for _, email, _ in entries}
+    students = {
+        student.email: student
+        for student in session.exec(select(Student).where(Student.email.in_(emails))).all()
+    }
+    for name, email, _ in entries:
+        student = students.get(email)
+        if student is None:
+            students[email] = student = Student(name=name, email=email)
+            session.add(student)
+        elif student.name != name:
+            student.name = name
+            session.add(student)
+    session.flush() # Assigns student IDs
+
+    plans = [_new_study_plan(students[email].id, plan_data) for _, email, plan_data in entries]
+    session.add_all(plans)
+    session.flush() # Assigns plan IDs
+    logger.info(f"Added {len(plans)} study plans for {len(emails)} students")
+    return plans
+
+
+def get_study_plan(session: Session, plan_id: int) -> StudyPlan | None:
+    """Gets a study plan by ID."""
+    logger.info(f"Fetching study plan with ID: {plan_id}")
+    return session.get(StudyPlan, plan_id)
+
+
+def update_chat(session: Session, plan_id: int, conversation_history: List[Dict[str, str]],
+                is_degraded: bool | None = None, structured_plan: Dict[str, Any] | None = None) -> StudyPlan | None:
+    """Updates the conversation history snapshot (and optionally the degraded flag and structured plan) for a study plan."""
     logger.info(f"Updating conversation history snapshot for plan ID: {plan_id}")
     plan = session.get(StudyPlan, plan_id) # Use session.get for primary key lookup
     if plan:
         plan.chat = conversation_history # Use the renamed field 'chat'
+        if is_degraded is not None:
+            plan.is_degraded = is_degraded
+        if structured_plan is not None:
+            plan.structured_plan = structured_plan
         session.add(plan)
         session.flush() # Apply changes to the session
         session.refresh(plan) # Refresh the object with DB state (including potential triggers/defaults)
@@ -126,4 +224,132 @@ def update_chat(session: Session, plan_id: int, conversation_history: List[Dict[
         return plan
     else:
         logger.warning(f"Study plan with ID {plan_id} not found during update attempt.")
-        return None
\ No newline at end of file
+        return None
+
+
+def get_plan_cache_entry(session: Session, key: str) -> PlanCacheEntry | None:
+    """Gets a cached plan by its profile key."""
+    return session.get(PlanCacheEntry, key)
+
+
+def save_plan_cache_entry(session: Session, key: str, plan_text: str, asset_version: str,
+                          structured_plan: Dict[str, Any] | None = None) -> None:
+    """Stores (or replaces) the cached plan for a profile key."""
+    logger.debug(f"Saving plan cache entry {key[:12]}")
+    # Upsert, so concurrent requests for the same profile can't collide on the primary key
+    values = {
+        "key": key,
+        "plan_text": plan_text,
+        "structured_plan": structured_plan,
+        "asset_version": asset_version,
+        "hits": 0,
+        "created_at": datetime.datetime.now(datetime.timezone.utc),
+    }
+    statement = sqlite_insert(PlanCacheEntry).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=[PlanCacheEntry.key],
+        set_={name: value for name, value in values.items() if name != "key"},
+    )
+    session.exec(statement)
+    session.expire_all()
+
+
+def record_plan_cache_hit(session: Session, entry: PlanCacheEntry) -> None:
+    """Increments the hit counter of a cached plan."""
+    entry.hits += 1
+    session.add(entry)
+    session.flush()
+
+
+def delete_plan_cache_entry(session: Session, key: str) -> None:
+    """Removes a cached plan (e.g. when it expired)."""
+    entry = session.get(PlanCacheEntry, key)
+    if entry:
+        session.delete(entry)
+        session.flush()
+
+
+def delete_plan_cache_entries_before(session: Session, cutoff: datetime.datetime) -> int:
+    """Removes cached plans created before `cutoff`; returns how many were removed."""
+    entries = session.exec(select(PlanCacheEntry).where(PlanCacheEntry.created_at < cutoff)).all()
+    for entry in entries:
+        session.delete(entry)
+    session.flush()
+    if entries:
+        logger.info(f"Removed {len(entries)} expired plan cache entries")
+    return len(entries)
+
+
+def get_pregeneration_checkpoints(session: Session, job: str) -> Dict[str, PregenerationCheckpoint]:
+    """Checkpoints of a pre-generation job, keyed by row key."""
+    statement = select(PregenerationCheckpoint).where(PregenerationCheckpoint.job == job)
+    return {checkpoint.row_key: checkpoint for checkpoint in session.exec(statement).all()}
+
+
+def save_pregeneration_checkpoint(session: Session, job: str, row_key: str, row_number: int, status: str,
+                                  plan_id: int | None = None, error: str | None = None) -> PregenerationCheckpoint:
+    """Records the outcome of one attempt at a pre-generation row."""
+    checkpoint = session.get(PregenerationCheckpoint, (job, row_key))
+    if checkpoint is None:
+        checkpoint = PregenerationCheckpoint(job=job, row_key=row_key, row_number=row_number, status=status)
+    checkpoint.status = status
+    checkpoint.row_number = row_number
+    checkpoint.plan_id = plan_id
+    checkpoint.error = error
+    checkpoint.attempts += 1
+    checkpoint.updated_at = datetime.datetime.now(datetime.timezone.utc)
+    session.add(checkpoint)
+    session.flush()
+    return checkpoint
+
+
+def add_llm_calls(session: Session, calls: List[Dict[str, Any]], plan_attributions: List[Tuple[str, int]]) -> None:
+    """
+    Appends a batch of LLM ledger entries and links earlier entries to their plans.
+
+    `plan_attributions` are (request_id, plan_id) pairs for requests whose plan was
+    saved after their LLM calls; they are applied after the inserts of the batch.
+    """
+    if calls:
+        session.execute(insert(LLMCall), calls)
+    for request_id, plan_id in plan_attributions:
+        session.execute(
+            update(LLMCall)
+            .where(LLMCall.request_id == request_id, LLMCall.plan_id.is_(None))
+            .values(plan_id=plan_id)
+        )
+    logger.debug(f"Wrote {len(calls)} LLM ledger entries and {len(plan_attributions)} plan attributions")
+
+
+def get_llm_call_latencies(session: Session, since: datetime.datetime) -> List[Tuple[str, str, int, int | None]]:
+    """(provider, day, latency_ms, ttft_ms) of the successful LLM calls made since `since`."""
+    day = func.date(LLMCall.created_at)
+    statement = (
+        select(LLMCall.provider, day, LLMCall.latency_ms, LLMCall.ttft_ms)
+        .where(LLMCall.created_at >= since, LLMCall.outcome == "success")
+        .order_by(LLMCall.provider, day)
+    )
+    return [tuple(row) for row in session.exec(statement).all()]
+
+
+def get_llm_cost_per_plan(session: Session, since: datetime.datetime, limit: int) -> List[Dict[str, Any]]:
+    """Calls, tokens, latency and cost of the LLM calls of each plan, most recent plans first."""
+    statement = (
+        select(
+            LLMCall.plan_id,
+            func.min(LLMCall.endpoint),
+            func.count(),
+            func.sum(LLMCall.prompt_tokens),
+            func.sum(LLMCall.completion_tokens),
+            func.sum(LLMCall.cached_tokens),
+            func.sum(LLMCall.latency_ms),
+            func.sum(LLMCall.cost_usd),
+        )
+        .where(LLMCall.created_at >= since, LLMCall.plan_id.is_not(None))
+        .group_by(LLMCall.plan_id)
+        .order_by(LLMCall.plan_id.desc())
+        .limit(limit)
+    )
+    keys = ("plan_id", "endpoint", "calls", "prompt_tokens", "completion_tokens", "cached_tokens",
+            "latency_ms", "cost_usd")
+    return [dict(zip(keys, row)) for row in session.exec(statement).all()]
@@ -26,7 +26,53 @@ class StudyPlan(SQLModel, table=True):
     interests: Optional[List[str]] = Field(default=None, sa_column=Column(JSON))
     main_challenge: Optional[str] = Field(default=None, sa_type=Text())
     chat: List[Dict[str, str]] = Field(sa_column=Column(JSON)) # Renamed from generated_plan
+    is_degraded: bool = Field(default=False) # Template plan served while the LLM was unavailable
+    # Weeks -> days -> courses of plans generated in structured output mode (see ai_agent/structured_plan.py)
+    structured_plan: Optional[Dict] = Field(default=None, sa_column=Column(JSON))
     created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
 
     # Relationship: Each study plan belongs to one student
-    student: Student = Relationship(back_populates="study_plans")
\ No newline at end of file
+    student: Student = Relationship(back_populates="study_plans")
+
+class PlanCacheEntry(SQLModel, table=True):
+    # SHA-256 of the normalized questionnaire (no name/email) and the prompt-asset version
+    key: str = Field(primary_key=True)
+    # Generated plan with the student's name replaced by placeholders
+    plan_text: str = Field(sa_type=Text())
+    # Structured plan with the same placeholders, for plans generated in structured output mode
+    structured_plan: Optional[Dict] = Field(default=None, sa_column=Column(JSON))
+    asset_version: str = Field(index=True)
+    hits: int = Field(default=0)
+    created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+
+class PregenerationCheckpoint(SQLModel, table=True):
+    # Progress of an offline pre-generation job (see pregenerate.py), one row per input questionnaire
+    job: str = Field(primary_key=True)
+    # SHA-256 of the validated questionnaire (email included)
+    row_key: str = Field(primary_key=True)
+    row_number: int
+    status: str = Field(index=True) # "done" or "failed"
+    plan_id: Optional[int] = Field(default=None)
+    attempts: int = Field(default=0)
+    error: Optional[str] = Field(default=None, sa_type=Text())
+    updated_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+
+class LLMCall(SQLModel, table=True):
+    # Append-only ledger of LLM provider calls (see ai_agent/llm_services/ledger.py)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc), index=True)
+    # Groups the calls made while serving one API request
+    request_id: Optional[str] = Field(default=None, index=True)
+    endpoint: str = Field(index=True)
+    # Plan the call was made for; not a foreign key, so the ledger outlives deleted plans
+    plan_id: Optional[int] = Field(default=None, index=True)
+    provider: str = Field(index=True)
+    model: str
+    kind: str # "completion" or "stream"
+    outcome: str # "success", "error" or "cancelled"
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+    cached_tokens: int = Field(default=0)
+    latency_ms: int
+    ttft_ms: Optional[int] = Field(default=None) # Time to first token (streams only)
+    cost_usd: Optional[float] = Field(default=None) # Estimated from MODEL_PRICES
@@ -64,6 +64,13 @@ class PlanRequestData(BaseModel):
             }
         }
 
+# --- Schema for Cohort (Batch) Plan Generation ---
+
+class CohortPlanRequest(BaseModel):
+    """Request model for the /generate_plan/batch endpoint."""
+    students: List[PlanRequestData] = PydanticField(..., min_length=1, description="Questionnaire of each student in the cohort.")
+    concurrency: Optional[int] = PydanticField(None, ge=1, description="Maximum plan generations in flight for this cohort (capped by the server limit).")
+
 # --- Schema for Chat Continuation Request ---
 
 class ContinueChatRequest(BaseModel):
@@ -83,6 +90,19 @@ class ContinueChatRequest(BaseModel):
             }
         }
 
+# --- Schema for Plan Upgrade Request ---
+
+class UpgradePlanRequest(BaseModel):
+    """Request model for the /upgrade_plan endpoint."""
+    plan_id: int = PydanticField(..., description="The ID of the degraded study plan to regenerate with the AI service.")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "plan_id": 5
+            }
+        }
+
 # --- Unified Response Schema ---
 
 class PlanResponse(BaseModel):
@@ -91,6 +111,9 @@ class PlanResponse(BaseModel):
     student_id: int
     plan_id: int
     chat: List[Dict[str, str]] # Renamed field for the full conversation history
+    degraded: bool = PydanticField(False, description="True when the plan was built from templates because the AI service was unavailable; it can be upgraded later via /upgrade_plan.")
+    degraded_reason: Optional[str] = PydanticField(None, description="Why the degraded plan was served (overloaded, timeout, provider_error, empty_response).")
+    structured_plan: Optional[Dict[str, Any]] = PydanticField(None, description="Weeks, days and courses of the plan when it was generated in structured output mode (PLAN_OUTPUT_FORMAT=json).")
 
     # Example for model configuration if needed later
     class Config:
@@ -102,6 +125,8 @@ class PlanResponse(BaseModel):
                 "chat": [ # Renamed key in example
                     {"role": "user", "content": "Generate a plan..."},
                     {"role": "assistant", "content": "Okay, here is week 1..."}
-                ]
+                ],
+                "degraded": False,
+                "degraded_reason": None
             }
         }
\ No newline at end of file
@@ -1,12 +1,20 @@
+# Imported first: starts the import clock (and, with STARTUP_PROFILE, the per-module timing)
+from startup_profile import startup_profiler
 from fastapi import FastAPI
 from loguru import logger
 from contextlib import asynccontextmanager
 import time
 
-from database.db_handler import create_db_and_tables
+from database.db_handler import create_db_and_tables, session_scope
 from ai_agent.llm_service import initialize_llm_service
+from ai_agent.llm_services.ledger import call_ledger
+from ai_agent.utils.prompt_assets import asset_registry
+from services.plan_cache import plan_cache
+from services.similar_plans import similar_plans
+from services.ledger_service import LedgerService
 import dependencies
-from routers import plan, chat
+from metrics import METRICS_ENABLED, MetricsMiddleware
+from routers import plan, chat, monitoring, metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -24,17 +32,39 @@ async def lifespan(app: FastAPI):
     try:
         # 1. Create database tables
         logger.info("Initializing database tables...")
-        create_db_and_tables()
+        with startup_profiler.stage("database"):
+            create_db_and_tables()
+            with session_scope() as session:
+                plan_cache.purge_expired(session)
+                similar_plans.build(session)
         logger.success("Database tables successfully initialized")
         
-        # 2. Initialize LLM service
+        # 2. Load prompt assets into memory and watch for changes
+        logger.info("Loading prompt assets...")
+        with startup_profiler.stage("prompt_assets"):
+            asset_registry.load()
+            asset_registry.start_watcher()
+        logger.success("Prompt assets loaded and cached in memory")
+
+        # 3. Initialize LLM service
         logger.info("Initializing Language Model service...")
-        app.state.llm_service = initialize_llm_service()
+        with startup_profiler.stage("llm_service"):
+            app.state.llm_service = initialize_llm_service()
         logger.success("LLM service successfully initialized and ready")
+
+        # 4. Open provider connections so the first request skips the TLS handshake
+        logger.info("Warming up LLM provider connections...")
+        with startup_profiler.stage("warm_up"):
+            await app.state.llm_service.warm_up()
+
+        # 5. Record every provider call in the LLM ledger, written in background batches
+        with startup_profiler.stage("ledger"):
+            call_ledger.start(LedgerService.write_batch)
         
         # Log successful startup
         elapsed = time.time() - start_time
         logger.success(f"=== Application startup completed successfully in {elapsed:.2f} seconds ===")
+        startup_profiler.startup_done()
         
     except Exception as e:
         # Log detailed error information on startup failure
@@ -47,6 +77,11 @@ async def lifespan(app: FastAPI):
 
     # Shutdown cleanup
     logger.info("=== Application shutdown process beginning ===")
+    asset_registry.stop_watcher()
+    call_ledger.stop()
+    llm_service = getattr(app.state, "llm_service", None)
+    if llm_service:
+        await llm_service.aclose()
     # Add any resource cleanup here if needed in the future
     logger.info("=== Application shutdown completed ===")
 
@@ -64,6 +99,10 @@ app = FastAPI(
 logger.debug("Registering application instance in dependency manager")
 dependencies.set_app(app)
 
+# Time every request by route template (exposed at /metrics)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Root endpoint for health check and API verification
 @app.get("/", tags=["health"])
 async def read_root():
@@ -82,8 +121,11 @@ async def read_root():
 logger.info("Registering API routers...")
 app.include_router(plan.router)
 app.include_router(chat.router)
+app.include_router(monitoring.router)
+app.include_router(metrics.router)
 logger.debug("API routers successfully registered")
 
 # Log application readiness
 logger.info(f"Application initialized and ready to accept requests")
-logger.info(f"API documentation available at /docs and /redoc")
\ No newline at end of file
+logger.info(f"API documentation available at /docs and /redoc")
+startup_profiler.imports_done()
@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Time every HTTP request (the /metrics endpoint is always available)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Latency buckets in seconds, from a cache hit to a long LLM generation
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+Labels = Tuple[str, ...]
+
+
+class _Metric:
+    """
+    Base of the metric types: every thread updates its own shard, so recording a
+    value takes no lock. Shards are summed when the metrics are scraped.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[Labels, Any]] = []
+        self._shards_lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _shard(self) -> Dict[Labels, Any]:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def _snapshots(self) -> Iterable[List[Tuple[Labels, Any]]]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        # list(dict.items()) runs without releasing the GIL, so a shard being
+        # updated by its thread is copied consistently
+        return (list(shard.items()) for shard in shards)
+
+    def collect(self) -> Dict[Labels, Any]:
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[Tuple[str, Labels, Tuple[Tuple[str, str], ...], float]]:
+        """(name suffix, label values, extra labels, value) of every sample."""
+        for labels, value in sorted(self.collect().items()):
+            yield "", labels, (), value
+
+
+class Counter(_Metric):
+    """Monotonically increasing total."""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def collect(self) -> Dict[Labels, float]:
+        totals: Dict[Labels, float] = {}
+        for items in self._snapshots():
+            for labels, value in items:
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in flight."""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Counts observations in cumulative `le` buckets, plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry: Optional["Registry"] = None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # Per-bucket counts (the last one is +Inf), then the sum and the count
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def collect(self) -> Dict[Labels, List[float]]:
+        totals: Dict[Labels, List[float]] = {}
+        for items in self._snapshots():
+            for labels, state in items:
+                state = list(state)
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = state
+                else:
+                    for position, value in enumerate(state):
+                        total[position] += value
+        return totals
+
+    def _samples(self):
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, state in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                yield "_bucket", labels, (("le", bound),), cumulative
+            yield "_sum", labels, (), state[-2]
+            yield "_count", labels, (), state[-1]
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Registry:
+    """The metrics exposed by /metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, extra, value in metric._samples():
+                pairs = list(zip(metric.labelnames, labels)) + list(extra)
+                rendered = ",".join(f'{name}="{_escape(label)}"' for name, label in pairs)
+                lines.append(f"{metric.name}{suffix}{{{rendered}}} {_format_value(value)}" if rendered
+                             else f"{metric.name}{suffix} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- HTTP ---
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to serve an HTTP request, until the last byte of the response.",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served.")
+
+# --- LLM providers ---
+LLM_CALL_DURATION = Histogram(
+    "llm_call_duration_seconds", "Duration of LLM provider calls (streams: until the last chunk).",
+    ("provider", "model", "kind", "outcome"),
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds", "Time until the first chunk of a streamed LLM call.", ("provider", "model"),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Tokens reported by the provider, by type (prompt, completion, cached).",
+    ("provider", "model", "type"),
+)
+LLM_CALLS_IN_FLIGHT = Gauge("llm_calls_in_flight", "LLM provider calls in progress.", ("provider",))
+
+# --- Database ---
+DB_SESSION_DURATION = Histogram(
+    "db_session_duration_seconds", "Lifetime of a database session, from opening to commit or rollback.",
+    ("outcome",), buckets=DB_BUCKETS,
+)
+DB_SESSIONS_IN_FLIGHT = Gauge("db_sessions_in_flight", "Database sessions currently open.")
+
+
+def record_llm_usage(provider: str, model: str, usage: Dict[str, int]) -> None:
+    """Adds the normalized usage of one completion (see extract_usage) to the token counters."""
+    for kind in ("prompt", "completion", "cached"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            LLM_TOKENS.inc(provider, model, kind, amount=tokens)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that times every HTTP request by route template.
+
+    The route is read after the request is handled (FastAPI stores the matched
+    route in the scope), so /plans/5 and /plans/6 share one series; requests that
+    match no route are labelled "unmatched". Streaming responses are timed until
+    their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, scope["method"], route, str(status))
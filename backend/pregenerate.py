@@ -0,0 +1,275 @@
+"""
+Pre-generates study plans for a cohort from a CSV or JSONL file of questionnaires.
+
+Run from the backend directory:
+
+    python pregenerate.py students.csv [--job NAME] [--concurrency 8] [--max-attempts 3]
+
+Each row goes through the same pipeline as /generate_plan (plan cache, similar
+plans, LLM, database). Progress is checkpointed in the SQLite database per row,
+so running the same command again after a crash or a rate limit only processes
+the rows that are not done yet.
+
+JSONL rows use the /generate_plan request fields. CSV rows use the same column
+names; `hours_per_day` may be a JSON object or be split into one column per
+weekday (Segunda ... Domingo), and `interests` is separated by ";".
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from pydantic import ValidationError
+
+from database.db_handler import (
+    create_db_and_tables,
+    get_pregeneration_checkpoints,
+    save_pregeneration_checkpoint,
+    session_scope,
+)
+from database.schemas import PlanRequestData, Weekday
+from ai_agent.llm_service import initialize_llm_service
+from ai_agent.llm_services.admission import AdmissionRejectedError
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.ledger import call_ledger
+from ai_agent.llm_services.resilience import CircuitOpenError
+from ai_agent.utils.prompt_assets import asset_registry
+from services.degraded_mode import plan_llm_guard
+from services.ledger_service import LedgerService
+from services.plan_service import PlanService
+from services.similar_plans import similar_plans
+
+DONE = "done"
+FAILED = "failed"
+
+# Longest pause after a rate limit before retrying a row
+_MAX_BACKOFF_SECONDS = 120.0
+
+_TRUE_VALUES = {"1", "true", "yes", "sim", "s", "x"}
+
+
+def _csv_row_to_request(row: Dict[str, str]) -> Dict[str, Any]:
+    """Converts a CSV row to the /generate_plan request fields."""
+    data: Dict[str, Any] = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+    if data.get("hours_per_day"):
+        data["hours_per_day"] = json.loads(data["hours_per_day"])
+    else:
+        data["hours_per_day"] = {day.value: int(data.pop(day.value) or 0) for day in Weekday if day.value in data}
+    for flag in ("used_git", "used_docker"):
+        data[flag] = data.get(flag, "").lower() in _TRUE_VALUES
+    interests = data.get("interests")
+    data["interests"] = [item.strip() for item in interests.split(";") if item.strip()] if interests else None
+    data["main_challenge"] = data.get("main_challenge") or None
+    return data
+
+
+def read_rows(path: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yields (row number, raw request fields) from a .csv or .jsonl file."""
+    with path.open(encoding="utf-8-sig", newline="") as file:
+        if path.suffix.lower() == ".csv":
+            for number, row in enumerate(csv.DictReader(file), start=1):
+                yield number, _csv_row_to_request(row)
+        else:
+            for number, line in enumerate(file, start=1):
+                if line.strip():
+                    yield number, json.loads(line)
+
+
+def row_key(request: PlanRequestData) -> str:
+    """Identifies a row across runs by its validated content."""
+    return hashlib.sha256(request.model_dump_json().encode("utf-8")).hexdigest()
+
+
+def _total_tokens(usage: Dict[str, Any]) -> int:
+    """Prompt + completion tokens from `usage_stats()` (of one provider or of the router)."""
+    if "providers" in usage:
+        return sum(_total_tokens(provider) for provider in usage["providers"].values())
+    return usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+
+
+class Progress:
+    """Counts finished rows and prints throughput, tokens and ETA at most once per `interval` seconds."""
+
+    def __init__(self, total: int, skipped: int, llm_service: BaseLLMService, interval: float = 2.0,
+                 out=sys.stdout):
+        self.total = total
+        self.skipped = skipped
+        self.done = 0
+        self.failed = 0
+        self.llm_service = llm_service
+        self.interval = interval
+        self.out = out
+        self.started = time.monotonic()
+        self._tokens_at_start = self.tokens()
+        self._printed_at = 0.0
+
+    def tokens(self) -> int:
+        try:
+            return _total_tokens(self.llm_service.usage_stats())
+        except Exception:
+            return 0
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        finished = self.done + self.failed
+        remaining = self.total - self.skipped - finished
+        rate = finished / elapsed
+        tokens = self.tokens() - self._tokens_at_start
+        eta = f"{remaining / rate:.0f}s" if rate else "?"
+        return (
+            f"[{self.skipped + finished}/{self.total}] done {self.skipped + self.done}, failed {self.failed} | "
+            f"{rate * 60:.1f} rows/min | {tokens} tokens ({tokens / elapsed:.0f}/s) | ETA {eta}"
+        )
+
+    def record(self, ok: bool) -> None:
+        if ok:
+            self.done += 1
+        else:
+            self.failed += 1
+        now = time.monotonic()
+        if now - self._printed_at >= self.interval:
+            self._printed_at = now
+            print(self.line(), file=self.out, flush=True)
+
+
+async def _process_row(job: str, number: int, key: str, request: PlanRequestData, llm_service: BaseLLMService,
+                       max_attempts: int) -> Tuple[bool, Optional[str]]:
+    """Generates and saves one plan; the checkpoint is committed with the plan."""
+    error = None
+    for attempt in range(1, max_attempts + 1):
+        try:
+            with session_scope() as session:
+                result = await PlanService.generate_study_plan(
+                    request_data=request.model_dump(), session=session, llm_service=llm_service
+                )
+                if not result:
+                    raise RuntimeError("LLM returned an empty plan")
+                save_pregeneration_checkpoint(session, job, key, number, DONE, plan_id=result["plan_id"])
+            return True, None
+        except (AdmissionRejectedError, CircuitOpenError) as e:
+            # Providers are saturated or failing: wait as long as they ask, then try the row again
+            error = str(e)
+            if attempt < max_attempts:
+                delay = min(e.retry_after, _MAX_BACKOFF_SECONDS)
+                logger.warning(f"Row {number}: {e}; retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+        except Exception as e:
+            # Other transient errors were already retried by the LLM layer
+            error = f"{type(e).__name__}: {e}"
+            break
+
+    logger.error(f"Row {number} failed: {error}")
+    with session_scope() as session:
+        save_pregeneration_checkpoint(session, job, key, number, FAILED, error=error)
+    return False, error
+
+
+async def run(path: Path, job: str, llm_service: BaseLLMService, concurrency: int = 8,
+              max_attempts: int = 3, progress_interval: float = 2.0) -> Dict[str, Any]:
+    """
+    Processes every row of `path` that is not done yet in `job`.
+
+    Returns a summary with the number of rows, how many were already done,
+    how many were generated and failed in this run, and the invalid rows.
+    """
+    with session_scope() as session:
+        done_keys = {key for key, checkpoint in get_pregeneration_checkpoints(session, job).items()
+                     if checkpoint.status == DONE}
+
+    pending: List[Tuple[int, str, PlanRequestData]] = []
+    invalid: List[Dict[str, Any]] = []
+    seen = set()
+    total = 0
+    for number, raw in read_rows(path):
+        total += 1
+        try:
+            request = PlanRequestData.model_validate(raw)
+        except ValidationError as e:
+            invalid.append({"row": number, "error": str(e.errors()[0].get("msg", e))})
+            continue
+        key = row_key(request)
+        if key in done_keys or key in seen:
+            continue
+        seen.add(key)
+        pending.append((number, key, request))
+
+    skipped = total - len(pending) - len(invalid)
+    progress = Progress(total - len(invalid), skipped, llm_service, interval=progress_interval)
+    print(f"{path.name}: {total} rows, {skipped} already done, {len(pending)} to generate, "
+          f"{len(invalid)} invalid", flush=True)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def worker(number: int, key: str, request: PlanRequestData) -> None:
+        async with semaphore:
+            ok, _ = await _process_row(job, number, key, request, llm_service, max_attempts)
+        progress.record(ok)
+
+    await asyncio.gather(*(worker(*row) for row in pending))
+    if pending:
+        print(progress.line(), flush=True)
+
+    return {
+        "job": job,
+        "rows": total,
+        "already_done": skipped,
+        "generated": progress.done,
+        "failed": progress.failed,
+        "invalid": invalid,
+        "elapsed_seconds": round(time.monotonic() - progress.started, 1),
+    }
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pre-generate study plans from a CSV or JSONL file.")
+    parser.add_argument("input", type=Path, help="CSV or JSONL file with one questionnaire per row")
+    parser.add_argument("--job", help="Checkpoint name (default: the input file name)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Plans generated at once (default: 8)")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="Attempts per row when providers are rate limited (default: 3)")
+    parser.add_argument("--verbose", action="store_true", help="Show the application logs")
+    return parser.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    llm_service = initialize_llm_service()
+    try:
+        await llm_service.warm_up()
+        return await run(args.input, args.job or args.input.name, llm_service,
+                         concurrency=args.concurrency, max_attempts=args.max_attempts)
+    finally:
+        await llm_service.aclose()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+    create_db_and_tables()
+    asset_registry.load()
+    with session_scope() as session:
+        similar_plans.build(session)
+    # A template plan would be saved as if it were final: fail the row instead, so the next run retries it
+    plan_llm_guard.enabled = False
+
+    call_ledger.start(LedgerService.write_batch)
+    try:
+        summary = asyncio.run(_main(args))
+    finally:
+        call_ledger.stop()
+    for row in summary["invalid"]:
+        print(f"Invalid row {row['row']}: {row['error']}", file=sys.stderr)
+    print(json.dumps({key: value for key, value in summary.items() if key != "invalid"}))
+    return 1 if summary["failed"] or summary["invalid"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
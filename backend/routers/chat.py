@@ -1,14 +1,29 @@
+import math
+
 from fastapi import APIRouter, HTTPException, Depends
 from loguru import logger
 from sqlmodel import Session
 
-from database.db_handler import get_session
+from database.db_handler import get_session, get_study_plan
 from database.schemas import ContinueChatRequest, PlanResponse
 from services.chat_service import ChatService
+from ai_agent.llm_services.admission import AdmissionRejectedError
+from ai_agent.llm_services.resilience import CircuitOpenError
+from routers.sse import started_sse_response
 from dependencies import get_llm_service
 
 router = APIRouter(tags=["chat"])
 
+def _validate_messages(request_data: ContinueChatRequest):
+    """Ensures the history is not empty and ends with a user message."""
+    if not request_data.messages:
+        logger.warning(f"Empty message history received for plan ID: {request_data.plan_id}")
+        raise HTTPException(status_code=400, detail="Chat history cannot be empty.")
+        
+    if request_data.messages[-1]['role'] != 'user':
+        logger.warning(f"Last message not from user for plan ID: {request_data.plan_id}")
+        raise HTTPException(status_code=400, detail="Last message must be from the user.")
+
 @router.post("/continue_chat", response_model=PlanResponse)
 async def continue_chat(
     request_data: ContinueChatRequest, 
@@ -28,18 +43,12 @@ async def continue_chat(
     logger.debug(f"Message history contains {len(request_data.messages)} messages")
     
     # Validate chat history requirements
-    if not request_data.messages:
-        logger.warning(f"Empty message history received for plan ID: {request_data.plan_id}")
-        raise HTTPException(status_code=400, detail="Chat history cannot be empty.")
-        
-    if request_data.messages[-1]['role'] != 'user':
-        logger.warning(f"Last message not from user for plan ID: {request_data.plan_id}")
-        raise HTTPException(status_code=400, detail="Last message must be from the user.")
+    _validate_messages(request_data)
 
     try:
         # Call service layer to handle business logic
         logger.debug(f"Calling ChatService to continue conversation for plan ID: {request_data.plan_id}")
-        result = ChatService.continue_conversation(
+        result = await ChatService.continue_conversation(
             plan_id=request_data.plan_id,
             messages=request_data.messages,
             session=session,
@@ -59,8 +68,71 @@ async def continue_chat(
     except HTTPException as http_exc:
         # Re-raise HTTP exceptions without modification
         raise http_exc
+    except AdmissionRejectedError as e:
+        # Every provider is at capacity: push back instead of queueing the request
+        logger.warning(f"Chat continuation not admitted for plan ID {request_data.plan_id}: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail="AI service is busy. Please try again shortly.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    except CircuitOpenError as e:
+        # Every provider is known to be failing: answer right away instead of waiting on it
+        logger.warning(f"Chat continuation rejected for plan ID {request_data.plan_id}: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="AI service is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
     except Exception as e:
         # Log unexpected errors with full context
         logger.error(f"Error during chat continuation for plan ID {request_data.plan_id}: {e}", exc_info=True)
         logger.debug(f"Last user message: {request_data.messages[-1].get('content', '')[:100]}...")
-        raise HTTPException(status_code=500, detail="An internal error occurred while processing the chat message.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="An internal error occurred while processing the chat message.")
+
+@router.post("/continue_chat/stream")
+async def stream_chat(
+    request_data: ContinueChatRequest,
+    session: Session = Depends(get_session),
+    llm_service = Depends(get_llm_service)
+):
+    """
+    Streaming variant of /continue_chat using Server-Sent Events.
+
+    Events:
+    - `token`: `{"content": "..."}` with the next piece of the assistant reply
+    - `done`: the same payload as /continue_chat, sent after the conversation is saved
+    - `error`: `{"detail": "..."}` when the reply fails after the stream started
+
+    The response starts with the first event, so a call that is not admitted is
+    answered with 429 (503 when every provider's circuit is open) and Retry-After,
+    as in /continue_chat.
+    """
+    logger.info(f"Received streaming chat continuation request for plan ID: {request_data.plan_id}")
+    _validate_messages(request_data)
+
+    # Fail fast with a 404 instead of spending an LLM call on a missing plan
+    if not get_study_plan(session=session, plan_id=request_data.plan_id):
+        logger.warning(f"Plan with ID {request_data.plan_id} not found in database")
+        raise HTTPException(status_code=404, detail=f"Study plan with ID {request_data.plan_id} not found.")
+
+    try:
+        return await started_sse_response(ChatService.stream_conversation(
+            plan_id=request_data.plan_id,
+            messages=request_data.messages,
+            llm_service=llm_service
+        ), propagate=(AdmissionRejectedError, CircuitOpenError))
+    except AdmissionRejectedError as e:
+        logger.warning(f"Streaming chat continuation not admitted for plan ID {request_data.plan_id}: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail="AI service is busy. Please try again shortly.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    except CircuitOpenError as e:
+        logger.warning(f"Streaming chat continuation rejected for plan ID {request_data.plan_id}: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="AI service is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from metrics import REGISTRY
+
+router = APIRouter(tags=["monitoring"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Exposes request, LLM and database metrics in the Prometheus text format.
+
+    Histograms and counters accumulate since process start; scrape this endpoint
+    with Prometheus (or any compatible agent) to compute rates and percentiles.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,179 @@
+from fastapi import APIRouter, Depends, Query
+from loguru import logger
+from sqlmodel import Session
+
+from ai_agent.utils.prompt_assets import asset_registry
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.ledger import call_ledger
+from database.db_handler import get_session
+from dependencies import get_llm_service
+from services.degraded_mode import plan_llm_guard
+from services.ledger_service import LedgerService
+from services.plan_cache import plan_cache
+from services.plan_service import plan_generations, plan_upgrades
+from services.similar_plans import similar_plans
+from startup_profile import startup_profiler
+
+router = APIRouter(prefix="/monitoring", tags=["monitoring"])
+
+@router.get("/prompt_assets")
+async def prompt_assets_stats():
+    """
+    Reports the state of the in-memory prompt asset snapshot.
+
+    Includes the current asset version, how many times each file was read from
+    disk and how many requests were served straight from memory.
+    """
+    logger.debug("Prompt asset stats requested")
+    return asset_registry.stats()
+
+@router.get("/llm_usage")
+async def llm_usage_stats(llm_service: BaseLLMService = Depends(get_llm_service)):
+    """
+    Reports accumulated token usage of the active LLM service.
+
+    `cache_hit_ratio` is the share of prompt tokens served from the provider's
+    prompt cache, which reflects the static prompt prefix being reused.
+    """
+    logger.debug("LLM usage stats requested")
+    return llm_service.usage_stats()
+
+
+@router.get("/llm_routing")
+async def llm_routing_stats(llm_service: BaseLLMService = Depends(get_llm_service)):
+    """
+    Reports how calls are distributed across LLM providers.
+
+    With several providers configured, shows the current ranking and each
+    provider's latency average, error rate and whether it is benched. With a
+    single provider, only its name is returned.
+    """
+    logger.debug("LLM routing stats requested")
+    routing_stats = getattr(llm_service, "routing_stats", None)
+    return routing_stats() if routing_stats else {"current": llm_service.name, "providers": {}}
+
+@router.get("/llm_resilience")
+async def llm_resilience_stats(llm_service: BaseLLMService = Depends(get_llm_service)):
+    """
+    Reports the circuit breaker state and retry counters of each LLM provider.
+
+    A breaker in the "open" state means calls to that provider are being
+    rejected without reaching it until the cooldown ends.
+    """
+    logger.debug("LLM resilience stats requested")
+    services = getattr(llm_service, "services", [llm_service])
+    return {
+        service.name: service.resilience_stats()
+        for service in services
+        if hasattr(service, "resilience_stats")
+    }
+
+@router.get("/llm_admission")
+async def llm_admission_stats(llm_service: BaseLLMService = Depends(get_llm_service)):
+    """
+    Reports the admission control state of each LLM provider.
+
+    Includes calls in flight against the concurrency limit, the wait queue
+    depth, mean and max queue wait, rejections by reason and the remaining
+    requests/tokens in the per-minute buckets.
+    """
+    logger.debug("LLM admission stats requested")
+    services = getattr(llm_service, "services", [llm_service])
+    return {
+        service.name: service.admission_stats()
+        for service in services
+        if hasattr(service, "admission_stats")
+    }
+
+@router.get("/plan_cache")
+async def plan_cache_stats():
+    """
+    Reports the plan cache counters.
+
+    Includes hits per tier (process memory and SQLite), misses, stores, LRU
+    evictions, expired entries and the overall hit ratio.
+    """
+    logger.debug("Plan cache stats requested")
+    return plan_cache.stats()
+
+@router.get("/similar_plans")
+async def similar_plans_stats():
+    """
+    Reports the near-duplicate plan index.
+
+    Includes lookups, hits, misses, matches rejected because the stored plan no
+    longer fits, the number of indexed plans and buckets and the mean lookup time.
+    """
+    logger.debug("Similar plan stats requested")
+    return similar_plans.stats()
+
+@router.get("/coalescing")
+async def coalescing_stats(llm_service: BaseLLMService = Depends(get_llm_service)):
+    """
+    Reports how many calls were served by an identical call already in flight.
+
+    `llm` counts exact duplicate LLM requests; `plan_generation` counts plan
+    requests that shared the generation of another student with the same
+    questionnaire, and `plan_upgrade` concurrent upgrades of the same plan.
+    """
+    logger.debug("Coalescing stats requested")
+    llm_stats = getattr(llm_service, "coalescing_stats", None)
+    return {
+        "llm": llm_stats() if llm_stats else None,
+        "plan_generation": plan_generations.stats(),
+        "plan_upgrade": plan_upgrades.stats(),
+    }
+
+@router.get("/degraded_mode")
+async def degraded_mode_stats():
+    """
+    Reports how plan generation is coping with the LLM provider.
+
+    Shows the deadline and concurrency limit, the calls currently in flight and
+    how many template-based plans were served, grouped by reason.
+    """
+    logger.debug("Degraded mode stats requested")
+    return plan_llm_guard.stats()
+
+@router.get("/llm_ledger")
+async def llm_ledger_stats():
+    """
+    Reports the state of the LLM call ledger writer.
+
+    Shows how many call entries were written to the database, how many are
+    waiting for the next batch and how many were dropped.
+    """
+    logger.debug("LLM ledger stats requested")
+    return call_ledger.stats()
+
+@router.get("/llm_ledger/latency")
+def llm_ledger_latency(days: int = Query(7, ge=1, le=90), session: Session = Depends(get_session)):
+    """
+    Reports daily p50/p95 latency and time to first token of successful LLM
+    calls per provider, over the last `days` days.
+    """
+    logger.debug(f"LLM ledger latency report requested for {days} days")
+    return LedgerService.latency_by_provider(session, days)
+
+@router.get("/llm_ledger/cost_per_plan")
+def llm_ledger_cost_per_plan(days: int = Query(7, ge=1, le=90), limit: int = Query(100, ge=1, le=1000),
+                             session: Session = Depends(get_session)):
+    """
+    Reports the LLM calls, tokens and estimated cost of the `limit` most recent
+    plans created in the last `days` days, and the average cost per plan.
+    """
+    logger.debug(f"LLM ledger cost per plan requested for {days} days")
+    return LedgerService.cost_per_plan(session, days, limit)
+
+@router.get("/startup")
+async def startup_profile_report():
+    """
+    Reports how long the application took to start.
+
+    `import_ms` is the time spent importing the application (checked against
+    STARTUP_IMPORT_BUDGET) and `stages` the duration of each startup step.
+    With STARTUP_PROFILE enabled, `slowest_imports` lists the modules that took
+    longest to import.
+    """
+    logger.debug("Startup profile requested")
+    return startup_profiler.report()
@@ -1,10 +1,16 @@
+import math
+
 from fastapi import APIRouter, HTTPException, Depends
 from loguru import logger
 from sqlmodel import Session
 
 from database.db_handler import get_session
-from database.schemas import PlanRequestData, PlanResponse
+from database.schemas import CohortPlanRequest, PlanRequestData, PlanResponse, UpgradePlanRequest
 from services.plan_service import PlanService
+from services.cohort_service import PLAN_BATCH_MAX_STUDENTS, CohortService
+from ai_agent.llm_services.admission import AdmissionRejectedError
+from ai_agent.llm_services.resilience import CircuitOpenError
+from routers.sse import ndjson_response, started_sse_response
 from dependencies import get_llm_service
 
 router = APIRouter(tags=["plans"])
@@ -29,7 +35,7 @@ async def generate_study_plan(
     try:
         # Call service layer to handle business logic
         logger.debug("Calling PlanService to generate study plan")
-        result = PlanService.generate_study_plan(
+        result = await PlanService.generate_study_plan(
             request_data=request_data.model_dump(),
             session=session,
             llm_service=llm_service
@@ -48,8 +54,122 @@ async def generate_study_plan(
     except HTTPException as http_exc:
         # Re-raise HTTP exceptions without modification
         raise http_exc
+    except AdmissionRejectedError as e:
+        # Only reached with degraded mode disabled (otherwise a template plan is served)
+        logger.warning(f"Plan generation not admitted for {request_data.email}: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail="AI service is busy. Please try again shortly.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
     except Exception as e:
         # Log unexpected errors with full context
         logger.error(f"Error during plan generation for {request_data.email}: {e}", exc_info=True)
         logger.debug(f"Request data that caused error: {request_data.model_dump()}")
-        raise HTTPException(status_code=500, detail="An internal error occurred while generating the study plan.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="An internal error occurred while generating the study plan.")
+
+@router.post("/generate_plan/stream")
+async def stream_study_plan(
+    request_data: PlanRequestData,
+    llm_service = Depends(get_llm_service)
+):
+    """
+    Streaming variant of /generate_plan using Server-Sent Events.
+
+    Events:
+    - `token`: `{"content": "..."}` with the next piece of the plan text
+    - `done`: the same payload as /generate_plan (plan_id, student_id, chat, degraded), sent after the plan is saved
+    - `error`: `{"detail": "..."}` when generation fails after the stream started
+
+    The response starts with the first event, so a call that is not admitted is
+    answered with 429 and Retry-After, as in /generate_plan.
+    """
+    logger.info(f"Received streaming plan generation request for: {request_data.name} ({request_data.email})")
+    try:
+        return await started_sse_response(PlanService.stream_study_plan(
+            request_data=request_data.model_dump(),
+            llm_service=llm_service
+        ), propagate=(AdmissionRejectedError,))
+    except AdmissionRejectedError as e:
+        # Only reached with degraded mode disabled (otherwise a template plan is streamed)
+        logger.warning(f"Streaming plan generation not admitted for {request_data.email}: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail="AI service is busy. Please try again shortly.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+
+@router.post("/generate_plan/batch")
+async def generate_cohort_plans(
+    request_data: CohortPlanRequest,
+    llm_service = Depends(get_llm_service)
+):
+    """
+    Generates and saves study plans for a whole cohort, streamed as NDJSON.
+
+    Students with identical questionnaires share one generation, and generations
+    run in parallel up to the concurrency limit. Each line is one student's result
+    as soon as it is saved:
+    - `{"index", "email", "status": "ok" | "degraded", "student_id", "plan_id", "reused", "degraded_reason", "plan"}`
+    - `{"index", "email", "status": "error", "detail"}`
+
+    The last line is `{"summary": {...}}` with the counts and the elapsed time.
+    """
+    if len(request_data.students) > PLAN_BATCH_MAX_STUDENTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A cohort request accepts at most {PLAN_BATCH_MAX_STUDENTS} students.",
+        )
+    logger.info(f"Received cohort plan generation request for {len(request_data.students)} students")
+    return ndjson_response(CohortService.generate_cohort_plans(
+        requests=[student.model_dump() for student in request_data.students],
+        llm_service=llm_service,
+        concurrency=request_data.concurrency
+    ))
+
+@router.post("/upgrade_plan", response_model=PlanResponse)
+async def upgrade_study_plan(
+    request_data: UpgradePlanRequest,
+    session: Session = Depends(get_session),
+    llm_service = Depends(get_llm_service)
+):
+    """
+    Regenerates a degraded (template-based) study plan with the LLM.
+
+    This endpoint:
+    - Looks up the plan and returns it unchanged if it is not degraded
+    - Rebuilds the prompt from the stored questionnaire and calls the LLM
+    - Returns 503 when the AI service is still unavailable, keeping the degraded plan
+    """
+    logger.info(f"Received plan upgrade request for plan ID: {request_data.plan_id}")
+
+    try:
+        result = await PlanService.upgrade_study_plan(
+            plan_id=request_data.plan_id,
+            session=session,
+            llm_service=llm_service
+        )
+    except AdmissionRejectedError as e:
+        logger.warning(f"Plan upgrade not admitted for plan ID {request_data.plan_id}: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail="AI service is busy. Please try again shortly.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    except CircuitOpenError as e:
+        logger.warning(f"Plan upgrade rejected for plan ID {request_data.plan_id}: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="AI service is still unavailable. Please try again later.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    except Exception as e:
+        logger.error(f"Error during plan upgrade for plan ID {request_data.plan_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=503, detail="AI service is still unavailable. Please try again later.")
+
+    if not result:
+        logger.warning(f"Plan with ID {request_data.plan_id} not found in database")
+        raise HTTPException(status_code=404, detail=f"Study plan with ID {request_data.plan_id} not found.")
+
+    logger.info(f"Plan upgrade finished for plan ID: {request_data.plan_id}")
+    return PlanResponse(**result)
@@ -0,0 +1,77 @@
+import json
+from typing import AsyncIterator, Optional, Tuple, Type
+
+from fastapi.responses import StreamingResponse
+from loguru import logger
+
+def format_sse(event: str, data: dict) -> str:
+    """Formats one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+async def _encode(events: AsyncIterator[Tuple[str, dict]]) -> AsyncIterator[str]:
+    try:
+        async for event, data in events:
+            yield format_sse(event, data)
+    except Exception as e:
+        # Headers are already sent, so errors are reported as a final event
+        logger.error(f"Error while streaming response: {e}", exc_info=True)
+        yield format_sse("error", {"detail": "An internal error occurred while streaming the response."})
+
+def sse_response(events: AsyncIterator[Tuple[str, dict]]) -> StreamingResponse:
+    """
+    Wraps an async iterator of (event, data) tuples in a text/event-stream response.
+
+    Proxy buffering is disabled so each token reaches the client as soon as it is produced.
+    """
+    return StreamingResponse(
+        _encode(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _resume(first: Optional[Tuple[str, dict]], error: Optional[Exception],
+                  events: AsyncIterator[Tuple[str, dict]]) -> AsyncIterator[Tuple[str, dict]]:
+    if error is not None:
+        raise error
+    if first is None:
+        return
+    yield first
+    async for event in events:
+        yield event
+
+async def started_sse_response(events: AsyncIterator[Tuple[str, dict]],
+                               propagate: Tuple[Type[Exception], ...] = ()) -> StreamingResponse:
+    """
+    Like `sse_response`, but waits for the first event before the response starts.
+
+    Errors of the `propagate` types raised before that event reach the caller, so
+    the route can still answer with an HTTP status (e.g. 429 with Retry-After when
+    the LLM call was not admitted) instead of a 200 followed by an error event.
+    Other errors are reported as the usual final error event.
+    """
+    first, error = None, None
+    try:
+        first = await anext(events)
+    except StopAsyncIteration:
+        pass
+    except propagate:
+        raise
+    except Exception as e:
+        error = e
+    return sse_response(_resume(first, error, events))
+
+async def _encode_ndjson(lines: AsyncIterator[dict]) -> AsyncIterator[str]:
+    try:
+        async for line in lines:
+            yield json.dumps(line, ensure_ascii=False, default=str) + "\n"
+    except Exception as e:
+        logger.error(f"Error while streaming response: {e}", exc_info=True)
+        yield json.dumps({"error": "An internal error occurred while streaming the response."}) + "\n"
+
+def ndjson_response(lines: AsyncIterator[dict]) -> StreamingResponse:
+    """Wraps an async iterator of dicts in a newline-delimited JSON (application/x-ndjson) response."""
+    return StreamingResponse(
+        _encode_ndjson(lines),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
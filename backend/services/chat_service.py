@@ -1,12 +1,18 @@
 from loguru import logger
 from sqlmodel import Session
 
-from database.db_handler import update_chat
+from database.db_handler import update_chat, session_scope
+from ai_agent.llm_services.admission import AdmissionRejectedError
 from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.call_context import set_endpoint
+from ai_agent.llm_services.ledger import call_ledger
+from ai_agent.llm_services.resilience import CircuitOpenError
+from ai_agent.utils.course_codes import COURSE_CODES_ENABLED, expand_course_codes, get_course_codes
+from ai_agent.utils.stream_rewriter import StreamRewriter
 
 class ChatService:
     @staticmethod
-    def continue_conversation(plan_id, messages, session: Session, llm_service: BaseLLMService):
+    async def continue_conversation(plan_id, messages, session: Session, llm_service: BaseLLMService):
         """
         Continue a conversation with existing plan and message history.
         
@@ -20,12 +26,14 @@ class ChatService:
             dict: Response data with updated conversation, or None if failure
         """
         logger.debug(f"Continuing conversation for plan ID: {plan_id}")
+        set_endpoint("continue_chat")
+        call_ledger.attribute_plan(plan_id)
         logger.debug(f"Received {len(messages)} messages in conversation history")
         
         # 1. Call the LLM with the provided message history
         logger.info(f"Sending conversation to LLM for plan ID: {plan_id}")
         # We pass the full conversation history to maintain context
-        assistant_response_text = llm_service.chat_completion(messages=messages)
+        assistant_response_text = await llm_service.achat_completion(messages=messages)
         
         # Check if we got a valid response
         if not assistant_response_text:
@@ -34,6 +42,9 @@ class ChatService:
 
         logger.info(f"Received LLM response with length: {len(assistant_response_text)} characters")
 
+        # Expand short course codes (e.g. "[BIP]") back to full course names
+        assistant_response_text = expand_course_codes(assistant_response_text)
+
         # 2. Update chat history and save to database
         logger.debug("Updating conversation history with new assistant response")
         updated_chat_history = messages + [
@@ -62,4 +73,79 @@ class ChatService:
             "student_id": updated_plan.student_id,
             "plan_id": plan_id,
             "chat": updated_chat_history
-        }
\ No newline at end of file
+        }
+
+    @staticmethod
+    async def stream_conversation(plan_id, messages, llm_service: BaseLLMService):
+        """
+        Continue a conversation while streaming the assistant reply as the LLM produces it.
+
+        Yields ("token", {"content": ...}) events with course codes already expanded and,
+        after the updated conversation is saved, a final ("done", response data) event.
+        If the stream fails or the plan no longer exists, an ("error", ...) event is
+        yielded instead and nothing is saved.
+
+        Parameters:
+            plan_id (int): ID of the study plan to continue conversation with
+            messages (list): List of message objects with role and content
+            llm_service (BaseLLMService): Service to interact with the LLM
+
+        Yields:
+            tuple: (event name, event data)
+        """
+        logger.info(f"Streaming conversation to LLM for plan ID: {plan_id}")
+        set_endpoint("continue_chat/stream")
+        call_ledger.attribute_plan(plan_id)
+        rewriter = StreamRewriter(codebook=get_course_codes() if COURSE_CODES_ENABLED else None)
+
+        started = False
+        try:
+            async for chunk in llm_service.astream_chat_completion(messages=messages):
+                started = True
+                text = rewriter.feed(chunk)
+                if text:
+                    yield "token", {"content": text}
+        except (AdmissionRejectedError, CircuitOpenError):
+            if not started:
+                # Nothing was sent yet: the route answers with 429/503 and Retry-After
+                raise
+            logger.error(f"LLM stream for plan ID {plan_id} was rejected mid-response")
+            yield "error", {"detail": "The AI service stopped responding. Please try again."}
+            return
+        except Exception as e:
+            logger.error(f"LLM stream failed for plan ID {plan_id}: {e}")
+            yield "error", {"detail": "The AI service stopped responding. Please try again."}
+            return
+        text = rewriter.finish()
+        if text:
+            yield "token", {"content": text}
+
+        assistant_response_text = rewriter.text
+        if not assistant_response_text:
+            logger.warning(f"LLM returned empty response for plan ID: {plan_id}")
+            yield "error", {"detail": "AI returned an empty response. Please try again."}
+            return
+
+        updated_chat_history = messages + [
+            {"role": "assistant", "content": assistant_response_text}
+        ]
+        with session_scope() as session:
+            updated_plan = update_chat(
+                session=session,
+                plan_id=plan_id,
+                conversation_history=updated_chat_history
+            )
+            student_id = updated_plan.student_id if updated_plan else None
+
+        if student_id is None:
+            logger.warning(f"Plan with ID {plan_id} not found in database")
+            yield "error", {"detail": f"Study plan with ID {plan_id} not found."}
+            return
+
+        logger.info(f"Successfully streamed conversation for plan ID: {plan_id}")
+        yield "done", {
+            "message": "Chat continued successfully.",
+            "student_id": student_id,
+            "plan_id": plan_id,
+            "chat": updated_chat_history
+        }
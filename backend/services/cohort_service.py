@@ -0,0 +1,210 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+from loguru import logger
+
+from database.db_handler import add_study_plans_bulk, session_scope
+from ai_agent.prompt_maker import prepare_plan_prompt
+from ai_agent.fallback_plan import render_fallback_plan
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.call_context import set_endpoint
+from ai_agent.structured_plan import StructuredPlan, map_strings
+from services.plan_cache import depersonalize, personalize, plan_cache
+from services.plan_service import PlanService
+from services.similar_plans import similar_plans
+
+# Plan generations running at once for one cohort request (a request may ask for fewer)
+PLAN_BATCH_CONCURRENCY = int(os.getenv("PLAN_BATCH_CONCURRENCY", "16"))
+
+# Largest cohort accepted in one request
+PLAN_BATCH_MAX_STUDENTS = int(os.getenv("PLAN_BATCH_MAX_STUDENTS", "1000"))
+
+
+@dataclass
+class _CohortStudent:
+    index: int
+    request_data: dict
+    api_data: dict
+
+
+@dataclass
+class _ProfileGroup:
+    """Students with the same normalized questionnaire; one generation serves all of them."""
+    students: List[_CohortStudent] = field(default_factory=list)
+    template: Optional[str] = None  # Plan text with name placeholders (see depersonalize)
+    structured: Optional[StructuredPlan] = None  # Structured plan with name placeholders, in structured output mode
+    degraded_reason: Optional[str] = None
+    reused: bool = False
+    error: Optional[str] = None
+
+
+class CohortService:
+    @staticmethod
+    def _group_profiles(requests: List[dict]) -> List[_ProfileGroup]:
+        """Groups the students by plan cache key, keeping the order of first appearance."""
+        groups: Dict[str, _ProfileGroup] = {}
+        for index, request_data in enumerate(requests):
+            api_data = PlanService._prompt_data(request_data)
+            group = groups.setdefault(plan_cache.key(api_data), _ProfileGroup())
+            group.students.append(_CohortStudent(index, request_data, api_data))
+        return list(groups.values())
+
+    @staticmethod
+    async def _generate_group(group: _ProfileGroup, llm_service: BaseLLMService,
+                              semaphore: asyncio.Semaphore) -> _ProfileGroup:
+        """Fills in the group's plan template, reusing a stored plan when possible."""
+        leader = group.students[0]
+        name = leader.request_data['name']
+        async with semaphore:
+            try:
+                plan_prompt = prepare_plan_prompt(user_data=leader.api_data)
+                with session_scope() as session:
+                    reused = PlanService._reuse_plan(session, leader.request_data, leader.api_data, plan_prompt)
+                if reused is not None:
+                    group.template = depersonalize(reused.text, name)
+                    if reused.structured is not None:
+                        group.structured = map_strings(reused.structured, lambda value: depersonalize(value, name))
+                    group.reused = True
+                    return group
+
+                result = await PlanService._generate_plan_template(
+                    leader.request_data, leader.api_data, plan_prompt, llm_service
+                )
+                if result.degraded:
+                    group.degraded_reason = result.degraded_reason
+                elif not result.text:
+                    logger.warning("LLM returned empty response for a cohort profile")
+                    group.error = "AI failed to generate a plan. Please try again."
+                else:
+                    group.template = result.text
+                    group.structured = result.structured
+                    with session_scope() as session:
+                        plan_cache.put(session, leader.api_data, name, personalize(result.text, name),
+                                       PlanService._personalize_structure(result.structured, name))
+            except Exception as e:
+                logger.error(f"Cohort plan generation failed for {len(group.students)} student(s): {e}", exc_info=True)
+                group.error = "An internal error occurred while generating the study plan."
+        return group
+
+    @staticmethod
+    def _save_groups(groups: List[_ProfileGroup]) -> List[dict]:
+        """Builds every student's plan from its group and saves them all with one bulk insert."""
+        lines, entries, saved = [], [], []
+        for group in groups:
+            for student in group.students:
+                if group.error:
+                    lines.append(CohortService._error_line(student, group.error))
+                    continue
+                name = student.request_data['name']
+                plan_prompt = prepare_plan_prompt(user_data=student.api_data)
+                structured = None
+                if group.degraded_reason:
+                    text = render_fallback_plan(student.api_data, schedule=plan_prompt.schedule)
+                else:
+                    text = personalize(group.template, name)
+                    structured = PlanService._personalize_structure(group.structured, name)
+                plan_data = student.api_data.copy()
+                plan_data["chat"] = [
+                    {"role": "user", "content": plan_prompt.prompt},
+                    {"role": "assistant", "content": text},
+                ]
+                plan_data["is_degraded"] = group.degraded_reason is not None
+                plan_data["structured_plan"] = structured.model_dump(mode="json") if structured else None
+                entries.append((name, student.request_data['email'], plan_data))
+                saved.append((student, group, text, plan_data["structured_plan"]))
+        if not entries:
+            return lines
+
+        try:
+            with session_scope() as session:
+                plans = add_study_plans_bulk(session, entries)
+                indexed = set()
+                for plan, (student, group, text, structured_plan) in zip(plans, saved):
+                    # Students of a group have identical questionnaires: indexing one plan is enough
+                    if not group.degraded_reason and id(group) not in indexed:
+                        similar_plans.add(plan.id, student.api_data)
+                        indexed.add(id(group))
+                    lines.append({
+                        "index": student.index,
+                        "email": student.request_data['email'],
+                        "status": "degraded" if group.degraded_reason else "ok",
+                        "student_id": plan.student_id,
+                        "plan_id": plan.id,
+                        "reused": group.reused,
+                        "degraded_reason": group.degraded_reason,
+                        "plan": text,
+                        "structured_plan": structured_plan,
+                    })
+        except Exception as e:
+            logger.error(f"Failed to save {len(entries)} cohort plans: {e}", exc_info=True)
+            lines.extend(
+                CohortService._error_line(student, "An internal error occurred while saving the study plan.")
+                for student, *_ in saved
+            )
+        return lines
+
+    @staticmethod
+    def _error_line(student: _CohortStudent, detail: str) -> dict:
+        return {"index": student.index, "email": student.request_data['email'], "status": "error", "detail": detail}
+
+    @staticmethod
+    async def generate_cohort_plans(requests: List[dict], llm_service: BaseLLMService,
+                                    concurrency: Optional[int] = None) -> AsyncIterator[dict]:
+        """
+        Generate and save study plans for a whole cohort.
+
+        Students with the same questionnaire (apart from name and email) share one
+        generation. At most `concurrency` generations (capped by PLAN_BATCH_CONCURRENCY)
+        run at once. Results are yielded as they complete, one dict per student
+        (`index` is the student's position in `requests`), followed by a final
+        {"summary": ...} dict. Plans finished together are saved in one bulk insert.
+
+        Parameters:
+            requests (list): Request data of each student (same fields as /generate_plan)
+            llm_service (BaseLLMService): Service to interact with the LLM
+            concurrency (int, optional): Maximum generations in flight for this cohort
+
+        Yields:
+            dict: Per-student result, then the summary
+        """
+        started = time.perf_counter()
+        set_endpoint("generate_plan/batch")
+        groups = CohortService._group_profiles(requests)
+        limit = max(1, min(concurrency or PLAN_BATCH_CONCURRENCY, PLAN_BATCH_CONCURRENCY))
+        logger.info(
+            f"Generating cohort plans for {len(requests)} students "
+            f"({len(groups)} distinct profiles, {limit} at a time)"
+        )
+
+        semaphore = asyncio.Semaphore(limit)
+        finished: asyncio.Queue = asyncio.Queue()
+        tasks = [asyncio.create_task(CohortService._generate_group(group, llm_service, semaphore)) for group in groups]
+        for task in tasks:
+            task.add_done_callback(finished.put_nowait)
+
+        summary = {"students": len(requests), "distinct_profiles": len(groups), "ok": 0, "degraded": 0, "error": 0,
+                   "reused_profiles": 0}
+        try:
+            pending = len(tasks)
+            while pending:
+                done = [await finished.get()]
+                while not finished.empty():
+                    done.append(finished.get_nowait())
+                pending -= len(done)
+                chunk = [task.result() for task in done]
+                summary["reused_profiles"] += sum(group.reused for group in chunk)
+                # Building and saving many plans is CPU and disk work: keep it off the event loop
+                for line in await asyncio.to_thread(CohortService._save_groups, chunk):
+                    summary[line["status"]] += 1
+                    yield line
+        finally:
+            # The client went away: stop the generations that have not finished
+            for task in tasks:
+                task.cancel()
+
+        summary["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+        logger.info(f"Cohort plan generation finished: {summary}")
+        yield {"summary": summary}
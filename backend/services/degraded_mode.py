@@ -0,0 +1,129 @@
+import asyncio
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+from ai_agent.llm_services.admission import AdmissionRejectedError
+
+# Serve template-based plans when the LLM provider fails, is slow or is saturated
+DEGRADED_MODE_ENABLED = os.getenv("PLAN_DEGRADED_MODE", "true").lower() in ("1", "true", "yes")
+
+# Seconds to wait for the LLM before answering with the degraded plan
+LLM_DEADLINE_SECONDS = float(os.getenv("PLAN_LLM_DEADLINE_SECONDS", "60"))
+
+# Concurrent LLM plan generations above which new requests are degraded immediately
+MAX_IN_FLIGHT = int(os.getenv("PLAN_MAX_IN_FLIGHT", "200"))
+
+# Reasons reported in the response and in the monitoring stats
+OVERLOADED = "overloaded"
+TIMEOUT = "timeout"
+PROVIDER_ERROR = "provider_error"
+EMPTY_RESPONSE = "empty_response"
+
+
+@dataclass(frozen=True)
+class GuardedResult:
+    """Outcome of a guarded LLM call: the text, or the reason it was not used."""
+    text: Optional[str]
+    degraded_reason: Optional[str] = None
+    # StructuredPlan the text was rendered from, in structured output mode
+    structured: Optional[Any] = None
+
+    @property
+    def degraded(self) -> bool:
+        return self.degraded_reason is not None
+
+
+class DegradedModeGuard:
+    """
+    Runs async LLM calls under a latency deadline and a concurrency limit.
+
+    At most `max_in_flight` provider requests are outstanding at once; further
+    requests are degraded immediately instead of queueing behind a slow
+    provider. A call that passes the deadline is cancelled, which closes the
+    HTTP request and frees its slot.
+    """
+
+    def __init__(self, deadline: float = LLM_DEADLINE_SECONDS, max_in_flight: int = MAX_IN_FLIGHT,
+                 enabled: bool = DEGRADED_MODE_ENABLED):
+        self.deadline = deadline
+        self.max_in_flight = max(1, max_in_flight)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._calls = 0
+        self._degraded: Dict[str, int] = {OVERLOADED: 0, TIMEOUT: 0, PROVIDER_ERROR: 0, EMPTY_RESPONSE: 0}
+
+    def acquire(self) -> bool:
+        """Reserves an in-flight slot; False when the limit is reached (the overload is recorded)."""
+        with self._lock:
+            self._calls += 1
+            if self._in_flight < self.max_in_flight:
+                self._in_flight += 1
+                return True
+        logger.warning(f"LLM saturated ({self.max_in_flight} calls in flight), serving degraded plan")
+        self.record_degraded(OVERLOADED)
+        return False
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def record_degraded(self, reason: str) -> None:
+        with self._lock:
+            self._degraded[reason] += 1
+
+    def _degrade(self, reason: str) -> GuardedResult:
+        self.record_degraded(reason)
+        return GuardedResult(text=None, degraded_reason=reason)
+
+    async def call(self, fn: Callable[..., Awaitable[Optional[str]]], *args, **kwargs) -> GuardedResult:
+        """
+        Await `fn` and return its text, or the reason a degraded answer should be used.
+
+        When the guard is disabled the call is awaited directly and errors propagate as before.
+        """
+        if not self.enabled:
+            return GuardedResult(text=await fn(*args, **kwargs))
+
+        if not self.acquire():
+            return GuardedResult(text=None, degraded_reason=OVERLOADED)
+
+        try:
+            text = await asyncio.wait_for(fn(*args, **kwargs), timeout=self.deadline)
+        except asyncio.TimeoutError:
+            logger.warning(f"LLM call exceeded the {self.deadline:.0f}s deadline, serving degraded plan")
+            return self._degrade(TIMEOUT)
+        except AdmissionRejectedError as e:
+            # Every provider is at its rate or concurrency limit
+            logger.warning(f"LLM call not admitted ({e}), serving degraded plan")
+            return self._degrade(OVERLOADED)
+        except Exception as e:
+            logger.error(f"LLM call failed, serving degraded plan: {e}")
+            return self._degrade(PROVIDER_ERROR)
+        finally:
+            self.release()
+
+        if not text:
+            logger.warning("LLM returned an empty response, serving degraded plan")
+            return self._degrade(EMPTY_RESPONSE)
+        return GuardedResult(text=text)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "deadline_seconds": self.deadline,
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "calls": self._calls,
+                "degraded": dict(self._degraded),
+                "degraded_total": sum(self._degraded.values()),
+            }
+
+
+# Guard shared by every plan generation request
+plan_llm_guard = DegradedModeGuard()
@@ -0,0 +1,78 @@
+import datetime
+import math
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlmodel import Session
+
+from database.db_handler import add_llm_calls, get_llm_call_latencies, get_llm_cost_per_plan, session_scope
+
+
+def _percentile(sorted_values: List[int], fraction: float) -> Optional[int]:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def _since(days: int) -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+
+
+class LedgerService:
+    @staticmethod
+    def write_batch(calls: List[Dict[str, Any]], plan_attributions: List[Tuple[str, int]]) -> None:
+        """Sink of the call ledger writer: persists one batch in its own session."""
+        with session_scope() as session:
+            add_llm_calls(session, calls, plan_attributions)
+
+    @staticmethod
+    def latency_by_provider(session: Session, days: int) -> List[Dict[str, Any]]:
+        """
+        Daily latency percentiles of successful LLM calls, per provider.
+
+        Returns one entry per (provider, day) with the number of calls and the
+        p50/p95 of the total latency and, for streamed calls, of the time to
+        first token, all in milliseconds.
+        """
+        latencies: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        first_tokens: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for provider, day, latency_ms, ttft_ms in get_llm_call_latencies(session, _since(days)):
+            latencies[(provider, day)].append(latency_ms)
+            if ttft_ms is not None:
+                first_tokens[(provider, day)].append(ttft_ms)
+
+        report = []
+        for (provider, day), values in latencies.items():
+            values.sort()
+            ttfts = sorted(first_tokens.get((provider, day), []))
+            report.append({
+                "provider": provider,
+                "day": day,
+                "calls": len(values),
+                "latency_p50_ms": _percentile(values, 0.5),
+                "latency_p95_ms": _percentile(values, 0.95),
+                "ttft_p50_ms": _percentile(ttfts, 0.5),
+                "ttft_p95_ms": _percentile(ttfts, 0.95),
+            })
+        return report
+
+    @staticmethod
+    def cost_per_plan(session: Session, days: int, limit: int) -> Dict[str, Any]:
+        """
+        LLM cost of the most recent plans and its average over them.
+
+        Each plan lists every call made for it (generation, upgrade, chat turns).
+        A generation shared by concurrent identical requests is counted once, for
+        the plan of the request that made the call.
+        """
+        plans = get_llm_cost_per_plan(session, _since(days), limit)
+        costs = [plan["cost_usd"] for plan in plans if plan["cost_usd"] is not None]
+        for plan in plans:
+            if plan["cost_usd"] is not None:
+                plan["cost_usd"] = round(plan["cost_usd"], 6)
+        return {
+            "plans": plans,
+            "average_cost_usd": round(sum(costs) / len(costs), 6) if costs else None,
+            "average_calls": round(sum(plan["calls"] for plan in plans) / len(plans), 2) if plans else None,
+        }
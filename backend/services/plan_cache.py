@@ -0,0 +1,256 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+from sqlmodel import Session
+
+from database.db_handler import (
+    delete_plan_cache_entries_before,
+    delete_plan_cache_entry,
+    get_plan_cache_entry,
+    record_plan_cache_hit,
+    save_plan_cache_entry,
+)
+from ai_agent.prompt_maker import CATALOG_PRUNING_ENABLED
+from ai_agent.scheduler import FIXED_SCHEDULE_ENABLED
+from ai_agent.structured_plan import STRUCTURED_OUTPUT_ENABLED, StructuredPlan, map_strings
+from ai_agent.utils.course_codes import COURSE_CODES_ENABLED
+from ai_agent.utils.prompt_assets import get_prompt_assets
+
+# Reuse the plan generated for an identical questionnaire instead of calling the LLM again
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE", "true").lower() in ("1", "true", "yes")
+
+# Plans kept in process memory (least recently used are evicted first)
+PLAN_CACHE_MEMORY_SIZE = int(os.getenv("PLAN_CACHE_MEMORY_SIZE", "512"))
+
+# Age after which a cached plan is regenerated
+PLAN_CACHE_TTL_SECONDS = float(os.getenv("PLAN_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Bump when the cached text format or the key fields change
+_CACHE_FORMAT = 2
+
+# Placeholders stored in place of the name of the student the plan was generated for
+FULL_NAME_TOKEN = "{{NOME_COMPLETO}}"
+FIRST_NAME_TOKEN = "{{PRIMEIRO_NOME}}"
+
+
+def normalize_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Canonical form of the questionnaire fields that shape the plan.
+
+    Name and email are left out. Days without study hours are dropped,
+    interests are deduplicated, lower-cased and sorted, and whitespace and case
+    in the main challenge are normalized, so equivalent answers share a key.
+    """
+    interests = profile.get("interests") or []
+    challenge = " ".join((profile.get("main_challenge") or "").split()).casefold()
+    return {
+        "hours_per_day": {str(day): int(hours) for day, hours in (profile.get("hours_per_day") or {}).items() if hours},
+        "start_date": str(profile.get("start_date")),
+        "python_level": profile.get("python_level"),
+        "sql_level": profile.get("sql_level"),
+        "cloud_level": profile.get("cloud_level"),
+        "used_git": bool(profile.get("used_git")),
+        "used_docker": bool(profile.get("used_docker")),
+        "interests": sorted({interest.strip().casefold() for interest in interests if interest.strip()}),
+        "main_challenge": challenge or None,
+    }
+
+
+def profile_key(profile: Dict[str, Any], asset_version: str) -> str:
+    """SHA-256 of the normalized profile, the prompt-asset version and the prompt and output flags."""
+    payload = {
+        "format": _CACHE_FORMAT,
+        "assets": asset_version,
+        "flags": [FIXED_SCHEDULE_ENABLED, CATALOG_PRUNING_ENABLED, COURSE_CODES_ENABLED, STRUCTURED_OUTPUT_ENABLED],
+        "profile": normalize_profile(profile),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _first_name(name: str) -> str:
+    parts = name.split()
+    return parts[0] if parts else ""
+
+
+def depersonalize(text: str, name: str) -> str:
+    """Replaces the student's full name, then their first name, with placeholders."""
+    name = " ".join(name.split())
+    if not name:
+        return text
+    # Whole words only: a short name must not match inside a course name ("Ana" in "Anaconda")
+    text = re.sub(rf"(?<!\w){re.escape(name)}(?!\w)", FULL_NAME_TOKEN, text)
+    first = _first_name(name)
+    if first and first != name:
+        text = re.sub(rf"(?<!\w){re.escape(first)}(?!\w)", FIRST_NAME_TOKEN, text)
+    return text
+
+
+def personalize(template: str, name: str) -> str:
+    """Fills the name placeholders of a cached plan with another student's name."""
+    name = " ".join(name.split())
+    return template.replace(FULL_NAME_TOKEN, name).replace(FIRST_NAME_TOKEN, _first_name(name))
+
+
+@dataclass(frozen=True)
+class CachedPlan:
+    """A cached plan personalized for one student."""
+    text: str
+    # Plan the text was rendered from, in structured output mode
+    structured: Optional[StructuredPlan] = None
+
+
+class PlanCache:
+    """
+    Two-tier cache of generated plans keyed on the normalized questionnaire.
+
+    The first tier is an in-process LRU of `memory_size` entries; the second is
+    the `PlanCacheEntry` SQLite table, which survives restarts and is shared by
+    workers. Entries older than `ttl_seconds` are ignored and removed. Plans are
+    stored with the student's name replaced by placeholders, and a hit only
+    fills in the new student's name (in the text and the structured plan).
+
+    The key includes the prompt-asset version, so editing the catalog or the
+    guidelines makes the old entries unreachable (they expire with the TTL).
+    """
+
+    def __init__(self, memory_size: int = PLAN_CACHE_MEMORY_SIZE, ttl_seconds: float = PLAN_CACHE_TTL_SECONDS,
+                 enabled: bool = PLAN_CACHE_ENABLED):
+        self.memory_size = max(0, memory_size)
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[str, Optional[Dict], float]]" = OrderedDict()
+        self._stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    @staticmethod
+    def _now() -> float:
+        return datetime.datetime.now(datetime.timezone.utc).timestamp()
+
+    def _remember(self, key: str, template: str, structured: Optional[Dict], created_at: float) -> None:
+        if not self.memory_size:
+            return
+        with self._lock:
+            self._memory[key] = (template, structured, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _from_memory(self, key: str) -> Optional[Tuple[str, Optional[Dict]]]:
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is None:
+                return None
+            template, structured, created_at = cached
+            if self._now() - created_at > self.ttl_seconds:
+                del self._memory[key]
+                self._stats["expired"] += 1
+                return None
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            return template, structured
+
+    def _from_db(self, session: Session, key: str) -> Optional[Tuple[str, Optional[Dict]]]:
+        entry = get_plan_cache_entry(session, key)
+        if entry is None:
+            return None
+        created_at = entry.created_at
+        if created_at.tzinfo is None:  # SQLite returns naive UTC datetimes
+            created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+        if self._now() - created_at.timestamp() > self.ttl_seconds:
+            delete_plan_cache_entry(session, key)
+            self._count("expired")
+            return None
+        record_plan_cache_hit(session, entry)
+        self._count("db_hits")
+        self._remember(key, entry.plan_text, entry.structured_plan, created_at.timestamp())
+        return entry.plan_text, entry.structured_plan
+
+    @staticmethod
+    def key(profile: Dict[str, Any]) -> str:
+        """Cache key of a questionnaire under the current prompt assets."""
+        return profile_key(profile, get_prompt_assets().version)
+
+    def get(self, session: Session, profile: Dict[str, Any], name: str) -> Optional[CachedPlan]:
+        """
+        Returns the cached plan for this questionnaire, personalized with `name`.
+
+        Returns None on a miss, when the cache is disabled or when the lookup fails
+        (a cache problem never fails the request).
+        """
+        if not self.enabled:
+            return None
+        try:
+            key = self.key(profile)
+            cached = self._from_memory(key)
+            if cached is None:
+                cached = self._from_db(session, key)
+            if cached is not None:
+                template, structured = cached
+                structured = StructuredPlan.model_validate(structured) if structured else None
+        except Exception as e:
+            logger.error(f"Plan cache lookup failed: {e}")
+            return None
+
+        if cached is None:
+            self._count("misses")
+            logger.debug(f"Plan cache miss for key {key[:12]}")
+            return None
+        logger.info(f"Plan cache hit for key {key[:12]}")
+        if structured is not None:
+            structured = map_strings(structured, lambda text: personalize(text, name))
+        return CachedPlan(personalize(template, name), structured)
+
+    def put(self, session: Session, profile: Dict[str, Any], name: str, plan_text: str,
+            structured: Optional[StructuredPlan] = None) -> None:
+        """Stores a generated plan (and its structured plan, if any) for this questionnaire in both tiers."""
+        if not self.enabled or not plan_text:
+            return
+        try:
+            version = get_prompt_assets().version
+            key = profile_key(profile, version)
+            template = depersonalize(plan_text, name)
+            structured_template = None
+            if structured is not None:
+                structured_template = map_strings(structured, lambda text: depersonalize(text, name)).model_dump(mode="json")
+            save_plan_cache_entry(session, key, template, version, structured_template)
+            self._remember(key, template, structured_template, self._now())
+            self._count("stores")
+        except Exception as e:
+            logger.error(f"Failed to store plan in cache: {e}")
+
+    def purge_expired(self, session: Session) -> int:
+        """Removes expired entries from the SQLite tier; returns how many were removed."""
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=self.ttl_seconds)
+        return delete_plan_cache_entries_before(session, cutoff)
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss, store, eviction and expiry counters, plus the memory tier size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        hits = stats["memory_hits"] + stats["db_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_ratio"] = round(hits / lookups, 3) if lookups else 0.0
+        stats["enabled"] = self.enabled
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
+
+
+plan_cache = PlanCache()
@@ -1,13 +1,260 @@
+import asyncio
+
 from loguru import logger
 from sqlmodel import Session
 
-from database.db_handler import get_or_create_student, add_study_plan
-from ai_agent.prompt_maker import make_final_prompt
+from database.db_handler import get_or_create_student, add_study_plan, get_study_plan, update_chat, session_scope
+from database.models import StudyPlan
+from ai_agent.prompt_maker import PlanPrompt, prepare_plan_prompt
+from ai_agent.scheduler import SCHEDULE_PLACEHOLDER, insert_schedule
+from ai_agent.structured_plan import (
+    STRUCTURED_OUTPUT_ENABLED,
+    StructuredPlan,
+    StructuredPlanError,
+    apply_schedule,
+    map_strings,
+    parse_structured_plan,
+    render_structured_plan,
+    response_format,
+    structured_output_instructions,
+)
+from ai_agent.fallback_plan import render_fallback_plan
+from ai_agent.utils.course_codes import COURSE_CODES_ENABLED, expand_course_codes, get_course_codes
+from ai_agent.utils.stream_rewriter import StreamRewriter
+from ai_agent.llm_services.admission import AdmissionRejectedError
 from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.call_context import set_endpoint
+from ai_agent.llm_services.ledger import call_ledger
+from ai_agent.llm_services.coalescing import SingleFlight
+from services.plan_cache import CachedPlan, depersonalize, personalize, plan_cache
+from services.similar_plans import similar_plans
+from services.degraded_mode import EMPTY_RESPONSE, OVERLOADED, PROVIDER_ERROR, TIMEOUT, GuardedResult, plan_llm_guard
+
+# Plan generations in flight, keyed on the normalized questionnaire (see PlanCache.key)
+plan_generations = SingleFlight("plan generation")
+
+# Upgrades of degraded plans in flight, keyed on the plan id
+plan_upgrades = SingleFlight("plan upgrade")
+
 
 class PlanService:
     @staticmethod
-    def generate_study_plan(request_data, session: Session, llm_service: BaseLLMService):
+    def _finalize_plan_text(text: str, plan_prompt: PlanPrompt, student_name: str) -> str:
+        """Post-processes the LLM output: expands course codes and inserts the fixed schedule."""
+        # Expand short course codes (e.g. "[BIP]") back to full course names
+        text = expand_course_codes(text)
+
+        # Insert the deterministic weekly schedule computed alongside the prompt
+        if plan_prompt.schedule:
+            text = insert_schedule(text, plan_prompt.schedule.render_markdown(student_name))
+            logger.debug("Fixed weekly schedule inserted into the generated plan")
+        return text
+
+    @staticmethod
+    def _plan_messages(plan_prompt: PlanPrompt) -> list:
+        """
+        The message sent to the LLM to generate the plan.
+
+        In structured output mode the JSON output instructions are appended; the stored
+        conversation keeps only the plan prompt, so chat follow-ups are answered in prose.
+        """
+        prompt = plan_prompt.prompt
+        if STRUCTURED_OUTPUT_ENABLED:
+            prompt += structured_output_instructions(fixed_schedule=plan_prompt.schedule is not None)
+        return [{"role": "user", "content": prompt}]
+
+    @staticmethod
+    def _llm_options() -> dict:
+        """Extra LLM call arguments for plan generation (the JSON schema in structured output mode)."""
+        return {"response_format": response_format()} if STRUCTURED_OUTPUT_ENABLED else {}
+
+    @staticmethod
+    def _finalize_response(text: str, plan_prompt: PlanPrompt,
+                           student_name: str) -> tuple[str, StructuredPlan | None]:
+        """
+        Turns the LLM output into the plan markdown and, in structured output mode, the structured plan.
+
+        The JSON is validated and repaired locally (see `parse_structured_plan`), course codes
+        are expanded, the fixed schedule replaces the model's weeks and the markdown is rendered
+        from the structure. A response that holds no usable JSON is kept as a markdown plan.
+        """
+        if not STRUCTURED_OUTPUT_ENABLED:
+            return PlanService._finalize_plan_text(text, plan_prompt, student_name), None
+        try:
+            structured = parse_structured_plan(text)
+        except StructuredPlanError as e:
+            logger.warning(f"Structured plan could not be read from the LLM output ({e}); keeping it as markdown")
+            return PlanService._finalize_plan_text(text, plan_prompt, student_name), None
+        structured = map_strings(structured, expand_course_codes)
+        if plan_prompt.schedule:
+            structured = apply_schedule(structured, plan_prompt.schedule)
+        return render_structured_plan(structured, student_name), structured
+
+    @staticmethod
+    def _personalize_structure(structured: StructuredPlan | None, name: str) -> StructuredPlan | None:
+        """Fills the name placeholders of a shared structured plan (see `personalize`)."""
+        if structured is None:
+            return None
+        return map_strings(structured, lambda text: personalize(text, name))
+
+    @staticmethod
+    def _plan_profile(plan: StudyPlan) -> dict:
+        """Rebuilds the questionnaire data (without email) from a stored study plan."""
+        return {
+            "name": plan.student.name,
+            "hours_per_day": plan.weekly_availability,
+            "start_date": plan.start_date,
+            "python_level": plan.python_level,
+            "sql_level": plan.sql_level,
+            "cloud_level": plan.cloud_level,
+            "used_git": plan.used_git,
+            "used_docker": plan.used_docker,
+            "interests": plan.interests,
+            "main_challenge": plan.main_challenge,
+        }
+
+    @staticmethod
+    def _prompt_data(request_data: dict) -> dict:
+        """Copies the request data without sensitive fields, for the prompt and persistence."""
+        logger.debug("Preparing data for prompt generation - removing sensitive fields")
+        api_data_for_prompt = request_data.copy()
+        if 'email' in api_data_for_prompt:
+            api_data_for_prompt.pop('email')
+            logger.debug("Email removed from prompt data for privacy")
+        return api_data_for_prompt
+
+    @staticmethod
+    def _save_plan(session: Session, request_data: dict, api_data_for_prompt: dict,
+                   conversation_history: list, degraded_reason: str | None = None,
+                   structured: StructuredPlan | None = None) -> dict:
+        """Gets or creates the student, saves the plan and returns the response data."""
+        logger.debug(f"Checking if student exists in database: {request_data.get('email')}")
+        student = get_or_create_student(
+            session=session,
+            name=request_data['name'],
+            email=request_data['email']
+        )
+        logger.info(f"Using student with ID: {student.id} for plan creation")
+
+        degraded = degraded_reason is not None
+        plan_save_data = api_data_for_prompt.copy()
+        plan_save_data["chat"] = conversation_history
+        plan_save_data["is_degraded"] = degraded
+        plan_save_data["structured_plan"] = structured.model_dump(mode="json") if structured else None
+
+        new_plan = add_study_plan(
+            session=session,
+            student_id=student.id,
+            plan_data=plan_save_data
+        )
+        logger.info(f"Study plan saved to database with ID: {new_plan.id}")
+        call_ledger.attribute_plan(new_plan.id)
+        if not degraded:
+            similar_plans.add(new_plan.id, api_data_for_prompt)
+
+        return {
+            "message": (
+                "AI service unavailable; a simplified study plan was generated and saved."
+                if degraded else "Study plan generated and saved successfully."
+            ),
+            "student_id": student.id,
+            "plan_id": new_plan.id,
+            "chat": conversation_history,
+            "degraded": degraded,
+            "degraded_reason": degraded_reason,
+            "structured_plan": plan_save_data["structured_plan"]
+        }
+
+    @staticmethod
+    def _similar_plan(session: Session, request_data: dict, api_data_for_prompt: dict,
+                      plan_prompt: PlanPrompt) -> CachedPlan | None:
+        """
+        Adapts the stored plan of a near-identical questionnaire to this student.
+
+        The old plan's fixed schedule is replaced by this student's schedule and the
+        old student's name by the new one. In structured output mode this is done on
+        the stored structured plan, and the text is rendered again from it. Returns None
+        when there is no similar plan, its schedule can't be found in the text (e.g. the
+        catalog changed since) or, in structured output mode, it has no structured plan.
+        """
+        match = similar_plans.find(api_data_for_prompt)
+        if not match:
+            return None
+        plan_id, similarity = match
+        plan = get_study_plan(session=session, plan_id=plan_id)
+        if not plan or plan.is_degraded or len(plan.chat) < 2:
+            similar_plans.record_rejected()
+            return None
+
+        old_name = plan.student.name
+        name = request_data['name']
+        if STRUCTURED_OUTPUT_ENABLED:
+            if not plan.structured_plan:
+                logger.debug(f"Similar plan {plan_id} rejected: it has no structured plan")
+                similar_plans.record_rejected()
+                return None
+            structured = map_strings(StructuredPlan.model_validate(plan.structured_plan),
+                                     lambda value: personalize(depersonalize(value, old_name), name))
+            if plan_prompt.schedule:
+                structured = apply_schedule(structured, plan_prompt.schedule)
+            logger.info(f"Reusing study plan {plan_id} for a similar questionnaire (similarity {similarity:.2f})")
+            return CachedPlan(render_structured_plan(structured, name), structured)
+
+        text = plan.chat[1]["content"]
+        if plan_prompt.schedule:
+            old_schedule = prepare_plan_prompt(user_data=PlanService._plan_profile(plan)).schedule
+            old_markdown = old_schedule.render_markdown(old_name) if old_schedule else None
+            if not old_markdown or old_markdown not in text:
+                logger.debug(f"Similar plan {plan_id} rejected: its schedule no longer matches the catalog")
+                similar_plans.record_rejected()
+                return None
+            text = text.replace(old_markdown, SCHEDULE_PLACEHOLDER)
+
+        text = personalize(depersonalize(text, old_name), name)
+        if plan_prompt.schedule:
+            text = insert_schedule(text, plan_prompt.schedule.render_markdown(name))
+        logger.info(f"Reusing study plan {plan_id} for a similar questionnaire (similarity {similarity:.2f})")
+        return CachedPlan(text)
+
+    @staticmethod
+    def _reuse_plan(session: Session, request_data: dict, api_data_for_prompt: dict,
+                    plan_prompt: PlanPrompt) -> CachedPlan | None:
+        """Plan for an identical (plan cache) or near-identical (similar plans) questionnaire."""
+        reused = plan_cache.get(session, api_data_for_prompt, request_data['name'])
+        if reused is None:
+            reused = PlanService._similar_plan(session, request_data, api_data_for_prompt, plan_prompt)
+            if reused is not None:
+                plan_cache.put(session, api_data_for_prompt, request_data['name'], reused.text, reused.structured)
+        return reused
+
+    @staticmethod
+    async def _generate_plan_template(request_data: dict, api_data_for_prompt: dict, plan_prompt: PlanPrompt,
+                                      llm_service: BaseLLMService) -> GuardedResult:
+        """
+        Generates the plan text through the degraded-mode guard.
+
+        Concurrent requests with the same questionnaire share a single generation, so the
+        returned text has the student's name replaced by placeholders (see `personalize`).
+        """
+        async def generate() -> GuardedResult:
+            logger.info("Sending prompt to LLM for study plan generation")
+            generated = await plan_llm_guard.call(
+                llm_service.achat_completion, messages=PlanService._plan_messages(plan_prompt),
+                **PlanService._llm_options()
+            )
+            if generated.degraded or not generated.text:
+                return generated
+            logger.info(f"Received study plan from LLM with length: {len(generated.text)} characters")
+            name = request_data['name']
+            text, structured = PlanService._finalize_response(generated.text, plan_prompt, name)
+            if structured is not None:
+                structured = map_strings(structured, lambda value: depersonalize(value, name))
+            return GuardedResult(text=depersonalize(text, name), structured=structured)
+
+        return await plan_generations.do(plan_cache.key(api_data_for_prompt), generate)
+
+    @staticmethod
+    async def generate_study_plan(request_data, session: Session, llm_service: BaseLLMService):
         """
         Generate a study plan using LLM and save it to the database.
         
@@ -20,60 +267,257 @@ class PlanService:
             dict: Response data containing plan details, or None if generation failed
         """
         logger.debug(f"Starting study plan generation process for user: {request_data.get('name')}")
-        
-        # 1. Get or Create Student in DB
-        logger.debug(f"Checking if student exists in database: {request_data.get('email')}")
-        student = get_or_create_student(
-            session=session, 
-            name=request_data['name'], 
-            email=request_data['email']
-        )
-        logger.info(f"Using student with ID: {student.id} for plan creation")
+        set_endpoint("generate_plan")
 
-        # 2. Prepare data for prompt maker - Remove sensitive info before sending to LLM
-        logger.debug("Preparing data for prompt generation - removing sensitive fields")
-        api_data_for_prompt = request_data.copy()
-        if 'email' in api_data_for_prompt:
-            api_data_for_prompt.pop('email')
-            logger.debug("Email removed from prompt data for privacy")
+        # 1. Prepare data for prompt maker - Remove sensitive info before sending to LLM
+        api_data_for_prompt = PlanService._prompt_data(request_data)
         
-        # 3. Create the Prompt using our prompt engineering template
+        # 2. Create the Prompt using our prompt engineering template
         logger.debug("Generating prompt from user data")
-        final_prompt = make_final_prompt(user_data=api_data_for_prompt)
+        plan_prompt = prepare_plan_prompt(user_data=api_data_for_prompt)
+        final_prompt = plan_prompt.prompt
         logger.debug(f"Generated prompt with length: {len(final_prompt)} characters")
-        
-        # 4. Call the LLM with our carefully crafted prompt
-        logger.info("Sending prompt to LLM for study plan generation")
         initial_messages = [{"role": "user", "content": final_prompt}]
-        assistant_response_text = llm_service.chat_completion(messages=initial_messages)
-        
-        # Check if we got a valid response from the LLM
-        if not assistant_response_text:
-            logger.warning("LLM returned empty response for study plan generation")
-            return None
 
-        logger.info(f"Received study plan from LLM with length: {len(assistant_response_text)} characters")
+        # 3. Reuse the plan generated for an identical or near-identical questionnaire, if any
+        reused = PlanService._reuse_plan(session, request_data, api_data_for_prompt, plan_prompt)
+        if reused is not None:
+            logger.info("Serving reused study plan")
+            return PlanService._save_plan(
+                session, request_data, api_data_for_prompt,
+                initial_messages + [{"role": "assistant", "content": reused.text}],
+                structured=reused.structured
+            )
+
+        # 4. Call the LLM with our carefully crafted prompt
+        # The guard enforces a deadline and a concurrency limit; when the provider fails,
+        # is too slow or is saturated, a template-based plan is served instead
+        result = await PlanService._generate_plan_template(
+            request_data, api_data_for_prompt, plan_prompt, llm_service
+        )
+
+        structured = None
+        if result.degraded:
+            logger.warning(f"Serving degraded study plan ({result.degraded_reason})")
+            assistant_response_text = render_fallback_plan(
+                api_data_for_prompt, schedule=plan_prompt.schedule
+            )
+        else:
+            assistant_response_text = result.text
+
+            # Check if we got a valid response from the LLM
+            if not assistant_response_text:
+                logger.warning("LLM returned empty response for study plan generation")
+                return None
+
+            assistant_response_text = personalize(assistant_response_text, request_data['name'])
+            structured = PlanService._personalize_structure(result.structured, request_data['name'])
+            plan_cache.put(session, api_data_for_prompt, request_data['name'], assistant_response_text, structured)
 
         # 5. Save the Study Plan to DB with chat history for continuity
         logger.debug("Preparing to save study plan to database")
-        plan_save_data = api_data_for_prompt.copy()
         initial_conversation_history = initial_messages + [
             {"role": "assistant", "content": assistant_response_text}
         ]
-        plan_save_data["chat"] = initial_conversation_history
+        return PlanService._save_plan(
+            session, request_data, api_data_for_prompt,
+            initial_conversation_history, result.degraded_reason, structured
+        )
 
-        new_plan = add_study_plan(
-            session=session, 
-            student_id=student.id, 
-            plan_data=plan_save_data
+    @staticmethod
+    async def stream_study_plan(request_data, llm_service: BaseLLMService):
+        """
+        Generate a study plan while streaming the text as the LLM produces it.
+
+        Yields ("token", {"content": ...}) events with text ready to display (course
+        codes expanded, fixed schedule inserted), then a final ("done", response data)
+        event once the plan is saved. The database is only touched after the stream
+        ends, in its own session. If the provider fails, is saturated or does not
+        start answering before the deadline, the degraded plan is sent as a single
+        token event, as is a reused plan (see `_reuse_plan`); a failure after text was sent yields an ("error", ...) event
+        and nothing is saved.
+
+        Parameters:
+            request_data (dict): Data from the user request containing name, email, and study preferences
+            llm_service (BaseLLMService): Service to interact with the LLM
+
+        Yields:
+            tuple: (event name, event data)
+        """
+        logger.debug(f"Starting streamed study plan generation for user: {request_data.get('name')}")
+        set_endpoint("generate_plan/stream")
+        api_data_for_prompt = PlanService._prompt_data(request_data)
+        plan_prompt = prepare_plan_prompt(user_data=api_data_for_prompt)
+        initial_messages = [{"role": "user", "content": plan_prompt.prompt}]
+
+        schedule_markdown = (
+            plan_prompt.schedule.render_markdown(request_data['name']) if plan_prompt.schedule else None
         )
-        logger.info(f"Study plan saved to database with ID: {new_plan.id}")
+        rewriter = StreamRewriter(
+            codebook=get_course_codes() if COURSE_CODES_ENABLED else None,
+            placeholder=SCHEDULE_PLACEHOLDER if schedule_markdown else None,
+            replacement=schedule_markdown,
+        )
+
+        with session_scope() as session:
+            reused = PlanService._reuse_plan(session, request_data, api_data_for_prompt, plan_prompt)
+
+        degraded_reason = None
+        guarded = plan_llm_guard.enabled
+        if reused is not None:
+            logger.info("Serving reused study plan over the stream")
+            yield "token", {"content": reused.text}
+        elif guarded and not plan_llm_guard.acquire():
+            degraded_reason = OVERLOADED
+        else:
+            logger.info("Streaming prompt to LLM for study plan generation")
+            stream = llm_service.astream_chat_completion(messages=initial_messages)
+            try:
+                # Only the wait for the first chunk is bounded: once text was sent
+                # to the client, falling back to another plan is no longer possible
+                try:
+                    if guarded:
+                        first_chunk = await asyncio.wait_for(anext(stream), timeout=plan_llm_guard.deadline)
+                    else:
+                        first_chunk = await anext(stream)
+                except StopAsyncIteration:
+                    first_chunk = None
+                    degraded_reason = EMPTY_RESPONSE
+                except asyncio.TimeoutError:
+                    degraded_reason = TIMEOUT
+                except AdmissionRejectedError as e:
+                    if not guarded:
+                        raise
+                    # Every provider is at its rate or concurrency limit (recorded here:
+                    # the guard's own slot was free, so acquire() did not count it)
+                    logger.warning(f"LLM stream not admitted ({e}), serving degraded plan")
+                    degraded_reason = OVERLOADED
+                    plan_llm_guard.record_degraded(OVERLOADED)
+                except Exception as e:
+                    if not guarded:
+                        raise
+                    logger.error(f"LLM stream failed before the first token: {e}")
+                    degraded_reason = PROVIDER_ERROR
 
-        # 6. Prepare and return response data
-        logger.debug("Preparing response data with plan details")
+                if degraded_reason is None:
+                    text = rewriter.feed(first_chunk)
+                    if text:
+                        yield "token", {"content": text}
+                    try:
+                        async for chunk in stream:
+                            text = rewriter.feed(chunk)
+                            if text:
+                                yield "token", {"content": text}
+                    except Exception as e:
+                        logger.error(f"LLM stream failed mid-response: {e}")
+                        yield "error", {"detail": "The AI service stopped responding. Please try again."}
+                        return
+                    text = rewriter.finish()
+                    if text:
+                        yield "token", {"content": text}
+            finally:
+                await stream.aclose()
+                if guarded:
+                    plan_llm_guard.release()
+
+        if degraded_reason is not None:
+            if degraded_reason != OVERLOADED:
+                plan_llm_guard.record_degraded(degraded_reason)
+            logger.warning(f"Serving degraded study plan ({degraded_reason})")
+            assistant_response_text = render_fallback_plan(api_data_for_prompt, schedule=plan_prompt.schedule)
+            yield "token", {"content": assistant_response_text}
+        elif reused is not None:
+            assistant_response_text = reused.text
+        else:
+            assistant_response_text = rewriter.text
+            logger.info(f"Streamed study plan from LLM with length: {len(assistant_response_text)} characters")
+
+        initial_conversation_history = initial_messages + [
+            {"role": "assistant", "content": assistant_response_text}
+        ]
+        with session_scope() as session:
+            # A streamed plan is markdown only: in structured output mode it is not cached,
+            # so a cache hit always carries the structured plan
+            if degraded_reason is None and reused is None and not STRUCTURED_OUTPUT_ENABLED:
+                plan_cache.put(session, api_data_for_prompt, request_data['name'], assistant_response_text)
+            response = PlanService._save_plan(
+                session, request_data, api_data_for_prompt,
+                initial_conversation_history, degraded_reason,
+                reused.structured if reused is not None else None
+            )
+        yield "done", response
+
+    @staticmethod
+    def _upgraded_response(plan: StudyPlan, message: str) -> dict:
+        """Response data of /upgrade_plan for a plan as currently stored."""
         return {
-            "message": "Study plan generated and saved successfully.",
-            "student_id": student.id,
-            "plan_id": new_plan.id,
-            "chat": initial_conversation_history
+            "message": message,
+            "student_id": plan.student_id,
+            "plan_id": plan.id,
+            "chat": plan.chat,
+            "structured_plan": plan.structured_plan,
+        }
+
+    @staticmethod
+    async def upgrade_study_plan(plan_id: int, session: Session, llm_service: BaseLLMService):
+        """
+        Regenerate a degraded study plan with the LLM.
+
+        The prompt is rebuilt from the stored questionnaire and the plan's conversation is
+        replaced by the new one. Plans that are not degraded are returned unchanged.
+        Provider errors are raised to the caller (no degraded fallback here).
+
+        Parameters:
+            plan_id (int): ID of the study plan to upgrade
+            session (Session): Database session for persistence operations
+            llm_service (BaseLLMService): Service to interact with the LLM
+
+        Returns:
+            dict: Response data containing plan details, or None if the plan does not exist
+        """
+        set_endpoint("upgrade_plan")
+        plan = get_study_plan(session=session, plan_id=plan_id)
+        if not plan:
+            logger.warning(f"Study plan with ID {plan_id} not found for upgrade")
+            return None
+        call_ledger.attribute_plan(plan_id)
+
+        if not plan.is_degraded:
+            logger.info(f"Study plan {plan_id} is not degraded, nothing to upgrade")
+            return PlanService._upgraded_response(plan, "Study plan is already complete.")
+
+        profile = PlanService._plan_profile(plan)
+        plan_prompt = prepare_plan_prompt(user_data=profile)
+        messages = [{"role": "user", "content": plan_prompt.prompt}]
+
+        async def generate() -> tuple[str, dict | None]:
+            logger.info(f"Sending prompt to LLM to upgrade degraded study plan {plan_id}")
+            text = await llm_service.achat_completion(
+                messages=PlanService._plan_messages(plan_prompt), **PlanService._llm_options()
+            )
+            if not text:
+                raise RuntimeError("LLM returned empty response while upgrading the study plan")
+            text, structured = PlanService._finalize_response(text, plan_prompt, profile["name"])
+            return text, structured.model_dump(mode="json") if structured else None
+
+        # Concurrent upgrades of the same plan share one generation
+        assistant_response_text, structured_plan = await plan_upgrades.do(plan_id, generate)
+
+        # Another request may have upgraded the plan while this one waited for the LLM
+        session.refresh(plan)
+        if not plan.is_degraded:
+            logger.info(f"Study plan {plan_id} was upgraded by a concurrent request")
+            return PlanService._upgraded_response(plan, "Study plan upgraded successfully.")
+
+        conversation_history = messages + [{"role": "assistant", "content": assistant_response_text}]
+        update_chat(session=session, plan_id=plan.id, conversation_history=conversation_history, is_degraded=False,
+                    structured_plan=structured_plan)
+        logger.info(f"Degraded study plan {plan_id} upgraded with LLM output")
+
+        return {
+            "message": "Study plan upgraded successfully.",
+            "student_id": plan.student_id,
+            "plan_id": plan.id,
+            "chat": conversation_history,
+            "structured_plan": structured_plan,
         }
\ No newline at end of file
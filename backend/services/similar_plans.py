@@ -0,0 +1,322 @@
+import datetime
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from loguru import logger
+from sqlmodel import Session, select
+
+from database.models import StudyPlan
+from ai_agent.utils.calendar_info import WEEKDAYS
+from ai_agent.utils.catalog_index import normalize
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    np = None  # Imported by _load_numpy on first use, so starting the application doesn't load NumPy
+
+# Reuse a stored plan for a near-identical questionnaire instead of calling the LLM
+SIMILAR_REUSE_ENABLED = os.getenv("PLAN_SIMILAR_REUSE", "true").lower() in ("1", "true", "yes")
+
+# Minimum cosine similarity of main_challenge + interests for a stored plan to be reused
+SIMILARITY_THRESHOLD = float(os.getenv("PLAN_SIMILAR_THRESHOLD", "0.85"))
+
+# Size of the hashed term space of the TF-IDF vectors
+VECTOR_DIMENSIONS = int(os.getenv("PLAN_SIMILAR_DIMENSIONS", "4096"))
+
+# Plans older than this are not reused (the catalog and the guidelines move on)
+MAX_AGE_DAYS = float(os.getenv("PLAN_SIMILAR_MAX_AGE_DAYS", "30"))
+
+# Words that carry no meaning when comparing challenges and interests
+_STOPWORDS = {
+    "a", "ao", "as", "com", "como", "da", "das", "de", "do", "dos", "e", "em", "eu", "isso", "mais",
+    "me", "meu", "minha", "muito", "na", "nas", "no", "nos", "o", "os", "ou", "para", "por", "pra",
+    "que", "se", "sem", "ser", "sou", "tenho", "um", "uma",
+}
+
+
+def hours_bucket(hours: int) -> int:
+    """Quantizes daily hours: 0 | 1 | 2-3 | 4-5 | 6+."""
+    hours = int(hours or 0)
+    return 0 if hours <= 0 else min(4, 1 + hours // 2)
+
+
+def bucket_key(profile: Dict[str, Any]) -> Tuple:
+    """
+    Fields that must match for a plan to be reused: quantized hours per weekday,
+    skill levels, tool flags and the week the plan starts.
+    """
+    hours = profile.get("hours_per_day") or {}
+    start = profile.get("start_date")
+    if isinstance(start, str):
+        start = datetime.date.fromisoformat(start)
+    return (
+        tuple(hours_bucket(hours.get(day, 0)) for day in WEEKDAYS),
+        profile.get("python_level"),
+        profile.get("sql_level"),
+        profile.get("cloud_level"),
+        bool(profile.get("used_git")),
+        bool(profile.get("used_docker")),
+        tuple(start.isocalendar()[:2]) if start else None,
+    )
+
+
+def profile_text(profile: Dict[str, Any]) -> str:
+    """Free-text part of the questionnaire compared by similarity."""
+    interests = " ".join(profile.get("interests") or [])
+    return f"{profile.get('main_challenge') or ''} {interests}"
+
+
+def term_weights(text: str, dimensions: int = VECTOR_DIMENSIONS) -> Dict[int, float]:
+    """Hashed, sublinear term frequencies (1 + log tf) of the text's meaningful words."""
+    counts: Dict[int, int] = {}
+    for token in re.findall(r"[a-z0-9]+", normalize(text)):
+        if len(token) < 2 or token in _STOPWORDS:
+            continue
+        slot = zlib.crc32(token.encode("utf-8")) % dimensions
+        counts[slot] = counts.get(slot, 0) + 1
+    return {slot: 1.0 + math.log(count) for slot, count in counts.items()}
+
+
+def _load_numpy() -> None:
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+def _grow(array: "np.ndarray", size: int) -> "np.ndarray":
+    if size < len(array):
+        return array
+    grown = np.zeros(max(8, len(array) * 2), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class _Postings:
+    """Positions (inside a bucket) and term frequencies of the plans containing one term slot."""
+
+    def __init__(self):
+        self.size = 0
+        self.positions = np.zeros(8, dtype=np.int32)
+        self.weights = np.zeros(8, dtype=np.float32)
+
+    def add(self, position: int, weight: float) -> None:
+        self.positions = _grow(self.positions, self.size)
+        self.weights = _grow(self.weights, self.size)
+        self.positions[self.size] = position
+        self.weights[self.size] = weight
+        self.size += 1
+
+
+class _Bucket:
+    """Plans sharing a bucket key: ids, creation times and an inverted index of their terms."""
+
+    def __init__(self):
+        self.size = 0
+        self.ids = np.zeros(8, dtype=np.int64)
+        self.created = np.zeros(8, dtype=np.float64)
+        self.norms = np.zeros(8, dtype=np.float64)
+        self.norms_version = 0
+        self.postings: Dict[int, _Postings] = {}
+
+    def add(self, plan_id: int, terms: Dict[int, float], created_at: float, idf: "np.ndarray") -> None:
+        position = self.size
+        self.ids = _grow(self.ids, position)
+        self.created = _grow(self.created, position)
+        self.norms = _grow(self.norms, position)
+        self.ids[position] = plan_id
+        self.created[position] = created_at
+        self.norms[position] = math.sqrt(sum((weight * idf[slot]) ** 2 for slot, weight in terms.items()))
+        for slot, weight in terms.items():
+            postings = self.postings.get(slot)
+            if postings is None:
+                postings = self.postings[slot] = _Postings()
+            postings.add(position, weight)
+        self.size += 1
+
+    def refresh_norms(self, idf: "np.ndarray", version: int) -> None:
+        """Recomputes the TF-IDF norm of every plan after the IDF weights changed."""
+        squared = np.zeros(self.size, dtype=np.float64)
+        for slot, postings in self.postings.items():
+            squared[postings.positions[:postings.size]] += (postings.weights[:postings.size] * idf[slot]) ** 2
+        self.norms[:self.size] = np.sqrt(squared)
+        self.norms_version = version
+
+
+class SimilarPlanIndex:
+    """
+    In-memory near-duplicate index over the stored study plans.
+
+    Plans are grouped by `bucket_key`, so a lookup only scores plans whose
+    hours, levels and tool flags already match. Inside the bucket, the
+    main_challenge and interests are compared by TF-IDF cosine similarity over
+    an inverted index: a lookup only touches the plans that share a term with
+    the query, and the scores are accumulated with NumPy over those postings.
+    The IDF weights are recomputed when the index has grown by 10% since the
+    last time; each bucket then refreshes its plan norms on its next lookup.
+
+    The index is built from the database at startup and receives every new
+    non-degraded plan afterwards. Each worker process keeps its own copy.
+    """
+
+    def __init__(self, dimensions: int = VECTOR_DIMENSIONS, threshold: float = SIMILARITY_THRESHOLD,
+                 max_age_days: float = MAX_AGE_DAYS, enabled: bool = SIMILAR_REUSE_ENABLED):
+        self.dimensions = dimensions
+        self.threshold = threshold
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple, _Bucket] = {}
+        # Allocated by _arrays on first use
+        self._document_frequency: Optional["np.ndarray"] = None
+        self._documents = 0
+        self._idf: Optional["np.ndarray"] = None
+        self._idf_documents = 0
+        self._idf_version = 0
+        self._stats = {"lookups": 0, "hits": 0, "misses": 0, "rejected": 0}
+        self._lookup_seconds = 0.0
+
+    def _arrays(self) -> None:
+        """Allocates the document frequencies and IDF weights (and imports NumPy) on first use."""
+        if self._idf is None:
+            _load_numpy()
+            self._document_frequency = np.zeros(self.dimensions, dtype=np.float64)
+            self._idf = np.ones(self.dimensions, dtype=np.float64)
+
+    def _refresh_idf(self) -> None:
+        if self._documents > 1.1 * self._idf_documents:
+            self._idf = np.log((1.0 + self._documents) / (1.0 + self._document_frequency)) + 1.0
+            self._idf_documents = self._documents
+            self._idf_version += 1
+
+    @staticmethod
+    def _timestamp(created_at: Optional[datetime.datetime]) -> float:
+        if created_at is None:
+            return time.time()
+        if created_at.tzinfo is None:  # SQLite returns naive UTC datetimes
+            created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+        return created_at.timestamp()
+
+    def add(self, plan_id: int, profile: Dict[str, Any], created_at: Optional[datetime.datetime] = None) -> None:
+        """Indexes a stored plan by the questionnaire it was generated from."""
+        if not self.enabled:
+            return
+        terms = term_weights(profile_text(profile), self.dimensions)
+        key = bucket_key(profile)
+        with self._lock:
+            self._arrays()
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket()
+                bucket.norms_version = self._idf_version
+            bucket.add(plan_id, terms, self._timestamp(created_at), self._idf)
+            for slot in terms:
+                self._document_frequency[slot] += 1
+            self._documents += 1
+
+    def build(self, session: Session) -> int:
+        """Indexes the recent non-degraded plans stored in the database; returns how many."""
+        if not self.enabled:
+            return 0
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=self.max_age_seconds)
+        statement = select(
+            StudyPlan.id, StudyPlan.start_date, StudyPlan.weekly_availability, StudyPlan.python_level,
+            StudyPlan.sql_level, StudyPlan.cloud_level, StudyPlan.used_git, StudyPlan.used_docker,
+            StudyPlan.interests, StudyPlan.main_challenge, StudyPlan.created_at,
+        ).where(StudyPlan.is_degraded == False, StudyPlan.created_at >= cutoff)  # noqa: E712
+        started = time.perf_counter()
+        count = 0
+        for row in session.exec(statement):
+            self.add(row.id, {
+                "hours_per_day": row.weekly_availability,
+                "start_date": row.start_date,
+                "python_level": row.python_level,
+                "sql_level": row.sql_level,
+                "cloud_level": row.cloud_level,
+                "used_git": row.used_git,
+                "used_docker": row.used_docker,
+                "interests": row.interests,
+                "main_challenge": row.main_challenge,
+            }, row.created_at)
+            count += 1
+        logger.info(f"Similar plan index built with {count} plans in {time.perf_counter() - started:.2f}s")
+        return count
+
+    def _scores(self, bucket: _Bucket, query: Dict[int, float]) -> "np.ndarray":
+        if bucket.norms_version != self._idf_version:
+            bucket.refresh_norms(self._idf, self._idf_version)
+        norms = bucket.norms[:bucket.size]
+        if not query:
+            # No free text: only plans without free text are similar
+            return (norms == 0).astype(np.float64)
+        dots = np.zeros(bucket.size, dtype=np.float64)
+        query_norm = 0.0
+        for slot, weight in query.items():
+            weighted = weight * self._idf[slot]
+            query_norm += weighted * weighted
+            postings = bucket.postings.get(slot)
+            if postings is not None:
+                dots[postings.positions[:postings.size]] += postings.weights[:postings.size] * (weighted * self._idf[slot])
+        denominators = norms * math.sqrt(query_norm)
+        return np.divide(dots, denominators, out=np.zeros(bucket.size, dtype=np.float64), where=denominators > 0)
+
+    def find(self, profile: Dict[str, Any]) -> Optional[Tuple[int, float]]:
+        """
+        Returns (plan_id, similarity) of the most similar recent plan in the profile's
+        bucket, or None when no plan reaches the threshold.
+        """
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        query = term_weights(profile_text(profile), self.dimensions)
+        match = None
+        with self._lock:
+            self._arrays()
+            self._refresh_idf()
+            bucket = self._buckets.get(bucket_key(profile))
+            if bucket is not None and bucket.size:
+                scores = self._scores(bucket, query)
+                scores[bucket.created[:bucket.size] < time.time() - self.max_age_seconds] = -1.0
+                best = float(scores.max())
+                if best >= self.threshold:
+                    # Among equally similar plans, the most recent one
+                    position = int(np.flatnonzero(scores == best)[-1])
+                    match = (int(bucket.ids[position]), best)
+            self._stats["lookups"] += 1
+            self._stats["hits" if match else "misses"] += 1
+            self._lookup_seconds += time.perf_counter() - started
+        return match
+
+    def record_rejected(self) -> None:
+        """Counts a match that could not be reused (e.g. its plan no longer fits the catalog)."""
+        with self._lock:
+            self._stats["rejected"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            if self._idf is not None:
+                self._document_frequency[:] = 0
+                self._idf[:] = 1.0
+            self._documents = 0
+            self._idf_documents = 0
+            self._idf_version += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Lookup counters, index size and mean lookup time."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["indexed_plans"] = self._documents
+            stats["buckets"] = len(self._buckets)
+            stats["mean_lookup_ms"] = round(1000 * self._lookup_seconds / stats["lookups"], 3) if stats["lookups"] else 0.0
+        stats["enabled"] = self.enabled
+        stats["threshold"] = self.threshold
+        return stats
+
+
+similar_plans = SimilarPlanIndex()
@@ -0,0 +1,166 @@
+import importlib.abc
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+# Time every module imported while the application starts (logged when startup completes).
+# Lifespan stages are always timed; only the per-module import timing is opt-in.
+STARTUP_PROFILE_ENABLED = os.getenv("STARTUP_PROFILE", "false").lower() in ("1", "true", "yes")
+
+# Seconds `import main` may take; above it a warning is logged and tests/test_startup.py fails
+IMPORT_BUDGET_SECONDS = float(os.getenv("STARTUP_IMPORT_BUDGET", "2.5"))
+
+# Slowest modules listed in the startup report
+PROFILE_TOP_IMPORTS = int(os.getenv("STARTUP_PROFILE_TOP", "25"))
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Wraps the loader of one module to time its execution."""
+
+    def __init__(self, loader: importlib.abc.Loader, profiler: "StartupProfiler"):
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        # The module runs (and stays) with its real loader, as without profiling
+        module.__spec__.loader = self._loader
+        module.__loader__ = self._loader
+        with self._profiler._timing(module.__name__):
+            self._loader.exec_module(module)
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """First finder on sys.meta_path: resolves the spec with the other finders and times its loader."""
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, "find_spec", None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self._profiler)
+        return spec
+
+
+class StartupProfiler:
+    """
+    Measures how long the application takes to start.
+
+    `import main` is timed from the import of this module (the first one in
+    main.py) until `imports_done`, and checked against `import_budget`. Each
+    lifespan step runs inside `stage(name)`. With profiling enabled, an import
+    hook also records the time spent executing every module, both on its own
+    ("self") and including the modules it imported ("cumulative"), like
+    `python -X importtime` but available from the running process.
+    """
+
+    def __init__(self, enabled: bool = STARTUP_PROFILE_ENABLED, import_budget: float = IMPORT_BUDGET_SECONDS):
+        self.enabled = enabled
+        self.import_budget = import_budget
+        self._origin = time.perf_counter()
+        self._import_seconds: Optional[float] = None
+        self._imports: Dict[str, Tuple[float, float]] = {}
+        self._stages: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._timer: Optional[_ImportTimer] = None
+
+    def install(self) -> None:
+        """Starts timing the modules imported from now on."""
+        if self._timer is None:
+            self._timer = _ImportTimer(self)
+            sys.meta_path.insert(0, self._timer)
+
+    def uninstall(self) -> None:
+        """Stops timing imports; the timings recorded so far are kept."""
+        if self._timer is not None:
+            try:
+                sys.meta_path.remove(self._timer)
+            except ValueError:
+                pass
+            self._timer = None
+
+    @contextmanager
+    def _timing(self, module: str) -> Iterator[None]:
+        # Each open import accumulates the time of the imports nested in it
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self._lock:
+                self._imports[module] = (elapsed - nested, elapsed)
+
+    def imports_done(self) -> float:
+        """Marks the end of `import main`; returns its duration in seconds."""
+        self._import_seconds = time.perf_counter() - self._origin
+        if self._import_seconds > self.import_budget:
+            logger.warning(f"Importing the application took {self._import_seconds:.2f}s, "
+                           f"above the {self.import_budget:.2f}s budget (STARTUP_IMPORT_BUDGET)")
+        return self._import_seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Times one startup step."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._stages.append((name, time.perf_counter() - started))
+
+    def startup_done(self) -> None:
+        """Stops the import hook and, when profiling, logs the report."""
+        self.uninstall()
+        if not self.enabled:
+            return
+        report = self.report()
+        stages = ", ".join(f"{stage['name']} {stage['ms']}ms" for stage in report["stages"])
+        logger.info(f"Startup profile: import {report['import_ms']}ms (budget {report['import_budget_ms']}ms); "
+                    f"stages: {stages or 'none'}")
+        for entry in report["slowest_imports"]:
+            logger.info(f"  import {entry['module']}: {entry['cumulative_ms']}ms cumulative, {entry['self_ms']}ms self")
+
+    def report(self, top: int = PROFILE_TOP_IMPORTS) -> Dict[str, Any]:
+        """Import duration, stage durations and the slowest imported modules, in milliseconds."""
+        with self._lock:
+            stages = list(self._stages)
+            imports = sorted(self._imports.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            "profiling": self.enabled,
+            "import_ms": round(self._import_seconds * 1000, 1) if self._import_seconds is not None else None,
+            "import_budget_ms": round(self.import_budget * 1000, 1),
+            "stages": [{"name": name, "ms": round(seconds * 1000, 1)} for name, seconds in stages],
+            "modules_timed": len(imports),
+            "slowest_imports": [
+                {"module": module, "self_ms": round(own * 1000, 1), "cumulative_ms": round(cumulative * 1000, 1)}
+                for module, (own, cumulative) in imports[:top]
+            ],
+        }
+
+
+# Profiler of this process; importing it first in main.py starts the clock
+startup_profiler = StartupProfiler()
+if startup_profiler.enabled:
+    startup_profiler.install()
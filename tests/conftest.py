@@ -1,5 +1,15 @@
 import sys
 import os
 
-# Adiciona o diretório src ao path do Python
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
\ No newline at end of file
+# Adiciona o diretório backend ao path do Python (os módulos usam imports relativos a ele)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+
+class FakeClock:
+    """Relógio manual para os testes: `now` só avança quando o teste o altera."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from ai_agent.llm_services.admission import (
+    QUEUE_FULL,
+    RATE_LIMITED,
+    WAIT_TIMEOUT,
+    AdmissionControlledLLMService,
+    AdmissionController,
+    AdmissionRejectedError,
+    TokenBucket,
+    estimate_call_tokens,
+)
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.router import LLMRouter
+from conftest import FakeClock
+
+class SlowService(BaseLLMService):
+    """Responde "ok" após um atraso, registrando o máximo de chamadas simultâneas."""
+
+    def __init__(self, name="slow", delay=0.05):
+        self._name = name
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.calls = 0
+
+    @property
+    def name(self):
+        return self._name
+
+    def chat_completion(self, messages, **kwargs):
+        self.calls += 1
+        return "ok"
+
+    async def achat_completion(self, messages, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return "ok"
+
+def _messages(content="oi"):
+    return [{"role": "user", "content": content}]
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now = 30
+    assert bucket.available() == pytest.approx(30)
+    assert bucket.wait_time(30) == 0
+    # A call larger than the bucket only waits for a full bucket
+    assert bucket.wait_time(1000) == pytest.approx(30)
+    assert TokenBucket(0, clock).wait_time(10 ** 9) == 0
+
+def test_estimate_uses_prompt_length_and_max_tokens():
+    assert estimate_call_tokens(_messages("x" * 400), {"max_tokens": 50}) == 150
+
+def test_bulkhead_limits_concurrent_calls():
+    service = SlowService()
+    limited = AdmissionControlledLLMService(
+        service, AdmissionController("slow", rpm=0, tpm=0, max_concurrency=2, max_queue=10, max_wait=5)
+    )
+
+    async def run():
+        return await asyncio.gather(*(limited.achat_completion(_messages()) for _ in range(6)))
+
+    assert asyncio.run(run()) == ["ok"] * 6
+    assert service.max_active == 2
+    stats = limited.admission_stats()
+    assert stats["admitted"] == 6 and stats["queued"] == 4
+    assert stats["active"] == 0 and stats["queue_depth"] == 0
+
+def test_full_queue_rejects_immediately():
+    service = SlowService(delay=0.2)
+    controller = AdmissionController("slow", rpm=0, tpm=0, max_concurrency=1, max_queue=1, max_wait=5)
+    limited = AdmissionControlledLLMService(service, controller)
+
+    async def run():
+        return await asyncio.gather(*(limited.achat_completion(_messages()) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert results[:2] == ["ok", "ok"]
+    assert isinstance(results[2], AdmissionRejectedError)
+    assert results[2].reason == QUEUE_FULL and results[2].retry_after >= 1
+    assert service.calls == 2
+    assert controller.stats()["rejected"][QUEUE_FULL] == 1
+
+def test_rate_limit_rejects_when_wait_exceeds_budget():
+    clock = FakeClock()
+    controller = AdmissionController("slow", rpm=1, tpm=0, max_wait=5, clock=clock)
+    limited = AdmissionControlledLLMService(SlowService(delay=0), controller)
+
+    async def run():
+        await limited.achat_completion(_messages())
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            await limited.achat_completion(_messages())
+        return rejected.value
+
+    error = asyncio.run(run())
+    assert error.reason == RATE_LIMITED
+    assert error.retry_after == pytest.approx(60)
+
+def test_waiter_times_out_in_queue():
+    controller = AdmissionController("slow", rpm=0, tpm=0, max_concurrency=1, max_queue=5, max_wait=0.05)
+    limited = AdmissionControlledLLMService(SlowService(delay=0.3), controller)
+
+    async def run():
+        return await asyncio.gather(limited.achat_completion(_messages()), limited.achat_completion(_messages()),
+                                    return_exceptions=True)
+
+    first, second = asyncio.run(run())
+    assert first == "ok"
+    assert isinstance(second, AdmissionRejectedError) and second.reason == WAIT_TIMEOUT
+    assert controller.stats()["queue_depth"] == 0
+
+def test_cancelled_waiter_leaves_the_queue():
+    controller = AdmissionController("slow", rpm=0, tpm=0, max_concurrency=1, max_queue=5, max_wait=5)
+    limited = AdmissionControlledLLMService(SlowService(delay=0.1), controller)
+
+    async def run():
+        first = asyncio.ensure_future(limited.achat_completion(_messages()))
+        second = asyncio.ensure_future(limited.achat_completion(_messages()))
+        third = asyncio.ensure_future(limited.achat_completion(_messages()))
+        await asyncio.sleep(0.01)
+        second.cancel()
+        return await first, await third
+
+    assert asyncio.run(run()) == ("ok", "ok")
+    assert controller.stats()["queue_depth"] == 0
+    assert controller.stats()["active"] == 0
+
+def test_router_fails_over_without_penalizing_a_saturated_provider():
+    busy = AdmissionControlledLLMService(
+        SlowService("busy"), AdmissionController("busy", rpm=0, tpm=0, max_concurrency=1, max_queue=0)
+    )
+    spare = SlowService("spare", delay=0)
+    router = LLMRouter([busy, spare])
+
+    async def run():
+        return await asyncio.gather(router.achat_completion(_messages()), router.achat_completion(_messages()))
+
+    assert asyncio.run(run()) == ["ok", "ok"]
+    assert spare.calls == 1
+    providers = router.routing_stats()["providers"]
+    assert providers["busy"]["error_rate"] == 0
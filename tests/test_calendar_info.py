@@ -0,0 +1,44 @@
+import datetime
+
+from ai_agent.utils.calendar_info import (
+    brazilian_holidays,
+    easter_sunday,
+    get_calendar_info,
+    study_calendar,
+)
+
+def test_easter_sunday_known_years():
+    assert easter_sunday(2024) == datetime.date(2024, 3, 31)
+    assert easter_sunday(2025) == datetime.date(2025, 4, 20)
+    assert easter_sunday(2026) == datetime.date(2026, 4, 5)
+
+def test_movable_holidays_2025():
+    holidays = {h.name: h.date for h in brazilian_holidays(2025)}
+
+    assert holidays["Carnaval (terça-feira)"] == datetime.date(2025, 3, 4)
+    assert holidays["Sexta-feira Santa"] == datetime.date(2025, 4, 18)
+    assert holidays["Corpus Christi"] == datetime.date(2025, 6, 19)
+
+def test_consciencia_negra_only_from_2024():
+    assert datetime.date(2023, 11, 20) not in {h.date for h in brazilian_holidays(2023)}
+    assert datetime.date(2024, 11, 20) in {h.date for h in brazilian_holidays(2024)}
+
+def test_study_calendar_zeroes_holidays_on_study_days():
+    # 14/04/2025 é segunda; Sexta-feira Santa (18/04) e Tiradentes (21/04) caem no período
+    days = study_calendar("2025-04-14", {"Segunda": 2, "Sexta": 3}, weeks=2)
+
+    assert [(d.date.day, d.hours) for d in days] == [(14, 2), (18, 0), (21, 0), (25, 3)]
+    assert days[1].holiday.name == "Sexta-feira Santa"
+
+def test_get_calendar_info_reports_only_relevant_dates():
+    info = get_calendar_info({
+        "start_date": datetime.date(2025, 4, 14),
+        "hours_per_day": {"Segunda": 2, "Terça": 0, "Sexta": 3},
+    })
+
+    assert "Período do plano: 14/04/2025 (Segunda) a 25/05/2025 (Domingo), 6 semanas." in info
+    assert "- 18/04 (Sexta): Sexta-feira Santa, -3h" in info
+    assert "- 21/04 (Segunda): Tiradentes, -2h" in info
+    assert "Dia do Trabalho" not in info  # 01/05/2025 é quinta, sem estudo
+    assert "S1 2h, S2 3h" in info
+    assert "total 25h" in info
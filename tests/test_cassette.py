@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.cassette import (
+    CassetteLLMService,
+    CassetteMissError,
+    CassetteStore,
+    RecordingLLMService,
+    parse_latency,
+    recorded_speed,
+)
+from ai_agent.llm_services.usage import UsageTracker
+from conftest import FakeClock
+
+class FakeProvider(BaseLLMService):
+    """Responde com texto fixo, avançando o relógio e registrando consumo como um provedor real."""
+    name = "fake"
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.usage = UsageTracker(self.name)
+
+    def chat_completion(self, messages, **kwargs):
+        self.clock.now += 1.5
+        self.usage.record(SimpleNamespace(prompt_tokens=100, completion_tokens=20, prompt_cache_hit_tokens=64))
+        return f"resposta para {messages[-1]['content']}"
+
+    async def achat_completion(self, messages, **kwargs):
+        return self.chat_completion(messages, **kwargs)
+
+    async def astream_chat_completion(self, messages, **kwargs):
+        for delay, chunk in [(0.4, "Olá"), (0.1, ", "), (0.2, "mundo")]:
+            self.clock.now += delay
+            yield chunk
+        self.usage.record(SimpleNamespace(prompt_tokens=50, completion_tokens=3))
+
+def _messages(content="plano"):
+    return [{"role": "user", "content": content}]
+
+def _replayer(store, sleeps, **kwargs):
+    async def asleep(delay):
+        sleeps.append(round(delay, 3))
+    return CassetteLLMService(store, asleep=asleep, sleep=sleeps.append, **kwargs)
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+def test_recorded_response_is_replayed_with_its_latency_and_usage(tmp_path):
+    clock = FakeClock()
+    recorder = RecordingLLMService(FakeProvider(clock), CassetteStore(tmp_path), clock=clock)
+    assert asyncio.run(recorder.achat_completion(_messages(), temperature=0.2)) == "resposta para plano"
+
+    sleeps = []
+    replay = _replayer(CassetteStore(tmp_path), sleeps)
+
+    assert asyncio.run(replay.achat_completion(_messages(), temperature=0.2)) == "resposta para plano"
+    assert sleeps == [1.5]
+    usage = replay.usage_stats()
+    assert usage["prompt_tokens"] == 100 and usage["completion_tokens"] == 20 and usage["cached_tokens"] == 64
+    assert replay.cassette_stats()["hits"] == 1
+
+def test_stream_chunks_are_replayed_with_their_timings(tmp_path):
+    clock = FakeClock()
+    recorder = RecordingLLMService(FakeProvider(clock), CassetteStore(tmp_path), clock=clock)
+    assert asyncio.run(_collect(recorder.astream_chat_completion(_messages()))) == ["Olá", ", ", "mundo"]
+
+    sleeps = []
+    replay = _replayer(CassetteStore(tmp_path), sleeps, speed=0.5)
+
+    assert asyncio.run(_collect(replay.astream_chat_completion(_messages()))) == ["Olá", ", ", "mundo"]
+    assert sleeps == [0.2, 0.05, 0.1]
+    assert replay.usage_stats()["prompt_tokens"] == 50
+    # The streamed recording also answers the non-streaming call
+    assert asyncio.run(replay.achat_completion(_messages())) == "Olá, mundo"
+
+def test_injected_latency_replaces_the_recorded_one(tmp_path):
+    clock = FakeClock()
+    store = CassetteStore(tmp_path)
+    recorder = RecordingLLMService(FakeProvider(clock), store, clock=clock)
+    recorder.chat_completion(_messages())
+    asyncio.run(_collect(recorder.astream_chat_completion(_messages("stream"))))
+
+    sleeps = []
+    replay = _replayer(store, sleeps, latency=parse_latency("fixed:2"))
+    replay.chat_completion(_messages())
+    asyncio.run(_collect(replay.astream_chat_completion(_messages("stream"))))
+
+    assert sleeps[0] == 2
+    assert sum(sleeps[1:]) == pytest.approx(2)
+
+def test_unrecorded_request(tmp_path):
+    clock = FakeClock()
+    store = CassetteStore(tmp_path)
+    RecordingLLMService(FakeProvider(clock), store, clock=clock).chat_completion(_messages())
+
+    strict = _replayer(CassetteStore(tmp_path), [])
+    with pytest.raises(CassetteMissError):
+        asyncio.run(strict.achat_completion(_messages("outro")))
+
+    lenient = _replayer(CassetteStore(tmp_path), [], on_miss="any")
+    assert asyncio.run(lenient.achat_completion(_messages("outro"))) == "resposta para plano"
+    assert lenient.cassette_stats()["misses"] == 1
+
+def test_latency_specifications():
+    assert parse_latency("recorded") is None and recorded_speed("recorded:0.25") == 0.25
+    assert parse_latency("none")() == 0
+    assert 1 <= parse_latency("uniform:1,2")() <= 2
+    assert parse_latency("lognormal:0.8,0.3")() > 0
+    with pytest.raises(ValueError):
+        parse_latency("gaussian:1")
@@ -0,0 +1,76 @@
+from ai_agent.utils.catalog_index import CatalogIndex, get_catalog_index, parse_fundamentals, parse_level_range
+
+GUIDELINES = """
+## FUNDAMENTOS ESSENCIAIS
+Os seguintes cursos devem ser priorizados:
+
+1. Workshop Git e Github - Ferramenta imprescindível
+2. Workshop Infra, Linux, Docker - Infraestrutura
+
+## OUTRA SEÇÃO
+1. Não é um curso
+"""
+
+CATALOG = {
+    "bootcamps": [
+        {"nome": "Bootcamp Intensivo Python", "nivel": "iniciante a intermediário"},
+        {"nome": "Bootcamp Avançado Python com Webscraping", "nivel": "avançado"},
+        {"nome": "Bootcamp Power BI", "nivel": "iniciante a intermediário"},
+    ],
+    "workshops": [
+        {"nome": "Workshop Git e Github", "nivel": "iniciante"},
+        {"nome": "Infra, Linux, Docker", "nivel": "intermediário"},
+        {"nome": "Arquitetura Streaming com Kafka", "nivel": "avançado"},
+    ],
+}
+
+PROFILE = {
+    "python_level": "Avançado",
+    "sql_level": "Avançado",
+    "cloud_level": "Avançado",
+    "used_git": True,
+    "used_docker": True,
+    "interests": [],
+}
+
+def test_parse_fundamentals_only_reads_its_section():
+    assert parse_fundamentals(GUIDELINES) == ["Workshop Git e Github", "Workshop Infra, Linux, Docker"]
+
+def test_parse_level_range():
+    assert parse_level_range("iniciante a intermediário") == (1, 2)
+    assert parse_level_range("avançado") == (3, 3)
+
+def test_fundamentals_resolve_despite_name_prefix():
+    index = CatalogIndex(CATALOG, GUIDELINES)
+
+    assert [index.courses[p].name for p in index.fundamentals] == ["Workshop Git e Github", "Infra, Linux, Docker"]
+
+def test_select_for_advanced_student():
+    selection = CatalogIndex(CATALOG, GUIDELINES).select(PROFILE)
+
+    assert selection.names == (
+        "Bootcamp Avançado Python com Webscraping",
+        "Workshop Git e Github",
+        "Infra, Linux, Docker",
+        "Arquitetura Streaming com Kafka",
+    )
+    assert selection.total_courses == 6
+    assert [c["nome"] for c in selection.catalog["bootcamps"]] == ["Bootcamp Avançado Python com Webscraping"]
+
+def test_select_matches_interests_ignoring_spaces():
+    profile = dict(PROFILE, python_level="Iniciante", sql_level="Iniciante", cloud_level="Iniciante", interests=["PowerBI"])
+
+    names = CatalogIndex(CATALOG, GUIDELINES).select(profile).names
+
+    assert "Bootcamp Power BI" in names
+    assert "Bootcamp Intensivo Python" in names
+    assert "Arquitetura Streaming com Kafka" not in names
+
+def test_real_catalog_is_pruned():
+    index = get_catalog_index()
+    beginner = dict(PROFILE, python_level="Nunca utilizei", sql_level="Nunca utilizei", cloud_level="Nunca utilizei")
+
+    selection = index.select(beginner)
+
+    assert len(index.fundamentals) == 5
+    assert len(selection.names) < selection.total_courses / 2
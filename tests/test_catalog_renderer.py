@@ -0,0 +1,60 @@
+from ai_agent.utils.catalog_renderer import estimate_tokens, measure_catalog_rendering, render_catalog
+from ai_agent.utils.prompt_assets import get_prompt_assets
+
+CATALOG = {
+    "bootcamps": [
+        {
+            "nome": "Bootcamp Intensivo SQL",
+            "tipo": "bootcamp",
+            "aulas": 15,
+            "duracao_total": "15h",
+            "modulos": [{"nome": "Módulo 1 (Aula 1-5)", "descricao": "SQL básico"}],
+            "nivel": "iniciante a intermediário",
+        }
+    ],
+    "workshops": [
+        {"nome": "Workshop Git e Github", "tipo": "workshop", "duracao": "4h", "nivel": "iniciante"},
+    ],
+}
+
+def test_render_catalog_is_line_oriented():
+    rendered = render_catalog(CATALOG)
+
+    assert rendered.splitlines() == [
+        "### BOOTCAMPS (nome | aulas | duracao_total | nivel)",
+        "Bootcamp Intensivo SQL | 15 | 15h | iniciante a intermediário",
+        "  - Módulo 1 (Aula 1-5): SQL básico",
+        "",
+        "### WORKSHOPS (nome | duracao | nivel)",
+        "Workshop Git e Github | 4h | iniciante",
+    ]
+
+def test_render_keeps_type_when_it_differs_from_section():
+    catalog = {"workshops": [{"nome": "A", "tipo": "palestra"}, {"nome": "B", "tipo": "workshop"}]}
+
+    assert "A | palestra" in render_catalog(catalog)
+
+def test_render_catalog_keeps_every_value_of_real_catalog():
+    conteudo = get_prompt_assets().conteudo_curso
+    rendered = render_catalog(conteudo)
+
+    for section in ("bootcamps", "workshops"):
+        for course in conteudo[section]:
+            for key, value in course.items():
+                if key == "tipo":
+                    continue
+                if key == "modulos":
+                    for module in value:
+                        assert f"{module['nome']}: {module['descricao']}" in rendered
+                else:
+                    assert str(value) in rendered
+
+def test_measurement_reports_savings():
+    metrics = measure_catalog_rendering(get_prompt_assets().conteudo_curso)
+
+    assert metrics["compact_chars"] < metrics["repr_chars"]
+    assert metrics["tokens_saved_est"] > 0
+    assert metrics["chars_saved"] == metrics["repr_chars"] - metrics["compact_chars"]
+
+def test_estimate_tokens_counts_punctuation():
+    assert estimate_tokens("{'nome': 'Git'}") == 9
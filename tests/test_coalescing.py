@@ -0,0 +1,149 @@
+import asyncio
+import threading
+
+import pytest
+
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.coalescing import CoalescingLLMService, SingleFlight
+
+class SlowService(BaseLLMService):
+    """Responde com o conteúdo da última mensagem após um pequeno atraso."""
+    name = "slow"
+
+    def __init__(self, delay=0.05, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def chat_completion(self, messages, **kwargs):
+        self.calls += 1
+        threading.Event().wait(self.delay)
+        if self.error:
+            raise self.error
+        return f"resposta: {messages[-1]['content']}"
+
+    async def achat_completion(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"resposta: {messages[-1]['content']}"
+
+def _messages(content):
+    return [{"role": "user", "content": content}]
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    service = SlowService()
+    coalescing = CoalescingLLMService(service)
+
+    async def run():
+        return await asyncio.gather(*(coalescing.achat_completion(_messages("plano")) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert results == ["resposta: plano"] * 5
+    assert service.calls == 1
+    stats = coalescing.coalescing_stats()
+    assert stats["calls"] == 5 and stats["upstream"] == 1 and stats["coalesced"] == 4
+    assert stats["in_flight"] == 0
+
+def test_different_requests_are_not_merged():
+    service = SlowService()
+    coalescing = CoalescingLLMService(service)
+
+    async def run():
+        return await asyncio.gather(
+            coalescing.achat_completion(_messages("a")),
+            coalescing.achat_completion(_messages("b")),
+            coalescing.achat_completion(_messages("a"), temperature=0.2),
+        )
+
+    assert asyncio.run(run()) == ["resposta: a", "resposta: b", "resposta: a"]
+    assert service.calls == 3
+
+def test_sequential_calls_are_not_cached():
+    service = SlowService(delay=0)
+    coalescing = CoalescingLLMService(service)
+
+    async def run():
+        await coalescing.achat_completion(_messages("a"))
+        await coalescing.achat_completion(_messages("a"))
+
+    asyncio.run(run())
+    assert service.calls == 2
+
+def test_error_reaches_every_waiter():
+    service = SlowService(error=ConnectionError("fora do ar"))
+    coalescing = CoalescingLLMService(service)
+
+    async def run():
+        return await asyncio.gather(
+            *(coalescing.achat_completion(_messages("a")) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert service.calls == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    flight = SingleFlight("teste")
+    started = []
+
+    async def fn():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("k", fn))
+        second = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "ok"
+    assert len(started) == 1
+
+def test_call_is_cancelled_when_every_waiter_leaves():
+    flight = SingleFlight("teste")
+    finished = []
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+
+    async def run():
+        waiter = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    assert finished == []
+    assert flight.stats()["in_flight"] == 0
+
+def test_sync_calls_from_threads_share_one_upstream_call():
+    service = SlowService(delay=0.1)
+    coalescing = CoalescingLLMService(service)
+    results = []
+
+    def call():
+        results.append(coalescing.chat_completion(_messages("a")))
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["resposta: a"] * 4
+    assert service.calls == 1
+
+def test_wrapped_service_attributes_stay_reachable():
+    service = SlowService()
+    service.routing_stats = lambda: {"current": "slow"}
+    coalescing = CoalescingLLMService(service)
+
+    assert coalescing.name == "slow"
+    assert coalescing.routing_stats() == {"current": "slow"}
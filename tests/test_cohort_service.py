@@ -0,0 +1,136 @@
+import asyncio
+import datetime
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from ai_agent.llm_services.base_client import BaseLLMService
+from database.db_handler import add_study_plans_bulk
+from database.models import Student, StudyPlan
+from services import cohort_service, plan_service
+from services.cohort_service import CohortService
+from services.plan_cache import PlanCache
+from services.similar_plans import SimilarPlanIndex
+
+BASE = {
+    "hours_per_day": {"Segunda": 2, "Quarta": 2},
+    "start_date": datetime.date(2025, 3, 10),
+    "python_level": "Iniciante",
+    "sql_level": "Nunca utilizei",
+    "cloud_level": "Nunca utilizei",
+    "used_git": False,
+    "used_docker": False,
+    "interests": ["Dados"],
+    "main_challenge": None,
+}
+
+class FakeLLM(BaseLLMService):
+    """Responde um plano fixo, contando chamadas e o máximo de chamadas simultâneas."""
+    name = "fake"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    def chat_completion(self, messages, **kwargs):
+        raise NotImplementedError
+
+    async def achat_completion(self, messages, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            self.active -= 1
+        if self.fail:
+            raise ConnectionError("fora do ar")
+        return "## Introdução\nPlano gerado."
+
+def _student(number, **changes):
+    return dict(BASE, name=f"Aluno {number}", email=f"aluno{number}@example.com", **changes)
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+
+    @contextmanager
+    def session_scope():
+        with Session(engine) as session:
+            yield session
+            session.commit()
+
+    cache, index = PlanCache(memory_size=16), SimilarPlanIndex()
+    for module in (cohort_service, plan_service):
+        monkeypatch.setattr(module, "session_scope", session_scope)
+        monkeypatch.setattr(module, "plan_cache", cache)
+        monkeypatch.setattr(module, "similar_plans", index)
+    return engine
+
+def _run(requests, llm, concurrency=None):
+    async def collect():
+        return [line async for line in CohortService.generate_cohort_plans(requests, llm, concurrency)]
+    return asyncio.run(collect())
+
+def test_identical_profiles_share_one_generation(engine):
+    requests = [_student(1), _student(2), _student(3, python_level="Avançado"), _student(4)]
+    llm = FakeLLM()
+
+    lines = _run(requests, llm)
+
+    results, summary = lines[:-1], lines[-1]["summary"]
+    assert llm.calls == 2
+    assert sorted(line["index"] for line in results) == [0, 1, 2, 3]
+    assert all(line["status"] == "ok" for line in results)
+    assert summary["students"] == 4 and summary["distinct_profiles"] == 2 and summary["ok"] == 4
+
+    with Session(engine) as session:
+        plans = session.exec(select(StudyPlan)).all()
+        assert len(plans) == 4
+        assert len({plan.student_id for plan in plans}) == 4
+        assert all(plan.chat[1]["content"] for plan in plans)
+
+def test_concurrency_limit_is_respected(engine):
+    requests = [_student(i, start_date=datetime.date(2025, 3, 10) + datetime.timedelta(weeks=i)) for i in range(6)]
+    llm = FakeLLM()
+
+    lines = _run(requests, llm, concurrency=2)
+
+    assert llm.calls == 6
+    assert llm.max_active == 2
+    assert lines[-1]["summary"]["ok"] == 6
+
+def test_provider_failure_serves_degraded_plans(engine):
+    llm = FakeLLM(fail=True)
+
+    lines = _run([_student(1), _student(2)], llm)
+
+    assert [line["status"] for line in lines[:-1]] == ["degraded", "degraded"]
+    assert lines[-1]["summary"]["degraded"] == 2
+    with Session(engine) as session:
+        assert all(plan.is_degraded for plan in session.exec(select(StudyPlan)).all())
+
+def test_bulk_insert_reuses_existing_students(engine):
+    plan_data = dict(BASE, chat=[{"role": "user", "content": "oi"}])
+    with Session(engine) as session:
+        session.add(Student(name="Antigo", email="aluno1@example.com"))
+        session.commit()
+
+        plans = add_study_plans_bulk(session, [
+            ("Aluno 1", "aluno1@example.com", plan_data),
+            ("Aluno 2", "aluno2@example.com", plan_data),
+            ("Aluno 2", "aluno2@example.com", plan_data),
+        ])
+        session.commit()
+
+        assert [plan.id for plan in plans] == [1, 2, 3]
+        students = session.exec(select(Student).order_by(Student.id)).all()
+        assert [(s.name, s.email) for s in students] == [
+            ("Aluno 1", "aluno1@example.com"), ("Aluno 2", "aluno2@example.com")
+        ]
+        assert plans[1].student_id == plans[2].student_id
@@ -0,0 +1,50 @@
+from ai_agent.utils.course_codes import CourseCodeBook
+
+CATALOG = {
+    "bootcamps": [
+        {"nome": "Bootcamp Intensivo Python", "tipo": "bootcamp"},
+        {"nome": "Bootcamp Intensivo SQL", "tipo": "bootcamp"},
+    ],
+    "workshops": [
+        {"nome": "Infra, Linux, Docker", "tipo": "workshop"},
+        {"nome": "Multiengine ETL: Databricks e DuckDB", "tipo": "workshop"},
+        {"nome": "Infra as a Code com Terraform", "tipo": "workshop"},
+        {"nome": "Infra as Code com Terraform", "tipo": "workshop"},
+    ],
+}
+
+def test_codes_are_short_and_stable():
+    codebook = CourseCodeBook(CATALOG)
+    reordered = CourseCodeBook({"workshops": CATALOG["workshops"][::-1], "bootcamps": CATALOG["bootcamps"]})
+
+    assert codebook.code_for("Bootcamp Intensivo Python") == "BIP"
+    assert codebook.code_for("Infra, Linux, Docker") == "WILD"
+    assert codebook.names_by_code == reordered.names_by_code
+
+def test_collisions_get_numeric_suffix():
+    codebook = CourseCodeBook(CATALOG)
+
+    assert codebook.code_for("Infra as Code com Terraform") == "WICT"
+    assert codebook.code_for("Infra as a Code com Terraform") == "WICT2"
+
+def test_compress_handles_guideline_prefixes():
+    codebook = CourseCodeBook(CATALOG)
+    text = "1. Bootcamp Intensivo Python - Base\n4. Workshop Infra, Linux, Docker - Infra"
+
+    assert codebook.compress(text) == "1. [BIP] - Base\n4. [WILD] - Infra"
+
+def test_expand_round_trip_and_unknown_codes():
+    codebook = CourseCodeBook(CATALOG)
+
+    assert codebook.expand("Comece com [BIP] e depois [BIS]. [XYZ]") == (
+        "Comece com Bootcamp Intensivo Python e depois Bootcamp Intensivo SQL. [XYZ]"
+    )
+
+def test_expand_keeps_mermaid_gantt_valid():
+    codebook = CourseCodeBook(CATALOG)
+    text = "Semana 1: [WMED]\n```mermaid\ngantt\n  [WMED] :a1, 2025-01-06, 3d\n```"
+
+    expanded = codebook.expand(text)
+
+    assert "Semana 1: Multiengine ETL: Databricks e DuckDB" in expanded
+    assert "  Multiengine ETL - Databricks e DuckDB :a1, 2025-01-06, 3d" in expanded
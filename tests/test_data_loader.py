@@ -3,7 +3,7 @@ import json
 import sys
 import os
 
-from utils.data_loader import load_file, get_data_dir
+from ai_agent.utils.data_loader import load_file, get_data_dir
 
 # Fixture to mock the data directory
 @pytest.fixture
@@ -25,7 +25,7 @@ def mock_data_dir(tmpdir, monkeypatch):
     invalid_json.write("{'key': 'value',}")  # Trailing comma
 
     # Mock the get_data_dir function
-    monkeypatch.setattr('utils.data_loader.get_data_dir', lambda: str(data_dir))
+    monkeypatch.setattr('ai_agent.utils.data_loader.get_data_dir', lambda: str(data_dir))
     return data_dir
 
 # Test Cases
@@ -65,11 +65,15 @@ def test_invalid_json_file(mock_data_dir, capsys):
     assert "Erro ao decodificar JSON do arquivo 'invalid.json'" in captured.out
 
 def test_uppercase_extension(mock_data_dir, capsys):
-    content = load_file("VALID.TXT")
+    # The extension is matched case-insensitively; the file name itself is not
+    # (it depends on the filesystem), so the file is created with that exact name
+    mock_data_dir.join("UPPER.TXT").write("Hello, World!")
+
+    content = load_file("UPPER.TXT")
     captured = capsys.readouterr()
 
     assert content == "Hello, World!"
-    assert "Arquivo de texto 'VALID.TXT' carregado com sucesso." in captured.out
+    assert "Arquivo de texto 'UPPER.TXT' carregado com sucesso." in captured.out
 
 def test_override_file_type(mock_data_dir, capsys):
     # Create a .dat file but force TXT parsing
@@ -84,12 +88,13 @@ def test_override_file_type(mock_data_dir, capsys):
     assert "Arquivo de texto 'custom.dat' carregado com sucesso." in captured.out
 
 def test_get_data_dir():
-    """Testa se a função get_data_dir retorna um caminho válido para a pasta 'data'."""
+    """Testa se a função get_data_dir retorna o caminho da pasta 'prompt_files' do backend."""
     data_dir = get_data_dir()
     
-    # Verifica se o caminho termina com 'data'
-    assert os.path.basename(data_dir) == 'data'
+    # Verifica se o caminho termina com 'prompt_files'
+    assert os.path.basename(data_dir) == 'prompt_files'
     
-    # Verifica se o diretório pai do caminho é o diretório raiz do projeto
-    expected_parent = os.path.dirname(os.path.dirname(__file__))
-    assert os.path.dirname(data_dir) == expected_parent
\ No newline at end of file
+    # Verifica se o diretório pai do caminho é o diretório backend
+    expected_parent = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+    assert os.path.abspath(os.path.dirname(data_dir)) == expected_parent
+    assert os.path.isdir(data_dir)
\ No newline at end of file
@@ -0,0 +1,164 @@
+import asyncio
+import datetime
+import os
+import time
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from ai_agent.llm_services.admission import AdmissionRejectedError
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.fallback_plan import DEGRADED_NOTICE, render_fallback_plan
+from ai_agent.utils.prompt_assets import PromptAssetRegistry
+from services import plan_service
+from services.degraded_mode import OVERLOADED, PROVIDER_ERROR, TIMEOUT, DegradedModeGuard
+from services.plan_cache import PlanCache
+from services.plan_service import PlanService
+from services.similar_plans import SimilarPlanIndex
+
+PROMPT_FILES = os.path.join(os.path.dirname(__file__), "..", "backend", "prompt_files")
+
+PROFILE = {
+    "name": "Ana",
+    "hours_per_day": {"Segunda": 2, "Quarta": 2, "Sábado": 4},
+    "start_date": datetime.date(2025, 4, 14),
+    "python_level": "Iniciante",
+    "sql_level": "Nunca utilizei",
+    "cloud_level": "Nunca utilizei",
+    "used_git": False,
+    "used_docker": False,
+    "interests": ["Power BI"],
+    "main_challenge": "Conseguir o primeiro emprego na área",
+}
+
+def test_fallback_plan_is_complete_and_fast():
+    assets = PromptAssetRegistry(data_dir=PROMPT_FILES, poll_interval=0).load()
+    render_fallback_plan(PROFILE, assets)  # aquece o índice do catálogo
+
+    started = time.perf_counter()
+    plan = render_fallback_plan(PROFILE, assets)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.05
+    assert plan.startswith("# Plano de Estudos: Ana")
+    assert DEGRADED_NOTICE in plan
+    assert "## Semana 1:" in plan
+    assert "🎉 Feriado: Sexta-feira Santa" not in plan  # sexta não é dia de estudo
+    assert "🎉 Feriado: Tiradentes" in plan
+    assert "```mermaid" in plan
+    assert "Conseguir o primeiro emprego na área" in plan
+
+async def _answer(messages=None):
+    return "plano"
+
+async def _fail():
+    raise ConnectionError("provider down")
+
+def test_guard_returns_text_when_provider_answers():
+    guard = DegradedModeGuard(deadline=1, max_in_flight=2, enabled=True)
+
+    result = asyncio.run(guard.call(_answer, messages=[]))
+
+    assert result.text == "plano"
+    assert not result.degraded
+
+def test_guard_degrades_on_provider_error():
+    guard = DegradedModeGuard(deadline=1, max_in_flight=2, enabled=True)
+
+    result = asyncio.run(guard.call(_fail))
+
+    assert result.degraded_reason == PROVIDER_ERROR
+    assert guard.stats()["degraded"][PROVIDER_ERROR] == 1
+
+def test_guard_degrades_when_provider_is_not_admitted():
+    guard = DegradedModeGuard(deadline=1, max_in_flight=2, enabled=True)
+
+    async def rejected():
+        raise AdmissionRejectedError("openai", "queue_full", 3)
+
+    result = asyncio.run(guard.call(rejected))
+
+    assert result.degraded_reason == OVERLOADED
+    assert guard.stats()["in_flight"] == 0
+
+def test_guard_cancels_calls_past_the_deadline():
+    guard = DegradedModeGuard(deadline=0.05, max_in_flight=1, enabled=True)
+
+    result = asyncio.run(guard.call(asyncio.sleep, 10))
+
+    assert result.degraded_reason == TIMEOUT
+    assert guard.stats()["in_flight"] == 0
+
+def test_guard_degrades_when_saturated():
+    guard = DegradedModeGuard(deadline=1, max_in_flight=1, enabled=True)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "plano"
+
+        first = asyncio.create_task(guard.call(slow))
+        await asyncio.sleep(0)
+        second = await guard.call(_answer)
+        release.set()
+        return await first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first.text == "plano"
+    assert second.degraded_reason == OVERLOADED
+
+def test_disabled_guard_propagates_errors():
+    guard = DegradedModeGuard(enabled=False)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(guard.call(_fail))
+
+class CountingLLM(BaseLLMService):
+    """Falha enquanto `down`; depois responde devagar, contando as chamadas."""
+    name = "fake"
+
+    def __init__(self):
+        self.down = True
+        self.calls = 0
+
+    def chat_completion(self, messages, **kwargs):
+        raise NotImplementedError
+
+    async def achat_completion(self, messages, **kwargs):
+        if self.down:
+            raise ConnectionError("provider down")
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return "# Plano de Estudos: Ana\nPlano completo"
+
+def test_concurrent_upgrades_of_a_plan_share_one_generation(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(plan_service, "plan_llm_guard", DegradedModeGuard(deadline=5, max_in_flight=4, enabled=True))
+    monkeypatch.setattr(plan_service, "plan_cache", PlanCache(memory_size=0, enabled=False))
+    monkeypatch.setattr(plan_service, "similar_plans", SimilarPlanIndex(threshold=1.1))
+    monkeypatch.setattr(plan_service, "STRUCTURED_OUTPUT_ENABLED", False)
+    llm = CountingLLM()
+    request = dict(PROFILE, email="ana@example.com", hours_per_day={"Segunda": 2, "Quarta": 2})
+
+    with Session(engine) as session:
+        plan_id = asyncio.run(PlanService.generate_study_plan(request, session, llm))["plan_id"]
+        session.commit()
+    llm.down = False
+
+    async def upgrade_twice():
+        with Session(engine) as first, Session(engine) as second:
+            return await asyncio.gather(
+                PlanService.upgrade_study_plan(plan_id, first, llm),
+                PlanService.upgrade_study_plan(plan_id, second, llm),
+            )
+
+    results = asyncio.run(upgrade_twice())
+
+    assert llm.calls == 1
+    assert results[0]["chat"] == results[1]["chat"]
+    assert "Plano completo" in results[0]["chat"][-1]["content"]
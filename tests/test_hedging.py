@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+
+from ai_agent.llm_services import hedging
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.call_context import set_endpoint
+from ai_agent.llm_services.hedging import Hedger
+from ai_agent.llm_services.router import LLMRouter
+
+class SlowService(BaseLLMService):
+    def __init__(self, name, delay, fail=False):
+        self._name = name
+        self.delay = delay
+        self.fail = fail
+        self.started = 0
+        self.cancelled = 0
+        self.closed = 0
+
+    @property
+    def name(self):
+        return self._name
+
+    def chat_completion(self, messages, **kwargs):
+        return self._name
+
+    async def achat_completion(self, messages, **kwargs):
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise ConnectionError(f"{self._name} down")
+        return self._name
+
+    async def astream_chat_completion(self, messages, **kwargs):
+        text = await self.achat_completion(messages, **kwargs)
+        try:
+            yield text
+            yield "!"
+        finally:
+            self.closed += 1
+
+@pytest.fixture(autouse=True)
+def fast_thresholds(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_DEFAULT_DELAY_SECONDS", 0.05)
+    monkeypatch.setattr(hedging, "HEDGE_MIN_DELAY_SECONDS", 0.0)
+    monkeypatch.setattr(hedging, "HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(hedging, "HEDGE_WINDOW", 10)
+    monkeypatch.setattr(hedging, "HEDGE_BUDGET", 0.5)
+    monkeypatch.setattr(hedging, "HEDGE_BUDGETS", {})
+
+def _chat(router, endpoint="generate_plan"):
+    async def run():
+        set_endpoint(endpoint)
+        return await router.achat_completion([{"role": "user", "content": "oi"}])
+    return asyncio.run(run())
+
+def test_slow_call_is_hedged_and_loser_cancelled():
+    stalled = SlowService("stalled", delay=5)
+    backup = SlowService("backup", delay=0.01)
+    router = LLMRouter([stalled, backup], hedger=Hedger())
+
+    assert _chat(router) == "backup"
+    assert stalled.cancelled == 1
+    stats = router.routing_stats()["hedging"]["generate_plan"]
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+
+def test_fast_call_is_not_hedged():
+    primary = SlowService("primary", delay=0.001)
+    backup = SlowService("backup", delay=0.001)
+    router = LLMRouter([primary, backup], hedger=Hedger())
+
+    assert _chat(router) == "primary"
+    assert backup.started == 0
+
+def test_budget_caps_hedges_per_endpoint(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_BUDGETS", {"continue_chat": 0.2})
+    stalled = SlowService("stalled", delay=0.1)
+    backup = SlowService("backup", delay=0.001)
+    router = LLMRouter([stalled, backup], hedger=Hedger())
+    # Mantém "stalled" como o provedor preferido
+    router.ranked = lambda: [stalled, backup]
+
+    results = [_chat(router, "continue_chat") for _ in range(4)]
+
+    assert results == ["backup", "stalled", "stalled", "stalled"]  # 0.2 × max(chamadas, 5) = 1 hedge
+    assert backup.started == 1
+
+def test_fresh_endpoint_stays_within_budget(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_BUDGETS", {"continue_chat": 0.2})
+    hedger = Hedger()
+    state = hedger._state("continue_chat")
+
+    # Toda chamada é lenta e pediria um hedge: o orçamento vale desde a primeira
+    hedges = []
+    for _ in range(10):
+        hedged = hedger._take_budget("continue_chat", state)
+        hedger._record(state, hedged, backup_won=False, latency=None)
+        hedges.append(sum(state.hedged))
+
+    assert hedges[4] == 1  # 0.2 × 5 primeiras chamadas
+    assert hedges[9] == 2  # 0.2 × 10 chamadas
+
+def test_threshold_follows_observed_quantile(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_QUANTILE", 0.8)
+    hedger = Hedger()
+    state = hedger._state("generate_plan")
+
+    assert hedger.threshold("generate_plan") == 0.05  # poucas amostras: valor padrão
+    state.latencies.extend([1.0, 2.0, 3.0, 4.0, 10.0])
+
+    assert hedger.threshold("generate_plan") == 4.0
+
+def test_single_provider_hedges_against_itself():
+    service = SlowService("solo", delay=0.2)
+    router = LLMRouter([service], hedger=Hedger())
+
+    assert _chat(router) == "solo"
+    assert service.started == 2
+
+def test_failed_hedge_still_returns_primary():
+    primary = SlowService("primary", delay=0.1)
+    backup = SlowService("backup", delay=0.001, fail=True)
+    router = LLMRouter([primary, backup], hedger=Hedger())
+
+    assert _chat(router) == "primary"
+
+def test_failed_hedge_does_not_retry_the_backup():
+    primary = SlowService("primary", delay=0.1, fail=True)
+    backup = SlowService("backup", delay=0.001, fail=True)
+    router = LLMRouter([primary, backup], hedger=Hedger())
+    router.ranked = lambda: [primary, backup]
+
+    with pytest.raises(ConnectionError):
+        _chat(router)
+    # Uma chamada por provedor: a corrida com hedge já tentou o backup
+    assert (primary.started, backup.started) == (1, 1)
+
+    spare = SlowService("spare", delay=0.001)
+    router = LLMRouter([primary, backup, spare], hedger=Hedger())
+    router.ranked = lambda: [primary, backup, spare]
+
+    assert _chat(router) == "spare"
+    assert (primary.started, backup.started, spare.started) == (2, 2, 1)
+
+def test_stream_hedge_closes_losing_stream():
+    stalled = SlowService("stalled", delay=5)
+    backup = SlowService("backup", delay=0.01)
+    router = LLMRouter([stalled, backup], hedger=Hedger())
+
+    async def run():
+        set_endpoint("generate_plan/stream")
+        return [chunk async for chunk in router.astream_chat_completion([])]
+
+    assert asyncio.run(run()) == ["backup", "!"]
+    assert stalled.cancelled == 1
+    assert backup.closed == 1
@@ -0,0 +1,95 @@
+import asyncio
+import datetime
+import time
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from ai_agent.llm_services.call_context import set_endpoint
+from ai_agent.llm_services.ledger import CallLedger, estimate_cost
+from database.db_handler import add_llm_calls
+from database.models import LLMCall
+from services.ledger_service import LedgerService
+
+USAGE = {"prompt_tokens": 1000, "completion_tokens": 500, "cached_tokens": 400}
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+def _ledger(batches):
+    ledger = CallLedger(flush_interval=60, batch_size=100)
+    ledger._sink = lambda calls, attributions: batches.append((calls, attributions))
+    return ledger
+
+def test_cost_is_estimated_from_model_prices():
+    # 600 uncached + 400 cached prompt tokens and 500 completion tokens of gpt-4.1-mini
+    assert estimate_cost("gpt-4.1-mini", 1000, 500, 400) == pytest.approx((600 * 0.4 + 400 * 0.1 + 500 * 1.6) / 1e6)
+    assert estimate_cost("unknown-model", 1000, 500, 0) is None
+
+def test_calls_are_linked_to_the_plan_saved_after_them():
+    batches = []
+    ledger = _ledger(batches)
+
+    async def generate_plan():
+        set_endpoint("generate_plan")
+        ledger.record("openai", "gpt-4.1-mini", "completion", "success", USAGE, 2.5)
+        ledger.attribute_plan(42)
+        ledger.record("openai", "gpt-4.1-mini", "completion", "error", None, 0.3)
+
+    asyncio.run(generate_plan())
+    assert ledger.flush() == 2
+
+    (calls, attributions), = batches
+    request_id = calls[0]["request_id"]
+    assert calls[0]["endpoint"] == "generate_plan" and calls[0]["plan_id"] is None
+    assert calls[0]["latency_ms"] == 2500 and calls[0]["cost_usd"] > 0
+    assert calls[1]["plan_id"] == 42 and calls[1]["cost_usd"] is None
+    assert attributions == [(request_id, 42)]
+
+def test_pending_entries_are_bounded():
+    ledger = _ledger([])
+    ledger.max_pending = 2
+    for _ in range(3):
+        ledger.record("openai", "gpt-4.1-mini", "completion", "success", USAGE, 1)
+
+    assert ledger.stats()["pending"] == 2 and ledger.stats()["dropped"] == 1
+
+def test_writer_thread_flushes_full_batches():
+    batches = []
+    ledger = CallLedger(flush_interval=60, batch_size=2)
+    ledger.start(lambda calls, attributions: batches.append(calls))
+    try:
+        ledger.record("openai", "gpt-4.1-mini", "completion", "success", USAGE, 1)
+        ledger.record("openai", "gpt-4.1-mini", "completion", "success", USAGE, 1)
+        deadline = time.monotonic() + 2
+        while not batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        ledger.stop()
+
+    assert len(batches[0]) == 2
+    assert ledger.stats()["written"] == 2
+
+def test_reports_aggregate_the_ledger(session):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    base = {"created_at": now, "endpoint": "generate_plan", "model": "deepseek-chat", "kind": "stream",
+            "prompt_tokens": 100, "completion_tokens": 50, "cached_tokens": 0, "cost_usd": 0.001}
+    calls = [dict(base, request_id="r1", provider="deepseek", outcome="success", latency_ms=ms, ttft_ms=ms // 10)
+             for ms in range(100, 2100, 100)]
+    calls.append(dict(base, request_id="r2", provider="openai", outcome="error", latency_ms=50, ttft_ms=None))
+    add_llm_calls(session, calls, [("r1", 7)])
+
+    latency, = LedgerService.latency_by_provider(session, days=1)
+    assert latency["provider"] == "deepseek" and latency["calls"] == 20
+    assert latency["latency_p50_ms"] == 1000 and latency["latency_p95_ms"] == 1900
+    assert latency["ttft_p50_ms"] == 100
+
+    costs = LedgerService.cost_per_plan(session, days=1, limit=10)
+    assert costs["plans"][0]["plan_id"] == 7 and costs["plans"][0]["calls"] == 20
+    assert costs["average_cost_usd"] == pytest.approx(0.02)
+    assert session.exec(select(LLMCall).where(LLMCall.plan_id.is_(None))).one().provider == "openai"
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.openai_client import OpenAIService
+from ai_agent.llm_services.openai_compatible import PROVIDERS, OpenAICompatibleService
+
+class SyncOnlyService(BaseLLMService):
+    name = "sync-only"
+
+    def chat_completion(self, messages, **kwargs):
+        self.thread = threading.current_thread()
+        return f"{len(messages)} mensagens, {kwargs}"
+
+def _response(content):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20,
+                              prompt_tokens_details=SimpleNamespace(cached_tokens=64)),
+    )
+
+class FakeCompletions:
+    def __init__(self):
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(0.01)
+        return _response("  plano  ")
+
+@pytest.fixture
+def openai_service(monkeypatch):
+    monkeypatch.setattr(OpenAICompatibleService, "_instances", {})
+    service = OpenAIService(api_key="sk-test")
+    completions = FakeCompletions()
+    service.async_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return service, completions
+
+def test_default_achat_completion_runs_off_the_event_loop():
+    service = SyncOnlyService()
+
+    result = asyncio.run(service.achat_completion([{"role": "user", "content": "oi"}], temperature=0))
+
+    assert result == "1 mensagens, {'temperature': 0}"
+    assert service.thread is not threading.main_thread()
+
+def test_openai_achat_completion_uses_async_client(openai_service):
+    service, completions = openai_service
+
+    result = asyncio.run(service.achat_completion([{"role": "user", "content": "oi"}], temperature=0.2, foo=1))
+
+    assert result == "plano"
+    assert completions.calls == [{
+        "messages": [{"role": "user", "content": "oi"}],
+        "temperature": 0.2,
+        "model": PROVIDERS["openai"].default_model,
+    }]
+    assert service.usage_stats()["cached_tokens"] == 64
+
+def test_concurrent_calls_overlap(openai_service):
+    service, completions = openai_service
+
+    async def many():
+        return await asyncio.gather(*(service.achat_completion([{"role": "user", "content": str(i)}]) for i in range(50)))
+
+    started = time.perf_counter()
+    results = asyncio.run(many())
+    elapsed = time.perf_counter() - started
+
+    assert results == ["plano"] * 50
+    assert elapsed < 0.25  # 50 chamadas de 10 ms em paralelo, não em sequência
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from ai_agent.llm_services import router as router_module
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.router import LLMRouter
+from conftest import FakeClock
+
+class FakeService(BaseLLMService):
+    def __init__(self, name, clock, latency=1.0, fail=False):
+        self._name = name
+        self.clock = clock
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+
+    @property
+    def name(self):
+        return self._name
+
+    def chat_completion(self, messages, **kwargs):
+        self.calls += 1
+        self.clock.now += self.latency
+        if self.fail:
+            raise ConnectionError(f"{self._name} down")
+        return self._name
+
+    async def astream_chat_completion(self, messages, **kwargs):
+        text = self.chat_completion(messages, **kwargs)
+        yield text[:2]
+        yield text[2:]
+
+def _call(router, times=1):
+    return [router.chat_completion([{"role": "user", "content": "oi"}]) for _ in range(times)]
+
+def test_measures_every_provider_then_prefers_the_fastest():
+    clock = FakeClock()
+    slow = FakeService("slow", clock, latency=3.0)
+    fast = FakeService("fast", clock, latency=1.0)
+    router = LLMRouter([slow, fast], clock=clock)
+
+    assert _call(router, 2) == ["slow", "fast"]
+    assert _call(router, 3) == ["fast"] * 3
+    assert router.routing_stats()["ranking"] == ["fast", "slow"]
+
+def test_keeps_current_provider_within_switch_margin():
+    clock = FakeClock()
+    first = FakeService("first", clock, latency=1.0)
+    second = FakeService("second", clock, latency=1.1)
+    router = LLMRouter([first, second], clock=clock)
+    _call(router, 2)  # mede os dois; o atual passa a ser "second"
+
+    assert _call(router) == ["second"]  # 10% mais lento não justifica trocar
+
+def test_fails_over_within_the_same_request():
+    clock = FakeClock()
+    broken = FakeService("broken", clock, fail=True)
+    backup = FakeService("backup", clock)
+    router = LLMRouter([broken, backup], clock=clock)
+
+    assert _call(router) == ["backup"]
+    assert router.routing_stats()["failovers"] == 1
+
+def test_benches_failing_provider_until_cooldown(monkeypatch):
+    monkeypatch.setattr(router_module, "ROUTER_MIN_SAMPLES", 2)
+    monkeypatch.setattr(router_module, "ROUTER_COOLDOWN_SECONDS", 30)
+    clock = FakeClock()
+    flaky = FakeService("flaky", clock, latency=0.1)
+    steady = FakeService("steady", clock, latency=2.0)
+    router = LLMRouter([flaky, steady], clock=clock)
+    _call(router, 2)  # mede os dois; "flaky" é o mais rápido
+
+    flaky.fail = True
+    _call(router, 2)
+    assert router.routing_stats()["providers"]["flaky"]["healthy"] is False
+
+    calls_while_benched = flaky.calls
+    _call(router, 3)
+    assert flaky.calls == calls_while_benched
+
+    clock.now += 31
+    flaky.fail = False
+    _call(router)
+    assert router.routing_stats()["providers"]["flaky"]["healthy"] is True
+
+def test_raises_when_every_provider_fails():
+    clock = FakeClock()
+    router = LLMRouter([FakeService("a", clock, fail=True), FakeService("b", clock, fail=True)], clock=clock)
+
+    with pytest.raises(ConnectionError):
+        _call(router)
+
+def test_async_and_stream_fail_over_before_first_chunk():
+    clock = FakeClock()
+    router = LLMRouter([FakeService("broken", clock, fail=True), FakeService("backup", clock)], clock=clock)
+
+    async def run():
+        text = await router.achat_completion([{"role": "user", "content": "oi"}])
+        chunks = [chunk async for chunk in router.astream_chat_completion([])]
+        return text, chunks
+
+    text, chunks = asyncio.run(run())
+
+    assert text == "backup"
+    assert chunks == ["ba", "ckup"]
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from ai_agent.llm_services.usage import UsageTracker, extract_usage
+
+def test_extract_usage_openai_shape():
+    usage = SimpleNamespace(
+        prompt_tokens=3000,
+        completion_tokens=800,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=2560),
+    )
+
+    assert extract_usage(usage) == {"prompt_tokens": 3000, "completion_tokens": 800, "cached_tokens": 2560}
+
+def test_extract_usage_deepseek_shape():
+    usage = SimpleNamespace(
+        prompt_tokens=3000,
+        completion_tokens=800,
+        prompt_tokens_details=None,
+        prompt_cache_hit_tokens=2944,
+    )
+
+    assert extract_usage(usage)["cached_tokens"] == 2944
+
+def test_extract_usage_missing():
+    assert extract_usage(None) == {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+
+def test_tracker_cache_hit_ratio():
+    tracker = UsageTracker("openai")
+    tracker.record(SimpleNamespace(prompt_tokens=1000, completion_tokens=10, prompt_tokens_details=None))
+    tracker.record(SimpleNamespace(
+        prompt_tokens=1000, completion_tokens=10,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=1000),
+    ))
+
+    stats = tracker.snapshot()
+    assert stats["calls"] == 2
+    assert stats["calls_with_cache_hit"] == 1
+    assert stats["cache_hit_ratio"] == 0.5
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+from ai_agent.llm_services.openai_compatible import OpenAICompatibleService, ProviderConfig, httpx
+from metrics import Counter, Gauge, Histogram, MetricsMiddleware, Registry
+from routers.metrics import router as metrics_router
+
+def test_metrics_are_rendered_in_text_format():
+    registry = Registry()
+    requests = Counter("requests_total", "Requests.", ("route",), registry=registry)
+    in_flight = Gauge("in_flight", "In flight.", registry=registry)
+    latency = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1), registry=registry)
+
+    requests.inc('/a"b')
+    requests.inc('/a"b', amount=2)
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, "/plan")
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="/a\\"b"} 3' in lines
+    assert "in_flight 1" in lines
+    assert 'latency_seconds_bucket{route="/plan",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/plan",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{route="/plan",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{route="/plan"} 3.65' in lines
+    assert 'latency_seconds_count{route="/plan"} 4' in lines
+
+def test_updates_from_many_threads_are_summed():
+    registry = Registry()
+    counter = Counter("calls_total", "Calls.", ("provider",), registry=registry)
+    histogram = Histogram("duration_seconds", "Duration.", registry=registry)
+
+    def work():
+        for _ in range(1000):
+            counter.inc("openai")
+            histogram.observe(0.2)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.collect() == {("openai",): 8000}
+    assert histogram.collect()[()][-1] == 8000
+
+def test_recording_is_cheap():
+    histogram = Histogram("cheap_seconds", "Cheap.", ("route",), registry=Registry())
+    started = time.perf_counter()
+    for _ in range(10000):
+        histogram.observe(0.3, "/generate_plan")
+    assert (time.perf_counter() - started) / 10000 < 50e-6
+
+def test_requests_are_timed_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
+    @app.get("/plans/{plan_id}")
+    async def get_plan(plan_id: int):
+        return {"plan_id": plan_id}
+
+    client = TestClient(app)
+    client.get("/plans/1")
+    client.get("/plans/2")
+    client.get("/does-not-exist")
+    response = client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_request_duration_seconds_count{method="GET",route="/plans/{plan_id}",status="200"}' in response.text
+    samples = metrics.HTTP_REQUEST_DURATION.collect()
+    assert samples[("GET", "/plans/{plan_id}", "200")][-1] >= 2
+    assert ("GET", "unmatched", "404") in samples
+
+def test_provider_calls_report_latency_and_tokens(monkeypatch):
+    monkeypatch.setattr(OpenAICompatibleService, "_instances", {})
+    config = ProviderConfig(name="metrics-test", label="Metrics", api_key_env="METRICS_TEST_KEY",
+                            default_model="tiny", base_url="https://llm.example.test/v1")
+    service = OpenAICompatibleService(config, api_key="sk-test")
+
+    def handler(request):
+        return httpx.Response(200, json={
+            "id": "1", "object": "chat.completion", "created": 0, "model": "tiny",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+            "usage": {"prompt_tokens": 30, "completion_tokens": 5, "total_tokens": 35,
+                      "prompt_tokens_details": {"cached_tokens": 10}},
+        })
+
+    service.client = service.client.with_options(http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+
+    assert service.chat_completion([{"role": "user", "content": "oi"}]) == "ok"
+
+    tokens = metrics.LLM_TOKENS.collect()
+    assert tokens[("metrics-test", "tiny", "prompt")] == 30
+    assert tokens[("metrics-test", "tiny", "cached")] == 10
+    assert metrics.LLM_CALL_DURATION.collect()[("metrics-test", "tiny", "completion", "success")][-1] == 1
+    assert metrics.LLM_CALLS_IN_FLIGHT.collect()[("metrics-test",)] == 0
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from ai_agent.llm_services.deepseek_client import DeepSeekService
+from ai_agent.llm_services.openai_client import OpenAIService
+from ai_agent.llm_services.openai_compatible import (
+    PROVIDERS,
+    HttpSettings,
+    OpenAICompatibleService,
+    ProviderConfig,
+    httpx,
+)
+
+@pytest.fixture(autouse=True)
+def fresh_instances(monkeypatch):
+    monkeypatch.setattr(OpenAICompatibleService, "_instances", {})
+
+def test_http_settings_from_env(monkeypatch):
+    monkeypatch.setenv("LLM_HTTP_MAX_CONNECTIONS", "64")
+    monkeypatch.setenv("LLM_HTTP_READ_TIMEOUT", "90")
+    monkeypatch.setenv("LLM_HTTP2", "false")
+
+    settings = HttpSettings.from_env()
+    options = settings.client_options()
+
+    assert settings.max_connections == 64
+    assert settings.http2 is False
+    assert options["limits"].max_connections == 64
+    assert options["timeout"].read == 90
+    assert options["timeout"].connect == 5
+
+def test_one_singleton_per_provider():
+    openai_service = OpenAIService(api_key="sk-openai")
+    deepseek_service = DeepSeekService(api_key="sk-deepseek")
+
+    assert OpenAIService() is openai_service
+    assert deepseek_service is not openai_service
+    assert deepseek_service.name == "deepseek"
+    assert str(deepseek_service.async_client.base_url).startswith("https://api.deepseek.com")
+
+def test_new_provider_is_just_configuration(monkeypatch):
+    monkeypatch.setenv("ACME_API_KEY", "sk-acme")
+    monkeypatch.setenv("ACME_MODEL", "acme-large")
+    config = ProviderConfig(name="acme", label="Acme", api_key_env="ACME_API_KEY",
+                            default_model="acme-small", base_url="https://llm.acme.test/v1", model_env="ACME_MODEL")
+
+    service = OpenAICompatibleService(config)
+
+    assert service.name == "acme"
+    assert service.default_model == "acme-large"
+    assert service._prepare_request({"temperature": 0, "unknown": 1}) == {"temperature": 0, "model": "acme-large"}
+
+def test_missing_api_key_raises(monkeypatch):
+    monkeypatch.delenv(PROVIDERS["openai"].api_key_env, raising=False)
+
+    with pytest.raises(ValueError):
+        OpenAIService()
+
+def test_warm_up_opens_pooled_connections():
+    service = OpenAIService(api_key="sk-openai", http_settings=HttpSettings(warmup_connections=3))
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"data": []})
+
+    service._async_http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    assert asyncio.run(service.warm_up()) == 3
+    assert len(requests) == 3
+    assert requests[0].url.path.endswith("/models")
+    assert requests[0].headers["Authorization"] == "Bearer sk-openai"
+
+def test_warm_up_failures_do_not_raise():
+    service = OpenAIService(api_key="sk-openai", http_settings=HttpSettings(warmup_connections=2))
+
+    def handler(request):
+        raise httpx.ConnectError("unreachable")
+
+    service._async_http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    assert asyncio.run(service.warm_up()) == 0
+
+def test_json_schema_output_falls_back_to_json_mode():
+    response_format = {"type": "json_schema", "json_schema": {"name": "plan", "schema": {}}}
+
+    openai_request = OpenAIService(api_key="sk-openai")._prepare_request({"response_format": response_format})
+    deepseek_request = DeepSeekService(api_key="sk-deepseek")._prepare_request({"response_format": response_format})
+
+    assert openai_request["response_format"] == response_format
+    assert deepseek_request["response_format"] == {"type": "json_object"}
@@ -0,0 +1,110 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from ai_agent.structured_plan import StructuredPlan
+from database.models import PlanCacheEntry
+from services import plan_cache as plan_cache_module
+from services.plan_cache import PlanCache, depersonalize, personalize, profile_key
+
+PROFILE = {
+    "hours_per_day": {"Segunda": 2, "Terça": 0, "Quarta": 3},
+    "start_date": datetime.date(2025, 3, 10),
+    "python_level": "Iniciante",
+    "sql_level": "Nunca utilizei",
+    "cloud_level": "Iniciante",
+    "used_git": False,
+    "used_docker": False,
+    "interests": ["Dados", "IA"],
+    "main_challenge": None,
+}
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(plan_cache_module, "get_prompt_assets", lambda: SimpleNamespace(version="v1"))
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+def test_key_ignores_formatting_and_zero_hour_days():
+    same = dict(PROFILE, hours_per_day={"Quarta": 3, "Segunda": 2}, interests=[" ia", "dados", "IA"], main_challenge="  ")
+
+    assert profile_key(same, "v1") == profile_key(PROFILE, "v1")
+    assert profile_key(PROFILE, "v2") != profile_key(PROFILE, "v1")
+    assert profile_key(dict(PROFILE, sql_level="Avançado"), "v1") != profile_key(PROFILE, "v1")
+
+def test_name_is_replaced_on_hit():
+    text = "Olá, Maria Souza! Maria, siga o cronograma. Marianne não é afetada."
+    template = depersonalize(text, "Maria Souza")
+
+    assert "Maria" not in template.replace("Marianne", "")
+    assert personalize(template, "João Lima") == "Olá, João Lima! João, siga o cronograma. Marianne não é afetada."
+
+def test_single_word_name_inside_course_names_is_kept():
+    text = "Olá, Ana! Instale o Anaconda antes do Bootcamp Python."
+    template = depersonalize(text, "Ana")
+
+    assert "Anaconda" in template
+    assert personalize(template, "Bruno Lima") == "Olá, Bruno Lima! Instale o Anaconda antes do Bootcamp Python."
+
+def test_memory_then_sqlite_tier(session):
+    cache = PlanCache(memory_size=4)
+    assert cache.get(session, PROFILE, "João") is None
+
+    cache.put(session, PROFILE, "Maria", "Plano da Maria")
+    assert cache.get(session, PROFILE, "João").text == "Plano da João"
+
+    # Outro processo (memória vazia) encontra o plano no SQLite
+    other = PlanCache(memory_size=4)
+    assert other.get(session, PROFILE, "Ana").text == "Plano da Ana"
+    assert other.get(session, PROFILE, "Ana").text == "Plano da Ana"
+
+    stats = other.stats()
+    assert (stats["db_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+    assert cache.stats()["misses"] == 1
+    assert session.get(PlanCacheEntry, profile_key(PROFILE, "v1")).hits == 1
+
+def test_structured_plan_is_personalized_on_hit(session):
+    structured = StructuredPlan(introduction="Olá, Maria Souza!", conclusion="Bons estudos, Maria!")
+    PlanCache(memory_size=4).put(session, PROFILE, "Maria Souza", "Plano da Maria", structured)
+
+    for cache in (PlanCache(memory_size=4), PlanCache(memory_size=0)):
+        hit = cache.get(session, PROFILE, "João Lima")
+        assert hit.text == "Plano da João"
+        assert (hit.structured.introduction, hit.structured.conclusion) == ("Olá, João Lima!", "Bons estudos, João!")
+    assert PlanCache(memory_size=4).get(session, dict(PROFILE, used_git=True), "João") is None
+
+def test_lru_evicts_least_recently_used(session):
+    cache = PlanCache(memory_size=1)
+    cache.put(session, PROFILE, "Maria", "A")
+    cache.put(session, dict(PROFILE, used_git=True), "Maria", "B")
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["memory_entries"] == 1
+
+def test_expired_entries_are_ignored_and_purged(session):
+    cache = PlanCache(ttl_seconds=60)
+    cache.put(session, PROFILE, "Maria", "Plano")
+    entry = session.get(PlanCacheEntry, profile_key(PROFILE, "v1"))
+    entry.created_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1)
+    session.add(entry)
+    session.flush()
+
+    assert PlanCache(ttl_seconds=60).get(session, PROFILE, "João") is None
+    assert session.get(PlanCacheEntry, profile_key(PROFILE, "v1")) is None
+
+    cache.put(session, PROFILE, "Maria", "Plano")
+    entry = session.get(PlanCacheEntry, profile_key(PROFILE, "v1"))
+    entry.created_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1)
+    session.add(entry)
+    session.flush()
+    assert cache.purge_expired(session) == 1
+
+def test_disabled_cache_never_hits(session):
+    cache = PlanCache(enabled=False)
+    cache.put(session, PROFILE, "Maria", "Plano")
+
+    assert cache.get(session, PROFILE, "Maria") is None
@@ -0,0 +1,118 @@
+import asyncio
+import json
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+import pregenerate
+from ai_agent.llm_services.admission import AdmissionRejectedError
+from ai_agent.llm_services.base_client import BaseLLMService
+from database.models import PregenerationCheckpoint, StudyPlan
+from services import plan_service
+from services.degraded_mode import plan_llm_guard
+from services.plan_cache import PlanCache
+from services.similar_plans import SimilarPlanIndex
+
+CSV_HEADER = "name,email,start_date,Segunda,Terça,Quarta,python_level,sql_level,cloud_level,used_git,used_docker,interests,main_challenge\n"
+
+class FakeLLM(BaseLLMService):
+    """Falha nas primeiras chamadas (com os erros dados) e depois responde um plano fixo."""
+    name = "fake"
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def chat_completion(self, messages, **kwargs):
+        raise NotImplementedError
+
+    async def achat_completion(self, messages, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "## Introdução\nPlano gerado."
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+
+    @contextmanager
+    def session_scope():
+        with Session(engine) as session:
+            try:
+                yield session
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+
+    monkeypatch.setattr(pregenerate, "session_scope", session_scope)
+    monkeypatch.setattr(plan_service, "plan_cache", PlanCache(memory_size=0, enabled=False))
+    monkeypatch.setattr(plan_service, "similar_plans", SimilarPlanIndex(threshold=1.1))
+    monkeypatch.setattr(plan_llm_guard, "enabled", False)
+    return engine
+
+@pytest.fixture
+def students_csv(tmp_path):
+    path = tmp_path / "coorte.csv"
+    path.write_text(
+        CSV_HEADER
+        + "Ana Lima,ana@example.com,2025-03-10,2,0,2,Iniciante,Iniciante,Nunca utilizei,sim,não,Dados;IA,\n"
+        + "Bruno Reis,bruno@example.com,2025-03-10,3,3,0,Avançado,Iniciante,Iniciante,false,true,,Tempo\n"
+        + "Carla Dias,carla@example.com,2025-03-10,1,1,1,Iniciante,Iniciante,Nunca utilizei,0,0,,\n"
+        + "Sem Email,,2025-03-10,1,1,1,Iniciante,Iniciante,Nunca utilizei,0,0,,\n",
+        encoding="utf-8",
+    )
+    return path
+
+def test_csv_rows_are_converted_to_requests(students_csv):
+    rows = list(pregenerate.read_rows(students_csv))
+
+    number, first = rows[0]
+    assert number == 1
+    assert first["hours_per_day"] == {"Segunda": 2, "Terça": 0, "Quarta": 2}
+    assert first["used_git"] is True and first["used_docker"] is False
+    assert first["interests"] == ["Dados", "IA"]
+    assert first["main_challenge"] is None
+
+def test_jsonl_rows_are_read(tmp_path):
+    path = tmp_path / "coorte.jsonl"
+    path.write_text(json.dumps({"name": "Ana"}) + "\n\n" + json.dumps({"name": "Bia"}) + "\n", encoding="utf-8")
+
+    assert [row["name"] for _, row in pregenerate.read_rows(path)] == ["Ana", "Bia"]
+
+def test_second_run_skips_completed_rows(engine, students_csv):
+    llm = FakeLLM(errors=[ValueError("resposta inválida")])
+
+    first = asyncio.run(pregenerate.run(students_csv, "coorte", llm, concurrency=1, progress_interval=0))
+
+    assert first["generated"] == 2 and first["failed"] == 1
+    assert [row["row"] for row in first["invalid"]] == [4]
+    with Session(engine) as session:
+        statuses = sorted(c.status for c in session.exec(select(PregenerationCheckpoint)).all())
+        assert statuses == ["done", "done", "failed"]
+
+    second = asyncio.run(pregenerate.run(students_csv, "coorte", llm, concurrency=2, progress_interval=0))
+
+    assert second["already_done"] == 2 and second["generated"] == 1 and second["failed"] == 0
+    assert llm.calls == 4
+    with Session(engine) as session:
+        assert len(session.exec(select(StudyPlan)).all()) == 3
+        assert all(c.status == "done" for c in session.exec(select(PregenerationCheckpoint)).all())
+
+def test_rate_limited_rows_wait_and_retry(engine, students_csv, monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(pregenerate.asyncio, "sleep", fake_sleep)
+    llm = FakeLLM(errors=[AdmissionRejectedError("fake", "queue_full", 7)])
+
+    summary = asyncio.run(pregenerate.run(students_csv, "coorte", llm, concurrency=1, progress_interval=0))
+
+    assert summary["generated"] == 3 and summary["failed"] == 0
+    assert sleeps == [7]
@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+
+from ai_agent.utils.prompt_assets import PromptAssetRegistry, to_builtin
+
+CATALOG = {
+    "bootcamps": [{"nome": "Bootcamp Intensivo Python", "aulas": 20}],
+    "workshops": [{"nome": "Workshop Git e Github", "duracao": "4h"}],
+}
+
+@pytest.fixture
+def assets_dir(tmpdir):
+    data_dir = tmpdir.mkdir("prompt_files")
+    data_dir.join("conteudo_curso.json").write(json.dumps(CATALOG))
+    data_dir.join("guidelines.txt").write("Diretrizes de teste")
+    return data_dir
+
+def _touch(path, content):
+    path.write(content)
+    # Garante mtime diferente mesmo em sistemas de arquivos com baixa resolução
+    stat = os.stat(str(path))
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_load_and_serve_from_memory(assets_dir):
+    registry = PromptAssetRegistry(data_dir=str(assets_dir), poll_interval=0)
+    registry.load()
+
+    for _ in range(5):
+        snapshot = registry.snapshot()
+
+    stats = registry.stats()
+    assert to_builtin(snapshot.conteudo_curso) == CATALOG
+    assert snapshot.guidelines == "Diretrizes de teste"
+    assert stats["file_reads"] == {"conteudo_curso.json": 1, "guidelines.txt": 1}
+    assert stats["snapshot_hits"] == 5
+    assert stats["snapshot_misses"] == 0
+
+def test_snapshot_is_immutable(assets_dir):
+    registry = PromptAssetRegistry(data_dir=str(assets_dir), poll_interval=0)
+    snapshot = registry.load()
+
+    with pytest.raises(TypeError):
+        snapshot.conteudo_curso["bootcamps"] = []
+    assert isinstance(snapshot.conteudo_curso["bootcamps"], tuple)
+
+def test_refresh_swaps_snapshot_when_content_changes(assets_dir):
+    registry = PromptAssetRegistry(data_dir=str(assets_dir), poll_interval=0)
+    old = registry.load()
+
+    assert registry.refresh_if_changed() is False
+
+    _touch(assets_dir.join("guidelines.txt"), "Novas diretrizes")
+    assert registry.refresh_if_changed() is True
+
+    new = registry.snapshot()
+    assert new.guidelines == "Novas diretrizes"
+    assert new.version != old.version
+    assert old.guidelines == "Diretrizes de teste"
+
+def test_refresh_ignores_mtime_only_changes(assets_dir):
+    registry = PromptAssetRegistry(data_dir=str(assets_dir), poll_interval=0)
+    old = registry.load()
+
+    _touch(assets_dir.join("guidelines.txt"), "Diretrizes de teste")
+
+    assert registry.refresh_if_changed() is False
+    assert registry.snapshot().version == old.version
+    assert registry.refresh_if_changed() is False
+
+def test_invalid_reload_keeps_previous_snapshot(assets_dir):
+    registry = PromptAssetRegistry(data_dir=str(assets_dir), poll_interval=0)
+    old = registry.load()
+
+    _touch(assets_dir.join("conteudo_curso.json"), "{invalid")
+
+    assert registry.refresh_if_changed() is False
+    assert registry.snapshot() is old
+    assert registry.stats()["reload_errors"] == 1
+
+def test_failed_reload_is_not_retried_until_the_file_changes(assets_dir):
+    registry = PromptAssetRegistry(data_dir=str(assets_dir), poll_interval=0)
+    registry.load()
+    catalog = assets_dir.join("conteudo_curso.json")
+
+    _touch(catalog, "{invalid")
+    for _ in range(3):
+        assert registry.refresh_if_changed() is False
+    assert registry.stats()["reload_errors"] == 1
+    assert registry.stats()["file_reads"]["conteudo_curso.json"] == 2
+
+    # Arquivo corrigido: a próxima verificação recarrega
+    _touch(catalog, json.dumps(dict(CATALOG, bootcamps=[{"nome": "Bootcamp SQL", "aulas": 10}])))
+    assert registry.refresh_if_changed() is True
+    assert registry.snapshot().conteudo_curso["bootcamps"][0]["nome"] == "Bootcamp SQL"
+
+def test_missing_required_file_raises(tmpdir):
+    registry = PromptAssetRegistry(data_dir=str(tmpdir), poll_interval=0)
+
+    with pytest.raises(FileNotFoundError):
+        registry.load()
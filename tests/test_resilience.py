@@ -0,0 +1,135 @@
+import asyncio
+
+import openai
+import pytest
+
+try:
+    import httpx
+except ImportError:
+    import httpx2 as httpx
+
+from ai_agent.llm_services import resilience
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.llm_services.resilience import CircuitBreaker, CircuitOpenError, ResilientLLMService
+from conftest import FakeClock
+
+def _status_error(status, headers=None):
+    request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return openai.APIStatusError("erro", response=response, body=None)
+
+class ScriptedService(BaseLLMService):
+    """Levanta os erros da lista em ordem e depois responde "ok"."""
+    name = "scripted"
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def chat_completion(self, messages, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+@pytest.fixture
+def sleeps():
+    return []
+
+def _resilient(service, sleeps, clock=None, attempts=3, threshold=3):
+    breaker = CircuitBreaker(service.name, failure_threshold=threshold, open_seconds=30, clock=clock or FakeClock())
+    return ResilientLLMService(service, breaker=breaker, max_attempts=attempts, sleep=sleeps.append)
+
+def test_retries_transient_errors_then_succeeds(sleeps):
+    service = ScriptedService([_status_error(503), _status_error(429)])
+    resilient = _resilient(service, sleeps)
+
+    assert resilient.chat_completion([]) == "ok"
+    assert service.calls == 3
+    assert len(sleeps) == 2
+    assert all(resilience.RETRY_BASE_DELAY <= s <= resilience.RETRY_MAX_DELAY for s in sleeps)
+    assert resilient.resilience_stats()["retries"] == 2
+
+def test_honours_retry_after(sleeps):
+    service = ScriptedService([_status_error(429, {"retry-after": "7"})])
+
+    assert _resilient(service, sleeps).chat_completion([]) == "ok"
+    assert sleeps == [7.0]
+
+def test_retry_after_beyond_cap_raises_immediately(sleeps):
+    service = ScriptedService([_status_error(429, {"retry-after": "600"})])
+
+    with pytest.raises(openai.APIStatusError):
+        _resilient(service, sleeps).chat_completion([])
+    assert service.calls == 1 and sleeps == []
+
+def test_client_errors_are_not_retried(sleeps):
+    service = ScriptedService([_status_error(400)] * 5)
+    resilient = _resilient(service, sleeps, threshold=1)
+
+    with pytest.raises(openai.APIStatusError):
+        resilient.chat_completion([])
+    assert service.calls == 1
+    assert resilient.breaker.state == CircuitBreaker.CLOSED
+
+def test_breaker_opens_rejects_fast_and_recovers_after_probe(sleeps):
+    clock = FakeClock()
+    service = ScriptedService([ConnectionError("down")] * 3)
+    resilient = _resilient(service, sleeps, clock=clock, attempts=3, threshold=3)
+
+    with pytest.raises(ConnectionError):
+        resilient.chat_completion([])
+    assert resilient.breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError) as rejected:
+        resilient.chat_completion([])
+    assert service.calls == 3  # o provedor não foi chamado
+    assert rejected.value.retry_after == 30
+
+    clock.now += 31
+    assert resilient.breaker.state == CircuitBreaker.HALF_OPEN
+    assert resilient.chat_completion([]) == "ok"
+    assert resilient.breaker.snapshot()["state"] == CircuitBreaker.CLOSED
+
+def test_failed_half_open_probe_reopens(sleeps):
+    clock = FakeClock()
+    breaker = CircuitBreaker("p", failure_threshold=1, open_seconds=10, clock=clock)
+    breaker.record_failure()
+    clock.now += 11
+
+    breaker.before_call()  # a sonda passa
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # só uma sonda por vez
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+
+def test_async_stream_retries_before_first_chunk():
+    class FlakyStream(BaseLLMService):
+        name = "flaky"
+        attempts = 0
+
+        def chat_completion(self, messages, **kwargs):
+            return ""
+
+        async def astream_chat_completion(self, messages, **kwargs):
+            self.attempts += 1
+            if self.attempts == 1:
+                raise _status_error(502)
+            yield "a"
+            yield "b"
+
+    service = FlakyStream()
+    waits = []
+
+    async def asleep(delay):
+        waits.append(delay)
+
+    resilient = ResilientLLMService(service, max_attempts=2, asleep=asleep)
+
+    async def run():
+        return [chunk async for chunk in resilient.astream_chat_completion([])]
+
+    assert asyncio.run(run()) == ["a", "b"]
+    assert service.attempts == 2 and len(waits) == 1
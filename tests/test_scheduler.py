@@ -0,0 +1,117 @@
+import datetime
+
+from ai_agent.scheduler import (
+    PRACTICE,
+    THEORY,
+    build_schedule,
+    course_hours,
+    insert_schedule,
+    prioritize_courses,
+)
+from ai_agent.utils.calendar_info import study_calendar
+from ai_agent.utils.catalog_index import CatalogIndex
+
+GUIDELINES = """
+## FUNDAMENTOS ESSENCIAIS
+1. Workshop Git e Github - Versionamento
+2. Bootcamp Intensivo Python - Base
+"""
+
+CATALOG = {
+    "bootcamps": [
+        {"nome": "Bootcamp Intensivo Python", "aulas": 4, "duracao_por_aula": "1h", "duracao_total": "4h", "nivel": "iniciante a intermediário"},
+        {"nome": "Bootcamp Power BI", "aulas": 2, "duracao_por_aula": "1h", "nivel": "iniciante"},
+    ],
+    "workshops": [
+        {"nome": "Workshop Git e Github", "duracao": "2h", "nivel": "iniciante"},
+        {"nome": "Como estruturar seu projeto de dados do Zero", "duracao": "2h", "nivel": "iniciante"},
+    ],
+}
+
+PROFILE = {
+    "python_level": "Iniciante",
+    "sql_level": "Iniciante",
+    "cloud_level": "Iniciante",
+    "used_git": False,
+    "used_docker": False,
+    "interests": ["PowerBI"],
+}
+
+# 06/01/2025 é uma segunda-feira, sem feriados nas semanas seguintes
+START = datetime.date(2025, 1, 6)
+
+def test_course_hours():
+    assert course_hours({"duracao_total": "20h"}) == 20
+    assert course_hours({"duracao": "4h"}) == 4
+    assert course_hours({"aulas": 3, "duracao_por_aula": "1,5h"}) == 5
+
+def test_prioritize_puts_fundamentals_then_interests():
+    index = CatalogIndex(CATALOG, GUIDELINES)
+    names = [course.name for course in index.courses]
+
+    ordered = [c["nome"] for c in prioritize_courses(index, names, PROFILE)]
+
+    assert ordered == [
+        "Workshop Git e Github",
+        "Bootcamp Intensivo Python",
+        "Bootcamp Power BI",
+        "Como estruturar seu projeto de dados do Zero",
+    ]
+
+def test_prioritize_moves_mastered_fundamentals_to_the_end():
+    index = CatalogIndex(CATALOG, GUIDELINES)
+    names = [course.name for course in index.courses]
+
+    ordered = [c["nome"] for c in prioritize_courses(index, names, dict(PROFILE, used_git=True, interests=[]))]
+
+    assert ordered[0] == "Bootcamp Intensivo Python"
+    assert ordered[-1] == "Workshop Git e Github"
+
+def test_prioritize_keeps_courses_with_similar_names():
+    catalog = {
+        "bootcamps": [{"nome": "Bootcamp Dashboards Power BI", "nivel": "Intermediário"}],
+        "workshops": [{"nome": "Workshop Power BI: Dashboards", "nivel": "Iniciante"}],
+    }
+    index = CatalogIndex(catalog)
+    names = [course.name for course in index.courses]
+
+    ordered = [c["nome"] for c in prioritize_courses(index, names, dict(PROFILE, interests=[]))]
+
+    assert sorted(ordered) == sorted(names)
+
+def test_build_schedule_packs_courses_into_days():
+    courses = [CATALOG["workshops"][0], CATALOG["bootcamps"][0]]
+    days = study_calendar(START, {"Segunda": 3, "Quarta": 2}, weeks=2)
+
+    schedule = build_schedule(courses, days, START, weeks=2, practice_ratio=0.5)
+
+    monday = schedule.weeks[0].days[0]
+    assert [(i.course, i.hours, i.kind) for i in monday.items] == [
+        ("Workshop Git e Github", 2, THEORY),
+        ("Workshop Git e Github", 1, PRACTICE),
+    ]
+    assert schedule.scheduled_hours == 9
+    assert schedule.available_hours == 10
+    assert schedule.unscheduled == []
+
+def test_build_schedule_reports_what_does_not_fit():
+    days = study_calendar(START, {"Segunda": 1}, weeks=2)
+
+    schedule = build_schedule([CATALOG["bootcamps"][0]], days, START, weeks=2, practice_ratio=0)
+
+    assert schedule.scheduled_hours == 2
+    assert schedule.unscheduled == [("Bootcamp Intensivo Python", 2)]
+
+def test_render_markdown_has_tables_and_gantt():
+    days = study_calendar(START, {"Segunda": 2}, weeks=1)
+    schedule = build_schedule([CATALOG["workshops"][0]], days, START, weeks=1, practice_ratio=0)
+
+    markdown = schedule.render_markdown("Ana")
+
+    assert "| Segunda 06/01 | Workshop Git e Github | 2h | Teoria |" in markdown
+    assert "title Plano de Estudos: Ana" in markdown
+    assert "Workshop Git e Github :2025-01-06, 2025-01-07" in markdown
+
+def test_insert_schedule_uses_placeholder_or_appends():
+    assert insert_schedule("Intro\n{{CRONOGRAMA}}\nDicas", "TABELAS") == "Intro\nTABELAS\nDicas"
+    assert insert_schedule("Intro", "TABELAS") == "Intro\n\nTABELAS"
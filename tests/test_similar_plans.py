@@ -0,0 +1,76 @@
+import datetime
+import time
+
+from services.similar_plans import SimilarPlanIndex, bucket_key, hours_bucket
+
+BASE = {
+    "hours_per_day": {"Segunda": 2, "Terça": 3, "Quarta": 0},
+    "start_date": datetime.date(2025, 3, 10),
+    "python_level": "Iniciante",
+    "sql_level": "Nunca utilizei",
+    "cloud_level": "Iniciante",
+    "used_git": False,
+    "used_docker": False,
+    "interests": ["Dados"],
+    "main_challenge": "Tenho pouco tempo para estudar Python depois do trabalho",
+}
+
+def _profile(**changes):
+    return dict(BASE, **changes)
+
+def test_hours_are_quantized():
+    assert [hours_bucket(h) for h in range(8)] == [0, 1, 2, 2, 3, 3, 4, 4]
+    assert bucket_key(_profile(hours_per_day={"Segunda": 2, "Terça": 2})) == bucket_key(BASE)
+    assert bucket_key(_profile(hours_per_day={"Segunda": 2, "Terça": 5})) != bucket_key(BASE)
+
+def test_finds_reworded_challenge_in_same_bucket():
+    index = SimilarPlanIndex(threshold=0.6)
+    index.add(1, BASE)
+    index.add(2, _profile(main_challenge="Quero migrar de carreira para engenharia de dados na nuvem"))
+
+    match = index.find(_profile(
+        hours_per_day={"Segunda": 2, "Terça": 2},
+        main_challenge="Pouco tempo para estudar Python, só depois do trabalho",
+    ))
+
+    assert match is not None and match[0] == 1
+    assert 0.6 <= match[1] <= 1.0
+
+def test_levels_and_flags_must_match_exactly():
+    index = SimilarPlanIndex()
+    index.add(1, BASE)
+
+    assert index.find(_profile(sql_level="Avançado")) is None
+    assert index.find(_profile(used_git=True)) is None
+    assert index.find(BASE)[0] == 1
+
+def test_dissimilar_text_is_below_threshold():
+    index = SimilarPlanIndex(threshold=0.85)
+    index.add(1, BASE)
+
+    assert index.find(_profile(main_challenge="Não entendo Docker nem Kubernetes", interests=["DevOps"])) is None
+    assert index.stats()["misses"] == 1
+
+def test_empty_text_only_matches_empty_text():
+    index = SimilarPlanIndex()
+    index.add(1, BASE)
+    index.add(2, _profile(main_challenge=None, interests=None))
+
+    assert index.find(_profile(main_challenge="", interests=[]))[0] == 2
+
+def test_old_plans_are_not_reused():
+    index = SimilarPlanIndex(max_age_days=30)
+    index.add(1, BASE, created_at=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=31))
+
+    assert index.find(BASE) is None
+
+def test_lookup_stays_fast_with_many_plans():
+    index = SimilarPlanIndex()
+    challenges = ["tempo curto", "foco e disciplina", "transição de carreira", "matemática e estatística"]
+    for plan_id in range(20_000):
+        index.add(plan_id, _profile(main_challenge=f"{challenges[plan_id % 4]} {plan_id % 97}"))
+
+    started = time.perf_counter()
+    for _ in range(20):
+        index.find(_profile(main_challenge="foco e disciplina 12"))
+    assert (time.perf_counter() - started) / 20 < 0.02
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from ai_agent import llm_service
+from ai_agent.llm_services.base_client import BaseLLMService
+from startup_profile import IMPORT_BUDGET_SECONDS, StartupProfiler
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend"))
+
+# Loaded on first use (a provider client is created, the similar plan index is filled),
+# never by `import main`
+LAZY_MODULES = [
+    "openai",
+    "numpy",
+    "ai_agent.llm_services.openai_compatible",
+    "ai_agent.llm_services.openai_client",
+    "ai_agent.llm_services.deepseek_client",
+    "ai_agent.llm_services.openrouter_client",
+]
+
+def _import_main(**env):
+    """Importa a aplicação num processo novo e devolve o relatório de inicialização."""
+    script = (
+        "import json, sys\n"
+        "import main\n"
+        "from database import db_handler\n"
+        "from startup_profile import startup_profiler\n"
+        f"lazy = [name for name in {LAZY_MODULES!r} if name in sys.modules]\n"
+        "print(json.dumps({'report': startup_profiler.report(top=1000), 'loaded': lazy,"
+        " 'engine_created': db_handler._engine is not None}))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=60,
+        env={**os.environ, "STARTUP_PROFILE": "false", **env},
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_importing_the_application_stays_within_budget():
+    result = _import_main()
+
+    assert result["loaded"] == []
+    assert not result["engine_created"]
+    assert result["report"]["import_ms"] < IMPORT_BUDGET_SECONDS * 1000
+    assert result["report"]["slowest_imports"] == []
+
+def test_profiling_mode_times_every_imported_module():
+    result = _import_main(STARTUP_PROFILE="true")
+
+    timings = {entry["module"]: entry for entry in result["report"]["slowest_imports"]}
+    assert "fastapi" in timings and "database.db_handler" in timings
+    assert timings["fastapi"]["cumulative_ms"] >= timings["fastapi"]["self_ms"] >= 0
+    # Nested imports are included in the cumulative time of the module that imported them
+    assert timings["fastapi"]["cumulative_ms"] >= timings["fastapi.applications"]["cumulative_ms"]
+
+def test_stages_are_reported_in_order():
+    profiler = StartupProfiler(enabled=False, import_budget=10)
+    with profiler.stage("database"):
+        time.sleep(0.01)
+    with profiler.stage("llm_service"):
+        pass
+    profiler.imports_done()
+
+    report = profiler.report()
+    assert [stage["name"] for stage in report["stages"]] == ["database", "llm_service"]
+    assert report["stages"][0]["ms"] >= 10
+    assert report["import_ms"] is not None
+
+class ReplayLLM(BaseLLMService):
+    """Serviço sem provedor real, como o de replay."""
+    name = "replay"
+
+    def chat_completion(self, messages, **kwargs):
+        raise NotImplementedError
+
+    async def achat_completion(self, messages, **kwargs):
+        raise NotImplementedError
+
+def test_replay_mode_does_not_load_the_provider_clients(monkeypatch):
+    monkeypatch.setattr(llm_service, "CASSETTE_MODE", "replay")
+    monkeypatch.setattr(llm_service, "CassetteLLMService", lambda store, **kwargs: ReplayLLM())
+    monkeypatch.setattr(llm_service, "CassetteStore", lambda: type("Store", (), {"directory": "cassettes"})())
+    created = []
+    monkeypatch.setattr(llm_service, "_load_class", lambda *target: created.append(target))
+
+    service = llm_service.initialize_llm_service()
+
+    assert created == []
+    assert "replay" in service.name
@@ -0,0 +1,173 @@
+import asyncio
+import contextlib
+import datetime
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ai_agent.llm_services.admission import AdmissionRejectedError
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.utils.course_codes import CourseCodeBook
+from ai_agent.utils.stream_rewriter import StreamRewriter
+from database.db_handler import get_session
+from dependencies import get_llm_service
+from routers import chat as chat_router
+from routers.sse import format_sse
+from services import chat_service, plan_service
+from services.chat_service import ChatService
+from services.degraded_mode import DegradedModeGuard
+from services.plan_service import PlanService
+
+CATALOG = {
+    "bootcamps": [{"nome": "Bootcamp Intensivo Python"}],
+    "workshops": [{"nome": "Workshop Git e Github"}, {"nome": "Dashboards: Power BI"}],
+}
+
+def _run(rewriter, chunks):
+    out = [rewriter.feed(chunk) for chunk in chunks]
+    out.append(rewriter.finish())
+    return out
+
+def test_rewriter_expands_codes_split_across_chunks():
+    rewriter = StreamRewriter(codebook=CourseCodeBook(CATALOG))
+
+    out = _run(rewriter, ["Comece pelo [W", "GG] e depois ", "o [BIP", "]."])
+
+    assert "".join(out) == "Comece pelo Workshop Git e Github e depois o Bootcamp Intensivo Python."
+    assert out[0] == "Comece pelo "  # o código incompleto fica retido
+    assert rewriter.text == "".join(out)
+
+def test_rewriter_replaces_placeholder_once():
+    rewriter = StreamRewriter(placeholder="{{CRONOGRAMA}}", replacement="TABELAS")
+
+    out = _run(rewriter, ["Intro\n{", "{CRONO", "GRAMA}}\nFim {{CRONOGRAMA}}"])
+
+    assert "".join(out) == "Intro\nTABELAS\nFim "
+
+def test_rewriter_appends_schedule_when_placeholder_missing():
+    rewriter = StreamRewriter(placeholder="{{CRONOGRAMA}}", replacement="TABELAS")
+
+    assert "".join(_run(rewriter, ["Intro"])) == "Intro\n\nTABELAS"
+
+def test_rewriter_tracks_mermaid_blocks():
+    rewriter = StreamRewriter(codebook=CourseCodeBook(CATALOG))
+
+    out = _run(rewriter, ["[WDPB]\n```mer", "maid\ngantt\n  [WDPB] :2025-01-01, 1d\n", "```\n[WDPB]"])
+
+    assert "".join(out) == (
+        "Dashboards: Power BI\n```mermaid\ngantt\n  Dashboards - Power BI :2025-01-01, 1d\n```\nDashboards: Power BI"
+    )
+
+def test_format_sse():
+    assert format_sse("token", {"content": "Olá"}) == 'event: token\ndata: {"content": "Olá"}\n\n'
+
+class StreamingService(BaseLLMService):
+    name = "fake"
+
+    def __init__(self, chunks, fail=False):
+        self.chunks = chunks
+        self.fail = fail
+
+    def chat_completion(self, messages, **kwargs):
+        return "".join(self.chunks)
+
+    async def astream_chat_completion(self, messages, **kwargs):
+        for chunk in self.chunks:
+            yield chunk
+        if self.fail:
+            raise ConnectionError("provider down")
+
+def _collect(events):
+    async def collect():
+        return [event async for event in events]
+    return asyncio.run(collect())
+
+def test_chat_stream_saves_conversation_and_ends_with_done(monkeypatch):
+    saved = {}
+
+    def fake_update_chat(session, plan_id, conversation_history):
+        saved["chat"] = conversation_history
+        return SimpleNamespace(student_id=7)
+
+    monkeypatch.setattr(chat_service, "session_scope", contextlib.nullcontext)
+    monkeypatch.setattr(chat_service, "update_chat", fake_update_chat)
+    monkeypatch.setattr(chat_service, "COURSE_CODES_ENABLED", False)
+    messages = [{"role": "user", "content": "Explique a semana 2"}]
+
+    events = _collect(ChatService.stream_conversation(3, messages, StreamingService(["Na semana", " 2..."])))
+
+    assert [e for e, _ in events] == ["token", "token", "done"]
+    assert events[-1][1]["plan_id"] == 3
+    assert events[-1][1]["student_id"] == 7
+    assert saved["chat"][-1] == {"role": "assistant", "content": "Na semana 2..."}
+
+def test_chat_stream_reports_errors_without_saving(monkeypatch):
+    monkeypatch.setattr(chat_service, "update_chat", lambda **kwargs: (_ for _ in ()).throw(AssertionError("saved")))
+    monkeypatch.setattr(chat_service, "COURSE_CODES_ENABLED", False)
+
+    events = _collect(ChatService.stream_conversation(3, [], StreamingService(["Na semana"], fail=True)))
+
+    assert [e for e, _ in events] == ["token", "error"]
+
+class SaturatedService(StreamingService):
+    """Provedor sem capacidade: rejeita a chamada antes do primeiro chunk."""
+
+    async def astream_chat_completion(self, messages, **kwargs):
+        raise AdmissionRejectedError("fake", "queue_full", retry_after=3.2)
+        yield
+
+def _chat_client(monkeypatch, llm_service):
+    monkeypatch.setattr(chat_router, "get_study_plan", lambda session, plan_id: SimpleNamespace(id=plan_id))
+    monkeypatch.setattr(chat_service, "session_scope", contextlib.nullcontext)
+    monkeypatch.setattr(chat_service, "update_chat", lambda **kwargs: SimpleNamespace(student_id=7))
+    monkeypatch.setattr(chat_service, "COURSE_CODES_ENABLED", False)
+    app = FastAPI()
+    app.include_router(chat_router.router)
+    app.dependency_overrides[get_session] = lambda: None
+    app.dependency_overrides[get_llm_service] = lambda: llm_service
+    return TestClient(app)
+
+def test_chat_stream_not_admitted_is_rejected_with_429(monkeypatch):
+    client = _chat_client(monkeypatch, SaturatedService([]))
+
+    response = client.post("/continue_chat/stream", json={"plan_id": 3, "messages": [{"role": "user", "content": "Oi"}]})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "4"
+
+def test_chat_stream_route_streams_events(monkeypatch):
+    client = _chat_client(monkeypatch, StreamingService(["Na semana", " 2..."]))
+
+    response = client.post("/continue_chat/stream", json={"plan_id": 3, "messages": [{"role": "user", "content": "Oi"}]})
+
+    assert response.status_code == 200
+    assert response.text.startswith('event: token\ndata: {"content": "Na semana"}')
+    assert "event: done" in response.text
+
+def test_plan_stream_not_admitted_serves_the_overloaded_plan(monkeypatch):
+    guard = DegradedModeGuard(deadline=5, max_in_flight=4, enabled=True)
+    monkeypatch.setattr(plan_service, "plan_llm_guard", guard)
+    monkeypatch.setattr(plan_service, "session_scope", contextlib.nullcontext)
+    monkeypatch.setattr(PlanService, "_reuse_plan", staticmethod(lambda *args: None))
+    saved = {}
+
+    def fake_save_plan(session, request_data, api_data, history, degraded_reason=None, structured=None):
+        saved["degraded_reason"] = degraded_reason
+        return {"plan_id": 1, "degraded_reason": degraded_reason}
+
+    monkeypatch.setattr(PlanService, "_save_plan", staticmethod(fake_save_plan))
+    request = {
+        "name": "Ana Lima", "email": "ana@example.com", "start_date": datetime.date(2025, 3, 10),
+        "hours_per_day": {"Segunda": 2}, "python_level": "Iniciante", "sql_level": "Iniciante",
+        "cloud_level": "Nunca utilizei", "used_git": False, "used_docker": False, "interests": None,
+        "main_challenge": None,
+    }
+
+    events = _collect(PlanService.stream_study_plan(request, SaturatedService([])))
+
+    assert [e for e, _ in events] == ["token", "done"]
+    assert events[-1][1]["degraded_reason"] == saved["degraded_reason"] == "overloaded"
+    stats = guard.stats()
+    assert stats["degraded"]["overloaded"] == 1 and stats["degraded"]["provider_error"] == 0
+    assert stats["in_flight"] == 0
@@ -0,0 +1,154 @@
+import asyncio
+import datetime
+import json
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from ai_agent.llm_services.base_client import BaseLLMService
+from ai_agent.scheduler import ScheduledDay, ScheduledItem, ScheduledWeek, StudySchedule
+from ai_agent.structured_plan import (
+    StructuredPlanError,
+    apply_schedule,
+    parse_structured_plan,
+    render_structured_plan,
+)
+from database.models import StudyPlan
+from services import plan_service
+from services.plan_cache import PlanCache
+from services.plan_service import PlanService
+from services.similar_plans import SimilarPlanIndex
+
+PLAN = {
+    "introduction": "Olá, Ana Lima! Vamos começar.",
+    "overview": "Seis semanas de fundamentos.",
+    "weeks": [{"number": 1, "milestones": ["Concluir Python"]}, {"number": 2, "milestones": ["Praticar SQL"]}],
+    "projects": ["Painel de dados"],
+    "tips": ["Estude todo dia"],
+    "conclusion": "Bons estudos, Ana!",
+}
+
+def _schedule():
+    monday = datetime.date(2025, 3, 10)
+    week = ScheduledWeek(1, monday, monday + datetime.timedelta(days=6), days=[
+        ScheduledDay(monday, "Segunda", 2, items=[ScheduledItem("Python Básico", 2, "Teoria")]),
+    ])
+    return StudySchedule(start=monday, weeks=[week], unscheduled=[("Cloud", 10)], available_hours=2)
+
+def test_json_inside_a_code_block_with_small_deviations_is_accepted():
+    text = "Aqui está o plano:\n```json\n" + json.dumps({
+        "introduction": ["Olá!", "Vamos lá."],
+        "weeks": [{"milestones": "Concluir Python", "days": [
+            {"date": "10/03/2025", "items": {"course": "Python", "hours": "1,5h", "kind": "Prática"}},
+        ]}],
+        "tips": "Uma dica",
+    }) + "\n```"
+
+    plan = parse_structured_plan(text.replace("]}]}", "],}],}"))
+
+    assert plan.introduction == "Olá!\n\nVamos lá."
+    week = plan.weeks[0]
+    assert week.number == 1 and week.milestones == ["Concluir Python"]
+    assert week.days[0].date == datetime.date(2025, 3, 10) and week.days[0].weekday == "Segunda"
+    assert week.days[0].items[0].hours == 2
+    assert plan.tips == ["Uma dica"]
+
+def test_truncated_json_is_closed_locally():
+    text = json.dumps(PLAN)
+    truncated = text[:text.index('"projects"') + len('"projects": ["Painel de')]
+
+    plan = parse_structured_plan(truncated)
+
+    assert [week.number for week in plan.weeks] == [1, 2]
+    assert plan.conclusion == ""
+
+def test_text_without_a_plan_is_rejected():
+    with pytest.raises(StructuredPlanError):
+        parse_structured_plan("## Plano\nSemana 1: Python")
+    with pytest.raises(StructuredPlanError):
+        parse_structured_plan("[1, 2, 3]")
+
+def test_fixed_schedule_replaces_the_model_weeks_and_renders_markdown():
+    plan = apply_schedule(parse_structured_plan(json.dumps(PLAN)), _schedule())
+
+    assert plan.weeks[0].milestones == ["Concluir Python"]
+    assert plan.weeks[0].days[0].items[0].course == "Python Básico"
+    assert plan.unscheduled[0].course == "Cloud"
+
+    markdown = render_structured_plan(plan, "Ana Lima")
+    assert markdown.startswith("# Plano de Estudos: Ana Lima")
+    assert "| Segunda 10/03 | Python Básico | 2h | Teoria |" in markdown
+    assert "```mermaid" in markdown
+    assert "- **Semana 1:** Concluir Python" in markdown
+
+class JsonLLM(BaseLLMService):
+    """Responde o plano estruturado, guardando os argumentos recebidos."""
+    name = "fake"
+
+    def __init__(self):
+        self.calls = []
+
+    def chat_completion(self, messages, **kwargs):
+        raise NotImplementedError
+
+    async def achat_completion(self, messages, **kwargs):
+        self.calls.append((messages, kwargs))
+        return json.dumps(PLAN)
+
+def test_structured_mode_stores_the_plan_next_to_the_chat(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(plan_service, "STRUCTURED_OUTPUT_ENABLED", True)
+    monkeypatch.setattr(plan_service, "plan_cache", PlanCache(memory_size=0, enabled=False))
+    monkeypatch.setattr(plan_service, "similar_plans", SimilarPlanIndex(threshold=1.1))
+    llm = JsonLLM()
+    request = {
+        "name": "Ana Lima", "email": "ana@example.com", "start_date": datetime.date(2025, 3, 10),
+        "hours_per_day": {"Segunda": 2, "Quarta": 2}, "python_level": "Iniciante", "sql_level": "Iniciante",
+        "cloud_level": "Nunca utilizei", "used_git": False, "used_docker": False, "interests": None,
+        "main_challenge": None,
+    }
+
+    with Session(engine) as session:
+        result = asyncio.run(PlanService.generate_study_plan(request, session, llm))
+        stored = session.get(StudyPlan, result["plan_id"])
+
+        messages, kwargs = llm.calls[0]
+        assert kwargs["response_format"]["type"] == "json_schema"
+        assert "FORMATO DE SAÍDA (JSON)" in messages[0]["content"]
+        # The stored conversation keeps the plain prompt, so follow-ups are answered in prose
+        assert "FORMATO DE SAÍDA (JSON)" not in stored.chat[0]["content"]
+        assert stored.chat[1]["content"].startswith("# Plano de Estudos: Ana Lima")
+        assert stored.structured_plan["weeks"][0]["milestones"] == ["Concluir Python"]
+        assert stored.structured_plan["weeks"][0]["days"]
+        assert result["structured_plan"] == stored.structured_plan
+
+@pytest.mark.parametrize("cache_enabled", [True, False])
+def test_reused_plans_keep_the_structured_plan(monkeypatch, cache_enabled):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(plan_service, "STRUCTURED_OUTPUT_ENABLED", True)
+    monkeypatch.setattr(plan_service, "plan_cache", PlanCache(memory_size=4, enabled=cache_enabled))
+    # Sem cache, o plano é reaproveitado pelo índice de planos semelhantes
+    monkeypatch.setattr(plan_service, "similar_plans", SimilarPlanIndex(threshold=0.9))
+    llm = JsonLLM()
+    request = {
+        "name": "Ana Lima", "email": "ana@example.com", "start_date": datetime.date(2025, 3, 10),
+        "hours_per_day": {"Segunda": 2, "Quarta": 2}, "python_level": "Iniciante", "sql_level": "Iniciante",
+        "cloud_level": "Nunca utilizei", "used_git": False, "used_docker": False, "interests": None,
+        "main_challenge": None,
+    }
+
+    with Session(engine) as session:
+        asyncio.run(PlanService.generate_study_plan(request, session, llm))
+        other = dict(request, name="João Souza", email="joao@example.com")
+        result = asyncio.run(PlanService.generate_study_plan(other, session, llm))
+        stored = session.get(StudyPlan, result["plan_id"])
+
+    assert len(llm.calls) == 1
+    assert result["structured_plan"] == stored.structured_plan
+    assert stored.structured_plan["introduction"] == "Olá, João Souza! Vamos começar."
+    assert stored.structured_plan["conclusion"] == "Bons estudos, João!"
+    assert stored.structured_plan["weeks"][0]["days"]
+    assert stored.chat[1]["content"].startswith("# Plano de Estudos: João Souza")